@@ -6,14 +6,18 @@ Agent Type:
 - Utility-based
 - State-aware (hysteresis)
 - Explainable
-- Cloud/Lambda compatible
+- Cloud/Lambda compatible (serverless.py)
 
 This is NOT a rule engine.
 This is a scoring-based decision agent.
 """
 
+import time
+from functools import lru_cache
 from datetime import datetime, timedelta
 
+import numpy as np
+
 # ==================================================
 # 🧠 AGENT KNOWLEDGE BASE (CONFIG)
 # ==================================================
@@ -30,6 +34,30 @@ UTILITY_LIMITS = {
     "DELAY": 35.0
 }
 
+# Field / Climate Agent bands and the climate override
+# (versioned per crop / field profile by policy_registry.py)
+FIELD_LIMITS = {
+    "SOIL_CRITICAL": 25.0,   # % → soil_status CRITICAL
+    "SOIL_LOW": 35.0,        # % → soil_status LOW; rain hold below this
+    "HEAT_STRESS": 32.0,     # °C → heat stress / evaporation risk HIGH
+    "RAIN_SAVE_SOIL": 30.0   # % → a rain hold below this avoids a pump cycle
+}
+
+# Compact decision codes (batch API)
+DECISIONS = ("HOLD", "DELAY", "IRRIGATE", "EMERGENCY_STOP")
+DECISION_CODES = {name: code for code, name in enumerate(DECISIONS)}
+
+# Reason bit flags: decisions carry these (+ soil / temp / elapsed);
+# text is rendered from an LRU of flags + inputs (Reasons, render_reasons)
+REASON_SOIL_BOUNDS = 1
+REASON_TEMP_BOUNDS = 2
+REASON_COOLDOWN = 4
+REASON_HIGH_TEMP = 8
+REASON_LOW_LIGHT = 16
+
+# Bounded LRU of rendered reason lists / explanations
+REASON_CACHE_SIZE = 4096
+
 
 # ==================================================
 # 🔢 HELPER FUNCTIONS (MATH, NOT MAGIC)
@@ -48,13 +76,30 @@ def confidence_from_distance(value, threshold, span=40.0):
     return round(clamp(dist / span, 0.0, 1.0), 2)
 
 
+def _round2(values):
+    """
+    np.round(values, 2) with half-way cases settled by Python's round(),
+    so batch results are bit-identical to the scalar agent.
+    """
+    scaled = values * 100.0
+    out = np.rint(scaled) / 100.0
+    ties = np.flatnonzero(np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6)
+    for i in ties:
+        out[i] = round(float(values[i]), 2)
+    return out
+
+
 # ==================================================
 # 🤖 CORE AGENT
 # ==================================================
 def agentic_decision(
     sensor_data: dict,
     last_action_time: datetime = None,
-    last_decision: str = None
+    last_decision: str = None,
+    now: datetime = None,
+    thresholds: dict = None,
+    utility_limits: dict = None,
+    features: dict = None
 ) -> dict:
     """
     Inputs:
@@ -63,6 +108,10 @@ def agentic_decision(
       }
       last_action_time = datetime or None
       last_decision = previous agent decision
+      now = evaluation time (default: datetime.utcnow())
+      thresholds / utility_limits = policy override (default: module config)
+      features = windowed utility inputs from features.FeatureStore
+                 {"soil", "temperature", "light"} (default: the reading)
 
     Output:
       Decision dict with utility + explanation trace
@@ -75,8 +124,10 @@ def agentic_decision(
     temp = float(sensor_data.get("temperature", -100))
     light = float(sensor_data.get("light", 0))
 
-    now = datetime.utcnow()
-    reasons = []
+    now = now or datetime.utcnow()
+    thresholds = thresholds or THRESHOLDS
+    limits = utility_limits or UTILITY_LIMITS
+    flags = 0
 
     # ----------------------------
     # 2. SAFETY GUARDRAILS
@@ -86,7 +137,7 @@ def agentic_decision(
             "decision": "EMERGENCY_STOP",
             "confidence": 1.0,
             "utility": 0.0,
-            "reasons": ["Soil sensor out of physical bounds"],
+            "reasons": Reasons(REASON_SOIL_BOUNDS, "EMERGENCY_STOP", soil, temp),
             "timestamp": now.isoformat()
         }
 
@@ -95,7 +146,7 @@ def agentic_decision(
             "decision": "EMERGENCY_STOP",
             "confidence": 1.0,
             "utility": 0.0,
-            "reasons": ["Temperature sensor out of physical bounds"],
+            "reasons": Reasons(REASON_TEMP_BOUNDS, "EMERGENCY_STOP", soil, temp),
             "timestamp": now.isoformat()
         }
 
@@ -104,36 +155,43 @@ def agentic_decision(
     # ----------------------------
     if last_action_time:
         elapsed = (now - last_action_time).total_seconds()
-        if elapsed < THRESHOLDS["MIN_INTERVAL_SEC"]:
+        if elapsed < thresholds["MIN_INTERVAL_SEC"]:
             return {
                 "decision": last_decision or "HOLD",
                 "confidence": 1.0,
                 "utility": 0.0,
-                "reasons": [f"Cooldown active ({int(elapsed)}s since last action)"],
+                "reasons": Reasons(REASON_COOLDOWN, last_decision or "HOLD", soil, temp, elapsed),
                 "timestamp": now.isoformat()
             }
 
+    # Windowed features replace the instantaneous reading as utility
+    # inputs; the guardrails above always judge the raw reading
+    if features is not None:
+        soil = features["soil"]
+        temp = features["temperature"]
+        light = features["light"]
+
     # ----------------------------
     # 4. UTILITY CALCULATION
     # ----------------------------
     # Soil urgency (0–100)
     soil_deficit = clamp(
-        THRESHOLDS["SOIL_DRY"] - soil,
+        thresholds["SOIL_DRY"] - soil,
         0.0,
-        THRESHOLDS["SOIL_DRY"]
+        thresholds["SOIL_DRY"]
     )
-    soil_urgency = (soil_deficit / THRESHOLDS["SOIL_DRY"]) * 100
+    soil_urgency = (soil_deficit / thresholds["SOIL_DRY"]) * 100
 
     # Temperature penalty
     temp_penalty = 1.0
-    if temp > THRESHOLDS["TEMP_HIGH"]:
+    if temp > thresholds["TEMP_HIGH"]:
         temp_penalty = 0.5
-        reasons.append(f"High temperature ({temp}°C) increases evaporation risk")
+        flags |= REASON_HIGH_TEMP
 
     # Light suitability
-    light_factor = 1.0 if light >= THRESHOLDS["LIGHT_DAY"] else 0.6
-    if light < THRESHOLDS["LIGHT_DAY"]:
-        reasons.append("Low light detected (non-ideal irrigation window)")
+    light_factor = 1.0 if light >= thresholds["LIGHT_DAY"] else 0.6
+    if light < thresholds["LIGHT_DAY"]:
+        flags |= REASON_LOW_LIGHT
 
     # Final utility score
     irrigation_utility = round(
@@ -144,20 +202,17 @@ def agentic_decision(
     # ----------------------------
     # 5. POLICY DECISION
     # ----------------------------
-    if irrigation_utility >= UTILITY_LIMITS["IRRIGATE"]:
+    if irrigation_utility >= limits["IRRIGATE"]:
         decision = "IRRIGATE"
-        confidence = confidence_from_distance(soil, THRESHOLDS["SOIL_DRY"])
-        reasons.append(f"Soil critically dry ({soil}%)")
+        confidence = confidence_from_distance(soil, thresholds["SOIL_DRY"])
 
-    elif irrigation_utility >= UTILITY_LIMITS["DELAY"]:
+    elif irrigation_utility >= limits["DELAY"]:
         decision = "DELAY"
         confidence = 0.7
-        reasons.append("Moderate dryness — delaying irrigation")
 
     else:
         decision = "HOLD"
         confidence = 0.9
-        reasons.append("Soil moisture within acceptable range")
 
     # ----------------------------
     # 6. OUTPUT
@@ -167,21 +222,270 @@ def agentic_decision(
         "decision": decision,
         "confidence": round(confidence, 2),
         "utility": irrigation_utility,
-        "reasons": reasons,
+        "reasons": Reasons(flags, decision, soil, temp),
         "timestamp": now.isoformat()
     }
 
 
+# ==================================================
+# 🚜 FLEET AGENT (BATCH)
+# ==================================================
+def agentic_decision_batch(
+    soil,
+    temperature,
+    light,
+    last_action_time=None,
+    last_decision=None,
+    now=None,
+    thresholds: dict = None,
+    utility_limits: dict = None,
+    features: dict = None
+) -> dict:
+    """
+    Vectorized agentic_decision for a whole fleet in one NumPy pass.
+
+    Inputs (equal-length array-likes, one row per device):
+      soil, temperature, light = sensor columns
+      last_action_time = epoch seconds, NaN if the device never acted
+      last_decision = DECISION_CODES used while cooling down (default HOLD)
+      now = epoch seconds, shared or per row (default: time.time())
+      thresholds / utility_limits = policy override (default: module config)
+      features = windowed utility input columns {"soil", "temperature",
+                 "light"} from features.FeatureStore (default: the readings)
+
+    Output:
+      Dict of columns: decision (uint8 code), confidence, utility,
+      reasons (REASON_* flags), elapsed (seconds since last action)
+      plus the inputs needed to render reasons with batch_reasons().
+    """
+    soil = np.asarray(soil, dtype=np.float64)
+    temp = np.asarray(temperature, dtype=np.float64)
+    light = np.asarray(light, dtype=np.float64)
+
+    thresholds = thresholds or THRESHOLDS
+    limits = utility_limits or UTILITY_LIMITS
+
+    inputs = utility_inputs(soil, temp, light, features)
+    decision, confidence, utility, reasons = _utility_batch(*inputs, thresholds, limits)
+    return _finish_batch(
+        decision, confidence, utility, reasons, soil, temp,
+        last_action_time, last_decision, now, thresholds, inputs
+    )
+
+
+def utility_inputs(soil, temp, light, features: dict = None) -> tuple:
+    """(soil, temperature, light) columns the utility step scores."""
+    if features is None:
+        return soil, temp, light
+    return (
+        np.asarray(features["soil"], dtype=np.float64),
+        np.asarray(features["temperature"], dtype=np.float64),
+        np.asarray(features["light"], dtype=np.float64)
+    )
+
+
+def _utility_batch(soil, temp, light, thresholds: dict, limits: dict) -> tuple:
+    """
+    Utility-based policy columns (steps 4–5 of the scalar agent):
+    decision codes, confidence, utility, REASON_* flags.
+    """
+    n = soil.shape[0]
+
+    # Utility (same operation order as the scalar agent)
+    soil_deficit = np.clip(
+        thresholds["SOIL_DRY"] - soil,
+        0.0,
+        thresholds["SOIL_DRY"]
+    )
+    soil_urgency = (soil_deficit / thresholds["SOIL_DRY"]) * 100
+
+    high_temp = temp > thresholds["TEMP_HIGH"]
+    temp_penalty = np.where(high_temp, 0.5, 1.0)
+
+    low_light = light < thresholds["LIGHT_DAY"]
+    light_factor = np.where(light >= thresholds["LIGHT_DAY"], 1.0, 0.6)
+
+    utility = _round2(soil_urgency * temp_penalty * light_factor)
+
+    # Policy decision
+    irrigate = utility >= limits["IRRIGATE"]
+    delay = ~irrigate & (utility >= limits["DELAY"])
+
+    decision = np.full(n, DECISION_CODES["HOLD"], dtype=np.uint8)
+    decision[delay] = DECISION_CODES["DELAY"]
+    decision[irrigate] = DECISION_CODES["IRRIGATE"]
+
+    confidence = np.where(delay, 0.7, 0.9)
+    confidence[irrigate] = _round2(
+        np.clip(np.abs(soil[irrigate] - thresholds["SOIL_DRY"]) / 40.0, 0.0, 1.0)
+    )
+
+    reasons = (
+        np.where(high_temp, REASON_HIGH_TEMP, 0)
+        | np.where(low_light, REASON_LOW_LIGHT, 0)
+    ).astype(np.uint8)
+
+    return decision, confidence, utility, reasons
+
+
+def _finish_batch(
+    decision, confidence, utility, reasons, soil, temp,
+    last_action_time, last_decision, now, thresholds: dict, inputs: tuple = None
+) -> dict:
+    """
+    Guardrails and hysteresis (steps 2–3 of the scalar agent) applied
+    over utility columns, in place; builds the batch result dict.
+    soil / temp are the raw readings; inputs = the utility inputs that
+    reason text quotes (default: the raw readings).
+    """
+    n = soil.shape[0]
+    if now is None:
+        now = time.time()
+
+    # Safety guardrails (NaN fails both comparisons, like the scalar agent)
+    soil_fault = ~((soil >= 0) & (soil <= 100))
+    temp_fault = ~((temp >= -10) & (temp <= 60)) & ~soil_fault
+    guard = soil_fault | temp_fault
+
+    # Hysteresis
+    if last_action_time is None:
+        elapsed = np.full(n, np.nan)
+    else:
+        elapsed = np.asarray(now, dtype=np.float64) - np.asarray(last_action_time, dtype=np.float64)
+    cooldown = (elapsed < thresholds["MIN_INTERVAL_SEC"]) & ~guard
+
+    # Cooldown and guardrails short-circuit the utility result
+    if last_decision is None:
+        decision[cooldown] = DECISION_CODES["HOLD"]
+    else:
+        decision[cooldown] = np.asarray(last_decision, dtype=np.uint8)[cooldown]
+    reasons[cooldown] = REASON_COOLDOWN
+
+    decision[guard] = DECISION_CODES["EMERGENCY_STOP"]
+    reasons[soil_fault] = REASON_SOIL_BOUNDS
+    reasons[temp_fault] = REASON_TEMP_BOUNDS
+
+    stopped = guard | cooldown
+    confidence[stopped] = 1.0
+    utility[stopped] = 0.0
+
+    return {
+        "decision": decision,
+        "confidence": confidence,
+        "utility": utility,
+        "reasons": reasons,
+        "elapsed": elapsed,
+        "soil": soil if inputs is None else inputs[0],
+        "temperature": temp if inputs is None else inputs[1],
+        # Per-row clocks (replay) have no single batch timestamp
+        "timestamp": datetime.utcfromtimestamp(now).isoformat() if np.ndim(now) == 0 else None
+    }
+
+
+@lru_cache(maxsize=REASON_CACHE_SIZE)
+def _reason_text(flags: int, decision: str, soil, temp, elapsed) -> tuple:
+    if flags & REASON_SOIL_BOUNDS:
+        return ("Soil sensor out of physical bounds",)
+    if flags & REASON_TEMP_BOUNDS:
+        return ("Temperature sensor out of physical bounds",)
+    if flags & REASON_COOLDOWN:
+        return (f"Cooldown active ({elapsed}s since last action)",)
+
+    reasons = []
+    if flags & REASON_HIGH_TEMP:
+        reasons.append(f"High temperature ({temp}°C) increases evaporation risk")
+    if flags & REASON_LOW_LIGHT:
+        reasons.append("Low light detected (non-ideal irrigation window)")
+
+    if decision == "IRRIGATE":
+        reasons.append(f"Soil critically dry ({soil}%)")
+    elif decision == "DELAY":
+        reasons.append("Moderate dryness — delaying irrigation")
+    else:
+        reasons.append("Soil moisture within acceptable range")
+
+    return tuple(reasons)
+
+
+def _reason_key(flags: int, decision: str, soil: float, temp: float, elapsed: float) -> tuple:
+    """
+    Keep only the parameters the text uses, so the LRU key is small.
+    (+ 0.0 folds -0.0 into 0.0: they hash equal, so must render equal.)
+    """
+    if flags & (REASON_SOIL_BOUNDS | REASON_TEMP_BOUNDS):
+        return flags, decision, None, None, None
+    if flags & REASON_COOLDOWN:
+        return flags, decision, None, None, int(elapsed)
+    return (
+        flags,
+        decision,
+        soil + 0.0 if decision == "IRRIGATE" else None,
+        temp if flags & REASON_HIGH_TEMP else None,
+        None
+    )
+
+
+def render_reasons(flags: int, decision: str, soil: float, temp: float, elapsed: float) -> list:
+    """The scalar agent's reasons list from REASON_* flags + inputs."""
+    return list(_reason_text(*_reason_key(flags, decision, soil, temp, elapsed)))
+
+
+def batch_reasons(batch: dict, i: int) -> list:
+    """
+    Render the scalar agent's reasons list for row i of a batch result.
+    """
+    return render_reasons(
+        int(batch["reasons"][i]),
+        DECISIONS[batch["decision"][i]],
+        float(batch["soil"][i]),
+        float(batch["temperature"][i]),
+        float(batch["elapsed"][i])
+    )
+
+
+class Reasons(list):
+    """
+    The scalar agent's reasons list (a plain list: JSON, append, ==),
+    plus key(): the hashable (flags, decision, soil, temp, elapsed) the
+    text was rendered from. The text comes from the _reason_text LRU, so
+    a repeated decision formats nothing.
+    """
+
+    __slots__ = ("_key",)
+
+    def __init__(self, flags: int, decision: str, soil: float, temp: float, elapsed: float = 0.0):
+        self._key = _reason_key(flags, decision, soil, temp, elapsed)
+        super().__init__(_reason_text(*self._key))
+
+    def key(self) -> tuple:
+        """What the text was rendered from (explanation cache key)."""
+        return self._key
+
+
 # ==================================================
 # 🗣️ EXPLANATION LAYER (LLM-READY)
 # ==================================================
 def generate_explanation(agent_output: dict) -> str:
-    decision = agent_output["decision"]
-    conf = int(agent_output["confidence"] * 100)
-    util = agent_output["utility"]
+    return _explanation(
+        agent_output["decision"],
+        int(agent_output["confidence"] * 100),
+        agent_output["utility"],
+        tuple(agent_output["reasons"])
+    )
+
 
+@lru_cache(maxsize=REASON_CACHE_SIZE)
+def _explanation(decision: str, conf: int, util: float, reasons: tuple) -> str:
     header = f"🧠 AI Decision: {decision} | Confidence: {conf}% | Utility: {util}"
 
-    explanation = "\n".join([f"- {r}" for r in agent_output["reasons"]])
+    explanation = "\n".join([f"- {r}" for r in reasons])
 
     return f"{header}\nReasoning:\n{explanation}"
+
+
+def reason_cache_info() -> dict:
+    """Hit / miss counters of the rendered-text LRU caches."""
+    return {
+        name: cache.cache_info()._asdict()
+        for name, cache in (("reasons", _reason_text), ("explanations", _explanation))
+    }
@@ -0,0 +1,690 @@
+"""
+AgriAgents - Historical Analytics
+Columnar, partitioned exports of the durable log and aggregations over them.
+
+The decision timeline keeps 30 entries and rollups keep fixed buckets;
+questions like "water saved per field last month" or "decision mix by
+hour" need every reading. The exporter tails the telemetry log
+(AGRI_LOG_DIR) in the background and writes it out column by column;
+queries read only the parts, columns and row ranges they need, one part
+at a time, so scans never hold the history in the ingest process's heap.
+
+Layout (<dir>, default <AGRI_LOG_DIR>/analytics; one exporter per dir):
+  manifest.json                               parts, zone maps, log watermark
+  devices.txt, fields.txt                     JSON id dictionaries (line = index)
+  day=2026-05-01/bucket=03/part-000042/<column>.npy
+
+Exports:
+- Partitioned by UTC day and device bucket (log device index %
+  DEVICE_BUCKETS): a directory per device would be 50 000 tiny files a
+  day. Rows in a part are sorted by (device, timestamp)
+- Each part records min / max of the filter columns (zone maps) and
+  the .npy header size per column, so reads skip header parsing
+- A partition holding more than MAX_PARTS parts, or more than one for a
+  closed day, is compacted into one part. Replaced parts are deleted by
+  the next export, so queries in flight keep their files
+- The manifest is replaced last (atomic): after a crash mid-export the
+  same log records are exported again over the orphan parts
+
+Schema (timeline-like, one row per logged reading; no control records):
+  timestamp f8, device u4, field u4 (0 = none), soil f4, temperature f4,
+  light u2, decision u1, reason u1 (OVERRIDE_REASONS code),
+  rain_expected, backfill, pump_run (actuated IRRIGATE), cycle_avoided
+  (bools), water_saved f4 (liters this reading saved)
+Avoided cycles are re-derived with the ingest rule and default field
+limits (like ImpactRollups.fold_log); field = the device's field when
+the reading is exported.
+
+Queries (AnalyticsStore.query):
+  filters   start / end (epoch), device_id, field_id, decision
+  group_by  day, hour, hour_of_day, device, field, decision, reason
+  metrics   see METRICS
+- Predicate pushdown: device bucket, then zone maps prune whole parts;
+  a device filter binary-searches the sorted device column; parts whose
+  zone map lies inside a range skip that column's row filter
+- Column pruning: only filter, group and metric columns are opened
+- Each part is reduced to partial aggregates, merged once at the end;
+  group keys are packed into one integer and counted densely when small
+"""
+
+import argparse
+import json
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+
+from agentic_engine import DECISIONS, DECISION_CODES, FIELD_LIMITS
+from pipeline import OVERRIDE_REASONS, PUMP_FLOW_LPM
+from telemetry_log import (
+    FLAG_BACKFILL,
+    FLAG_CONTROL,
+    FLAG_RAIN,
+    RECORD_DTYPE,
+    TelemetryLogReader,
+    id_line,
+    load_ids
+)
+
+DEVICE_BUCKETS = 16
+MAX_PARTS = 8
+EXPORT_SEC = 60.0
+EXPORT_BATCH = 1 << 20  # log records per export pass
+MAX_ROWS = 10000        # result rows per query
+MANIFEST = "manifest.json"
+DAY_SEC = 86400
+
+COLUMNS = (
+    ("timestamp", "<f8"),
+    ("device", "<u4"),
+    ("field", "<u4"),
+    ("soil", "<f4"),
+    ("temperature", "<f4"),
+    ("light", "<u2"),
+    ("decision", "u1"),
+    ("reason", "u1"),
+    ("rain_expected", "?"),
+    ("backfill", "?"),
+    ("pump_run", "?"),
+    ("cycle_avoided", "?"),
+    ("water_saved", "<f4")
+)
+DTYPES = {name: np.dtype(dtype) for name, dtype in COLUMNS}
+ZONE_MAPS = ("timestamp", "device", "field", "decision")
+
+# metric → (column, reduction); means are sums divided by count at the end
+METRICS = {
+    "count": (None, "sum"),
+    "water_saved_liters": ("water_saved", "sum"),
+    "pump_runs": ("pump_run", "sum"),
+    "pump_cycles_avoided": ("cycle_avoided", "sum"),
+    "water_used_liters": ("pump_run", "sum"),  # 1-minute runs at PUMP_FLOW_LPM
+    "soil_mean": ("soil", "sum"),
+    "soil_min": ("soil", "min"),
+    "soil_max": ("soil", "max"),
+    "temp_mean": ("temperature", "sum"),
+    "temp_max": ("temperature", "max")
+}
+DEFAULT_METRICS = ("count", "water_saved_liters", "pump_runs", "pump_cycles_avoided")
+
+# group → source column
+GROUPS = {
+    "day": "timestamp",
+    "hour": "timestamp",
+    "hour_of_day": "timestamp",
+    "device": "device",
+    "field": "field",
+    "decision": "decision",
+    "reason": "reason"
+}
+
+
+def _day_name(day: int) -> str:
+    return time.strftime("%Y-%m-%d", time.gmtime(day * DAY_SEC))
+
+
+def _read_manifest(directory: str) -> dict:
+    path = os.path.join(directory, MANIFEST)
+    if not os.path.exists(path):
+        return {
+            "version": 1,
+            "source": {"segment": None, "records": 0},
+            "exported_until": None,
+            "next_part": 1,
+            "parts": [],
+            "retired": []
+        }
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+# ==================================================
+# 📤 EXPORTER (LOG → COLUMNAR PARTS)
+# ==================================================
+class AnalyticsExporter:
+
+    def __init__(self, log_dir: str, directory: str, field_of=None, flush=None,
+                 max_parts: int = MAX_PARTS, batch: int = EXPORT_BATCH):
+        """
+        field_of(device_id) → field_id (e.g. ImpactRollups.field_of);
+        flush() pushes buffered log writes to disk before each export.
+        """
+        self.log_dir = log_dir
+        self.directory = directory
+        self.field_of = field_of or (lambda device_id: None)
+        self.flush = flush
+        self.max_parts = max_parts
+        self.batch = batch
+
+        self.exports = 0
+        self.rows_exported = 0
+        self.parts_written = 0
+        self.compactions = 0
+        self.errors = 0
+        self.last_error = None
+        self.last_export_ms = 0.0
+
+        os.makedirs(directory, exist_ok=True)
+        self._devices = load_ids(os.path.join(directory, "devices.txt"))
+        self._fields = load_ids(os.path.join(directory, "fields.txt")) or [""]
+        self._field_index = {field_id: i for i, field_id in enumerate(self._fields)}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def export(self) -> int:
+        """Log records after the watermark → parts. Returns rows exported."""
+        with self._lock:
+            started = time.perf_counter()
+            if self.flush is not None:
+                self.flush()
+            manifest = _read_manifest(self.directory)
+            self._purge(manifest)
+
+            with TelemetryLogReader(self.log_dir) as reader:
+                records, source = self._new_records(reader, manifest["source"])
+                self._sync_dictionaries(reader.device_ids)
+                columns = self._columns(records, reader.device_ids) if len(records) else None
+
+            if columns is not None:
+                self._write(manifest, columns)
+                until = float(columns["timestamp"].max())
+                manifest["exported_until"] = max(until, manifest["exported_until"] or until)
+            self.compactions += self._compact(manifest)
+            manifest["source"] = source
+
+            path = os.path.join(self.directory, MANIFEST)
+            with open(path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(manifest, f)
+            os.replace(path + ".tmp", path)
+
+            self.exports += 1
+            self.rows_exported += len(records)
+            self.last_export_ms = round((time.perf_counter() - started) * 1000, 3)
+            return len(records)
+
+    def _new_records(self, reader, source: dict) -> tuple:
+        """Readings after the watermark (at most batch records) + the new watermark."""
+        chunks, taken = [], 0
+        segment, done = source["segment"], source["records"]
+        for name, records in zip(reader.names, reader.segments):
+            if segment is not None and name < segment:
+                continue
+            start = done if name == segment else 0
+            chunk = records[start:start + self.batch - taken]
+            readings = (chunk["flags"] & FLAG_CONTROL) == 0
+            # Stop at a record whose devices.txt line is not synced yet
+            unknown = np.flatnonzero(readings & (chunk["device"] >= len(reader.device_ids)))
+            if len(unknown):
+                chunk, readings = chunk[:unknown[0]], readings[:unknown[0]]
+            chunks.append(chunk[readings])
+            taken += len(chunk)
+            source = {"segment": name, "records": start + len(chunk)}
+            if len(unknown) or taken >= self.batch:
+                break
+        records = np.concatenate(chunks) if chunks else np.empty(0, dtype=RECORD_DTYPE)
+        return records, source
+
+    def _sync_dictionaries(self, device_ids: list):
+        if len(device_ids) > len(self._devices):
+            with open(os.path.join(self.directory, "devices.txt"), "a", encoding="utf-8") as f:
+                f.writelines(id_line(device_id) for device_id in device_ids[len(self._devices):])
+            self._devices = list(device_ids)
+
+    def _field(self, field_id) -> int:
+        if field_id is None:
+            return 0
+        index = self._field_index.get(field_id)
+        if index is None:
+            index = self._field_index[field_id] = len(self._fields)
+            self._fields.append(field_id)
+            with open(os.path.join(self.directory, "fields.txt"), "w", encoding="utf-8") as f:
+                f.writelines(id_line(name) for name in self._fields)
+        return index
+
+    def _columns(self, records, device_ids: list) -> dict:
+        """Log records → export columns (copies: the log is unmapped after)."""
+        device = records["device"].astype("<u4")
+        unique, inverse = np.unique(device, return_inverse=True)
+        fields = np.array([self._field(self.field_of(device_ids[d])) for d in unique.tolist()], dtype="<u4")
+
+        decision = records["decision"].astype("u1")
+        flags = records["flags"]
+        rain = (flags & FLAG_RAIN) != 0
+        backfill = (flags & FLAG_BACKFILL) != 0
+        avoided = (records["soil"] < FIELD_LIMITS["RAIN_SAVE_SOIL"]) & (decision == DECISION_CODES["HOLD"]) & rain
+        return {
+            "timestamp": records["timestamp"].astype("<f8"),
+            "device": device,
+            "field": fields[inverse.reshape(-1)],
+            "soil": records["soil"].astype("<f4"),
+            "temperature": records["temperature"].astype("<f4"),
+            "light": records["light"].astype("<u2"),
+            "decision": decision,
+            "reason": records["reason"].astype("u1"),
+            "rain_expected": rain,
+            "backfill": backfill,
+            "pump_run": ~backfill & (decision == DECISION_CODES["IRRIGATE"]),
+            "cycle_avoided": avoided,
+            "water_saved": (avoided * float(PUMP_FLOW_LPM)).astype("<f4")
+        }
+
+    def _write(self, manifest: dict, columns: dict):
+        """One part per (day, device bucket) present in columns."""
+        day = (columns["timestamp"] // DAY_SEC).astype(np.int64)
+        bucket = (columns["device"] % DEVICE_BUCKETS).astype(np.int64)
+        order = np.lexsort((columns["timestamp"], columns["device"], bucket, day))
+        day, bucket = day[order], bucket[order]
+        columns = {name: values[order] for name, values in columns.items()}
+
+        edges = np.flatnonzero((np.diff(day) != 0) | (np.diff(bucket) != 0)) + 1
+        for lo, hi in zip(np.r_[0, edges].tolist(), np.r_[edges, len(day)].tolist()):
+            self._write_part(
+                manifest, int(day[lo]), int(bucket[lo]),
+                {name: values[lo:hi] for name, values in columns.items()}
+            )
+
+    def _write_part(self, manifest: dict, day: int, bucket: int, columns: dict):
+        path = f"day={_day_name(day)}/bucket={bucket:02d}/part-{manifest['next_part']:06d}"
+        manifest["next_part"] += 1
+        full = os.path.join(self.directory, path)
+        os.makedirs(full, exist_ok=True)
+        nbytes = 0
+        offsets = {}
+        for name, dtype in COLUMNS:
+            values = np.ascontiguousarray(columns[name], dtype=dtype)
+            column = os.path.join(full, name + ".npy")
+            np.save(column, values)
+            nbytes += values.nbytes
+            offsets[name] = os.path.getsize(column) - values.nbytes  # .npy header
+
+        manifest["parts"].append({
+            "path": path,
+            "day": day,
+            "bucket": bucket,
+            "rows": len(columns["timestamp"]),
+            "bytes": nbytes,
+            "offsets": offsets,
+            "min": {name: columns[name].min().item() for name in ZONE_MAPS},
+            "max": {name: columns[name].max().item() for name in ZONE_MAPS}
+        })
+        self.parts_written += 1
+
+    def _compact(self, manifest: dict) -> int:
+        """Merge partitions with too many parts (closed days: into one)."""
+        if not manifest["parts"]:
+            return 0
+        newest = max(part["day"] for part in manifest["parts"])
+        partitions = {}
+        for part in manifest["parts"]:
+            partitions.setdefault((part["day"], part["bucket"]), []).append(part)
+
+        compacted = 0
+        for (day, bucket), parts in partitions.items():
+            if len(parts) <= (1 if day < newest else self.max_parts):
+                continue
+            columns = {
+                name: np.concatenate([
+                    np.load(os.path.join(self.directory, part["path"], name + ".npy")) for part in parts
+                ])
+                for name, _ in COLUMNS
+            }
+            order = np.lexsort((columns["timestamp"], columns["device"]))
+            retired = {part["path"] for part in parts}
+            manifest["parts"] = [part for part in manifest["parts"] if part["path"] not in retired]
+            manifest["retired"].extend(sorted(retired))
+            self._write_part(manifest, day, bucket, {name: values[order] for name, values in columns.items()})
+            compacted += 1
+        return compacted
+
+    def _purge(self, manifest: dict):
+        """Delete parts the previous export replaced."""
+        for path in manifest["retired"]:
+            shutil.rmtree(os.path.join(self.directory, path), ignore_errors=True)
+        manifest["retired"] = []
+
+    def start(self, interval: float = EXPORT_SEC):
+        """Export every interval seconds (daemon thread); catches up in batches."""
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    while self.export() >= self.batch:
+                        pass
+                except (OSError, ValueError) as e:
+                    self.errors += 1
+                    self.last_error = str(e)
+
+        self._thread = threading.Thread(target=run, name="agri-analytics-export", daemon=True)
+        self._thread.start()
+        return self
+
+    def stats(self) -> dict:
+        return {
+            "exports": self.exports,
+            "rows_exported": self.rows_exported,
+            "parts_written": self.parts_written,
+            "compactions": self.compactions,
+            "errors": self.errors,
+            "last_error": self.last_error,
+            "last_export_ms": self.last_export_ms
+        }
+
+
+# ==================================================
+# 🔎 QUERIES (READ SIDE)
+# ==================================================
+def _group(keys: np.ndarray) -> tuple:
+    """
+    Key rows [n, k] → (distinct rows, row → group index). Keys are packed
+    into one int64 (mixed radix over each column's range) so grouping is
+    a 1-D sort; unique rows over all columns only when the ranges overflow.
+    """
+    code = np.zeros(len(keys), dtype=np.int64)
+    lows, spans, radix = [], [], 1
+    for column in keys.T:
+        lo = int(column.min())
+        span = int(column.max()) - lo + 1
+        radix *= span
+        if radix >= 1 << 62:
+            unique, inverse = np.unique(keys, axis=0, return_inverse=True)
+            return unique, inverse.reshape(-1)
+        code = code * span + (column - lo)
+        lows.append(lo)
+        spans.append(span)
+
+    if radix <= 4 * len(keys) + 1024:
+        # Dense codes: bincount instead of a sort
+        present = np.flatnonzero(np.bincount(code, minlength=radix))
+        remap = np.empty(radix, dtype=np.int64)
+        remap[present] = np.arange(len(present))
+        unique = np.stack(np.unravel_index(present, spans), axis=1) + np.array(lows, dtype=np.int64)
+        return unique, remap[code]
+    _, first, inverse = np.unique(code, return_index=True, return_inverse=True)
+    return keys[first], inverse.reshape(-1)
+
+
+def _reduce(keys: np.ndarray, partials: dict) -> tuple:
+    """
+    Rows (keys [n, k]) → one row per distinct key. partials: (column,
+    op) → values (None = count); sums via bincount, min / max via
+    reduceat over the key-sorted rows.
+    """
+    unique, inverse = _group(keys)
+    out = {}
+    order = starts = None
+    for (column, op), values in partials.items():
+        if op == "sum":
+            out[(column, op)] = np.bincount(inverse, weights=values, minlength=len(unique))
+            continue
+        if order is None:
+            order = np.argsort(inverse, kind="stable")
+            starts = np.searchsorted(inverse[order], np.arange(len(unique)))
+        reduce = np.minimum if op == "min" else np.maximum
+        out[(column, op)] = reduce.reduceat(np.asarray(values, dtype=np.float64)[order], starts)
+    return unique, out
+
+
+class AnalyticsStore:
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.queries = 0
+        self.query_ms = 0.0
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._snapshot = None
+
+    def _current(self) -> dict:
+        """Manifest + dictionaries, re-read whenever an export replaced the manifest."""
+        try:
+            mtime = os.stat(os.path.join(self.directory, MANIFEST)).st_mtime_ns
+        except OSError:
+            mtime = None
+        with self._lock:
+            if self._snapshot is None or mtime != self._mtime:
+                devices = load_ids(os.path.join(self.directory, "devices.txt"))
+                fields = load_ids(os.path.join(self.directory, "fields.txt")) or [""]
+                self._snapshot = {
+                    "manifest": _read_manifest(self.directory),
+                    "devices": devices,
+                    "device_index": {device_id: i for i, device_id in enumerate(devices)},
+                    "fields": fields,
+                    "field_index": {field_id: i for i, field_id in enumerate(fields) if i}
+                }
+                self._mtime = mtime
+            return self._snapshot
+
+    def query(self, start: float = None, end: float = None, device_id=None, field_id=None,
+              decision: str = None, group_by=(), metrics=None, limit: int = MAX_ROWS) -> dict:
+        started = time.perf_counter()
+        group_by = list(group_by)
+        metrics = list(metrics or DEFAULT_METRICS)
+        unknown = [g for g in group_by if g not in GROUPS] + [m for m in metrics if m not in METRICS]
+        if unknown:
+            raise ValueError(f"unknown group_by / metrics: {', '.join(unknown)}")
+        if decision is not None and decision not in DECISION_CODES:
+            raise ValueError(f"unknown decision: {decision}")
+
+        snapshot = self._current()
+        manifest = snapshot["manifest"]
+
+        # Filters → [lo, hi) on stored codes; an unknown device / field matches nothing
+        ranges = {}
+        empty = False
+        if start is not None or end is not None:
+            ranges["timestamp"] = (-np.inf if start is None else start, np.inf if end is None else end)
+        if device_id is not None:
+            device = snapshot["device_index"].get(device_id)
+            empty |= device is None
+            ranges["device"] = (device, device + 1) if device is not None else (0, 0)
+        if field_id is not None:
+            field = snapshot["field_index"].get(field_id)
+            empty |= field is None
+            ranges["field"] = (field, field + 1) if field is not None else (0, 0)
+        if decision is not None:
+            code = DECISION_CODES[decision]
+            ranges["decision"] = (code, code + 1)
+
+        # Partition + zone-map pruning
+        parts = [] if empty else [
+            part for part in manifest["parts"]
+            if ("device" not in ranges or part["bucket"] == ranges["device"][0] % DEVICE_BUCKETS)
+            and all(part["max"][c] >= lo and part["min"][c] < hi for c, (lo, hi) in ranges.items())
+        ]
+
+        # Column pruning: (column, op) partials this query needs
+        partials_wanted = {METRICS[m] for m in metrics} | {METRICS["count"]}
+        columns_read = set(ranges) | {GROUPS[g] for g in group_by} | {c for c, _ in partials_wanted if c}
+
+        keys_out, partials_out = [], []
+        rows_scanned = rows_matched = 0
+        for part in parts:
+            result = self._scan_part(part, ranges, group_by, partials_wanted)
+            if result is None:
+                continue
+            scanned, matched, keys, partials = result
+            rows_scanned += scanned
+            rows_matched += matched
+            if matched:
+                keys_out.append(keys)
+                partials_out.append(partials)
+
+        rows = []
+        if keys_out:
+            keys, totals = _reduce(
+                np.concatenate(keys_out),
+                {key: np.concatenate([p[key] for p in partials_out]) for key in partials_wanted}
+            )
+            rows = self._render(keys, totals, group_by, metrics, snapshot)
+
+        elapsed = (time.perf_counter() - started) * 1000
+        self.queries += 1
+        self.query_ms += elapsed
+        return {
+            "group_by": group_by,
+            "metrics": metrics,
+            "filters": {
+                name: value for name, value in (
+                    ("start", start), ("end", end), ("device_id", device_id),
+                    ("field_id", field_id), ("decision", decision)
+                ) if value is not None
+            },
+            "rows": rows[:limit],
+            "truncated": len(rows) > limit,
+            "scan": {
+                "parts": len(manifest["parts"]),
+                "parts_pruned": len(manifest["parts"]) - len(parts),
+                "rows_scanned": rows_scanned,
+                "rows_matched": rows_matched,
+                "columns": sorted(columns_read)
+            },
+            "exported_until": manifest["exported_until"],
+            "elapsed_ms": round(elapsed, 3)
+        }
+
+    def _scan_part(self, part: dict, ranges: dict, group_by: list, partials_wanted: set):
+        """One part → (rows scanned, rows matched, group keys, partial aggregates)."""
+        path = os.path.join(self.directory, part["path"])
+
+        def column(name, lo=0, hi=part["rows"]):
+            # Rows [lo, hi) only; the header offset comes from the manifest
+            dtype = DTYPES[name]
+            return np.fromfile(
+                os.path.join(path, name + ".npy"), dtype=dtype, count=hi - lo,
+                offset=part["offsets"][name] + lo * dtype.itemsize
+            )
+
+        lo, hi = 0, part["rows"]
+        if "device" in ranges:
+            lo, hi = np.searchsorted(column("device"), ranges["device"]).tolist()
+            if lo == hi:
+                return None
+
+        mask = None
+        for name, (a, b) in ranges.items():
+            if name == "device" or (part["min"][name] >= a and part["max"][name] < b):
+                continue
+            values = column(name, lo, hi)
+            keep = (values >= a) & (values < b)
+            mask = keep if mask is None else mask & keep
+
+        def load(name):
+            values = column(name, lo, hi)
+            return values[mask] if mask is not None else values
+
+        matched = (hi - lo) if mask is None else int(np.count_nonzero(mask))
+        if not matched:
+            return hi - lo, 0, None, None
+
+        loaded = {}
+        keys = []
+        for group in group_by:
+            source = GROUPS[group]
+            if source not in loaded:
+                loaded[source] = load(source)
+            values = loaded[source]
+            if group == "day":
+                keys.append((values // DAY_SEC).astype(np.int64))
+            elif group == "hour":
+                keys.append((values // 3600).astype(np.int64))
+            elif group == "hour_of_day":
+                keys.append((values // 3600).astype(np.int64) % 24)
+            else:
+                keys.append(values.astype(np.int64))
+        keys = np.stack(keys, axis=1) if keys else np.zeros((matched, 1), dtype=np.int64)
+
+        partials = {}
+        for source, op in partials_wanted:
+            if source is None:
+                partials[(source, op)] = None
+                continue
+            if source not in loaded:
+                loaded[source] = load(source)
+            partials[(source, op)] = loaded[source].astype(np.float64)
+
+        unique, reduced = _reduce(keys, partials)
+        return hi - lo, matched, unique, reduced
+
+    @staticmethod
+    def _render(keys: np.ndarray, totals: dict, group_by: list, metrics: list, snapshot: dict) -> list:
+        count = totals[METRICS["count"]]
+        rows = []
+        for i, key in enumerate(keys.tolist()):
+            row = {}
+            for group, value in zip(group_by, key):
+                if group == "day":
+                    row[group] = _day_name(value)
+                elif group == "hour":
+                    row[group] = time.strftime("%Y-%m-%dT%H:00:00Z", time.gmtime(value * 3600))
+                elif group == "device":
+                    row[group] = snapshot["devices"][value] if value < len(snapshot["devices"]) else str(value)
+                elif group == "field":
+                    row[group] = (snapshot["fields"][value] or None) if value < len(snapshot["fields"]) else str(value)
+                elif group == "decision":
+                    row[group] = DECISIONS[value]
+                elif group == "reason":
+                    row[group] = OVERRIDE_REASONS[value] if value < len(OVERRIDE_REASONS) else value
+                else:
+                    row[group] = value
+            n = count[i]
+            for metric in metrics:
+                total = totals[METRICS[metric]][i]
+                if metric in ("count", "pump_runs", "pump_cycles_avoided"):
+                    row[metric] = int(total)
+                elif metric == "water_used_liters":
+                    row[metric] = round(float(total) * PUMP_FLOW_LPM, 3)
+                elif metric.endswith("_mean"):
+                    row[metric] = round(float(total) / n, 3) if n else None
+                else:
+                    row[metric] = round(float(total), 3)
+            rows.append(row)
+        return rows
+
+    def stats(self) -> dict:
+        manifest = self._current()["manifest"]
+        parts = manifest["parts"]
+        return {
+            "parts": len(parts),
+            "rows": sum(part["rows"] for part in parts),
+            "bytes": sum(part["bytes"] for part in parts),
+            "days": len({part["day"] for part in parts}),
+            "devices": len(self._current()["devices"]),
+            "exported_until": manifest["exported_until"],
+            "queries": self.queries,
+            "avg_query_ms": round(self.query_ms / self.queries, 3) if self.queries else 0.0
+        }
+
+
+# ==================================================
+# 🚀 ENTRYPOINT (OFFLINE EXPORT / QUERY)
+# ==================================================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="AgriAgents analytics export + query")
+    parser.add_argument("--log", required=True, help="telemetry_log directory (AGRI_LOG_DIR)")
+    parser.add_argument("--out", help="analytics directory (default <log>/analytics)")
+    parser.add_argument("--group-by", default="", help="comma-separated: " + ",".join(GROUPS))
+    parser.add_argument("--metrics", default="", help="comma-separated: " + ",".join(METRICS))
+    parser.add_argument("--start", type=float, help="epoch seconds")
+    parser.add_argument("--end", type=float, help="epoch seconds")
+    parser.add_argument("--device-id")
+    parser.add_argument("--field-id")
+    parser.add_argument("--decision")
+    args = parser.parse_args()
+
+    out = args.out or os.path.join(args.log, "analytics")
+    exporter = AnalyticsExporter(args.log, out)
+    while exporter.export() >= exporter.batch:
+        pass
+    print(f"📤 Exported {exporter.rows_exported} readings to {out}")
+
+    print(json.dumps(AnalyticsStore(out).query(
+        start=args.start,
+        end=args.end,
+        device_id=args.device_id,
+        field_id=args.field_id,
+        decision=args.decision,
+        group_by=[g for g in args.group_by.split(",") if g],
+        metrics=[m for m in args.metrics.split(",") if m]
+    ), indent=2))
@@ -0,0 +1,412 @@
+"""
+AgriAgents - Async Micro-Batching Ingest Server
+Asyncio front end for high device counts (no Flask, no dev server).
+
+Flow:
+  connection → parse + validate POST /data (400 for that reading only)
+             → MicroBatcher.submit()
+             → batch closes at max_batch readings or max_delay
+             → one run_batch() call for the whole batch
+             → each waiting request gets its own device decision
+
+Backpressure:
+  More than max_pending in-flight readings → 503 + Retry-After,
+  so overload sheds load instead of growing memory.
+
+Usage:
+    python async_ingest.py --port 5001 --max-batch 256 --max-delay-ms 5
+
+Endpoints:
+    POST /data      same payload as Flask /data, compact decision reply
+    POST /scenario  {"mode": "NORMAL" | "RAIN" | "PUMP_FAIL"}
+    GET  /stats     p50/p99 latency, throughput, batch sizes, capacity
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from climate import ClimateAgent, FileForecastProvider
+from device_state import make_store
+from features import FeatureStore
+from irrigation_scheduler import IrrigationScheduler
+from pipeline import DEFAULT_DEVICE_ID, readings_to_columns, run_batch, batch_results
+from policy_registry import PolicyRegistry
+from sensor_faults import FaultDetector
+from telemetry_log import SCENARIO_MODES
+
+# ESP32 firmware posts one reading every TELEMETRY_INTERVAL
+TELEMETRY_INTERVAL_SEC = 10.0
+
+STATUS_TEXT = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    500: "Internal Server Error",
+    503: "Service Unavailable"
+}
+
+
+class Overloaded(Exception):
+    """Raised by MicroBatcher.submit() when max_pending is reached."""
+
+
+# ==================================================
+# 📦 MICRO-BATCHER
+# ==================================================
+class MicroBatcher:
+    """
+    Collects submitted items and evaluates them in batches.
+
+    evaluate(items) → list of results (same order) runs on a single
+    worker thread so the event loop keeps accepting while a batch runs.
+    """
+
+    def __init__(self, evaluate, max_batch=256, max_delay=0.005, max_pending=10000):
+        self.evaluate = evaluate
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.max_pending = max_pending
+
+        self.pending = 0
+        self.batches = 0
+        self.batched_items = 0
+
+        self._queue = asyncio.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="batch")
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+        self._executor.shutdown(wait=False)
+
+    async def submit(self, item):
+        if self.pending >= self.max_pending:
+            raise Overloaded()
+
+        future = asyncio.get_running_loop().create_future()
+        self.pending += 1
+        self._queue.put_nowait((item, future))
+        try:
+            return await future
+        finally:
+            self.pending -= 1
+
+    async def _collect(self) -> list:
+        batch = [await self._queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_delay
+
+        while len(batch) < self.max_batch:
+            # Drain whatever is already queued without awaiting
+            while len(batch) < self.max_batch and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            if len(batch) >= self.max_batch:
+                break
+
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            items = [item for item, _ in batch]
+
+            try:
+                results = await loop.run_in_executor(self._executor, self.evaluate, items)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.batched_items += len(batch)
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+
+# ==================================================
+# 📈 LATENCY & THROUGHPUT
+# ==================================================
+class IngestStats:
+    """Rolling request latency samples + lifetime counters."""
+
+    def __init__(self, window: int = 50000):
+        self.latencies = deque(maxlen=window)
+        self.started = time.perf_counter()
+        self.requests = 0
+        self.rejected = 0
+
+    def record(self, seconds: float):
+        self.requests += 1
+        self.latencies.append(seconds)
+
+    def report(self, batcher: MicroBatcher) -> dict:
+        elapsed = time.perf_counter() - self.started
+        throughput = self.requests / elapsed if elapsed > 0 else 0.0
+
+        if self.latencies:
+            p50, p99 = np.percentile(np.fromiter(self.latencies, dtype=np.float64), [50, 99])
+        else:
+            p50 = p99 = 0.0
+
+        return {
+            "requests": self.requests,
+            "rejected": self.rejected,
+            "uptime_sec": round(elapsed, 1),
+            "throughput_rps": round(throughput, 1),
+            "latency_ms": {
+                "p50": round(p50 * 1000, 3),
+                "p99": round(p99 * 1000, 3)
+            },
+            "batches": batcher.batches,
+            "avg_batch_size": round(batcher.batched_items / batcher.batches, 1) if batcher.batches else 0.0,
+            "pending": batcher.pending,
+            "max_pending": batcher.max_pending,
+            # Devices this box sustains at the observed rate
+            "fleet_capacity_at_telemetry_interval": int(throughput * TELEMETRY_INTERVAL_SEC)
+        }
+
+
+# ==================================================
+# 🌐 ASYNC INGEST SERVER
+# ==================================================
+class AsyncIngestServer:
+    """
+    The Flask fleet path behind micro-batches: device store, climate,
+    feature windows, policy profiles ("profile" / "field_id" sticky per
+    device, like /data/batch), zone scheduling (zones = fields;
+    zone_limits = IrrigationScheduler defaults, unlimited if omitted)
+    and fault detection (EMERGENCY_STOP lockout if fault_lockout).
+    """
+
+    def __init__(self, store=None, climate=None, policy_file: str = None, zone_limits: dict = None,
+                 fault_lockout: bool = False, max_batch=256, max_delay=0.005, max_pending=10000):
+        self.store = store or make_store("memory")
+        self.climate = climate or ClimateAgent()
+        self.features = FeatureStore()
+        self.fields = {}  # device_id → field_id
+        self.policies = PolicyRegistry(policy_file, field_of=self.fields.get)
+        self.scheduler = IrrigationScheduler(zone_of=self.fields.get, **(zone_limits or {}))
+        self.faults = FaultDetector(lockout=fault_lockout)
+        self.scenario = {"mode": "NORMAL", "rain_eta": None}
+        self.stats = IngestStats()
+        self.batcher = MicroBatcher(
+            self.evaluate,
+            max_batch=max_batch,
+            max_delay=max_delay,
+            max_pending=max_pending
+        )
+
+    # ------------------------------
+    # Engine call (worker thread)
+    # ------------------------------
+    def evaluate(self, items: list) -> list:
+        """items = (reading, row) pairs from handle_data, already validated."""
+        readings = [reading for reading, _ in items]
+        device_ids = [row[0] for _, row in items]
+        soil, temp, light = (
+            np.fromiter((row[k] for _, row in items), dtype=np.float64, count=len(items))
+            for k in (1, 2, 3)
+        )
+        self.climate.locate_readings(readings)
+        self.assign_fields(readings)
+        self.policies.assign_profiles(readings)
+        result = run_batch(
+            self.store, self.scenario, self.climate, device_ids, soil, temp, light,
+            features=self.features,
+            policies=self.policies,
+            scheduler=self.scheduler,
+            faults=self.faults
+        )
+        return batch_results(device_ids, result)
+
+    def assign_fields(self, readings: list):
+        for reading in readings:
+            if reading.get("field_id") is not None:
+                self.fields[reading.get("device_id", DEFAULT_DEVICE_ID)] = str(reading["field_id"])
+
+    # ------------------------------
+    # Routes
+    # ------------------------------
+    async def handle_data(self, body: bytes):
+        started = time.perf_counter()
+        try:
+            reading = json.loads(body)
+        except ValueError:
+            return 400, {"status": "error", "error": "invalid JSON"}
+        if not isinstance(reading, dict):
+            return 400, {"status": "error", "error": "expected a JSON object"}
+        # Validated here, so a bad reading never reaches a shared batch
+        try:
+            columns = readings_to_columns([reading])
+        except ValueError as e:
+            return 400, {"status": "error", "error": str(e).removeprefix("reading 0: ")}
+        row = (columns["device_ids"][0], columns["soil"][0], columns["temp"][0], columns["light"][0])
+
+        try:
+            result = await self.batcher.submit((reading, row))
+        except Overloaded:
+            self.stats.rejected += 1
+            return 503, {"status": "busy", "error": "ingest queue full"}
+        except Exception as e:
+            return 500, {"status": "error", "error": str(e)}
+
+        self.stats.record(time.perf_counter() - started)
+        return 200, {"status": "ok", **result}
+
+    def handle_scenario(self, body: bytes):
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            return 400, {"status": "error", "error": "invalid JSON"}
+        mode = payload.get("mode", "NORMAL") if isinstance(payload, dict) else None
+        if mode not in SCENARIO_MODES:
+            return 400, {"status": "error", "error": f"mode must be one of {', '.join(SCENARIO_MODES)}"}
+
+        # Same transitions as Flask /scenario
+        self.scenario["mode"] = mode
+        self.scenario["rain_eta"] = 90 if mode == "RAIN" else None
+        self.store.reset_scenario(reset_impact=mode not in ("RAIN", "PUMP_FAIL"))
+        self.climate.apply_scenario(mode, time.time(), self.scenario["rain_eta"] or 0)
+        return 200, {"status": "ok", "scenario": self.scenario}
+
+    async def route(self, method: str, path: str, body: bytes):
+        if method == "POST" and path == "/data":
+            return await self.handle_data(body)
+        if method == "POST" and path == "/scenario":
+            return self.handle_scenario(body)
+        if method == "GET" and path == "/stats":
+            return 200, {
+                **self.stats.report(self.batcher),
+                "climate": self.climate.stats(),
+                "features": self.features.stats(),
+                "policy": self.policies.stats(),
+                "schedule": self.scheduler.stats(),
+                "faults": self.faults.stats()
+            }
+        return 404, {"status": "error", "error": "not found"}
+
+    # ------------------------------
+    # Minimal HTTP/1.1 (keep-alive)
+    # ------------------------------
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+
+                method, target, version = request_line.decode("latin-1").split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get("content-length", 0))
+                body = await reader.readexactly(length) if length else b""
+
+                status, payload = await self.route(method, target.split("?", 1)[0], body)
+
+                keep_alive = (
+                    headers.get("connection", "").lower() != "close"
+                    and version == "HTTP/1.1"
+                )
+                data = json.dumps(payload).encode()
+                head = (
+                    f"HTTP/1.1 {status} {STATUS_TEXT[status]}\r\n"
+                    f"Content-Type: application/json\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+                )
+                if status == 503:
+                    head += "Retry-After: 1\r\n"
+                writer.write(head.encode() + b"\r\n" + data)
+                await writer.drain()
+
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host: str = "0.0.0.0", port: int = 5001):
+        if self.policies.path:
+            self.policies.start_watching()
+        self.batcher.start()
+        server = await asyncio.start_server(self.handle_connection, host, port, backlog=4096)
+        async with server:
+            await server.serve_forever()
+
+
+# ==================================================
+# 🚀 ENTRYPOINT
+# ==================================================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="AgriAgents async ingest server")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=5001)
+    parser.add_argument("--max-batch", type=int, default=256)
+    parser.add_argument("--max-delay-ms", type=float, default=5.0)
+    parser.add_argument("--max-pending", type=int, default=10000)
+    parser.add_argument("--backend", default="memory", help="memory | columnar | sqlite")
+    parser.add_argument("--forecast-file", help="JSON forecast grid (default: no rain)")
+    parser.add_argument("--policy-file", default=os.environ.get("AGRI_POLICY_FILE"),
+                        help="policy profiles, hot-reloaded (default: AGRI_POLICY_FILE)")
+    parser.add_argument("--zone-capacity-lpm", type=float, default=os.environ.get("AGRI_ZONE_CAPACITY_LPM"),
+                        help="default zone pump flow limit (default: AGRI_ZONE_CAPACITY_LPM, unlimited)")
+    parser.add_argument("--zone-budget-l", type=float, default=os.environ.get("AGRI_ZONE_BUDGET_L"),
+                        help="default zone daily water budget (default: AGRI_ZONE_BUDGET_L, unlimited)")
+    parser.add_argument("--zone-stagger-sec", type=float, default=os.environ.get("AGRI_ZONE_STAGGER_SEC", 0),
+                        help="default gap between pump starts (default: AGRI_ZONE_STAGGER_SEC, 0)")
+    parser.add_argument("--fault-lockout", action="store_true",
+                        default=os.environ.get("AGRI_FAULT_LOCKOUT", "0") == "1",
+                        help="faulty devices answer EMERGENCY_STOP (default: AGRI_FAULT_LOCKOUT, off)")
+    args = parser.parse_args()
+
+    print("=" * 50)
+    print("🌱 AgriAgents - Async Ingest (micro-batching)")
+    print(f"   Batch: {args.max_batch} readings / {args.max_delay_ms} ms")
+    print(f"   Backpressure: {args.max_pending} pending")
+    print("=" * 50)
+    print()
+
+    ingest = AsyncIngestServer(
+        store=make_store(args.backend),
+        climate=ClimateAgent(FileForecastProvider(args.forecast_file) if args.forecast_file else None),
+        policy_file=args.policy_file,
+        zone_limits={
+            "capacity_lpm": args.zone_capacity_lpm,
+            "budget_liters": args.zone_budget_l,
+            "stagger_sec": args.zone_stagger_sec
+        },
+        fault_lockout=args.fault_lockout,
+        max_batch=args.max_batch,
+        max_delay=args.max_delay_ms / 1000.0,
+        max_pending=args.max_pending
+    )
+    asyncio.run(ingest.serve(args.host, args.port))
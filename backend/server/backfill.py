@@ -0,0 +1,357 @@
+"""
+AgriAgents - Store-and-Forward Backfill
+Catch-up ingestion for readings a device buffered while it was offline.
+
+Readings carrying (seq, device timestamp) are split three ways:
+  duplicate  seq already seen (per-device anti-replay window) → dropped
+  live       newest fresh reading of its device → normal actuating path
+  replay     everything older → replayed in event-time order, not actuated
+
+"Fresh" = timestamped within STALE_SEC of the server clock and newer than
+the device's last live reading. Readings without a device clock
+(timestamp 0) can only go live; older untimed ones are dropped.
+
+Replay (per device, event-time order):
+- Decision Agent + overrides evaluated at the reading's own timestamp,
+  under the device's current policy version
+- Cooldown runs on a scratch clock: replayed IRRIGATE decisions never
+  touch last_action_time / last_decision (nothing was actuated)
+- Impact metrics, rollups (event-time buckets) and the timeline are
+  updated once per unique reading
+- Durable log rows are flagged FLAG_BACKFILL (recovery ignores them for
+  device state)
+
+Streaming: bodies are read in BACKFILL_READ_BYTES chunks and replayed
+chunk by chunk, each device's lock held for one chunk at a time, so hours
+of buffered data neither grow server memory nor stall live ingest.
+"""
+
+import json
+import threading
+from collections import Counter
+
+import numpy as np
+
+from device_state import from_epoch
+from agentic_engine import FIELD_LIMITS
+from pipeline import DEFAULT_DEVICE_ID, PUMP_FLOW_LPM, apply_override
+from policy_table import compiled_policy
+from telemetry_frame import FrameStreamDecoder, frames_to_columns
+
+STALE_SEC = 120             # older readings are history, not commands
+SEQ_WINDOW = 4096           # per-device dedupe window (seq numbers)
+BACKFILL_READ_BYTES = 8192  # ≈ 580 binary readings per chunk
+BACKFILL_CHUNK_LINES = 512  # NDJSON readings per chunk
+
+
+# ==================================================
+# 🔁 SEQUENCE DEDUPE
+# ==================================================
+class SeqTracker:
+    """
+    Sliding anti-replay window per device: the highest seq seen plus a
+    SEQ_WINDOW-bit mask of which seqs below it were seen. Seqs older than
+    the window are rejected, unless the reading is fresh (timestamped
+    after fresh_after and after the device's newest live reading): the
+    device's seq space restarted (32-bit wrap, reflashed or reset
+    counter), so its window restarts at that seq. Also remembers each
+    device's newest live reading time.
+    """
+
+    def __init__(self, window: int = SEQ_WINDOW):
+        self.window = window
+        self.resets = 0
+        self._devices = {}   # device_id → [max_seq, mask, last_live_ts]
+        self._lock = threading.Lock()
+
+    def accept(self, device_ids, seq, timestamp=None, fresh_after: float = None) -> np.ndarray:
+        """Per-row status: 0 new, 1 duplicate, 2 older than the window."""
+        status = np.zeros(len(device_ids), dtype=np.uint8)
+        limit = (1 << self.window) - 1
+        timestamp = (
+            np.zeros(len(device_ids)) if timestamp is None or fresh_after is None
+            else np.asarray(timestamp, dtype=np.float64)
+        )
+        fresh_after = 0.0 if fresh_after is None else fresh_after
+        with self._lock:
+            for i, (device_id, s, ts) in enumerate(zip(device_ids, seq.tolist(), timestamp.tolist())):
+                state = self._devices.get(device_id)
+                if state is None:
+                    self._devices[device_id] = [s, 1, 0.0]
+                    continue
+                top, mask = state[0], state[1]
+                if s > top:
+                    state[0] = s
+                    state[1] = ((mask << (s - top)) | 1) & limit if s - top < self.window else 1
+                elif top - s >= self.window:
+                    if ts > fresh_after and ts > state[2]:
+                        self.resets += 1
+                        state[0], state[1] = s, 1
+                    else:
+                        status[i] = 2
+                elif (mask >> (top - s)) & 1:
+                    status[i] = 1
+                else:
+                    state[1] = mask | (1 << (top - s))
+        return status
+
+    def last_live(self, device_id) -> float:
+        state = self._devices.get(device_id)
+        return state[2] if state else 0.0
+
+    def mark_live(self, device_id, timestamp: float):
+        with self._lock:
+            state = self._devices.get(device_id)
+            if state is not None and timestamp > state[2]:
+                state[2] = timestamp
+
+    def export(self, device_id):
+        """[max_seq, mask, last_live_ts] for shard handover, or None."""
+        with self._lock:
+            state = self._devices.get(device_id)
+            return list(state) if state is not None else None
+
+    def restore(self, device_id, state):
+        with self._lock:
+            self._devices[device_id] = list(state)
+
+    def discard(self, device_id):
+        with self._lock:
+            self._devices.pop(device_id, None)
+
+    def __len__(self):
+        return len(self._devices)
+
+
+def take_rows(columns: dict, rows) -> dict:
+    """Row subset of a columns dict (device_ids list + NumPy columns)."""
+    ids = columns["device_ids"]
+    return {
+        key: [ids[i] for i in rows.tolist()] if key == "device_ids" else value[rows]
+        for key, value in columns.items()
+    }
+
+
+# ==================================================
+# 📥 CHUNKED READERS
+# ==================================================
+def frame_chunks(stream, read_bytes: int = BACKFILL_READ_BYTES):
+    """Binary frame body → columns dict per chunk (FrameError if malformed)."""
+    decoder = FrameStreamDecoder()
+    while True:
+        chunk = stream.read(read_bytes)
+        if not chunk:
+            break
+        readings = decoder.feed(chunk)
+        if len(readings):
+            yield frames_to_columns(readings)
+    decoder.close()
+
+
+def ndjson_chunks(stream, lines: int = BACKFILL_CHUNK_LINES):
+    """
+    One reading per line:
+      {"device_id": ..., "seq": 17, "timestamp": 1760000000, "sensors": {...}}
+    → columns dict per chunk of lines (ValueError if malformed).
+    """
+    batch = []
+    for line in stream:
+        if line.strip():
+            batch.append(json.loads(line))
+        if len(batch) == lines:
+            yield _ndjson_columns(batch)
+            batch = []
+    if batch:
+        yield _ndjson_columns(batch)
+
+
+def _ndjson_columns(readings: list) -> dict:
+    n = len(readings)
+    columns = {
+        "device_ids": [],
+        "soil": np.empty(n),
+        "temp": np.empty(n),
+        "light": np.empty(n),
+        "seq": np.empty(n, dtype=np.int64),
+        "timestamp": np.empty(n)
+    }
+    for i, reading in enumerate(readings):
+        sensors = reading.get("sensors", {})
+        columns["device_ids"].append(reading.get("device_id", DEFAULT_DEVICE_ID))
+        columns["soil"][i] = float(sensors.get("soil", 0))
+        columns["temp"][i] = float(sensors.get("temp", 0))
+        columns["light"][i] = int(sensors.get("light", 0))
+        columns["seq"][i] = int(reading["seq"])
+        columns["timestamp"][i] = float(reading.get("timestamp", 0))
+    return columns
+
+
+# ==================================================
+# ⏪ REPLAY
+# ==================================================
+class BackfillReplayer:
+
+    def __init__(self, store, climate, timeline, scenario: dict, telemetry_log=None, rollups=None,
+                 policies=None, stale_sec: float = STALE_SEC):
+        self.store = store
+        self.climate = climate
+        self.timeline = timeline
+        self.scenario = scenario
+        self.telemetry_log = telemetry_log
+        self.rollups = rollups
+        self.policies = policies
+        self.stale_sec = stale_sec
+        self.seqs = SeqTracker()
+        self.totals = Counter()
+
+    def split(self, columns: dict, now: float) -> tuple:
+        """
+        (live rows, replay rows, counts). At most one live row per device:
+        its newest fresh reading.
+        """
+        device_ids = columns["device_ids"]
+        timestamp = np.asarray(columns["timestamp"], dtype=np.float64)
+        status = self.seqs.accept(
+            device_ids, np.asarray(columns["seq"], dtype=np.int64), timestamp, now - self.stale_sec
+        )
+        counts = Counter(
+            readings=len(device_ids),
+            duplicate=int((status == 1).sum()),
+            too_old=int((status == 2).sum())
+        )
+
+        # Newest accepted reading per device (by timestamp, then arrival)
+        newest = {}
+        for i in np.flatnonzero(status == 0).tolist():
+            best = newest.get(device_ids[i])
+            if best is None or timestamp[i] >= timestamp[best]:
+                newest[device_ids[i]] = i
+
+        live, replay = [], []
+        for i in np.flatnonzero(status == 0).tolist():
+            ts = timestamp[i]
+            if newest[device_ids[i]] == i and (
+                ts == 0 or (ts >= now - self.stale_sec and ts > self.seqs.last_live(device_ids[i]))
+            ):
+                live.append(i)
+            elif ts == 0:
+                counts["untimed"] += 1
+            else:
+                replay.append(i)
+
+        for i in live:
+            self.seqs.mark_live(device_ids[i], timestamp[i] or now)
+        counts["live"] = len(live)
+        counts["replayed"] = len(replay)
+        self.totals.update(counts)
+        return np.array(live, dtype=np.intp), np.array(replay, dtype=np.intp), counts
+
+    def replay(self, columns: dict, arrival: float) -> list:
+        """
+        Replay rows (all stale) per device in event-time order.
+        arrival = server time, stamped on durable log rows (the log stays
+        time-ordered; the timeline keeps event time). Returns the timeline
+        seqs appended.
+        """
+        device_ids = columns["device_ids"]
+        if not device_ids:
+            return []
+
+        # Group by device, then event time, then seq
+        codes = {}
+        device = np.array([codes.setdefault(d, len(codes)) for d in device_ids])
+        order = np.lexsort((columns["seq"], columns["timestamp"], device))
+        bounds = np.flatnonzero(np.r_[True, device[order][1:] != device[order][:-1], True])
+
+        pump_fail = self.scenario["mode"] == "PUMP_FAIL"
+        seqs = []
+
+        for lo, hi in zip(bounds[:-1], bounds[1:]):
+            rows = order[lo:hi].tolist()
+            device_id = device_ids[rows[0]]
+            entries = []
+
+            if self.policies is not None:
+                policy = self.policies.policy_for(device_id)
+                table, limits, version = policy.table, policy.field_limits, policy.version
+            else:
+                table, limits, version = compiled_policy(), FIELD_LIMITS, 0
+
+            with self.store.update(device_id) as dev:
+                last_action = dev.last_action_time  # scratch cooldown clock
+
+                for i in rows:
+                    ts = float(columns["timestamp"][i])
+                    soil = float(columns["soil"][i])
+                    temp = float(columns["temp"][i])
+                    light = float(columns["light"][i])
+
+                    rain_expected, rain_eta = self.climate.outlook(device_id, ts)
+                    base = table.decide(
+                        {"soil": soil, "temperature": temp, "light": light},
+                        last_action_time=(
+                            from_epoch(last_action)
+                            if last_action is not None and last_action <= ts else None
+                        ),
+                        now=from_epoch(ts)
+                    )
+                    decision, reason = apply_override(
+                        base["decision"], soil, rain_expected, pump_fail, limits["SOIL_LOW"]
+                    )
+
+                    avoided = soil < limits["RAIN_SAVE_SOIL"] and decision == "HOLD" and rain_expected
+                    if avoided:
+                        dev.pump_cycles_avoided += 1
+                        dev.water_saved_liters += PUMP_FLOW_LPM * 1
+                    if decision == "IRRIGATE":
+                        last_action = ts
+                    if self.rollups is not None:
+                        # Never actuated: counts the decision, not a pump run
+                        self.rollups.record(
+                            device_id, ts, decision,
+                            water_saved=PUMP_FLOW_LPM * 1 if avoided else 0.0,
+                            avoided=avoided
+                        )
+
+                    entries.append((ts, soil, decision, reason, rain_expected))
+
+                    if self.telemetry_log:
+                        self.telemetry_log.append(
+                            device_id,
+                            timestamp=arrival,
+                            soil=soil,
+                            temperature=temp,
+                            light=light,
+                            decision=decision,
+                            reason=reason,
+                            rain_expected=rain_expected,
+                            mode=self.scenario["mode"],
+                            last_action_time=dev.last_action_time,
+                            rain_eta=dev.rain_eta,
+                            water_saved=dev.water_saved_liters,
+                            pump_cycles_avoided=dev.pump_cycles_avoided,
+                            backfill=True
+                        )
+
+            impact = self.store.impact_totals()
+            for ts, soil, decision, reason, rain_expected in entries:
+                seqs.append(self.timeline.append(
+                    device_id,
+                    timestamp=ts,
+                    soil=soil,
+                    decision=decision,
+                    reason=reason,
+                    rain_expected=rain_expected,
+                    water_saved=impact["water_saved_liters"],
+                    pump_cycles_avoided=impact["pump_cycles_avoided"],
+                    policy_version=version
+                ))
+        return seqs
+
+    def stats(self) -> dict:
+        return {
+            "devices_tracked": len(self.seqs),
+            "stale_sec": self.stale_sec,
+            "seq_resets": self.seqs.resets,
+            **self.totals
+        }
@@ -0,0 +1,319 @@
+"""
+AgriAgents - Climate Agent (Forecast Subsystem)
+Rain expectation and ETA from forecast grids instead of a request counter.
+
+Pieces:
+- ForecastProvider: fetch(lat, lon, start, end) → Forecast
+    StubForecastProvider   fixed / no rain (tests, demo scenarios)
+    FileForecastProvider   JSON forecast grid on disk (reloaded on change)
+- ClimateAgent
+    device_id → location → tile (tile_deg grid)
+    tile cache keyed by (tile, forecast window) with TTL eviction
+    concurrent lookups of one tile coalesce into a single fetch
+    rain ETA = first rainy forecast slot − now (wall clock)
+
+Forecast file format:
+    {
+      "step_minutes": 60,
+      "points": {
+        "12.97,77.59": [{"time": "2026-10-17T14:00:00Z", "precip_mm": 1.2}, ...]
+      },
+      "default": [...]        # optional, used when no point is listed
+    }
+Each tile uses the nearest listed point.
+"""
+
+import json
+import math
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from concurrent.futures import Future
+from datetime import datetime, timezone
+
+import numpy as np
+
+from pipeline import DEFAULT_DEVICE_ID
+
+# Forecast slots [time, time + step) with precipitation in mm
+Forecast = namedtuple("Forecast", ["times", "precip_mm", "step"])
+
+NO_FORECAST = Forecast(np.zeros(0), np.zeros(0), 3600.0)
+
+RAIN_MM_THRESHOLD = 0.5   # slot counts as rain at or above this
+RAIN_HORIZON_MIN = 180    # rain further out than this is not "expected"
+DEFAULT_LOCATION = (0.0, 0.0)  # devices that never reported a location
+
+
+def _parse_time(value: str) -> float:
+    dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+# ==================================================
+# 🔌 PROVIDERS
+# ==================================================
+class ForecastProvider:
+    """Interface: precipitation forecast covering [start, end) near (lat, lon)."""
+
+    def fetch(self, lat: float, lon: float, start: float, end: float) -> Forecast:
+        raise NotImplementedError
+
+
+class StubForecastProvider(ForecastProvider):
+    """Same forecast everywhere: dry, or rain from rain_at for rain_minutes."""
+
+    def __init__(self, rain_at: float = None, rain_minutes: float = 60, precip_mm: float = 5.0, step: float = 900.0):
+        self.rain_at = rain_at
+        self.rain_minutes = rain_minutes
+        self.precip_mm = precip_mm
+        self.step = step
+        self.fetches = 0
+
+    def fetch(self, lat, lon, start, end) -> Forecast:
+        self.fetches += 1
+        # Slots aligned on rain_at so the ETA lands exactly on it
+        anchor = self.rain_at or 0.0
+        first = anchor + math.floor((start - anchor) / self.step) * self.step
+        times = np.arange(first, end, self.step)
+        precip = np.zeros(len(times))
+        if self.rain_at is not None:
+            rain_end = self.rain_at + self.rain_minutes * 60
+            precip[(times + self.step > self.rain_at) & (times < rain_end)] = self.precip_mm
+        return Forecast(times, precip, self.step)
+
+
+class FileForecastProvider(ForecastProvider):
+    """Forecast grid from a JSON file; reparsed only when its mtime changes."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.fetches = 0
+        self._mtime = None
+        self._points = None   # (lat, lon) array
+        self._series = []     # Forecast per point
+        self._default = NO_FORECAST
+        self._lock = threading.Lock()
+
+    def _load(self):
+        mtime = os.stat(self.path).st_mtime
+        if mtime == self._mtime:
+            return
+        with open(self.path, encoding="utf-8") as f:
+            data = json.load(f)
+        step = float(data.get("step_minutes", 60)) * 60
+
+        def series(slots):
+            slots = sorted(slots, key=lambda s: s["time"])
+            return Forecast(
+                np.array([_parse_time(s["time"]) for s in slots], dtype=np.float64),
+                np.array([float(s.get("precip_mm", 0)) for s in slots], dtype=np.float64),
+                step
+            )
+
+        points = data.get("points", {})
+        self._points = np.array(
+            [[float(v) for v in key.split(",")] for key in points], dtype=np.float64
+        ).reshape(-1, 2)
+        self._series = [series(slots) for slots in points.values()]
+        self._default = series(data["default"]) if "default" in data else Forecast(np.zeros(0), np.zeros(0), step)
+        self._mtime = mtime
+
+    def fetch(self, lat, lon, start, end) -> Forecast:
+        with self._lock:
+            self._load()
+            self.fetches += 1
+            if len(self._points):
+                nearest = int(np.argmin(np.hypot(self._points[:, 0] - lat, self._points[:, 1] - lon)))
+                forecast = self._series[nearest]
+            else:
+                forecast = self._default
+
+        # Only the requested window
+        keep = (forecast.times + forecast.step > start) & (forecast.times < end)
+        return Forecast(forecast.times[keep], forecast.precip_mm[keep], forecast.step)
+
+
+# ==================================================
+# 🌦️ CLIMATE AGENT
+# ==================================================
+class _CacheEntry:
+    __slots__ = ("forecast", "expires")
+
+    def __init__(self, forecast: Forecast, expires: float):
+        self.forecast = forecast
+        self.expires = expires
+
+
+class ClimateAgent:
+
+    def __init__(
+        self,
+        provider: ForecastProvider = None,
+        tile_deg: float = 0.25,
+        window_sec: float = 3600.0,
+        ttl: float = 600.0,
+        max_tiles: int = 4096,
+        horizon_min: float = RAIN_HORIZON_MIN
+    ):
+        self.provider = provider or StubForecastProvider()
+        self.tile_deg = tile_deg
+        self.window_sec = window_sec
+        self.ttl = ttl
+        self.max_tiles = max_tiles
+        self.horizon_min = horizon_min
+
+        self._override = None   # scenario provider, wins over self.provider
+        self._tiles = {}        # device_id → tile
+        self._cache = OrderedDict()  # (tile, window) → _CacheEntry, LRU order
+        self._inflight = {}     # (tile, window) → Future
+        self._generation = 0    # bumped on scenario change: drops in-flight results
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.errors = 0
+
+    # ------------------------------
+    # Locations
+    # ------------------------------
+    def tile(self, lat: float, lon: float) -> tuple:
+        return math.floor(lat / self.tile_deg), math.floor(lon / self.tile_deg)
+
+    def locate(self, device_id, lat: float, lon: float):
+        self._tiles[device_id] = self.tile(float(lat), float(lon))
+
+    def locate_readings(self, readings: list):
+        """Pick up optional {"location": {"lat", "lon"}} from payloads."""
+        for reading in readings:
+            location = reading.get("location")
+            if location:
+                self.locate(reading.get("device_id", DEFAULT_DEVICE_ID), location["lat"], location["lon"])
+
+    def device_tile(self, device_id):
+        """Located tile of a device, or None (shard handover)."""
+        return self._tiles.get(device_id)
+
+    def set_tile(self, device_id, tile):
+        self._tiles[device_id] = tuple(tile)
+
+    def _device_tile(self, device_id) -> tuple:
+        tile = self._tiles.get(device_id)
+        return tile if tile is not None else self.tile(*DEFAULT_LOCATION)
+
+    # ------------------------------
+    # Scenario (demo)
+    # ------------------------------
+    def apply_scenario(self, mode: str, now: float, rain_eta_minutes: float = 90):
+        """RAIN → rain forecast everywhere rain_eta_minutes from now."""
+        with self._lock:
+            self._override = (
+                StubForecastProvider(rain_at=now + rain_eta_minutes * 60) if mode == "RAIN" else None
+            )
+            self._generation += 1
+            self._cache.clear()
+            self._inflight.clear()
+
+    # ------------------------------
+    # Tile cache
+    # ------------------------------
+    def forecast(self, tile: tuple, now: float) -> Forecast:
+        window = int(now // self.window_sec)
+        key = (tile, window)
+        clock = time.monotonic()
+
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None and entry.expires > clock:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return entry.forecast
+
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+                provider = self._override or self.provider
+                generation = self._generation
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not owner:
+            return future.result()
+
+        start = window * self.window_sec
+        lat = (tile[0] + 0.5) * self.tile_deg
+        lon = (tile[1] + 0.5) * self.tile_deg
+        try:
+            forecast = provider.fetch(lat, lon, start, start + self.window_sec + self.horizon_min * 60)
+        except Exception:
+            # Provider down: serve the stale tile if we still have it
+            forecast = entry.forecast if entry is not None else NO_FORECAST
+            with self._lock:
+                self.errors += 1
+
+        with self._lock:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+            if generation == self._generation:
+                self._cache[key] = _CacheEntry(forecast, clock + self.ttl)
+                self._cache.move_to_end(key)
+                while len(self._cache) > self.max_tiles:
+                    self._cache.popitem(last=False)
+        future.set_result(forecast)
+        return forecast
+
+    # ------------------------------
+    # Outlook
+    # ------------------------------
+    def _eta_minutes(self, forecast: Forecast, now: float):
+        rainy = np.flatnonzero(
+            (forecast.precip_mm >= RAIN_MM_THRESHOLD) & (forecast.times + forecast.step > now)
+        )
+        if not len(rainy):
+            return None
+        return int(math.ceil(max(0.0, forecast.times[rainy[0]] - now) / 60))
+
+    def outlook(self, device_id, now: float) -> tuple:
+        """(rain_expected, rain ETA minutes or None) for one device."""
+        eta = self._eta_minutes(self.forecast(self._device_tile(device_id), now), now)
+        if eta is None or eta > self.horizon_min:
+            return False, None
+        return True, eta
+
+    def outlook_batch(self, device_ids, now: float) -> tuple:
+        """
+        (rain_expected bool array, ETA minutes float array, NaN = None).
+        One cache lookup per distinct tile, not per device.
+        """
+        n = len(device_ids)
+        rain_expected = np.zeros(n, dtype=bool)
+        eta = np.full(n, np.nan)
+
+        by_tile = {}
+        for i, device_id in enumerate(device_ids):
+            by_tile.setdefault(self._device_tile(device_id), []).append(i)
+
+        for tile, rows in by_tile.items():
+            minutes = self._eta_minutes(self.forecast(tile, now), now)
+            if minutes is not None and minutes <= self.horizon_min:
+                rain_expected[rows] = True
+                eta[rows] = minutes
+        return rain_expected, eta
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "tiles_cached": len(self._cache),
+                "devices_located": len(self._tiles),
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "errors": self.errors,
+                "scenario_override": self._override is not None
+            }
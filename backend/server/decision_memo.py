@@ -0,0 +1,111 @@
+"""
+AgriAgents - Decision Memo
+Reuses a device's previous decision when nothing it depends on changed.
+
+Hobby sensors report the same (device-quantized) soil / temperature /
+light for many intervals in a row. The /data decision stage (Decision
+Agent + climate / safety override + farmer message code) is a pure
+function of:
+
+  raw soil, raw temperature   guardrails, override, field thresholds
+  utility inputs              windowed soil; windowed temperature and
+                              light only as the policy sees them (above
+                              TEMP_HIGH, below LIGHT_DAY), so float noise
+                              in the light integral does not miss
+  cooling down or not         a cooldown decision is HOLD whatever the
+                              elapsed time (elapsed only feeds reasons)
+  rain_expected, mode         Climate Agent context, scenario
+  policy                      the device's policy version (thresholds,
+                              utility and field limits)
+
+One entry per device holds that key and the stored decision_agent /
+farmer_assistant dicts. A reading with the same key reuses them (same
+objects, so unchanged agents also diff as unchanged); anything else
+recomputes and replaces the entry.
+
+Bounds and invalidation:
+- LRU over devices (max_devices) and a TTL per entry (ttl_sec)
+- invalidate() drops every entry; the server calls it on /scenario and
+  every policy registry publish / reload
+- Entries remember their policy, so a device moved to another profile
+  or version is never served a decision made under the old one
+"""
+
+import threading
+from collections import OrderedDict
+
+MEMO_MAX_DEVICES = 100000
+MEMO_TTL_SEC = 600.0
+
+
+class DecisionMemo:
+
+    def __init__(self, max_devices: int = MEMO_MAX_DEVICES, ttl_sec: float = MEMO_TTL_SEC):
+        self.max_devices = max_devices
+        self.ttl_sec = ttl_sec
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()  # device_id → (key, policy, stored_at, record)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(soil: float, temp: float, light: float, features, thresholds: dict,
+            cooling_down: bool, rain_expected: bool, mode: str) -> tuple:
+        if features is not None:
+            utility_soil, temp_in, light_in = features["soil"], features["temperature"], features["light"]
+        else:
+            utility_soil, temp_in, light_in = soil, temp, light
+        return (
+            soil, temp, utility_soil,
+            temp_in > thresholds["TEMP_HIGH"],
+            # NaN light is neither day nor night: never equal, never a hit
+            light_in < thresholds["LIGHT_DAY"] if light_in == light_in else light_in,
+            cooling_down, rain_expected, mode
+        )
+
+    def lookup(self, device_id, key: tuple, policy, now: float):
+        """Stored record for an unchanged key, else None."""
+        with self._lock:
+            entry = self._entries.get(device_id)
+            if entry is not None and entry[0] == key and entry[1] is policy:
+                if now - entry[2] <= self.ttl_sec:
+                    self._entries.move_to_end(device_id)
+                    self.hits += 1
+                    return entry[3]
+                self.expired += 1
+            self.misses += 1
+            return None
+
+    def store(self, device_id, key: tuple, policy, now: float, record):
+        with self._lock:
+            self._entries[device_id] = (key, policy, now, record)
+            self._entries.move_to_end(device_id)
+            while len(self._entries) > self.max_devices:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, device_id=None):
+        """Drop one device's entry, or every entry."""
+        with self._lock:
+            if device_id is not None:
+                self._entries.pop(device_id, None)
+                return
+            self._entries.clear()
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_devices": self.max_devices,
+            "ttl_sec": self.ttl_sec,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "expired": self.expired,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations
+        }
@@ -0,0 +1,599 @@
+"""
+AgriAgents - Per-Device State Store
+Replaces the process-global STATE / rain countdown / IMPACT memory.
+
+Design:
+- One compact __slots__ record per device_id
+- Lock-striped access (one lock per stripe, never one lock per fleet)
+- Interchangeable backends behind one interface:
+    memory   → InMemoryDeviceStore  (dict shards, default)
+    columnar → ColumnarDeviceStore  (NumPy columns, large fleets)
+    sqlite   → SQLiteDeviceStore    (shared by several worker processes)
+
+Times are stored as UTC epoch seconds (float), None when unset.
+"""
+
+import json
+import sqlite3
+import threading
+import zlib
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import numpy as np
+
+from agentic_engine import DECISIONS, DECISION_CODES
+
+NO_DECISION = 255  # columnar code for "no decision yet"
+
+
+# ==================================================
+# 🕒 TIME HELPERS
+# ==================================================
+def to_epoch(dt: datetime) -> float:
+    """Naive UTC datetime → epoch seconds."""
+    return dt.replace(tzinfo=timezone.utc).timestamp()
+
+
+def from_epoch(ts: float) -> datetime:
+    """Epoch seconds → naive UTC datetime (what agentic_decision expects)."""
+    return datetime.fromtimestamp(ts, tz=timezone.utc).replace(tzinfo=None)
+
+
+# ==================================================
+# 📦 DEVICE RECORD
+# ==================================================
+class DeviceState:
+    __slots__ = (
+        "device_id",
+        "last_action_time",
+        "last_decision",
+        "rain_eta",
+        "water_saved_liters",
+        "pump_cycles_avoided",
+        "latest_agents"
+    )
+
+    def __init__(
+        self,
+        device_id,
+        last_action_time=None,
+        last_decision=None,
+        rain_eta=None,
+        water_saved_liters=0.0,
+        pump_cycles_avoided=0,
+        latest_agents=None
+    ):
+        self.device_id = device_id
+        self.last_action_time = last_action_time
+        self.last_decision = last_decision
+        self.rain_eta = rain_eta
+        self.water_saved_liters = water_saved_liters
+        self.pump_cycles_avoided = pump_cycles_avoided
+        self.latest_agents = latest_agents
+
+    def copy(self):
+        return DeviceState(*(getattr(self, name) for name in self.__slots__))
+
+    def to_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+# ==================================================
+# 🔌 STORE INTERFACE
+# ==================================================
+class DeviceStore:
+    """
+    Common interface. Subclasses implement update(), get(),
+    reset_scenario(), impact_totals(), device_ids(), pop() and __len__().
+
+    update(device_id) is the only write path for single readings:
+
+        with store.update("esp32_main") as dev:
+            dev.rain_eta = 87
+
+    The record is locked for the duration of the block and persisted
+    when it exits. locked(device_ids) holds several records across a
+    gather() → apply_batch() round trip (stripe locks are reentrant).
+    """
+
+    def __init__(self, stripes: int = 64):
+        self._stripes = stripes
+        self._locks = [threading.RLock() for _ in range(stripes)]
+
+    def _stripe(self, device_id) -> int:
+        # crc32, not hash(): stable across processes and restarts
+        return zlib.crc32(str(device_id).encode()) % self._stripes
+
+    @contextmanager
+    def locked(self, device_ids=None):
+        """Hold the stripes of device_ids (every stripe if None)."""
+        # Sorted acquisition keeps concurrent batches deadlock-free
+        if device_ids is None:
+            stripes = range(self._stripes)
+        else:
+            stripes = sorted({self._stripe(d) for d in device_ids})
+        for i in stripes:
+            self._locks[i].acquire()
+        try:
+            yield
+        finally:
+            for i in reversed(stripes):
+                self._locks[i].release()
+
+    @contextmanager
+    def update(self, device_id):
+        raise NotImplementedError
+
+    def get(self, device_id):
+        """Detached copy of the record, or None if the device is unknown."""
+        raise NotImplementedError
+
+    def reset_scenario(self, reset_impact: bool = False):
+        """Clear every rain countdown (and optionally impact counters)."""
+        raise NotImplementedError
+
+    def impact_totals(self) -> dict:
+        """Fleet-wide impact metrics."""
+        raise NotImplementedError
+
+    def device_ids(self) -> list:
+        """Every device with a record."""
+        raise NotImplementedError
+
+    def pop(self, device_id):
+        """Remove a record (shard handover); returns it, or None if unknown."""
+        raise NotImplementedError
+
+    def __len__(self):
+        raise NotImplementedError
+
+    # ------------------------------
+    # Batch access (fleet ingest)
+    # ------------------------------
+    def gather(self, device_ids) -> dict:
+        """
+        Columns consumed by agentic_decision_batch:
+          last_action_time (NaN = never), rain_eta (NaN = not started)
+        """
+        n = len(device_ids)
+        last_action_time = np.full(n, np.nan)
+        rain_eta = np.full(n, np.nan)
+
+        for i, device_id in enumerate(device_ids):
+            dev = self.get(device_id)
+            if dev is None:
+                continue
+            if dev.last_action_time is not None:
+                last_action_time[i] = dev.last_action_time
+            if dev.rain_eta is not None:
+                rain_eta[i] = dev.rain_eta
+
+        return {"last_action_time": last_action_time, "rain_eta": rain_eta}
+
+    def apply_batch(
+        self,
+        device_ids,
+        last_action_time,
+        rain_eta,
+        decision,
+        water_saved,
+        cycles_avoided
+    ):
+        """
+        Write back a batch. last_action_time / rain_eta are the new values
+        (NaN = None), decision holds DECISION_CODES, water_saved and
+        cycles_avoided are increments.
+
+        Returns each row's cumulative water_saved_liters and
+        pump_cycles_avoided after the write.
+        """
+        water_total = np.empty(len(device_ids))
+        cycles_total = np.empty(len(device_ids), dtype=np.int64)
+
+        for i, device_id in enumerate(device_ids):
+            with self.update(device_id) as dev:
+                dev.last_action_time = _nan_to_none(last_action_time[i])
+                dev.rain_eta = _nan_to_none(rain_eta[i])
+                if dev.rain_eta is not None:
+                    dev.rain_eta = int(dev.rain_eta)
+                dev.last_decision = DECISIONS[decision[i]]
+                dev.water_saved_liters += float(water_saved[i])
+                dev.pump_cycles_avoided += int(cycles_avoided[i])
+                water_total[i] = dev.water_saved_liters
+                cycles_total[i] = dev.pump_cycles_avoided
+
+        return {"water_saved_liters": water_total, "pump_cycles_avoided": cycles_total}
+
+
+def _nan_to_none(value):
+    value = float(value)
+    return None if value != value else value
+
+
+# ==================================================
+# 🧠 IN-PROCESS STORE (DICT SHARDS)
+# ==================================================
+class InMemoryDeviceStore(DeviceStore):
+
+    def __init__(self, stripes: int = 64):
+        super().__init__(stripes)
+        self._shards = [{} for _ in range(stripes)]
+        # Per-stripe impact totals so fleet totals cost O(stripes)
+        self._water = [0.0] * stripes
+        self._cycles = [0] * stripes
+
+    @contextmanager
+    def update(self, device_id):
+        i = self._stripe(device_id)
+        with self._locks[i]:
+            shard = self._shards[i]
+            dev = shard.get(device_id)
+            if dev is None:
+                dev = shard[device_id] = DeviceState(device_id)
+
+            water, cycles = dev.water_saved_liters, dev.pump_cycles_avoided
+            try:
+                yield dev
+            finally:
+                self._water[i] += dev.water_saved_liters - water
+                self._cycles[i] += dev.pump_cycles_avoided - cycles
+
+    def get(self, device_id):
+        i = self._stripe(device_id)
+        with self._locks[i]:
+            dev = self._shards[i].get(device_id)
+            return dev.copy() if dev is not None else None
+
+    def reset_scenario(self, reset_impact: bool = False):
+        for i, lock in enumerate(self._locks):
+            with lock:
+                for dev in self._shards[i].values():
+                    dev.rain_eta = None
+                    if reset_impact:
+                        dev.water_saved_liters = 0.0
+                        dev.pump_cycles_avoided = 0
+                if reset_impact:
+                    self._water[i] = 0.0
+                    self._cycles[i] = 0
+
+    def impact_totals(self) -> dict:
+        return {
+            "water_saved_liters": float(sum(self._water)),
+            "pump_cycles_avoided": int(sum(self._cycles))
+        }
+
+    def device_ids(self) -> list:
+        ids = []
+        for i, lock in enumerate(self._locks):
+            with lock:
+                ids.extend(self._shards[i])
+        return ids
+
+    def pop(self, device_id):
+        i = self._stripe(device_id)
+        with self._locks[i]:
+            dev = self._shards[i].pop(device_id, None)
+            if dev is not None:
+                self._water[i] -= dev.water_saved_liters
+                self._cycles[i] -= dev.pump_cycles_avoided
+            return dev
+
+    def __len__(self):
+        return sum(len(shard) for shard in self._shards)
+
+
+# ==================================================
+# 📊 COLUMNAR STORE (LARGE FLEETS)
+# ==================================================
+class ColumnarDeviceStore(DeviceStore):
+    """
+    One NumPy column per field, one row per device.
+    Batch gather/apply are vectorized over row indices.
+    """
+
+    def __init__(self, capacity: int = 1024, stripes: int = 64):
+        super().__init__(stripes)
+        self._index = {}
+        self._ids = []
+        self._grow_lock = threading.Lock()
+        self._alloc(capacity)
+
+    def _alloc(self, capacity: int):
+        old = len(self._ids)
+
+        def grow(column, fill, dtype):
+            new = np.full(capacity, fill, dtype=dtype)
+            if column is not None:
+                new[:old] = column[:old]
+            return new
+
+        self.last_action_time = grow(getattr(self, "last_action_time", None), np.nan, np.float64)
+        self.last_decision = grow(getattr(self, "last_decision", None), NO_DECISION, np.uint8)
+        self.rain_eta = grow(getattr(self, "rain_eta", None), np.nan, np.float64)
+        self.water_saved_liters = grow(getattr(self, "water_saved_liters", None), 0.0, np.float64)
+        self.pump_cycles_avoided = grow(getattr(self, "pump_cycles_avoided", None), 0, np.int64)
+        self.latest_agents = getattr(self, "latest_agents", []) + [None] * (capacity - old)
+        self._capacity = capacity
+
+    def _row(self, device_id) -> int:
+        row = self._index.get(device_id)
+        if row is not None:
+            return row
+
+        with self._grow_lock:
+            row = self._index.get(device_id)
+            if row is not None:
+                return row
+
+            row = len(self._ids)
+            if row == self._capacity:
+                # Resizing swaps every column: stop all writers first
+                for lock in self._locks:
+                    lock.acquire()
+                try:
+                    self._alloc(self._capacity * 2)
+                finally:
+                    for lock in self._locks:
+                        lock.release()
+
+            self._ids.append(device_id)
+            self._index[device_id] = row
+            return row
+
+    def _read(self, row: int, device_id) -> DeviceState:
+        code = int(self.last_decision[row])
+        return DeviceState(
+            device_id,
+            last_action_time=_nan_to_none(self.last_action_time[row]),
+            last_decision=None if code == NO_DECISION else DECISIONS[code],
+            rain_eta=_nan_to_int(self.rain_eta[row]),
+            water_saved_liters=float(self.water_saved_liters[row]),
+            pump_cycles_avoided=int(self.pump_cycles_avoided[row]),
+            latest_agents=self.latest_agents[row]
+        )
+
+    @contextmanager
+    def update(self, device_id):
+        row = self._row(device_id)
+        with self._locks[self._stripe(device_id)]:
+            dev = self._read(row, device_id)
+            yield dev
+            self.last_action_time[row] = np.nan if dev.last_action_time is None else dev.last_action_time
+            self.last_decision[row] = (
+                NO_DECISION if dev.last_decision is None
+                else DECISION_CODES[dev.last_decision]
+            )
+            self.rain_eta[row] = np.nan if dev.rain_eta is None else dev.rain_eta
+            self.water_saved_liters[row] = dev.water_saved_liters
+            self.pump_cycles_avoided[row] = dev.pump_cycles_avoided
+            self.latest_agents[row] = dev.latest_agents
+
+    def get(self, device_id):
+        row = self._index.get(device_id)
+        if row is None:
+            return None
+        with self._locks[self._stripe(device_id)]:
+            return self._read(row, device_id)
+
+    @contextmanager
+    def locked(self, device_ids=None):
+        # Rows first: a resize inside _row() needs every stripe
+        for device_id in device_ids if device_ids is not None else ():
+            self._row(device_id)
+        with super().locked(device_ids):
+            yield
+
+    def gather(self, device_ids) -> dict:
+        rows = np.fromiter((self._row(d) for d in device_ids), dtype=np.intp, count=len(device_ids))
+        with self.locked(device_ids):
+            return {
+                "last_action_time": self.last_action_time[rows],
+                "rain_eta": self.rain_eta[rows]
+            }
+
+    def apply_batch(
+        self,
+        device_ids,
+        last_action_time,
+        rain_eta,
+        decision,
+        water_saved,
+        cycles_avoided
+    ):
+        rows = np.fromiter((self._row(d) for d in device_ids), dtype=np.intp, count=len(device_ids))
+        with self.locked(device_ids):
+            self.last_action_time[rows] = last_action_time
+            self.rain_eta[rows] = rain_eta
+            self.last_decision[rows] = decision
+            np.add.at(self.water_saved_liters, rows, water_saved)
+            np.add.at(self.pump_cycles_avoided, rows, cycles_avoided)
+            return {
+                "water_saved_liters": self.water_saved_liters[rows],
+                "pump_cycles_avoided": self.pump_cycles_avoided[rows]
+            }
+
+    def reset_scenario(self, reset_impact: bool = False):
+        with self.locked():
+            self.rain_eta[:] = np.nan
+            if reset_impact:
+                self.water_saved_liters[:] = 0.0
+                self.pump_cycles_avoided[:] = 0
+
+    def impact_totals(self) -> dict:
+        n = len(self._ids)
+        return {
+            "water_saved_liters": float(self.water_saved_liters[:n].sum()),
+            "pump_cycles_avoided": int(self.pump_cycles_avoided[:n].sum())
+        }
+
+    def device_ids(self) -> list:
+        return list(self._ids)
+
+    def pop(self, device_id):
+        """
+        The last row moves into the freed one, so rows are renumbered:
+        callers must quiesce ingest first (the shard router does).
+        """
+        with self._grow_lock, self.locked():
+            row = self._index.pop(device_id, None)
+            if row is None:
+                return None
+            dev = self._read(row, device_id)
+
+            last = len(self._ids) - 1
+            columns = (
+                self.last_action_time, self.last_decision, self.rain_eta,
+                self.water_saved_liters, self.pump_cycles_avoided, self.latest_agents
+            )
+            if row != last:
+                moved = self._ids[last]
+                for column in columns:
+                    column[row] = column[last]
+                self._ids[row] = moved
+                self._index[moved] = row
+            for column, fill in zip(columns, (np.nan, NO_DECISION, np.nan, 0.0, 0, None)):
+                column[last] = fill
+            self._ids.pop()
+            return dev
+
+    def __len__(self):
+        return len(self._ids)
+
+
+def _nan_to_int(value):
+    value = _nan_to_none(value)
+    return None if value is None else int(value)
+
+
+# ==================================================
+# 🗄️ SQLITE STORE (MULTI-WORKER)
+# ==================================================
+class SQLiteDeviceStore(DeviceStore):
+    """
+    Same interface, persisted in one SQLite file (WAL mode) so several
+    worker processes can share device state.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS devices (
+            device_id TEXT PRIMARY KEY,
+            last_action_time REAL,
+            last_decision TEXT,
+            rain_eta INTEGER,
+            water_saved_liters REAL NOT NULL DEFAULT 0,
+            pump_cycles_avoided INTEGER NOT NULL DEFAULT 0,
+            latest_agents TEXT
+        )
+    """
+
+    def __init__(self, path: str = "device_state.db", stripes: int = 64):
+        super().__init__(stripes)
+        self._path = path
+        self._local = threading.local()
+        self._conn().execute(self.SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self._path, isolation_level=None, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _record(device_id, row) -> DeviceState:
+        if row is None:
+            return DeviceState(device_id)
+        return DeviceState(
+            device_id,
+            last_action_time=row[0],
+            last_decision=row[1],
+            rain_eta=row[2],
+            water_saved_liters=row[3],
+            pump_cycles_avoided=row[4],
+            latest_agents=json.loads(row[5]) if row[5] else None
+        )
+
+    def _select(self, conn, device_id):
+        return conn.execute(
+            "SELECT last_action_time, last_decision, rain_eta, water_saved_liters, "
+            "pump_cycles_avoided, latest_agents FROM devices WHERE device_id = ?",
+            (device_id,)
+        ).fetchone()
+
+    @contextmanager
+    def update(self, device_id):
+        conn = self._conn()
+        with self._locks[self._stripe(device_id)]:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                dev = self._record(device_id, self._select(conn, device_id))
+                yield dev
+                conn.execute(
+                    "INSERT OR REPLACE INTO devices VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        device_id,
+                        dev.last_action_time,
+                        dev.last_decision,
+                        dev.rain_eta,
+                        dev.water_saved_liters,
+                        dev.pump_cycles_avoided,
+                        json.dumps(dev.latest_agents) if dev.latest_agents else None
+                    )
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def get(self, device_id):
+        row = self._select(self._conn(), device_id)
+        return None if row is None else self._record(device_id, row)
+
+    def reset_scenario(self, reset_impact: bool = False):
+        if reset_impact:
+            self._conn().execute(
+                "UPDATE devices SET rain_eta = NULL, water_saved_liters = 0, pump_cycles_avoided = 0"
+            )
+        else:
+            self._conn().execute("UPDATE devices SET rain_eta = NULL")
+
+    def impact_totals(self) -> dict:
+        water, cycles = self._conn().execute(
+            "SELECT COALESCE(SUM(water_saved_liters), 0), "
+            "COALESCE(SUM(pump_cycles_avoided), 0) FROM devices"
+        ).fetchone()
+        return {"water_saved_liters": float(water), "pump_cycles_avoided": int(cycles)}
+
+    def device_ids(self) -> list:
+        return [row[0] for row in self._conn().execute("SELECT device_id FROM devices")]
+
+    def pop(self, device_id):
+        conn = self._conn()
+        with self._locks[self._stripe(device_id)]:
+            row = self._select(conn, device_id)
+            if row is None:
+                return None
+            conn.execute("DELETE FROM devices WHERE device_id = ?", (device_id,))
+            return self._record(device_id, row)
+
+    def __len__(self):
+        return self._conn().execute("SELECT COUNT(*) FROM devices").fetchone()[0]
+
+
+# ==================================================
+# 🏭 FACTORY
+# ==================================================
+BACKENDS = {
+    "memory": InMemoryDeviceStore,
+    "columnar": ColumnarDeviceStore,
+    "sqlite": SQLiteDeviceStore
+}
+
+
+def make_store(backend: str = "memory", **options) -> DeviceStore:
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown device state backend: {backend}")
+    return BACKENDS[backend](**options)
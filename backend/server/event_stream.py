@@ -0,0 +1,139 @@
+"""
+AgriAgents - Dashboard Event Stream (Server-Sent Events)
+Pushes ingest deltas to dashboards instead of full-payload polling.
+
+Events:
+  decisions  new timeline entries (seq-ordered, clients dedupe by seq)
+  agents     changed agent fields of one device
+  impact     impact metric increments + new totals
+  resync     this subscriber fell behind: refetch /state and /timeline
+
+Fan-out:
+- Each event is encoded to an SSE frame once and shared by all subscribers
+- Every subscriber has a bounded queue; a full queue drops the event and
+  flags a resync instead of blocking ingest
+- No subscribers → publish() returns before doing any work
+"""
+
+import json
+import queue
+import threading
+
+HEARTBEAT_SEC = 15.0
+
+_MISSING = object()
+
+
+def encode_event(event: str, data) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n".encode()
+
+
+def diff_agents(old: dict, new: dict) -> dict:
+    """Per-agent fields whose values changed (whole agents when new)."""
+    old = old or {}
+    changes = {}
+    for agent, fields in new.items():
+        before = old.get(agent) or {}
+        changed = {k: v for k, v in fields.items() if before.get(k, _MISSING) != v}
+        if changed:
+            changes[agent] = changed
+    return changes
+
+
+# ==================================================
+# 📮 SUBSCRIBER
+# ==================================================
+class Subscriber:
+    __slots__ = ("queue", "device_id", "lagging", "dropped")
+
+    def __init__(self, max_queue: int, device_id=None):
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.device_id = device_id
+        self.lagging = False
+        self.dropped = 0
+
+    def offer(self, frame: bytes):
+        try:
+            self.queue.put_nowait(frame)
+        except queue.Full:
+            self.dropped += 1
+            self.lagging = True
+
+
+# ==================================================
+# 📡 BROKER
+# ==================================================
+class EventBroker:
+
+    def __init__(self, max_queue: int = 256):
+        self.max_queue = max_queue
+        self.published = 0
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._impact = None
+
+    @property
+    def has_subscribers(self) -> bool:
+        return bool(self._subscribers)
+
+    def subscribe(self, device_id=None) -> Subscriber:
+        sub = Subscriber(self.max_queue, device_id)
+        with self._lock:
+            self._subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscriber):
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    def publish(self, event: str, data, device_id=None):
+        """device_id set → only fleet-wide and matching subscribers get it."""
+        if not self._subscribers:
+            return
+        frame = encode_event(event, data)
+        with self._lock:
+            subscribers = list(self._subscribers)
+            self.published += 1
+        for sub in subscribers:
+            if device_id is None or sub.device_id in (None, device_id):
+                sub.offer(frame)
+
+    def publish_impact(self, totals: dict):
+        """Increments since the last impact event; silent when unchanged."""
+        with self._lock:
+            previous = self._impact
+            self._impact = dict(totals)
+        if previous is None or previous == totals or not self._subscribers:
+            return
+        self.publish("impact", {
+            "delta": {k: totals[k] - previous.get(k, 0) for k in totals},
+            "totals": totals
+        })
+
+    def stream(self, sub: Subscriber):
+        """Blocking generator of SSE frames for one HTTP response."""
+        try:
+            yield b"retry: 3000\n\n"
+            while True:
+                if sub.lagging:
+                    sub.lagging = False
+                    # Drain stale frames; the client reloads full state
+                    while not sub.queue.empty():
+                        sub.queue.get_nowait()
+                    yield encode_event("resync", {"dropped": sub.dropped})
+                try:
+                    yield sub.queue.get(timeout=HEARTBEAT_SEC)
+                except queue.Empty:
+                    yield b": keepalive\n\n"
+        finally:
+            self.unsubscribe(sub)
+
+    def stats(self) -> dict:
+        with self._lock:
+            subscribers = list(self._subscribers)
+        return {
+            "subscribers": len(subscribers),
+            "published": self.published,
+            "queued": sum(s.queue.qsize() for s in subscribers),
+            "dropped": sum(s.dropped for s in subscribers)
+        }
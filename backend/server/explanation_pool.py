@@ -0,0 +1,246 @@
+"""
+AgriAgents - Deferred Explanations
+Farmer Assistant explanations generated off the ingest path.
+
+The explanation layer (generate_explanation, "LLM-READY") may be backed
+by a model that takes seconds per answer. /data never waits for it:
+
+  /data    builds the decision context, asks the pool for its text
+           → cached text, or null (placeholder) and a queued job
+  workers  generate texts in the background (bounded thread pool)
+  /state   asks again → the text once ready (a dropped job is queued
+           again at that point)
+
+Context = everything the explanation says (decision, override, message,
+confidence, utility, reason key); it is also the cache fingerprint, so
+devices in the same situation share one generation:
+- Identical contexts queued or running at once → one job (deduplicated)
+- Finished texts cached per context (LRU, max_entries) with a TTL
+- Two bounded lanes: high priority (irrigate, emergency stop, climate /
+  pump / scheduler / fault overrides) and low (routine holds). Low jobs
+  are refused once the queue is LOW_PRIORITY_SHARE full; a high job
+  arriving at a full queue evicts the newest low job, else it is
+  dropped too
+
+Generators should release the GIL while they wait (network call, native
+inference, sleep) so ingest threads keep running; LocalExplainer is the
+stand-in until a real model is wired in.
+"""
+
+import threading
+import time
+from collections import OrderedDict, deque
+
+from agentic_engine import generate_explanation, render_reasons
+from pipeline import OVERRIDE_REASONS, REASON_PUMP_FAIL, REASON_RAIN, REASON_SCHEDULED, REASON_SENSOR_FAULT
+
+EXPLAIN_WORKERS = 2
+EXPLAIN_QUEUE = 256           # jobs waiting, both lanes
+EXPLAIN_TTL_SEC = 600.0
+EXPLAIN_MAX_ENTRIES = 10000   # cached texts
+LOW_PRIORITY_SHARE = 0.5      # low jobs only below this queue fill
+
+HIGH, LOW = 0, 1
+OVERRIDES = (REASON_RAIN, REASON_PUMP_FAIL, REASON_SCHEDULED, REASON_SENSOR_FAULT)
+
+
+def explanation_context(decision: str, reason: int, message_code: int, base_decision: dict) -> tuple:
+    """
+    Flat, hashable fingerprint of one decision (survives a JSON round
+    trip as a list): final decision, override reason code, farmer message
+    code, the Decision Agent's own decision / confidence / utility and
+    its reason key (flags, decision, soil, temp, elapsed).
+    """
+    return (
+        decision, reason, message_code,
+        base_decision["decision"], base_decision["confidence"], base_decision["utility"],
+        *base_decision["reasons"].key()
+    )
+
+
+def overridden_context(context, decision: str, reason: int, message_code: int) -> tuple:
+    """Same Decision Agent output, later stage's final decision (scheduler)."""
+    return (decision, reason, message_code, *tuple(context)[3:])
+
+
+def explanation_priority(context: tuple) -> int:
+    decision, reason = context[0], context[1]
+    if decision in ("IRRIGATE", "EMERGENCY_STOP") or reason in OVERRIDES:
+        return HIGH
+    return LOW
+
+
+# ==================================================
+# 🗣️ LOCAL STAND-IN MODEL
+# ==================================================
+class LocalExplainer:
+    """
+    generate_explanation() behind a model-shaped interface: context →
+    text, with optional simulated inference latency.
+    """
+
+    def __init__(self, latency_sec: float = 0.0):
+        self.latency_sec = latency_sec
+
+    def __call__(self, context: tuple) -> str:
+        if self.latency_sec:
+            time.sleep(self.latency_sec)
+        decision, reason, _, base, confidence, utility, *reason_key = context
+        text = generate_explanation({
+            "decision": base,
+            "confidence": confidence,
+            "utility": utility,
+            "reasons": render_reasons(*reason_key)
+        })
+        if reason in OVERRIDES:
+            text += f"\nOverride: {OVERRIDE_REASONS[reason]} → {decision}"
+        return text
+
+
+# ==================================================
+# 🧵 WORKER POOL
+# ==================================================
+class ExplanationPool:
+
+    def __init__(self, generator=None, workers: int = EXPLAIN_WORKERS, max_queue: int = EXPLAIN_QUEUE,
+                 ttl_sec: float = EXPLAIN_TTL_SEC, max_entries: int = EXPLAIN_MAX_ENTRIES):
+        self.generator = generator or LocalExplainer()
+        self.workers = workers
+        self.max_queue = max_queue
+        self.ttl_sec = ttl_sec
+        self.max_entries = max_entries
+
+        self.hits = 0
+        self.misses = 0
+        self.deduplicated = 0
+        self.dropped_low = 0
+        self.evicted_low = 0
+        self.dropped_high = 0
+        self.completed = 0
+        self.errors = 0
+        self.last_error = None
+        self.generate_sec = 0.0
+
+        self._cache = OrderedDict()   # context → (text, stored_at)
+        self._pending = set()         # contexts queued or running
+        self._lanes = (deque(), deque())
+        self._cond = threading.Condition()
+        self._threads = []
+        self._stopped = False
+
+    def start(self):
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"agri-explain-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+
+    # ------------------------------
+    # Ingest / read side (never blocks on generation)
+    # ------------------------------
+    def explain(self, context, now: float = None):
+        """Cached text for this context, else None (and the job queued)."""
+        context = tuple(context)
+        now = time.time() if now is None else now
+        with self._cond:
+            entry = self._cache.get(context)
+            if entry is not None:
+                if now - entry[1] <= self.ttl_sec:
+                    self._cache.move_to_end(context)
+                    self.hits += 1
+                    return entry[0]
+                del self._cache[context]
+            self.misses += 1
+
+            if context in self._pending:
+                self.deduplicated += 1
+                return None
+            self._admit(context, explanation_priority(context))
+            return None
+
+    def _admit(self, context: tuple, priority: int):
+        high, low = self._lanes
+        depth = len(high) + len(low)
+        if priority == LOW:
+            if depth >= self.max_queue * LOW_PRIORITY_SHARE:
+                self.dropped_low += 1
+                return
+        elif depth >= self.max_queue:
+            if not low:
+                self.dropped_high += 1
+                return
+            self._pending.discard(low.pop())
+            self.evicted_low += 1
+
+        self._lanes[priority].append(context)
+        self._pending.add(context)
+        self._cond.notify()
+
+    # ------------------------------
+    # Workers
+    # ------------------------------
+    def _run(self):
+        high, low = self._lanes
+        while True:
+            with self._cond:
+                while not high and not low and not self._stopped:
+                    self._cond.wait()
+                if self._stopped:
+                    return
+                context = (high or low).popleft()
+
+            start = time.perf_counter()
+            error = "generator returned no text"
+            try:
+                text = self.generator(context)
+            except Exception as e:  # a failing model must not kill the worker
+                text = None
+                error = f"{type(e).__name__}: {e}"
+            elapsed = time.perf_counter() - start
+
+            with self._cond:
+                self._pending.discard(context)
+                self.generate_sec += elapsed
+                if text is None:
+                    self.errors += 1
+                    self.last_error = error
+                    continue
+                self.completed += 1
+                self._cache[context] = (text, time.time())
+                self._cache.move_to_end(context)
+                while len(self._cache) > self.max_entries:
+                    self._cache.popitem(last=False)
+
+    # ------------------------------
+    # Introspection
+    # ------------------------------
+    def stats(self) -> dict:
+        with self._cond:
+            high, low = len(self._lanes[HIGH]), len(self._lanes[LOW])
+            lookups = self.hits + self.misses
+            done = self.completed + self.errors
+            return {
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "queued_high": high,
+                "queued_low": low,
+                "in_progress": len(self._pending) - high - low,
+                "cached": len(self._cache),
+                "ttl_sec": self.ttl_sec,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "deduplicated": self.deduplicated,
+                "dropped_low": self.dropped_low,
+                "evicted_low": self.evicted_low,
+                "dropped_high": self.dropped_high,
+                "completed": self.completed,
+                "errors": self.errors,
+                "last_error": self.last_error,
+                "avg_generate_ms": round(self.generate_sec / done * 1000, 3) if done else 0.0
+            }
@@ -0,0 +1,338 @@
+"""
+AgriAgents - Windowed Feature Stage
+Rolling per-device features computed on ingest, fed to the Decision Agent.
+
+Per device, over the last WINDOW readings:
+  soil_ewma       time-aware EWMA of soil moisture (tau = EWMA_TAU_SEC)
+  drying_slope    least-squares soil trend, % per hour (negative = drying)
+  temp_max        hottest reading in the window
+  light_integral  light × hours since the previous reading, summed
+
+The Decision Agent scores these instead of the raw reading
+(utility_inputs):
+  soil         EWMA projected LOOKAHEAD_SEC along the drying slope,
+               rounded to the 0.1 % grid (keeps the compiled table exact)
+  temperature  temp_max (sustained heat, not a single sample)
+  light        light_integral / window hours (a passing cloud is not night)
+Guardrails and reason thresholds for sensor faults still see the raw reading.
+
+Storage:
+- Preallocated NumPy rings, one row per device: memory is fixed per
+  device (WINDOW samples × 4 columns) however long it reports
+- Regression and integral sums are updated in O(1) (add new sample,
+  subtract evicted one) and recomputed from the ring whenever it wraps,
+  so float drift never accumulates
+- State is not persisted: after a restart the windows refill from live data
+"""
+
+import math
+import threading
+
+import numpy as np
+
+WINDOW = 16               # readings kept per device
+EWMA_TAU_SEC = 600.0      # EWMA time constant
+LOOKAHEAD_SEC = 1800.0    # how far the drying slope projects soil
+MAX_GAP_SEC = 3600.0      # longest gap one reading's light is held for
+
+
+class FeatureStore:
+    """
+    update()       one reading → utility inputs (single /data path)
+    update_batch() column arrays → utility input columns (batch path)
+    discard()      forget a device; its row is reused by the next new one
+    """
+
+    # Rings [row, slot] with their empty value; running sums start at 0
+    RINGS = (("_ts", np.nan), ("_soil", np.nan), ("_temp", -np.inf), ("_light_h", 0.0), ("_hours", 0.0))
+    SUMS = ("_t0", "_last_ts", "_ewma", "_st", "_ss", "_stt", "_sts", "_light_sum", "_hour_sum")
+
+    def __init__(
+        self,
+        window: int = WINDOW,
+        capacity: int = 1024,
+        tau: float = EWMA_TAU_SEC,
+        lookahead: float = LOOKAHEAD_SEC,
+        max_gap: float = MAX_GAP_SEC
+    ):
+        self.window = window
+        self.tau = tau
+        self.lookahead = lookahead
+        self.max_gap = max_gap
+
+        self._index = {}
+        self._free = []  # rows of discarded devices
+        self._lock = threading.Lock()
+        self._capacity = 0
+        self._alloc(capacity)
+
+    def _alloc(self, capacity: int):
+        old = self._capacity
+
+        def grow(name, fill, shape=(), dtype=np.float64):
+            new = np.full((capacity,) + shape, fill, dtype=dtype)
+            column = getattr(self, name, None)
+            if column is not None:
+                new[:old] = column[:old]
+            setattr(self, name, new)
+
+        # Rings: [row, slot]; slot = head is the next write position
+        for name, fill in self.RINGS:
+            grow(name, fill, (self.window,))
+        grow("_head", 0, dtype=np.int64)
+        grow("_count", 0, dtype=np.int64)
+
+        # Running sums; t is hours since the row's origin _t0
+        for name in self.SUMS:
+            grow(name, 0.0)
+        self._capacity = capacity
+
+    def _row(self, device_id) -> int:
+        row = self._index.get(device_id)
+        if row is None:
+            if self._free:
+                row = self._index[device_id] = self._free.pop()
+                return row
+            row = self._index[device_id] = len(self._index)
+            if row == self._capacity:
+                self._alloc(self._capacity * 2)
+        return row
+
+    def discard(self, device_id):
+        """Drop a device's window (e.g. it moved to another shard)."""
+        with self._lock:
+            row = self._index.pop(device_id, None)
+            if row is None:
+                return
+            for name, fill in self.RINGS:
+                getattr(self, name)[row] = fill
+            for name in self.SUMS + ("_head", "_count"):
+                getattr(self, name)[row] = 0
+            self._free.append(row)
+
+    def __len__(self):
+        return len(self._index)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(v.nbytes for v in vars(self).values() if isinstance(v, np.ndarray))
+
+    # ------------------------------
+    # Single reading
+    # ------------------------------
+    def update(self, device_id, timestamp: float, soil: float, temperature: float, light: float) -> dict:
+        """
+        Add one reading (epoch seconds); returns features + utility inputs,
+        or None for a reading the guardrails reject (kept out of the window).
+        """
+        if not (0 <= soil <= 100 and -10 <= temperature <= 60) or light != light:
+            return None
+
+        with self._lock:
+            r = self._row(device_id)
+            count = int(self._count[r])
+
+            if count:
+                dt = max(0.0, timestamp - self._last_ts[r])
+                self._ewma[r] += (1 - math.exp(-dt / self.tau)) * (soil - self._ewma[r])
+                hours = min(dt, self.max_gap) / 3600
+            else:
+                self._t0[r] = timestamp
+                self._ewma[r] = soil
+                hours = 0.0
+            self._last_ts[r] = timestamp
+
+            head = int(self._head[r])
+            if count == self.window:
+                # Evict the oldest sample from the running sums
+                t = (self._ts[r, head] - self._t0[r]) / 3600
+                s = self._soil[r, head]
+                self._st[r] -= t
+                self._ss[r] -= s
+                self._stt[r] -= t * t
+                self._sts[r] -= t * s
+                self._light_sum[r] -= self._light_h[r, head]
+                self._hour_sum[r] -= self._hours[r, head]
+            else:
+                self._count[r] = count = count + 1
+
+            t = (timestamp - self._t0[r]) / 3600
+            self._ts[r, head] = timestamp
+            self._soil[r, head] = soil
+            self._temp[r, head] = temperature
+            self._light_h[r, head] = light * hours
+            self._hours[r, head] = hours
+            self._st[r] += t
+            self._ss[r] += soil
+            self._stt[r] += t * t
+            self._sts[r] += t * soil
+            self._light_sum[r] += light * hours
+            self._hour_sum[r] += hours
+
+            head = (head + 1) % self.window
+            self._head[r] = head
+            if head == 0:
+                self._resync(np.array([r]))
+
+            return self._features(r, light)
+
+    def _features(self, r: int, light: float) -> dict:
+        n = float(self._count[r])
+        denom = n * self._stt[r] - self._st[r] ** 2
+        slope = (n * self._sts[r] - self._st[r] * self._ss[r]) / denom if n > 1 and denom > 1e-9 else 0.0
+        hours = self._hour_sum[r]
+
+        ewma = float(self._ewma[r])
+        temp_max = float(self._temp[r].max())
+        light_integral = float(self._light_sum[r])
+        projected = min(100.0, max(0.0, ewma + slope * self.lookahead / 3600))
+        return {
+            "soil_ewma": ewma,
+            "drying_slope": float(slope),
+            "temp_max": temp_max,
+            "light_integral": light_integral,
+            "soil": round(projected * 10) / 10,
+            "temperature": temp_max,
+            "light": float(light_integral / hours) if hours > 0 else float(light)
+        }
+
+    # ------------------------------
+    # Batch
+    # ------------------------------
+    def update_batch(self, device_ids, timestamp, soil, temperature, light) -> dict:
+        """
+        Column arrays in arrival order → dict of feature columns (same keys
+        as update()). A device listed several times is applied in order,
+        one wave per repeat, so the result matches calling update() per row.
+        Rejected readings (see update()) pass their raw values through.
+        """
+        timestamp = np.broadcast_to(np.asarray(timestamp, dtype=np.float64), (len(device_ids),))
+        soil = np.asarray(soil, dtype=np.float64)
+        temperature = np.asarray(temperature, dtype=np.float64)
+        light = np.asarray(light, dtype=np.float64)
+
+        out = {
+            "soil_ewma": soil.copy(),
+            "drying_slope": np.zeros(len(soil)),
+            "temp_max": temperature.copy(),
+            "light_integral": np.zeros(len(soil)),
+            "soil": soil.copy(),
+            "temperature": temperature.copy(),
+            "light": light.copy()
+        }
+
+        valid = np.flatnonzero(
+            (soil >= 0) & (soil <= 100) & (temperature >= -10) & (temperature <= 60) & ~np.isnan(light)
+        )
+        if len(valid) < len(soil):
+            device_ids = [device_ids[i] for i in valid.tolist()]
+            timestamp, soil, temperature, light = timestamp[valid], soil[valid], temperature[valid], light[valid]
+        n = len(valid)
+
+        with self._lock:
+            rows = np.fromiter((self._row(d) for d in device_ids), dtype=np.intp, count=n)
+
+            # k-th occurrence of a device goes into wave k
+            order = np.argsort(rows, kind="stable")
+            starts = np.r_[True, rows[order][1:] != rows[order][:-1]]
+            first = np.maximum.accumulate(np.where(starts, np.arange(n), 0))
+            rank = np.empty(n, dtype=np.int64)
+            rank[order] = np.arange(n) - first
+
+            for k in range(int(rank.max()) + 1 if n else 0):
+                idx = np.flatnonzero(rank == k)
+                self._apply(rows[idx], timestamp[idx], soil[idx], temperature[idx], light[idx])
+                for key, values in self._features_batch(rows[idx], light[idx]).items():
+                    out[key][valid[idx]] = values
+        return out
+
+    def _apply(self, r, ts, soil, temp, light):
+        """One vectorized update() over distinct rows r."""
+        count = self._count[r]
+        seen = count > 0
+
+        dt = np.where(seen, np.maximum(0.0, ts - self._last_ts[r]), 0.0)
+        alpha = np.where(seen, 1 - np.exp(-dt / self.tau), 1.0)
+        self._ewma[r] += alpha * (soil - self._ewma[r])
+        self._t0[r] = np.where(seen, self._t0[r], ts)
+        self._last_ts[r] = ts
+        hours = np.minimum(dt, self.max_gap) / 3600
+
+        head = self._head[r]
+        full = count == self.window
+        t_old = np.where(full, (self._ts[r, head] - self._t0[r]) / 3600, 0.0)
+        s_old = np.where(full, self._soil[r, head], 0.0)
+        self._st[r] -= t_old
+        self._ss[r] -= s_old
+        self._stt[r] -= t_old * t_old
+        self._sts[r] -= t_old * s_old
+        self._light_sum[r] -= np.where(full, self._light_h[r, head], 0.0)
+        self._hour_sum[r] -= np.where(full, self._hours[r, head], 0.0)
+        self._count[r] = np.minimum(count + 1, self.window)
+
+        t = (ts - self._t0[r]) / 3600
+        self._ts[r, head] = ts
+        self._soil[r, head] = soil
+        self._temp[r, head] = temp
+        self._light_h[r, head] = light * hours
+        self._hours[r, head] = hours
+        self._st[r] += t
+        self._ss[r] += soil
+        self._stt[r] += t * t
+        self._sts[r] += t * soil
+        self._light_sum[r] += light * hours
+        self._hour_sum[r] += hours
+
+        head = (head + 1) % self.window
+        self._head[r] = head
+        wrapped = r[head == 0]
+        if len(wrapped):
+            self._resync(wrapped)
+
+    def _features_batch(self, r, light) -> dict:
+        n = self._count[r].astype(np.float64)
+        st, stt = self._st[r], self._stt[r]
+        denom = n * stt - st * st
+        with np.errstate(divide="ignore", invalid="ignore"):
+            slope = np.where(
+                (n > 1) & (denom > 1e-9),
+                (n * self._sts[r] - st * self._ss[r]) / denom,
+                0.0
+            )
+            hours = self._hour_sum[r]
+            light_mean = np.where(hours > 0, self._light_sum[r] / hours, light)
+
+        ewma = self._ewma[r]
+        temp_max = self._temp[r].max(axis=1)
+        projected = np.clip(ewma + slope * self.lookahead / 3600, 0.0, 100.0)
+        return {
+            "soil_ewma": ewma,
+            "drying_slope": slope,
+            "temp_max": temp_max,
+            "light_integral": self._light_sum[r],
+            "soil": np.rint(projected * 10) / 10,
+            "temperature": temp_max,
+            "light": light_mean
+        }
+
+    def _resync(self, r):
+        """Recompute running sums from the full rings; re-base t on the oldest sample."""
+        ts = self._ts[r]
+        self._t0[r] = ts.min(axis=1)
+        t = (ts - self._t0[r][:, None]) / 3600
+        soil = self._soil[r]
+        self._st[r] = t.sum(axis=1)
+        self._ss[r] = soil.sum(axis=1)
+        self._stt[r] = (t * t).sum(axis=1)
+        self._sts[r] = (t * soil).sum(axis=1)
+        self._light_sum[r] = self._light_h[r].sum(axis=1)
+        self._hour_sum[r] = self._hours[r].sum(axis=1)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "devices": len(self._index),
+                "window": self.window,
+                "capacity": self._capacity,
+                "bytes": self.nbytes
+            }
@@ -0,0 +1,755 @@
+"""
+AgriAgents - Fleet Simulator & Ingest Benchmarks
+Load-generates N independent devices against a running backend, or
+microbenchmarks the decision hot path in-process.
+
+Load mode (Flask on :5000 or async_ingest on :5001):
+    python fleet_sim.py --url http://localhost:5001 --devices 5000 \\
+        --rate 2000 --duration 30 --connections 64
+
+Each device has its own soil drying rate, temperature sine, light curve
+and pump feedback (IRRIGATE → soil rises), like fake_sensor_stream.py.
+Requests are scheduled open-loop at --rate over pooled keep-alive
+connections; latency is measured from the scheduled send time, so a
+stalled server shows up as latency instead of silently lowering load.
+
+Microbenchmark mode (no server needed):
+    python fleet_sim.py --bench --iterations 20000
+
+Cold-start mode (fresh interpreter per run, Flask app vs serverless.py):
+    python fleet_sim.py --cold-start --runs 5
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import time
+from collections import Counter
+from urllib.parse import urlsplit
+
+import numpy as np
+
+
+# ==================================================
+# 🌱 SIMULATED DEVICE
+# ==================================================
+class SimDevice:
+    """One ESP32: own drying rate, daily phase and pump feedback."""
+
+    __slots__ = ("device_id", "soil", "drying", "phase", "step", "rng")
+
+    def __init__(self, device_id: str, seed: int):
+        self.device_id = device_id
+        self.rng = random.Random(seed)
+        self.soil = self.rng.uniform(35, 60)
+        self.drying = self.rng.uniform(0.5, 2.0)
+        self.phase = self.rng.uniform(0, 2 * math.pi)
+        self.step = 0
+
+    def reading(self) -> dict:
+        rng = self.rng
+        self.soil = max(5.0, min(95.0, self.soil - self.drying * rng.uniform(0.5, 1.5)))
+        t = self.step * 0.1 + self.phase
+        temp = 28 + 8 * math.sin(t) + rng.uniform(-1, 1)
+        light = max(100, min(4095, int(2000 + 1500 * math.sin(t * 1.5) + rng.randint(-200, 200))))
+        self.step += 1
+        return {
+            "device_id": self.device_id,
+            "sensors": {
+                "soil": round(self.soil, 1),
+                "temp": round(temp, 1),
+                "light": light
+            }
+        }
+
+    def feedback(self, decision: str):
+        if decision == "IRRIGATE":
+            self.soil = min(95.0, self.soil + self.rng.uniform(8, 15))
+
+
+# ==================================================
+# 📊 LATENCY HISTOGRAM
+# ==================================================
+class LatencyHistogram:
+    """
+    Log-bucketed histogram (8 buckets per doubling, ~9 % resolution)
+    from 10 µs to ~170 s: constant memory however long the run.
+    """
+
+    MIN_SEC = 1e-5
+    PER_OCTAVE = 8
+
+    def __init__(self, octaves: int = 24):
+        self.counts = np.zeros(octaves * self.PER_OCTAVE + 1, dtype=np.int64)
+        self.total = 0
+        self.max = 0.0
+
+    def _bucket(self, seconds: float) -> int:
+        if seconds <= self.MIN_SEC:
+            return 0
+        index = int(math.log2(seconds / self.MIN_SEC) * self.PER_OCTAVE) + 1
+        return min(index, len(self.counts) - 1)
+
+    def upper(self, bucket: int) -> float:
+        return self.MIN_SEC * 2 ** (bucket / self.PER_OCTAVE)
+
+    def record(self, seconds: float):
+        self.counts[self._bucket(seconds)] += 1
+        self.total += 1
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, p: float) -> float:
+        if not self.total:
+            return 0.0
+        rank = max(1, math.ceil(self.total * p / 100))
+        bucket = int(np.searchsorted(np.cumsum(self.counts), rank))
+        return min(self.upper(bucket), self.max)
+
+    def render(self, rows: int = 12, width: int = 40) -> list:
+        """ASCII bars, adjacent buckets merged into at most rows lines."""
+        used = np.flatnonzero(self.counts)
+        if not len(used):
+            return []
+        lo, hi = used[0], used[-1] + 1
+        step = max(1, math.ceil((hi - lo) / rows))
+        groups = [(b, min(b + step, hi)) for b in range(lo, hi, step)]
+        peak = max(self.counts[a:b].sum() for a, b in groups)
+
+        lines = []
+        for a, b in groups:
+            count = int(self.counts[a:b].sum())
+            bar = "█" * int(round(width * count / peak))
+            lines.append(f"  ≤{self.upper(b - 1) * 1000:9.3f} ms | {bar:<{width}} {count}")
+        return lines
+
+
+# ==================================================
+# 🔌 KEEP-ALIVE HTTP CLIENT
+# ==================================================
+class HTTPConnection:
+    """One persistent HTTP/1.1 connection; reconnects when the server closes it."""
+
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+
+    async def _connect(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.reader = self.writer = None
+
+    async def post(self, path: str, body: bytes):
+        if self.writer is None:
+            await self._connect()
+        try:
+            return await self._exchange(path, body)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            # Stale keep-alive socket: retry once on a fresh connection
+            self.close()
+            await self._connect()
+            return await self._exchange(path, body)
+
+    async def _exchange(self, path: str, body: bytes):
+        self.writer.write(
+            f"POST {path} HTTP/1.1\r\n"
+            f"Host: {self.host}:{self.port}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: keep-alive\r\n\r\n".encode() + body
+        )
+        await self.writer.drain()
+
+        head = await self.reader.readuntil(b"\r\n\r\n")
+        lines = head.decode("latin-1").split("\r\n")
+        status = int(lines[0].split()[1])
+        headers = {}
+        for line in lines[1:]:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        if "content-length" in headers:
+            data = await self.reader.readexactly(int(headers["content-length"]))
+        else:
+            data = await self.reader.read()
+            headers["connection"] = "close"
+
+        if headers.get("connection", "").lower() == "close" or lines[0].startswith("HTTP/1.0"):
+            self.close()
+        return status, data
+
+
+class ConnectionPool:
+
+    def __init__(self, url: str, size: int):
+        parts = urlsplit(url)
+        self.path = parts.path if parts.path not in ("", "/") else "/data"
+        self._idle = asyncio.Queue()
+        for _ in range(size):
+            self._idle.put_nowait(HTTPConnection(parts.hostname, parts.port or 80))
+
+    async def post(self, body: bytes):
+        conn = await self._idle.get()
+        try:
+            return await conn.post(self.path, body)
+        except BaseException:
+            conn.close()
+            raise
+        finally:
+            self._idle.put_nowait(conn)
+
+    def close(self):
+        while not self._idle.empty():
+            self._idle.get_nowait().close()
+
+
+# ==================================================
+# 🚜 FLEET LOAD RUN
+# ==================================================
+class FleetRun:
+
+    def __init__(self, url: str, devices: int, rate: float, duration: float, connections: int, seed: int = 0):
+        self.url = url
+        self.rate = rate
+        self.duration = duration
+        self.connections = connections
+        self.devices = [SimDevice(f"sim_{i:05d}", seed * 1000003 + i) for i in range(devices)]
+
+        self.latency = LatencyHistogram()
+        self.decisions = Counter()
+        self.errors = Counter()
+        self.sent = 0
+        self.elapsed = 0.0
+
+    async def _send(self, pool: ConnectionPool, device: SimDevice, scheduled: float):
+        try:
+            status, data = await pool.post(json.dumps(device.reading()).encode())
+        except (OSError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError) as e:
+            self.errors[type(e).__name__] += 1
+            return
+
+        self.latency.record(time.perf_counter() - scheduled)
+        if status != 200:
+            self.errors[f"HTTP {status}"] += 1
+            return
+        try:
+            decision = json.loads(data).get("decision", "UNKNOWN")
+        except ValueError:
+            self.errors["invalid JSON"] += 1
+            return
+        self.decisions[decision] += 1
+        device.feedback(decision)
+
+    async def run(self):
+        pool = ConnectionPool(self.url, self.connections)
+        total = int(self.rate * self.duration)
+        interval = 1.0 / self.rate
+        tasks = set()
+
+        started = time.perf_counter()
+        for i in range(total):
+            scheduled = started + i * interval
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            device = self.devices[i % len(self.devices)]
+            task = asyncio.ensure_future(self._send(pool, device, scheduled))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            self.sent += 1
+
+        if tasks:
+            await asyncio.gather(*tasks)
+        self.elapsed = time.perf_counter() - started
+        pool.close()
+
+    def report(self) -> dict:
+        completed = self.latency.total
+        failed = sum(self.errors.values())
+        answered = sum(self.decisions.values())
+        return {
+            "sent": self.sent,
+            "completed": completed,
+            "target_rps": self.rate,
+            "achieved_rps": round(completed / self.elapsed, 1) if self.elapsed else 0.0,
+            "error_rate": round(failed / self.sent, 4) if self.sent else 0.0,
+            "errors": dict(self.errors),
+            "latency_ms": {
+                **{f"p{p:g}": round(self.latency.percentile(p) * 1000, 3) for p in (50, 90, 99, 99.9)},
+                "max": round(self.latency.max * 1000, 3)
+            },
+            "decisions": {
+                d: round(n / answered, 4) for d, n in self.decisions.most_common()
+            }
+        }
+
+
+def print_load_report(run: FleetRun):
+    report = run.report()
+    print(f"📡 Sent {report['sent']} | completed {report['completed']} in {run.elapsed:.1f}s")
+    print(f"   Throughput: {report['achieved_rps']} rps (target {report['target_rps']})")
+    print(f"   Errors: {report['error_rate'] * 100:.2f}% {report['errors'] or ''}")
+    print("   Latency: " + "  ".join(f"{k}={v}ms" for k, v in report["latency_ms"].items()))
+    for line in run.latency.render():
+        print(line)
+    print("   Decisions: " + "  ".join(f"{d}={share * 100:.1f}%" for d, share in report["decisions"].items()))
+
+
+# ==================================================
+# ⏱️ IN-PROCESS MICROBENCHMARKS
+# ==================================================
+def _timeit(fn, iterations: int) -> dict:
+    fn(0)  # warm-up
+    started = time.perf_counter()
+    for i in range(iterations):
+        fn(i)
+    elapsed = time.perf_counter() - started
+    return {
+        "iterations": iterations,
+        "us_per_op": round(elapsed / iterations * 1e6, 2),
+        "ops_per_sec": round(iterations / elapsed, 1)
+    }
+
+
+def _timeit_rows(fn, batches: int, batch_size: int) -> dict:
+    """_timeit over whole batches, reported per row."""
+    per_batch = _timeit(fn, batches)
+    return {
+        "iterations": batches * batch_size,
+        "us_per_op": round(per_batch["us_per_op"] / batch_size, 3),
+        "ops_per_sec": round(per_batch["ops_per_sec"] * batch_size, 1)
+    }
+
+
+def run_benchmarks(iterations: int, batch_size: int = 1000, seed: int = 0) -> dict:
+    """
+    Every microbenchmark, in report order (batch benchmarks report per row):
+      bench_decisions  scalar / batch agent and compiled decision table
+      bench_parsing    JSON vs binary frame parsing
+      bench_scheduler  fleet irrigation scheduler
+      bench_faults     sensor / pump fault detector
+      bench_analytics  log export and queries
+      bench_ingest     Flask /data handler end to end
+      bench_replies    /data reply serialization
+    """
+    devices = [SimDevice(f"bench_{i:04d}", seed + i) for i in range(100)]
+    # At least one full batch, however few iterations
+    readings = [devices[i % len(devices)].reading() for i in range(max(iterations, batch_size))]
+
+    results = {}
+    results.update(bench_decisions(readings, iterations, batch_size))
+    results.update(bench_parsing(readings, iterations, batch_size))
+    results.update(bench_scheduler(iterations, seed))
+    results.update(bench_faults(readings, iterations, batch_size))
+    results.update(bench_analytics(iterations, seed))
+    results.update(bench_ingest(readings, iterations))
+    results.update(bench_replies(readings[iterations - 1]["device_id"], iterations))
+    return results
+
+
+def bench_decisions(readings: list, iterations: int, batch_size: int) -> dict:
+    """agentic_decision and the compiled table per reading, both batch paths per row."""
+    from datetime import datetime
+
+    from agentic_engine import agentic_decision, agentic_decision_batch
+    from device_state import to_epoch
+    from policy_table import compiled_policy
+
+    now = datetime.utcnow()
+    results = {}
+
+    def scalar(i):
+        agentic_decision(
+            {"soil": readings[i]["sensors"]["soil"],
+             "temperature": readings[i]["sensors"]["temp"],
+             "light": readings[i]["sensors"]["light"]},
+            now=now
+        )
+    results["agentic_decision"] = _timeit(scalar, iterations)
+
+    table = compiled_policy()
+
+    def table_scalar(i):
+        table.decide(
+            {"soil": readings[i]["sensors"]["soil"],
+             "temperature": readings[i]["sensors"]["temp"],
+             "light": readings[i]["sensors"]["light"]},
+            now=now
+        )
+    results["policy_table.decide"] = _timeit(table_scalar, iterations)
+
+    soil = np.array([r["sensors"]["soil"] for r in readings])
+    temp = np.array([r["sensors"]["temp"] for r in readings])
+    light = np.array([r["sensors"]["light"] for r in readings])
+    batches = max(1, iterations // batch_size)
+
+    for name, decide in (
+        ("agentic_decision_batch", agentic_decision_batch),
+        ("policy_table.decide_batch", table.decide_batch)
+    ):
+        def batch(i):
+            lo = (i % batches) * batch_size
+            decide(soil[lo:lo + batch_size], temp[lo:lo + batch_size],
+                   light[lo:lo + batch_size], now=to_epoch(now))
+        results[f"{name}[{batch_size}]"] = _timeit_rows(batch, batches, batch_size)
+    return results
+
+
+def bench_parsing(readings: list, iterations: int, batch_size: int) -> dict:
+    """JSON batch bodies vs binary frames, per reading, with bytes per reading."""
+    from datetime import datetime
+
+    from device_state import to_epoch
+    from pipeline import readings_to_columns
+    from telemetry_frame import encode_frame, decode_frames, frames_to_columns
+
+    now = to_epoch(datetime.utcnow())
+    batches = max(1, iterations // batch_size)
+    json_batches = [
+        json.dumps({"readings": readings[lo:lo + batch_size]}).encode()
+        for lo in range(0, batches * batch_size, batch_size)
+    ]
+    frame_batches = [
+        b"".join(
+            encode_frame(i % 100, [(i, int(now), r["sensors"]["soil"], r["sensors"]["temp"], r["sensors"]["light"])])
+            for i, r in enumerate(readings[lo:lo + batch_size], lo)
+        )
+        for lo in range(0, batches * batch_size, batch_size)
+    ]
+
+    results = {}
+    for name, parse, body_batches in (
+        ("parse_json", lambda body: readings_to_columns(json.loads(body)["readings"]), json_batches),
+        ("parse_frames", lambda body: frames_to_columns(decode_frames(body)), frame_batches)
+    ):
+        results[f"{name}[{batch_size}]"] = {
+            **_timeit_rows(lambda i: parse(body_batches[i % batches]), batches, batch_size),
+            "bytes_per_reading": round(sum(map(len, body_batches)) / (batches * batch_size), 1)
+        }
+    return results
+
+
+def bench_scheduler(iterations: int, seed: int = 0) -> dict:
+    """
+    50k requesting devices in 50 zones: request_batch per device, tick
+    (release finished runs + admit the next ones) per call.
+    """
+    from irrigation_scheduler import IrrigationScheduler
+
+    fleet = [f"sched_{i:05d}" for i in range(50000)]
+    zones = {device_id: f"zone_{i % 50}" for i, device_id in enumerate(fleet)}
+    rng = np.random.default_rng(seed)
+    scheduler = IrrigationScheduler(zone_of=zones.get, capacity_lpm=200)
+    irrigate = np.ones(len(fleet), dtype=bool)
+    utility = rng.uniform(40, 100, len(fleet))
+    confidence = rng.uniform(0.5, 1.0, len(fleet))
+
+    results = {}
+    started = time.perf_counter()
+    scheduler.request_batch(fleet, irrigate, utility, confidence, 0.0, 1e9)
+    elapsed = time.perf_counter() - started
+    results[f"scheduler.request_batch[{len(fleet)}]"] = {
+        "iterations": len(fleet),
+        "us_per_op": round(elapsed / len(fleet) * 1e6, 3),
+        "ops_per_sec": round(len(fleet) / elapsed, 1)
+    }
+    # Every tick: the previous runs finish, the next 20 per zone start
+    ticks = min(iterations, 40)
+    results[f"scheduler.tick[{len(fleet)}]"] = {
+        **_timeit(lambda i: scheduler.tick((i + 1) * (scheduler.run_sec + 1)), ticks),
+        "granted": scheduler.stats()["granted"]
+    }
+    return results
+
+
+def bench_faults(readings: list, iterations: int, batch_size: int) -> dict:
+    """FaultDetector.update per reading, update_batch (one reading per device) per row."""
+    from sensor_faults import FaultDetector
+
+    soil = [r["sensors"]["soil"] for r in readings]
+    temp = [r["sensors"]["temp"] for r in readings]
+
+    detector = FaultDetector()
+    results = {
+        "faults.update": _timeit(
+            lambda i: detector.update(readings[i]["device_id"], i * 60.0, soil[i], temp[i], None),
+            iterations
+        )
+    }
+
+    soil_col, temp_col = np.array(soil), np.array(temp)
+    batch_ids = [f"fault_{i:05d}" for i in range(batch_size)]
+    batch_detector = FaultDetector()
+    batches = max(1, iterations // batch_size)
+
+    def faults_batch(i):
+        lo = (i % batches) * batch_size
+        batch_detector.update_batch(batch_ids, i * 60.0, soil_col[lo:lo + batch_size], temp_col[lo:lo + batch_size])
+    results[f"faults.update_batch[{batch_size}]"] = _timeit_rows(faults_batch, batches, batch_size)
+    return results
+
+
+def bench_analytics(iterations: int, seed: int = 0) -> dict:
+    """
+    A month of 1000 devices at 15-minute readings in a temporary log:
+    export per row, queries per call.
+    """
+    import tempfile
+
+    from analytics import AnalyticsExporter, AnalyticsStore
+    from telemetry_log import TelemetryLog
+
+    results = {}
+    with tempfile.TemporaryDirectory() as log_dir:
+        log = TelemetryLog(log_dir)
+        month_ids = [f"month_{d:04d}" for d in range(1000)]
+        rng = np.random.default_rng(seed)
+        start = 1_777_593_600.0  # 2026-05-01 UTC
+        for step in range(30 * 96):
+            decision = rng.integers(0, 4, len(month_ids)).astype(np.uint8)
+            nan = np.full(len(month_ids), np.nan)
+            log.append_batch(month_ids, start + step * 900.0, {
+                "soil": rng.uniform(10, 60, len(month_ids)),
+                "temperature": rng.normal(25, 3, len(month_ids)),
+                "light": np.full(len(month_ids), 2500),
+                "decision": decision,
+                "reason": np.zeros(len(month_ids), dtype=np.uint8),
+                "rain_expected": rng.random(len(month_ids)) < 0.2,
+                "last_action_time": nan,
+                "rain_eta": nan,
+                "water_saved": np.zeros(len(month_ids)),
+                "pump_cycles_avoided": np.zeros(len(month_ids))
+            }, "NORMAL")
+        log.flush()
+
+        exporter = AnalyticsExporter(
+            log_dir, os.path.join(log_dir, "analytics"), field_of=lambda device_id: f"field_{int(device_id[-4:]) % 50}"
+        )
+        started = time.perf_counter()
+        while exporter.export() >= exporter.batch:
+            pass
+        elapsed = time.perf_counter() - started
+        results[f"analytics.export[{exporter.rows_exported}]"] = {
+            "iterations": exporter.rows_exported,
+            "us_per_op": round(elapsed / exporter.rows_exported * 1e6, 3),
+            "ops_per_sec": round(exporter.rows_exported / elapsed, 1)
+        }
+
+        store = AnalyticsStore(exporter.directory)
+        queries = {
+            "field,day": {"group_by": ["field", "day"]},
+            "decision,hour": {"group_by": ["decision", "hour_of_day"], "metrics": ["count", "soil_mean"]},
+            "device,week": {"device_id": "month_0042", "start": start + 7 * 86400, "end": start + 14 * 86400},
+            "field,week": {"field_id": "field_7", "start": start + 7 * 86400, "end": start + 14 * 86400,
+                           "group_by": ["device"]}
+        }
+        for name, query in queries.items():
+            results[f"analytics.query[{name}]"] = {
+                **_timeit(lambda i: store.query(**query), min(iterations, 5)),
+                "rows_scanned": store.query(**query)["scan"]["rows_scanned"]
+            }
+    return results
+
+
+def bench_ingest(readings: list, iterations: int) -> dict:
+    """
+    Flask /data through the test client (stdout discarded): both reply
+    shapes, a steady-state fleet repeating its readings (decision memo
+    hits), and a 1 s explanation model (deferred: should match
+    ingest_handler).
+    """
+    import server
+    client = server.app.test_client()
+    bodies = [json.dumps(r) for r in readings[:iterations]]
+
+    def ingest(i):
+        client.post("/data", data=bodies[i], content_type="application/json")
+
+    def ingest_min(i):
+        client.post("/data?reply=min", data=bodies[i], content_type="application/json")
+
+    steady = [
+        json.dumps({"device_id": f"steady_{d:04d}", "sensors": {"soil": 45.0, "temp": 28.0, "light": 2500}})
+        for d in range(100)
+    ]
+
+    def ingest_steady(i):
+        client.post("/data?reply=min", data=steady[i % len(steady)], content_type="application/json")
+
+    results = {}
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        results["ingest_handler"] = _timeit(ingest, iterations)
+        results["ingest_handler[reply=min]"] = _timeit(ingest_min, iterations)
+        hits = server.DECISION_MEMO.hits
+        results["ingest_handler[steady]"] = {
+            **_timeit(ingest_steady, iterations),
+            "memo_hits": server.DECISION_MEMO.hits - hits
+        }
+
+        from explanation_pool import LocalExplainer
+        fast, server.EXPLAINER.generator = server.EXPLAINER.generator, LocalExplainer(latency_sec=1.0)
+        explain = server.EXPLAINER.stats()
+        results["ingest_handler[slow_explain]"] = _timeit(ingest, iterations)
+        after = server.EXPLAINER.stats()
+        results["ingest_handler[slow_explain]"].update({
+            name: after[name] - explain[name] for name in ("completed", "deduplicated", "dropped_low")
+        })
+        server.EXPLAINER.generator = fast
+    return results
+
+
+def bench_replies(device_id, iterations: int) -> dict:
+    """/data reply for an ingested device: jsonify vs preencoded full vs minimal, with bytes per reply."""
+    import server
+    from flask import jsonify
+    from pipeline import render_agents
+    from response import encode_full, encode_minimal
+
+    dev = server.DEVICES.get(device_id)
+    impact = server.DEVICES.impact_totals()
+    replies = {
+        "reply_jsonify": lambda: jsonify({
+            "status": "ok",
+            "decision": dev.last_decision,
+            "agents": render_agents(dev.latest_agents),
+            "impact_metrics": impact
+        }).get_data(),
+        "reply_full": lambda: encode_full(dev.last_decision, dev.latest_agents, impact),
+        "reply_min": lambda: encode_minimal(dev.last_decision, 0)
+    }
+    results = {}
+    with server.app.app_context():
+        for name, encode in replies.items():
+            results[name] = {**_timeit(lambda i: encode(), iterations), "bytes_per_reply": len(encode())}
+    return results
+
+
+# ==================================================
+# 🧊 COLD START (FLASK vs SERVERLESS)
+# ==================================================
+# Runs in a fresh interpreter: import, first batch, warm batches, peak RSS
+COLD_START_PROBE = """
+import contextlib, io, json, resource, sys, time
+event = json.loads(sys.argv[1])
+with contextlib.redirect_stdout(io.StringIO()):
+    started = time.perf_counter()
+    {load}
+    imported = time.perf_counter()
+    {invoke}
+    first = time.perf_counter()
+    for _ in range({warm}):
+        {invoke}
+    warm = time.perf_counter()
+print(json.dumps({{
+    "import_ms": (imported - started) * 1000,
+    "first_invoke_ms": (first - imported) * 1000,
+    "warm_invoke_ms": (warm - first) / {warm} * 1000,
+    "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+}}))
+"""
+
+COLD_START_PATHS = {
+    "flask": ("import server; client = server.app.test_client()",
+              "client.post('/data/batch', json=event)"),
+    "serverless": ("import serverless",
+                   "serverless.handler(event, None)"),
+    # Engine built at import (the runtime's init phase)
+    "serverless[preload]": ("import os; os.environ['AGRI_SERVERLESS_PRELOAD'] = '1'; import serverless",
+                            "serverless.handler(event, None)")
+}
+
+
+def run_cold_start(runs: int = 5, batch_size: int = 100, warm: int = 20, seed: int = 0) -> dict:
+    """
+    Median over runs of a fresh interpreter per path: import time, first
+    /data/batch-equivalent invocation (batch_size readings), mean warm
+    invocation and peak resident memory (interpreter start excluded).
+    """
+    devices = [SimDevice(f"cold_{i:04d}", seed + i) for i in range(batch_size)]
+    event = json.dumps({"readings": [device.reading() for device in devices]})
+    here = os.path.dirname(os.path.abspath(__file__))
+
+    results = {}
+    for path, (load, invoke) in COLD_START_PATHS.items():
+        probe = COLD_START_PROBE.format(load=load, invoke=invoke, warm=warm)
+        samples = []
+        for _ in range(runs):
+            out = subprocess.run(
+                [sys.executable, "-c", probe, event], cwd=here, capture_output=True, text=True, check=True
+            )
+            samples.append(json.loads(out.stdout.strip().splitlines()[-1]))
+        results[path] = {
+            name: round(float(np.median([sample[name] for sample in samples])), 3) for name in samples[0]
+        }
+    return results
+
+
+def print_cold_start_report(results: dict):
+    print(f"{'path':<22}{'import ms':>12}{'first ms':>12}{'warm ms':>12}{'RSS MB':>10}")
+    for path, r in results.items():
+        print(f"{path:<22}{r['import_ms']:>12}{r['first_invoke_ms']:>12}{r['warm_invoke_ms']:>12}{r['rss_mb']:>10}")
+
+
+def print_bench_report(results: dict):
+    print(f"{'benchmark':<34}{'µs/op':>10}{'ops/s':>14}{'bytes':>8}")
+    for name, r in results.items():
+        size = r.get("bytes_per_reading", r.get("bytes_per_reply", ""))
+        print(f"{name:<34}{r['us_per_op']:>10}{r['ops_per_sec']:>14,.0f}{size:>8}")
+
+
+# ==================================================
+# 🚀 ENTRYPOINT
+# ==================================================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="AgriAgents fleet simulator")
+    parser.add_argument("--url", default="http://localhost:5000/data")
+    parser.add_argument("--devices", type=int, default=1000)
+    parser.add_argument("--rate", type=float, default=200.0, help="target requests per second")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds")
+    parser.add_argument("--connections", type=int, default=32)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--bench", action="store_true", help="in-process microbenchmarks")
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--cold-start", action="store_true", help="Flask vs serverless.py cold start")
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters per cold-start path")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    if args.bench:
+        results = run_benchmarks(args.iterations, seed=args.seed)
+        if args.json:
+            print(json.dumps(results, indent=2))
+        else:
+            print_bench_report(results)
+    elif args.cold_start:
+        results = run_cold_start(args.runs, seed=args.seed)
+        if args.json:
+            print(json.dumps(results, indent=2))
+        else:
+            print_cold_start_report(results)
+    else:
+        print("=" * 50)
+        print("🌱 AgriAgents - Fleet Simulator")
+        print(f"   {args.devices} devices → {args.url}")
+        print(f"   {args.rate} rps for {args.duration}s over {args.connections} connections")
+        print("=" * 50)
+        print()
+
+        run = FleetRun(args.url, args.devices, args.rate, args.duration, args.connections, args.seed)
+        asyncio.run(run.run())
+        if args.json:
+            print(json.dumps(run.report(), indent=2))
+        else:
+            print_load_report(run)
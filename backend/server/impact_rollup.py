@@ -0,0 +1,507 @@
+"""
+AgriAgents - Impact Rollups
+Time-bucketed impact metrics per device, field and fleet.
+
+DEVICES keeps cumulative counters only (reset when the scenario returns
+to NORMAL). Rollups keep the history dashboards chart:
+
+  metric columns  water_saved_liters, pump_cycles_run (actuated
+                  IRRIGATE), pump_cycles_avoided, decisions per
+                  DECISIONS code
+  scopes          device (device_id), field (field_id the device
+                  reported), fleet (one row)
+  resolutions     minute / hour / day buckets, each a preallocated ring
+                  per row; coarser rings keep a longer history (retention
+                  per scope in RETENTION)
+
+Writes:
+- Every reading adds into its bucket at all three resolutions (O(1),
+  no compaction pass): an hour bucket is the sum of its minutes even
+  after those minutes left the minute ring
+- A ring slot carries the bucket number it holds; a write for a newer
+  bucket zeroes the slot first, so expired buckets are never scanned
+- Readings older than a ring's retention only reach the coarser rings
+
+Reads:
+- query() over [start, end) picks the finest resolution that still
+  covers start within MAX_POINTS buckets: O(buckets), never O(readings)
+
+Durability:
+- snapshot() writes every ring to one .npz (atomic replace); the server
+  snapshots every SNAPSHOT_SEC when AGRI_LOG_DIR is set
+- fold_log() replays telemetry log records newer than the snapshot, so a
+  restart loses nothing the durable log kept
+- Scenario resets never touch rollups
+"""
+
+import os
+import threading
+import time
+
+import numpy as np
+
+from agentic_engine import DECISIONS, DECISION_CODES, FIELD_LIMITS
+from pipeline import DEFAULT_DEVICE_ID
+from telemetry_log import FLAG_BACKFILL, FLAG_RAIN
+
+RESOLUTIONS = (("minute", 60), ("hour", 3600), ("day", 86400))
+BUCKET_SEC = dict(RESOLUTIONS)
+
+# Buckets kept per row (minute, hour, day)
+RETENTION = {
+    "fleet": {"minute": 1440, "hour": 720, "day": 365},
+    "field": {"minute": 1440, "hour": 720, "day": 365},
+    "device": {"minute": 60, "hour": 48, "day": 30}
+}
+SCOPES = tuple(RETENTION)
+
+METRICS = ("water_saved_liters", "pump_cycles_run", "pump_cycles_avoided") + DECISIONS
+WATER, RUN, AVOIDED = 0, 1, 2
+FIRST_DECISION = 3
+
+MAX_POINTS = 500        # buckets one query returns at most
+DEFAULT_RANGE_SEC = 3600
+SNAPSHOT_SEC = 60.0
+SNAPSHOT_FILE = "impact_rollups.npz"
+FLEET = "fleet"
+
+
+# ==================================================
+# 🧱 RING TABLE (ONE SCOPE)
+# ==================================================
+class RollupTable:
+    """
+    One row per key; per resolution a (rows, retention, metrics) float32
+    ring and a (rows, retention) int64 array of the bucket number each
+    slot holds (-1 = empty). Not thread-safe: ImpactRollups locks.
+    """
+
+    def __init__(self, retention: dict, capacity: int = 16):
+        self.retention = retention
+        self.keys = []
+        self.index = {}
+        self.values = {}
+        self.stamps = {}
+        self._capacity = 0
+        self._alloc(capacity)
+
+    def _alloc(self, capacity: int):
+        old = len(self.keys)
+        for name, _ in RESOLUTIONS:
+            slots = self.retention[name]
+            values = np.zeros((capacity, slots, len(METRICS)), dtype=np.float32)
+            stamps = np.full((capacity, slots), -1, dtype=np.int64)
+            if name in self.values:
+                values[:old] = self.values[name][:old]
+                stamps[:old] = self.stamps[name][:old]
+            self.values[name] = values
+            self.stamps[name] = stamps
+        self._capacity = capacity
+
+    def row(self, key) -> int:
+        row = self.index.get(key)
+        if row is None:
+            row = len(self.keys)
+            if row == self._capacity:
+                self._alloc(self._capacity * 2)
+            self.keys.append(key)
+            self.index[key] = row
+        return row
+
+    def add(self, row: int, timestamp: float, column: int, water: float, run: bool, avoided: bool):
+        """One reading into all three resolutions."""
+        for name, width in RESOLUTIONS:
+            bucket = int(timestamp // width)
+            slot = bucket % self.retention[name]
+            stamps = self.stamps[name][row]
+            held = stamps[slot]
+            if held > bucket:
+                continue  # older than this ring's retention
+            values = self.values[name][row, slot]
+            if held != bucket:
+                values[:] = 0.0
+                stamps[slot] = bucket
+            values[column] += 1.0
+            if water:
+                values[WATER] += water
+            if run:
+                values[RUN] += 1.0
+            if avoided:
+                values[AVOIDED] += 1.0
+
+    def add_batch(self, rows: np.ndarray, timestamp: np.ndarray, metrics: np.ndarray):
+        """rows / timestamp per reading, metrics (n, len(METRICS)) float32."""
+        for name, width in RESOLUTIONS:
+            retention = self.retention[name]
+            bucket = (timestamp // width).astype(np.int64)
+            slot = bucket % retention
+            stamps, values = self.stamps[name], self.values[name]
+
+            held = stamps[rows, slot]
+            # Newest bucket per slot wins; older readings fall out of this ring
+            np.maximum.at(stamps, (rows, slot), bucket)
+            now_held = stamps[rows, slot]
+            advanced = now_held != held
+            values[rows[advanced], slot[advanced]] = 0.0
+            keep = bucket == now_held
+            np.add.at(values, (rows[keep], slot[keep]), metrics[keep])
+
+    def series(self, row: int, resolution: str, first: int, last: int) -> np.ndarray:
+        """(last - first + 1, metrics) float64 for bucket numbers first … last."""
+        buckets = np.arange(first, last + 1, dtype=np.int64)
+        out = np.zeros((len(buckets), len(METRICS)))
+        if row is None:
+            return out
+        slot = buckets % self.retention[resolution]
+        hit = self.stamps[resolution][row, slot] == buckets
+        out[hit] = self.values[resolution][row, slot[hit]]
+        return out
+
+    def export_row(self, key) -> dict:
+        row = self.index.get(key)
+        if row is None:
+            return None
+        rings = {}
+        for name, _ in RESOLUTIONS:
+            used = np.flatnonzero(self.stamps[name][row] >= 0)
+            rings[name] = {
+                "stamps": self.stamps[name][row, used].tolist(),
+                "values": self.values[name][row, used].tolist()
+            }
+        return rings
+
+    def import_row(self, key, rings: dict):
+        """Merge an export_row() snapshot (bucket-wise sum)."""
+        row = self.row(key)
+        for name, _ in RESOLUTIONS:
+            stamps = np.asarray(rings[name]["stamps"], dtype=np.int64)
+            if not len(stamps):
+                continue
+            metrics = np.asarray(rings[name]["values"], dtype=np.float32)
+            retention = self.retention[name]
+            slot = stamps % retention
+            held = self.stamps[name][row, slot]
+            fresh = stamps > held
+            self.values[name][row, slot[fresh]] = 0.0
+            self.stamps[name][row, slot[fresh]] = stamps[fresh]
+            keep = stamps == self.stamps[name][row, slot]
+            self.values[name][row, slot[keep]] += metrics[keep]
+
+    def discard(self, key):
+        """Drop a row: the last row moves into its place."""
+        row = self.index.pop(key, None)
+        if row is None:
+            return
+        last = len(self.keys) - 1
+        for name, _ in RESOLUTIONS:
+            self.values[name][row] = self.values[name][last]
+            self.stamps[name][row] = self.stamps[name][last]
+            self.values[name][last] = 0.0
+            self.stamps[name][last] = -1
+        moved = self.keys.pop()
+        if row != last:
+            self.keys[row] = moved
+            self.index[moved] = row
+
+    def __len__(self):
+        return len(self.keys)
+
+
+# ==================================================
+# 📊 IMPACT ROLLUPS
+# ==================================================
+class ImpactRollups:
+    """
+    record()        one reading (single /data path, backfill replay)
+    record_batch()  column arrays (batch / binary / UDP path)
+    query()         bucket series + totals for one scope key
+    """
+
+    def __init__(self, retention: dict = None):
+        retention = retention or RETENTION
+        self.tables = {scope: RollupTable(retention[scope]) for scope in SCOPES}
+        self.fields = {}   # device_id → field_id
+        self.as_of = 0.0   # newest snapshot time (fold_log() resumes here)
+        self.records = 0
+        self.snapshots = 0
+        self._lock = threading.Lock()
+        self._thread = None
+        self._fleet_row = self.tables["fleet"].row(FLEET)
+
+    # ------------------------------
+    # Field membership
+    # ------------------------------
+    def assign_field(self, device_id, field_id):
+        if field_id is not None and self.fields.get(device_id) != field_id:
+            with self._lock:
+                self.fields[device_id] = str(field_id)
+
+    def assign_fields(self, readings: list):
+        """Batch payloads: optional "field_id" per reading."""
+        for reading in readings:
+            if "field_id" in reading:
+                self.assign_field(reading.get("device_id", DEFAULT_DEVICE_ID), reading["field_id"])
+
+    def field_of(self, device_id):
+        return self.fields.get(device_id)
+
+    # ------------------------------
+    # Writes
+    # ------------------------------
+    def record(self, device_id, timestamp: float, decision: str, water_saved: float = 0.0,
+               run: bool = False, avoided: bool = False):
+        column = FIRST_DECISION + DECISION_CODES[decision]
+        with self._lock:
+            device = self.tables["device"]
+            device.add(device.row(device_id), timestamp, column, water_saved, run, avoided)
+            field_id = self.fields.get(device_id)
+            if field_id is not None:
+                field = self.tables["field"]
+                field.add(field.row(field_id), timestamp, column, water_saved, run, avoided)
+            self.tables["fleet"].add(self._fleet_row, timestamp, column, water_saved, run, avoided)
+            self.records += 1
+
+    def record_batch(self, device_ids, timestamp, decision, water_saved, run, avoided):
+        """
+        decision: DECISION_CODES array; timestamp scalar or per reading;
+        water_saved per reading (liters); run / avoided bool arrays.
+        """
+        n = len(device_ids)
+        if not n:
+            return
+        metrics = np.zeros((n, len(METRICS)), dtype=np.float32)
+        metrics[:, WATER] = water_saved
+        metrics[:, RUN] = run
+        metrics[:, AVOIDED] = avoided
+        metrics[np.arange(n), FIRST_DECISION + np.asarray(decision, dtype=np.intp)] = 1.0
+        timestamp = np.broadcast_to(np.asarray(timestamp, dtype=np.float64), (n,))
+
+        with self._lock:
+            device = self.tables["device"]
+            device.add_batch(np.array([device.row(d) for d in device_ids], dtype=np.intp), timestamp, metrics)
+
+            fields = [self.fields.get(d) for d in device_ids]
+            in_field = np.array([f is not None for f in fields])
+            if in_field.any():
+                field = self.tables["field"]
+                rows = np.array([field.row(f) for f in fields if f is not None], dtype=np.intp)
+                field.add_batch(rows, timestamp[in_field], metrics[in_field])
+
+            self.tables["fleet"].add_batch(np.full(n, self._fleet_row, dtype=np.intp), timestamp, metrics)
+            self.records += n
+
+    # ------------------------------
+    # Reads
+    # ------------------------------
+    def pick_resolution(self, scope: str, start: float, end: float, now: float) -> str:
+        """Finest resolution whose ring still holds start, within MAX_POINTS buckets."""
+        retention = self.tables[scope].retention
+        for name, width in RESOLUTIONS:
+            oldest = (int(now // width) - retention[name] + 1) * width
+            if start >= oldest and (end - start) / width <= MAX_POINTS:
+                return name
+        return RESOLUTIONS[-1][0]
+
+    def query(self, scope: str = FLEET, key=None, start: float = None, end: float = None,
+              resolution: str = None, now: float = None) -> dict:
+        """
+        Buckets overlapping [start, end) at one resolution (auto-picked
+        unless given). Defaults: the last DEFAULT_RANGE_SEC up to now.
+        Raises ValueError for an unknown scope / resolution.
+        """
+        if scope not in self.tables:
+            raise ValueError(f"unknown scope {scope!r} (expected one of {', '.join(SCOPES)})")
+        if resolution is not None and resolution not in BUCKET_SEC:
+            raise ValueError(f"unknown resolution {resolution!r} (expected minute, hour or day)")
+
+        now = time.time() if now is None else now
+        end = now if end is None else end
+        start = end - DEFAULT_RANGE_SEC if start is None else start
+        resolution = resolution or self.pick_resolution(scope, start, end, now)
+        width = BUCKET_SEC[resolution]
+        key = FLEET if scope == FLEET else key
+
+        first = int(start // width)
+        last = max(first, int(-(-end // width)) - 1)
+        if last - first + 1 > MAX_POINTS:
+            first = last - MAX_POINTS + 1
+
+        table = self.tables[scope]
+        with self._lock:
+            series = table.series(table.index.get(key), resolution, first, last)
+        return render_series(scope, key, resolution, first, series)
+
+    def stats(self) -> dict:
+        return {
+            "records": self.records,
+            "devices": len(self.tables["device"]),
+            "fields": len(self.tables["field"]),
+            "snapshots": self.snapshots,
+            "snapshot_age_sec": round(time.time() - self.as_of, 1) if self.as_of else None
+        }
+
+    # ------------------------------
+    # Shard handover
+    # ------------------------------
+    def export_device(self, device_id) -> dict:
+        with self._lock:
+            rings = self.tables["device"].export_row(device_id)
+        return {"field_id": self.fields.get(device_id), "rings": rings}
+
+    def import_device(self, device_id, snapshot: dict):
+        with self._lock:
+            if snapshot.get("field_id") is not None:
+                self.fields[device_id] = snapshot["field_id"]
+            if snapshot.get("rings"):
+                self.tables["device"].import_row(device_id, snapshot["rings"])
+
+    def discard_device(self, device_id):
+        """Device rows only: field and fleet rows keep what happened here."""
+        with self._lock:
+            self.tables["device"].discard(device_id)
+            self.fields.pop(device_id, None)
+
+    # ------------------------------
+    # Snapshots
+    # ------------------------------
+    def snapshot(self, path: str):
+        """Every ring + field membership → path (.npz, atomic replace)."""
+        with self._lock:
+            as_of = time.time()
+            arrays = {
+                "as_of": np.array(as_of),
+                "field_devices": np.array(list(self.fields), dtype=str),
+                "field_ids": np.array(list(self.fields.values()), dtype=str)
+            }
+            for scope, table in self.tables.items():
+                n = len(table)
+                arrays[f"{scope}.keys"] = np.array(table.keys, dtype=str)
+                for name, _ in RESOLUTIONS:
+                    arrays[f"{scope}.{name}.values"] = table.values[name][:n].copy()
+                    arrays[f"{scope}.{name}.stamps"] = table.stamps[name][:n].copy()
+
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp, path)
+        self.as_of = as_of
+        self.snapshots += 1
+
+    def load(self, path: str) -> bool:
+        """Restore a snapshot() file; rings whose retention changed start empty."""
+        if not os.path.exists(path):
+            return False
+        with np.load(path, allow_pickle=False) as data:
+            with self._lock:
+                self.fields = dict(zip(data["field_devices"].tolist(), data["field_ids"].tolist()))
+                for scope, table in self.tables.items():
+                    if f"{scope}.keys" not in data:
+                        continue
+                    for key in data[f"{scope}.keys"].tolist():
+                        table.row(key)
+                    n = len(table)
+                    for name, _ in RESOLUTIONS:
+                        values = data[f"{scope}.{name}.values"]
+                        if values.shape[1:] != table.values[name].shape[1:]:
+                            continue
+                        table.values[name][:n] = values
+                        table.stamps[name][:n] = data[f"{scope}.{name}.stamps"]
+                self.as_of = float(data["as_of"])
+        return True
+
+    def fold_log(self, reader, pump_flow_lpm: float) -> int:
+        """
+        Record telemetry log readings newer than the snapshot (as_of).
+        Avoided cycles are re-derived with the ingest rule (default field
+        limits: log records carry no policy version); replayed readings
+        land in the bucket of their arrival time.
+        """
+        folded = 0
+        for records in reader.scan(start=self.as_of):
+            records = records[
+                (records["timestamp"] > self.as_of) & (records["device"] < len(reader.device_ids))
+            ]
+            if not len(records):
+                continue
+            decision = records["decision"]
+            live = (records["flags"] & FLAG_BACKFILL) == 0
+            avoided = (
+                (records["soil"] < FIELD_LIMITS["RAIN_SAVE_SOIL"])
+                & (decision == DECISION_CODES["HOLD"])
+                & ((records["flags"] & FLAG_RAIN) != 0)
+            )
+            self.record_batch(
+                [reader.device_ids[d] for d in records["device"].tolist()],
+                records["timestamp"],
+                decision,
+                water_saved=avoided * float(pump_flow_lpm),
+                run=live & (decision == DECISION_CODES["IRRIGATE"]),
+                avoided=avoided
+            )
+            folded += len(records)
+        return folded
+
+    def start_snapshots(self, path: str, interval: float = SNAPSHOT_SEC):
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.snapshot(path)
+                except OSError:
+                    pass  # retried next interval
+
+        self._thread = threading.Thread(target=run, name="agri-rollup-snapshot", daemon=True)
+        self._thread.start()
+        return self
+
+
+# ==================================================
+# 📤 RENDERING / MERGING
+# ==================================================
+def render_series(scope: str, key, resolution: str, first: int, series: np.ndarray) -> dict:
+    width = BUCKET_SEC[resolution]
+    rows = series.tolist()
+    buckets = [
+        {
+            "start": (first + i) * width,
+            "water_saved_liters": round(row[WATER], 3),
+            "pump_cycles_run": int(row[RUN]),
+            "pump_cycles_avoided": int(row[AVOIDED]),
+            "decisions": {name: int(row[FIRST_DECISION + code]) for code, name in enumerate(DECISIONS)}
+        }
+        for i, row in enumerate(rows)
+    ]
+    totals = series.sum(axis=0)
+    return {
+        "scope": scope,
+        "key": key,
+        "resolution": resolution,
+        "bucket_sec": width,
+        "start": first * width,
+        "end": (first + len(rows)) * width,
+        "buckets": buckets,
+        "totals": {
+            "water_saved_liters": round(float(totals[WATER]), 3),
+            "pump_cycles_run": int(totals[RUN]),
+            "pump_cycles_avoided": int(totals[AVOIDED]),
+            "decisions": {name: int(totals[FIRST_DECISION + code]) for code, name in enumerate(DECISIONS)}
+        }
+    }
+
+
+def _add_counts(into: dict, other: dict):
+    into["water_saved_liters"] = round(into["water_saved_liters"] + other["water_saved_liters"], 3)
+    into["pump_cycles_run"] += other["pump_cycles_run"]
+    into["pump_cycles_avoided"] += other["pump_cycles_avoided"]
+    for name, count in other["decisions"].items():
+        into["decisions"][name] += count
+
+
+def merge_series(replies: list) -> dict:
+    """Bucket-wise sum of query() results for the same range (sharded fleet/field views)."""
+    merged = replies[0]
+    for reply in replies[1:]:
+        for bucket, other in zip(merged["buckets"], reply["buckets"]):
+            _add_counts(bucket, other)
+        _add_counts(merged["totals"], reply["totals"])
+    return merged
@@ -0,0 +1,389 @@
+"""
+AgriAgents - Fleet Irrigation Scheduler
+Admits IRRIGATE decisions under shared water-supply limits.
+
+The Decision Agent decides per device; pumps in one zone share a water
+source. This stage runs after it (and after the climate / safety
+override): an IRRIGATE decision becomes a request, and only requests
+the zone can supply start the pump. The rest answer DELAY (reason
+"Irrigation queued ...") until their turn.
+
+Zones = fields (field_id); devices without one share DEFAULT_ZONE.
+Limits per zone (all optional; a zone without limits admits at once):
+  capacity_lpm          concurrent pump flow (PUMP_FLOW_LPM per pump)
+  daily_budget_liters   liters granted per UTC day
+  stagger_sec           gap between granted start times (pressure surges)
+
+Scheduling:
+- One priority queue per zone (heapq), ranked by utility, then
+  confidence, then first arrival. Re-requests replace the device's entry
+  in O(log n) (old entry marked dead, skipped on pop); dead entries are
+  compacted away once they outnumber live ones
+- A tick releases finished runs / lapsed grants, then pops the best
+  requests while flow and budget allow: O(k log n) for k grants
+- A grant carries a start time (staggered); the device's next IRRIGATE
+  reading at or after it starts the pump (one RUN_SEC run)
+- Requests and unclaimed grants lapse after the device policy's
+  MIN_INTERVAL_SEC: the reading behind them is that old. A lapsed or
+  cancelled grant gives its flow and budget back. A reading that no
+  longer asks for water (rain hold, soil recovered) cancels both
+"""
+
+import heapq
+import itertools
+import threading
+
+import numpy as np
+
+from pipeline import PUMP_FLOW_LPM
+
+DEFAULT_ZONE = "default"
+RUN_SEC = 60  # one pump run = the 1-minute demo unit of the impact metrics
+DAY_SEC = 86400
+
+
+# ==================================================
+# 🚰 ZONE (SHARED WATER SOURCE)
+# ==================================================
+class Zone:
+
+    __slots__ = (
+        "name", "capacity_lpm", "budget_liters", "stagger_sec",
+        "queue", "live", "in_use_lpm", "used_liters", "day", "next_start",
+        "granted", "started", "expired", "cancelled"
+    )
+
+    def __init__(self, name: str, capacity_lpm=None, budget_liters=None, stagger_sec: float = 0.0):
+        self.name = name
+        self.capacity_lpm = capacity_lpm
+        self.budget_liters = budget_liters
+        self.stagger_sec = stagger_sec
+        self.queue = []          # [-utility, -confidence, arrival, seq, device_id | None, expires_at, ttl, zone]
+        self.live = 0            # queue entries not marked dead
+        self.in_use_lpm = 0.0    # flow reserved by grants and running pumps
+        self.used_liters = 0.0   # granted today
+        self.day = None
+        self.next_start = 0.0
+        self.granted = 0
+        self.started = 0
+        self.expired = 0
+        self.cancelled = 0
+
+    @property
+    def constrained(self) -> bool:
+        return self.capacity_lpm is not None or self.budget_liters is not None or self.stagger_sec > 0
+
+    def to_dict(self) -> dict:
+        return {
+            "capacity_lpm": self.capacity_lpm,
+            "daily_budget_liters": self.budget_liters,
+            "stagger_sec": self.stagger_sec,
+            "in_use_lpm": self.in_use_lpm,
+            "used_liters_today": self.used_liters,
+            "pending": self.live,
+            "granted": self.granted,
+            "started": self.started,
+            "expired": self.expired,
+            "cancelled": self.cancelled
+        }
+
+
+def _limit(value, name: str):
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0:
+        raise ValueError(f"{name} must be a non-negative number or null")
+    return float(value)
+
+
+# ==================================================
+# 🗓️ SCHEDULER
+# ==================================================
+class IrrigationScheduler:
+
+    def __init__(self, zone_of=None, capacity_lpm=None, budget_liters=None, stagger_sec: float = 0.0,
+                 pump_flow_lpm: float = PUMP_FLOW_LPM, run_sec: float = RUN_SEC):
+        """
+        zone_of(device_id) → zone name or None (e.g. ImpactRollups.field_of).
+        capacity_lpm / budget_liters / stagger_sec = limits of zones
+        without their own configure() call.
+        """
+        self.zone_of = zone_of or (lambda device_id: None)
+        self.defaults = {
+            "capacity_lpm": _limit(capacity_lpm, "capacity_lpm"),
+            "budget_liters": _limit(budget_liters, "daily_budget_liters"),
+            "stagger_sec": _limit(stagger_sec, "stagger_sec") or 0.0
+        }
+        self.pump_flow_lpm = float(pump_flow_lpm)
+        self.run_sec = float(run_sec)
+        self.liters_per_run = self.pump_flow_lpm * self.run_sec / 60
+        self.deferred = 0
+
+        self._zones = {}       # name → Zone
+        self._configured = set()
+        self._requests = {}    # device_id → live queue entry
+        self._grants = {}      # device_id → (zone, start_at, claim_by)
+        self._holds = {}       # device_id → seq of its current flow reservation
+        self._releases = []    # heap (release_at, seq, device_id, zone, refund_day | None)
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    # ------------------------------
+    # Zones
+    # ------------------------------
+    @property
+    def constrained(self) -> bool:
+        """False while no zone has limits (every request starts at once)."""
+        return (
+            self.defaults["capacity_lpm"] is not None
+            or self.defaults["budget_liters"] is not None
+            or self.defaults["stagger_sec"] > 0
+            or any(self._zones[name].constrained for name in self._configured)
+        )
+
+    def configure(self, name: str, capacity_lpm=None, budget_liters=None, stagger_sec=0.0) -> Zone:
+        """Set one zone's limits (ValueError if invalid); None = unlimited."""
+        limits = (
+            _limit(capacity_lpm, "capacity_lpm"),
+            _limit(budget_liters, "daily_budget_liters"),
+            _limit(stagger_sec, "stagger_sec") or 0.0
+        )
+        with self._lock:
+            zone = self._zone(str(name))
+            zone.capacity_lpm, zone.budget_liters, zone.stagger_sec = limits
+            self._configured.add(zone.name)
+        return zone
+
+    def _zone(self, name) -> Zone:
+        name = DEFAULT_ZONE if name is None else name
+        zone = self._zones.get(name)
+        if zone is None:
+            zone = self._zones[name] = Zone(
+                name, self.defaults["capacity_lpm"], self.defaults["budget_liters"], self.defaults["stagger_sec"]
+            )
+        return zone
+
+    # ------------------------------
+    # Queue internals (lock held)
+    # ------------------------------
+    def _push(self, zone: Zone, device_id, utility: float, confidence: float, now: float, ttl: float):
+        old = self._requests.get(device_id)
+        if old is not None:
+            # Refreshed reading: new rank and expiry, same place among equals
+            old[4] = None
+            old[7].live -= 1
+        seq = next(self._seq)
+        arrival = old[2] if old is not None else seq
+        entry = [-utility, -confidence, arrival, seq, device_id, now + ttl, ttl, zone]
+        self._requests[device_id] = entry
+        zone.live += 1
+        heapq.heappush(zone.queue, entry)
+        if len(zone.queue) > 2 * zone.live + 64:
+            zone.queue = [e for e in zone.queue if e[4] is not None]
+            heapq.heapify(zone.queue)
+
+    def _hold(self, device_id, zone: Zone, until: float, refund_day=None):
+        """(Re)place the device's flow reservation; older releases go stale."""
+        seq = next(self._seq)
+        self._holds[device_id] = seq
+        heapq.heappush(self._releases, (until, seq, device_id, zone, refund_day))
+
+    def _release(self, now: float):
+        releases = self._releases
+        while releases and releases[0][0] <= now:
+            _, seq, device_id, zone, refund_day = heapq.heappop(releases)
+            if self._holds.get(device_id) != seq:
+                continue
+            del self._holds[device_id]
+            zone.in_use_lpm -= self.pump_flow_lpm
+            if refund_day is not None:
+                # Grant never claimed
+                self._grants.pop(device_id, None)
+                zone.expired += 1
+                if zone.day == refund_day:
+                    zone.used_liters -= self.liters_per_run
+
+    def _tick(self, zone: Zone, now: float) -> int:
+        day = int(now // DAY_SEC)
+        if zone.day != day:
+            zone.day = day
+            zone.used_liters = 0.0
+
+        flow, liters = self.pump_flow_lpm, self.liters_per_run
+        queue = zone.queue
+        granted = 0
+        while queue:
+            if zone.capacity_lpm is not None and zone.in_use_lpm + flow > zone.capacity_lpm:
+                break
+            if zone.budget_liters is not None and zone.used_liters + liters > zone.budget_liters:
+                break
+            entry = heapq.heappop(queue)
+            device_id = entry[4]
+            if device_id is None:
+                continue
+            zone.live -= 1
+            del self._requests[device_id]
+            if entry[5] < now:
+                zone.expired += 1
+                continue
+
+            start_at = max(now, zone.next_start)
+            zone.next_start = start_at + zone.stagger_sec
+            claim_by = start_at + entry[6]
+            self._grants[device_id] = (zone, start_at, claim_by)
+            zone.in_use_lpm += flow
+            zone.used_liters += liters
+            zone.granted += 1
+            granted += 1
+            self._hold(device_id, zone, claim_by, refund_day=day)
+        return granted
+
+    def _claim(self, device_id, now: float):
+        """Seconds until the device's grant starts; 0.0 = started now; None = no grant."""
+        grant = self._grants.get(device_id)
+        if grant is None:
+            return None
+        zone, start_at, _ = grant
+        if start_at > now:
+            return start_at - now
+        del self._grants[device_id]
+        zone.started += 1
+        self._hold(device_id, zone, now + self.run_sec)
+        return 0.0
+
+    def _cancel(self, device_id, now: float):
+        entry = self._requests.pop(device_id, None)
+        if entry is not None:
+            entry[4] = None
+            entry[7].live -= 1
+            entry[7].cancelled += 1
+        grant = self._grants.pop(device_id, None)
+        if grant is not None:
+            zone = grant[0]
+            del self._holds[device_id]
+            zone.in_use_lpm -= self.pump_flow_lpm
+            if zone.day == int(now // DAY_SEC):
+                zone.used_liters -= self.liters_per_run
+            zone.cancelled += 1
+
+    # ------------------------------
+    # Ingest side
+    # ------------------------------
+    def request(self, device_id, utility: float, confidence: float, now: float, ttl: float):
+        """
+        An IRRIGATE decision. Returns 0.0 → start the pump now; seconds
+        until a granted start; None → queued behind other requests.
+        """
+        if not self.constrained:
+            return 0.0
+        with self._lock:
+            zone = self._zone(self.zone_of(device_id))
+            if not zone.constrained:
+                return 0.0
+            self._release(now)
+            if device_id not in self._grants:
+                self._push(zone, device_id, utility, confidence, now, ttl)
+                self._tick(zone, now)
+            start_in = self._claim(device_id, now)
+            if start_in != 0.0:
+                self.deferred += 1
+            return start_in
+
+    def cancel(self, device_id, now: float):
+        """A reading that no longer asks for water: drop request / grant."""
+        if device_id in self._requests or device_id in self._grants:
+            with self._lock:
+                self._cancel(device_id, now)
+
+    def request_batch(self, device_ids, irrigate, utility, confidence, now: float, ttl) -> np.ndarray:
+        """
+        Vectorized request() / cancel(): irrigate = per-row IRRIGATE mask,
+        ttl per row or shared. Returns per row seconds until start (0.0 =
+        start now, NaN = queued); rows not irrigating return 0.0.
+        """
+        start_in = np.zeros(len(device_ids))
+        if not self.constrained and not self._requests and not self._grants:
+            return start_in
+
+        rows = np.flatnonzero(irrigate)
+        columns = zip(
+            rows.tolist(),
+            np.asarray(utility, dtype=np.float64)[rows].tolist(),
+            np.asarray(confidence, dtype=np.float64)[rows].tolist(),
+            np.broadcast_to(np.asarray(ttl, dtype=np.float64), len(device_ids))[rows].tolist()
+        )
+        with self._lock:
+            self._release(now)
+            touched = {}
+            waiting = []
+            for i, util, conf, row_ttl in columns:
+                device_id = device_ids[i]
+                zone = self._zone(self.zone_of(device_id))
+                if not zone.constrained:
+                    continue
+                if device_id not in self._grants:
+                    self._push(zone, device_id, util, conf, now, row_ttl)
+                    touched[zone.name] = zone
+                waiting.append(i)
+
+            for zone in touched.values():
+                self._tick(zone, now)
+            for i in waiting:
+                wait = self._claim(device_ids[i], now)
+                start_in[i] = np.nan if wait is None else wait
+            self.deferred += int(np.count_nonzero(start_in != 0.0))
+
+            if self._requests or self._grants:
+                for i in np.flatnonzero(~np.asarray(irrigate)).tolist():
+                    device_id = device_ids[i]
+                    if device_id in self._requests or device_id in self._grants:
+                        self._cancel(device_id, now)
+        return start_in
+
+    def tick(self, now: float) -> int:
+        """Release / admit across every zone; returns grants made."""
+        with self._lock:
+            self._release(now)
+            return sum(self._tick(zone, now) for zone in list(self._zones.values()) if zone.live)
+
+    def discard(self, device_id, now: float = 0.0):
+        with self._lock:
+            self._cancel(device_id, now)
+
+    # ------------------------------
+    # Introspection
+    # ------------------------------
+    def device_status(self, device_id, now: float) -> dict:
+        with self._lock:
+            grant = self._grants.get(device_id)
+            entry = self._requests.get(device_id)
+            zone = self._zone(self.zone_of(device_id)).name
+        if grant is not None:
+            return {"device_id": device_id, "zone": zone, "state": "granted", "start_in_sec": max(0.0, grant[1] - now)}
+        if entry is not None:
+            return {"device_id": device_id, "zone": zone, "state": "queued", "expires_in_sec": entry[5] - now}
+        state = "running" if device_id in self._holds else "idle"
+        return {"device_id": device_id, "zone": zone, "state": state}
+
+    def describe(self) -> dict:
+        with self._lock:
+            zones = {name: zone.to_dict() for name, zone in self._zones.items()}
+        return {**self.stats(), "defaults": dict(self.defaults), "zones": zones}
+
+    def stats(self) -> dict:
+        with self._lock:
+            zones = list(self._zones.values())
+            return {
+                "constrained": self.constrained,
+                "zones": len(zones),
+                "pending": len(self._requests),
+                "granted_waiting": len(self._grants),
+                "running": len(self._holds) - len(self._grants),
+                "deferred": self.deferred,
+                "granted": sum(z.granted for z in zones),
+                "started": sum(z.started for z in zones),
+                "expired": sum(z.expired for z in zones),
+                "cancelled": sum(z.cancelled for z in zones),
+                "pump_flow_lpm": self.pump_flow_lpm,
+                "run_sec": self.run_sec
+            }
@@ -0,0 +1,382 @@
+"""
+AgriAgents - Observability
+Where ingest time goes, without slowing ingest down.
+
+Pieces:
+- StageMetrics     per-stage timers; each thread writes its own counter
+                   block (no locks on the hot path), blocks are summed
+                   only when /metrics is scraped
+- StageHistogram   HDR-style log-linear buckets over integer nanoseconds
+                   (16 sub-buckets per doubling, ~6 % resolution)
+- SampledLogger    structured JSON lines, sampled, written by a
+                   background thread (ingest never blocks on stdout)
+- SamplingProfiler stack sampler over all threads, toggled at runtime,
+                   output in folded-stack format (flamegraph.pl, speedscope)
+
+Usage:
+    clock = METRICS.clock()
+    ... parse ...
+    clock.lap("parse")
+    ... decide ...
+    clock.lap("decision")
+    clock.done()          # records "total"
+"""
+
+import json
+import os
+import queue
+import random
+import sys
+import threading
+import time
+import weakref
+from collections import Counter
+
+SUB_BITS = 5                    # 32 linear values, then 16 per doubling
+HALF = 1 << (SUB_BITS - 1)
+MAX_SHIFT = 40                  # 2^45 ns ≈ 10 h: beyond is clamped
+
+# Exported Prometheus buckets (seconds)
+PROM_BUCKETS = (
+    5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4,
+    1e-3, 2.5e-3, 5e-3, 1e-2, 2.5e-2, 5e-2, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0
+)
+
+
+# ==================================================
+# 📊 HISTOGRAM
+# ==================================================
+def bucket_index(ns: int) -> int:
+    if ns < 2 * HALF:
+        return ns if ns > 0 else 0
+    shift = min(ns.bit_length() - SUB_BITS, MAX_SHIFT)
+    return min(shift * HALF + (ns >> shift), (MAX_SHIFT + 2) * HALF - 1)
+
+
+def bucket_upper(index: int) -> int:
+    """Exclusive upper bound (ns) of a bucket."""
+    if index < 2 * HALF:
+        return index + 1
+    shift = index // HALF - 1
+    return (index % HALF + HALF + 1) << shift
+
+
+N_BUCKETS = (MAX_SHIFT + 2) * HALF
+
+
+class StageHistogram:
+    __slots__ = ("counts", "count", "sum_ns", "max_ns")
+
+    def __init__(self):
+        self.counts = [0] * N_BUCKETS
+        self.count = 0
+        self.sum_ns = 0
+        self.max_ns = 0
+
+    def record(self, ns: int):
+        self.counts[bucket_index(ns)] += 1
+        self.count += 1
+        self.sum_ns += ns
+        if ns > self.max_ns:
+            self.max_ns = ns
+
+    def merge(self, other: "StageHistogram"):
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.sum_ns += other.sum_ns
+        self.max_ns = max(self.max_ns, other.max_ns)
+
+    def percentile(self, p: float) -> float:
+        """Seconds; upper bound of the bucket holding the p-th percentile."""
+        if not self.count:
+            return 0.0
+        rank = max(1, -(-self.count * p // 100))
+        seen = 0
+        for index, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return min(bucket_upper(index), self.max_ns) / 1e9
+        return self.max_ns / 1e9
+
+    def cumulative(self, bounds=PROM_BUCKETS) -> list:
+        """Counts ≤ each bound (whole buckets only, so never overcounted)."""
+        out, seen, index = [], 0, 0
+        for bound in bounds:
+            limit = bound * 1e9
+            while index < N_BUCKETS and bucket_upper(index) <= limit:
+                seen += self.counts[index]
+                index += 1
+            out.append(seen)
+        return out
+
+
+# ==================================================
+# ⏱️ STAGE TIMERS
+# ==================================================
+class _Block:
+    """One thread's histograms, one per stage."""
+    __slots__ = ("stages",)
+
+    def __init__(self):
+        self.stages = {}
+
+
+class _Owner:
+    """Lives in thread-local storage; its collection frees the block."""
+    __slots__ = ("__weakref__",)
+
+
+class StageClock:
+    __slots__ = ("_stages", "_start", "_last")
+
+    def __init__(self, stages: dict):
+        self._stages = stages
+        self._start = self._last = time.perf_counter_ns()
+
+    def lap(self, stage: str):
+        """Time since the previous lap (or start) goes to stage."""
+        now = time.perf_counter_ns()
+        histogram = self._stages.get(stage)
+        if histogram is None:
+            histogram = self._stages[stage] = StageHistogram()
+        histogram.record(now - self._last)
+        self._last = now
+
+    def done(self):
+        self._last = self._start
+        self.lap("total")
+
+
+class StageMetrics:
+    """
+    Thread blocks are recycled: when a request thread exits its block goes
+    back to a free list with its counts intact, so memory tracks peak
+    concurrency, not request count.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._blocks = []
+        self._free = []
+        self._lock = threading.Lock()
+
+    def _release(self, block: _Block):
+        with self._lock:
+            self._free.append(block)
+
+    def _block(self) -> _Block:
+        block = getattr(self._local, "block", None)
+        if block is None:
+            with self._lock:
+                if self._free:
+                    block = self._free.pop()
+                else:
+                    block = _Block()
+                    self._blocks.append(block)
+            owner = _Owner()
+            weakref.finalize(owner, self._release, block)
+            self._local.block = block
+            self._local.owner = owner
+        return block
+
+    def clock(self) -> StageClock:
+        return StageClock(self._block().stages)
+
+    def snapshot(self) -> dict:
+        """stage → merged StageHistogram over every thread."""
+        with self._lock:
+            blocks = list(self._blocks)
+        merged = {}
+        for block in blocks:
+            for stage, histogram in list(block.stages.items()):
+                merged.setdefault(stage, StageHistogram()).merge(histogram)
+        return merged
+
+    def summary(self) -> dict:
+        return {
+            stage: {
+                "count": h.count,
+                "mean_ms": round(h.sum_ns / h.count / 1e6, 4) if h.count else 0.0,
+                "p50_ms": round(h.percentile(50) * 1000, 4),
+                "p99_ms": round(h.percentile(99) * 1000, 4),
+                "max_ms": round(h.max_ns / 1e6, 4)
+            }
+            for stage, h in self.snapshot().items()
+        }
+
+    def render_prometheus(self, name: str = "agri_stage_seconds") -> str:
+        lines = [
+            f"# HELP {name} Time spent per ingest stage.",
+            f"# TYPE {name} histogram"
+        ]
+        for stage, h in sorted(self.snapshot().items()):
+            for bound, n in zip(PROM_BUCKETS, h.cumulative()):
+                lines.append(f'{name}_bucket{{stage="{stage}",le="{bound:g}"}} {n}')
+            lines.append(f'{name}_bucket{{stage="{stage}",le="+Inf"}} {h.count}')
+            lines.append(f'{name}_sum{{stage="{stage}"}} {h.sum_ns / 1e9:.9f}')
+            lines.append(f'{name}_count{{stage="{stage}"}} {h.count}')
+        return "\n".join(lines) + "\n"
+
+
+def render_gauges(prefix: str, values: dict, help_text: str = "") -> str:
+    """Flat numeric stats dict → Prometheus gauges (non-numbers skipped)."""
+    lines = []
+    for key, value in values.items():
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            continue
+        metric = f"{prefix}_{key}"
+        lines.append(f"# HELP {metric} {help_text or key}")
+        lines.append(f"# TYPE {metric} gauge")
+        lines.append(f"{metric} {value}")
+    return "\n".join(lines) + "\n" if lines else ""
+
+
+# ==================================================
+# 📝 SAMPLED ASYNC LOGGING
+# ==================================================
+class SampledLogger:
+    """
+    log(event, **fields): kept with probability sample_rate (always=True
+    bypasses sampling), queued, and written as one JSON line by a daemon
+    thread. A full queue drops the line and counts it. Without a stream,
+    lines go to whatever sys.stdout is at write time (redirect_stdout works).
+    """
+
+    def __init__(self, sample_rate: float = 0.01, max_queue: int = 10000, stream=None):
+        self.sample_rate = sample_rate
+        self.stream = stream
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.logged = 0
+        self.sampled_out = 0
+        self.dropped = 0
+        self._random = random.random
+        self._writer = threading.Thread(target=self._run, name="agri-log-writer", daemon=True)
+        self._writer.start()
+
+    def log(self, event: str, always: bool = False, **fields):
+        if not always and self._random() >= self.sample_rate:
+            self.sampled_out += 1
+            return
+        fields["event"] = event
+        fields["ts"] = time.time()
+        try:
+            self.queue.put_nowait(fields)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        while True:
+            record = self.queue.get()
+            lines = [record]
+            # Drain what is already queued into one write
+            while len(lines) < 256:
+                try:
+                    lines.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            stream = self.stream or sys.stdout
+            try:
+                stream.write("".join(json.dumps(r, default=str) + "\n" for r in lines))
+                stream.flush()
+                self.logged += len(lines)
+            except (OSError, ValueError):
+                self.dropped += len(lines)
+
+    def stats(self) -> dict:
+        return {
+            "sample_rate": self.sample_rate,
+            "logged": self.logged,
+            "sampled_out": self.sampled_out,
+            "dropped": self.dropped,
+            "queued": self.queue.qsize()
+        }
+
+
+def logger_from_env() -> SampledLogger:
+    """AGRI_LOG_SAMPLE = fraction of per-reading events logged (default 0.01)."""
+    return SampledLogger(float(os.environ.get("AGRI_LOG_SAMPLE", 0.01)))
+
+
+# ==================================================
+# 🔬 SAMPLING PROFILER
+# ==================================================
+class SamplingProfiler:
+    """
+    Every interval, records each thread's Python stack (root → leaf).
+    Off by default; start()/stop() at runtime. Distinct stacks are capped
+    at max_stacks (the rest count as "[other]") so memory stays bounded.
+    """
+
+    def __init__(self, interval: float = 0.005, max_stacks: int = 10000, max_depth: int = 64):
+        self.interval = interval
+        self.max_stacks = max_stacks
+        self.max_depth = max_depth
+        self.samples = Counter()
+        self.ticks = 0
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval: float = None):
+        with self._lock:
+            if interval:
+                self.interval = interval
+            if self.running:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="agri-profiler", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        with self._lock:
+            thread = self._thread
+            self._stop.set()
+        if thread is not None:
+            thread.join()
+
+    def reset(self):
+        with self._lock:
+            self.samples = Counter()
+            self.ticks = 0
+
+    def _run(self):
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            stacks = []
+            for ident, frame in frames.items():
+                if ident == me:
+                    continue
+                names = []
+                while frame is not None and len(names) < self.max_depth:
+                    code = frame.f_code
+                    names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                stacks.append(";".join(reversed(names)))
+            del frames
+            with self._lock:
+                self.ticks += 1
+                for stack in stacks:
+                    if stack in self.samples or len(self.samples) < self.max_stacks:
+                        self.samples[stack] += 1
+                    else:
+                        self.samples["[other]"] += 1
+
+    def folded(self) -> str:
+        """One "frame;frame;frame count" line per stack, hottest first."""
+        with self._lock:
+            items = self.samples.most_common()
+        return "".join(f"{stack} {count}\n" for stack, count in items)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "running": self.running,
+                "interval_ms": self.interval * 1000,
+                "ticks": self.ticks,
+                "stacks": len(self.samples)
+            }
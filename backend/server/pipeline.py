@@ -0,0 +1,407 @@
+"""
+AgriAgents - Batch Agent Pipeline
+Field → Climate → Decision → Impact for many readings at once.
+
+Shared by:
+- Flask POST /data/batch (server.py)
+- Async micro-batching ingest (async_ingest.py)
+- Offline replay / backtesting (replay.py)
+
+State is passed in (DeviceStore + scenario dict + ClimateAgent), never
+imported, so every front end can own its own fleet.
+"""
+
+import math
+from datetime import datetime
+from functools import lru_cache
+
+import numpy as np
+
+from agentic_engine import DECISIONS, DECISION_CODES, FIELD_LIMITS
+from device_state import to_epoch
+from policy_table import compiled_policy
+from sensor_faults import FAULT_PUMP
+
+# Demo assumption: pump flow rate
+PUMP_FLOW_LPM = 10  # 10 liters per minute (stated in README)
+
+DEFAULT_DEVICE_ID = "esp32_main"
+
+# Decision Agent reasons after the climate override (index = reason code)
+OVERRIDE_REASONS = (
+    "Soil moisture within acceptable range",
+    "Rain expected soon despite dry soil",
+    "Pump failure detected - system locked",
+    "Soil critically dry - irrigation needed",
+    "Soil moisture below optimal range",
+    "Irrigation queued - zone water supply in use",
+    "Sensor fault detected - device locked out"
+)
+REASON_CODES = {reason: code for code, reason in enumerate(OVERRIDE_REASONS)}
+(
+    REASON_OK,
+    REASON_RAIN,
+    REASON_PUMP_FAIL,
+    REASON_IRRIGATE,
+    REASON_LOW,
+    REASON_SCHEDULED,
+    REASON_SENSOR_FAULT
+) = range(len(OVERRIDE_REASONS))
+
+# Farmer Assistant messages (index = message code). Stored agent outputs
+# keep codes; text is rendered by render_agents() when someone reads it.
+FARMER_MESSAGES = (
+    "✅ Soil moisture is adequate. System is monitoring field and "
+    "climate conditions.",
+    "🌧️ Rain is expected in {eta}. Irrigation is delayed to save water "
+    "and avoid unnecessary pump usage.",
+    "⚠️ Pump failure detected. Please check the water pump and tank. "
+    "System has locked irrigation for safety.",
+    "💧 Soil moisture is critically low. Irrigation has been activated "
+    "to maintain crop health.",
+    "⏳ Soil moisture is low. Irrigation is queued while other pumps "
+    "share the zone's water supply.",
+    "⚠️ Sensor readings look faulty (frozen or jumping). Please check "
+    "the soil and temperature sensors. Irrigation is locked until "
+    "readings recover."
+)
+(
+    FARMER_OK,
+    FARMER_RAIN,
+    FARMER_PUMP_FAIL,
+    FARMER_IRRIGATE,
+    FARMER_SCHEDULED,
+    FARMER_SENSOR_FAULT
+) = range(len(FARMER_MESSAGES))
+
+MESSAGE_CACHE_SIZE = 1024
+
+
+# ==================================================
+# 📥 PAYLOAD → COLUMNS
+# ==================================================
+def readings_to_columns(readings: list) -> dict:
+    """
+    [{"device_id": ..., "sensors": {"soil", "temp", "light"}}, ...]
+    → device_ids list + float64 sensor columns
+
+    ValueError names the first malformed reading (non-numeric sensor,
+    unusable device_id or "location"); nothing has been applied yet.
+    """
+    n = len(readings)
+    soil = np.empty(n)
+    temp = np.empty(n)
+    light = np.empty(n)
+    device_ids = []
+
+    for i, reading in enumerate(readings):
+        try:
+            sensors = reading.get("sensors", {})
+            device_id = reading.get("device_id", DEFAULT_DEVICE_ID)
+            hash(device_id)
+            soil[i] = float(sensors.get("soil", 0))
+            temp[i] = float(sensors.get("temp", 0))
+            light[i] = int(sensors.get("light", 0))
+            check_location(reading.get("location"))
+        except (ValueError, TypeError, AttributeError, OverflowError) as e:
+            raise ValueError(f"reading {i}: {e}") from None
+        device_ids.append(device_id)
+
+    return {"device_ids": device_ids, "soil": soil, "temp": temp, "light": light}
+
+
+def check_location(location):
+    """Optional {"lat", "lon"} as ClimateAgent.locate_readings() reads it."""
+    if not location:
+        return
+    if not isinstance(location, dict) or "lat" not in location or "lon" not in location:
+        raise ValueError('location must be {"lat": ..., "lon": ...}')
+    if not (math.isfinite(float(location["lat"])) and math.isfinite(float(location["lon"]))):
+        raise ValueError("location lat/lon must be finite")
+
+
+# ==================================================
+# 🌦️ CLIMATE / SAFETY OVERRIDE
+# ==================================================
+def apply_overrides(decision, soil, rain_expected, pump_fail, soil_low: float = FIELD_LIMITS["SOIL_LOW"]) -> np.ndarray:
+    """
+    The /data override step on DECISION_CODES, in place.
+    rain_expected / pump_fail are bools or per-row bool arrays.
+    Returns OVERRIDE_REASONS codes.
+    """
+    low = soil < soil_low
+
+    reason = np.full(len(decision), REASON_OK, dtype=np.uint8)
+    reason[low] = REASON_LOW
+    reason[decision == DECISION_CODES["IRRIGATE"]] = REASON_IRRIGATE
+
+    rain_hold = low & rain_expected
+    pump_stop = ~rain_hold & pump_fail
+
+    decision[rain_hold] = DECISION_CODES["HOLD"]
+    reason[rain_hold] = REASON_RAIN
+    decision[pump_stop] = DECISION_CODES["EMERGENCY_STOP"]
+    reason[pump_stop] = REASON_PUMP_FAIL
+
+    return reason
+
+
+def apply_override(
+    decision: str, soil: float, rain_expected: bool, pump_fail: bool,
+    soil_low: float = FIELD_LIMITS["SOIL_LOW"]
+) -> tuple:
+    """Scalar apply_overrides(): (decision, OVERRIDE_REASONS code)."""
+    if rain_expected and soil < soil_low:
+        return "HOLD", REASON_RAIN
+    if pump_fail:
+        return "EMERGENCY_STOP", REASON_PUMP_FAIL
+    if decision == "IRRIGATE":
+        return decision, REASON_IRRIGATE
+    return decision, REASON_LOW if soil < soil_low else REASON_OK
+
+
+def lockout_codes(faults: int) -> tuple:
+    """FAULT_* bits of a locked-out device → (reason code, farmer message code)."""
+    if faults & FAULT_PUMP:
+        return REASON_PUMP_FAIL, FARMER_PUMP_FAIL
+    return REASON_SENSOR_FAULT, FARMER_SENSOR_FAULT
+
+
+# ==================================================
+# 🧑‍🌾 LAZY TEXT RENDERING
+# ==================================================
+def farmer_message_code(mode: str, rain_expected: bool, decision: str) -> int:
+    if mode == "PUMP_FAIL":
+        return FARMER_PUMP_FAIL
+    if rain_expected:
+        return FARMER_RAIN
+    if decision == "IRRIGATE":
+        return FARMER_IRRIGATE
+    return FARMER_OK
+
+
+@lru_cache(maxsize=MESSAGE_CACHE_SIZE)
+def farmer_message(code: int, rain_eta=None) -> str:
+    if code == FARMER_RAIN:
+        return FARMER_MESSAGES[code].format(eta=f"{rain_eta} minutes" if rain_eta else "soon")
+    return FARMER_MESSAGES[code]
+
+
+def render_agents(agents: dict, explain=None) -> dict:
+    """
+    Stored agent outputs (reason_code / message_code) → the JSON shape
+    served by /data and /state. Field and climate dicts are shared, not
+    copied; agents stored before codes existed pass through unchanged.
+    explain(context) → deferred explanation text or None (placeholder).
+    """
+    if not agents or "reason_code" not in agents["decision_agent"]:
+        return agents
+
+    decision_agent = dict(agents["decision_agent"])
+    decision_agent["reason"] = OVERRIDE_REASONS[decision_agent.pop("reason_code")]
+    stored = agents["farmer_assistant"]
+    farmer_assistant = {
+        "message": farmer_message(stored["message_code"], agents["climate_agent"]["rain_eta_minutes"])
+    }
+    if "explain" in stored:
+        farmer_assistant["explanation"] = explain(stored["explain"]) if explain is not None else None
+    return {
+        "field_agent": agents["field_agent"],
+        "climate_agent": agents["climate_agent"],
+        "decision_agent": decision_agent,
+        "farmer_assistant": farmer_assistant
+    }
+
+
+# ==================================================
+# 🚜 BATCH PIPELINE
+# ==================================================
+def _decide_group(table, field_limits: dict, soil, temp, light, last_action_time, now: float,
+                  window, rain_expected, pump_fail: bool) -> tuple:
+    """Decision Agent + override + avoided flags for rows sharing one policy."""
+    batch = table.decide_batch(soil, temp, light, last_action_time=last_action_time, now=now, features=window)
+    decision = batch["decision"]
+    reason = apply_overrides(decision, soil, rain_expected, pump_fail, field_limits["SOIL_LOW"])
+    avoided = (soil < field_limits["RAIN_SAVE_SOIL"]) & (decision == DECISION_CODES["HOLD"]) & rain_expected
+    return decision, reason, batch["confidence"], batch["utility"], avoided
+
+
+def run_batch(
+    store, scenario: dict, climate, device_ids, soil, temp, light,
+    now: datetime = None, features=None, policies=None, scheduler=None, faults=None
+) -> dict:
+    """
+    One vectorized pass of the /data pipeline (minus the farmer message).
+    features = FeatureStore whose windows feed the Decision Agent (optional).
+    policies = PolicyRegistry choosing each device's policy (default: the
+    compiled module config, policy_version 0); one pass per policy.
+    scheduler = IrrigationScheduler admitting IRRIGATE decisions under
+    zone water limits (deferred ones become DELAY / REASON_SCHEDULED).
+    faults = FaultDetector; with lockout on, devices with a fault become
+    EMERGENCY_STOP (REASON_SENSOR_FAULT, or REASON_PUMP_FAIL for a pump).
+
+    Output columns: decision (DECISION_CODES), reason (OVERRIDE_REASONS
+    index), confidence, utility, policy_version, fault (FAULT_* bits),
+    rain_expected, avoided
+    (pump cycle avoided by a rain hold), plus each device's state
+    after the reading (last_action_time, rain_eta, cumulative water_saved
+    and pump_cycles_avoided); and fleet impact totals.
+
+    The devices' stripes stay locked from gather() to apply_batch(), and a
+    device listed k times is evaluated in k waves, each seeing the state
+    the previous one wrote (cooldown holds within one batch).
+    """
+    now = now or datetime.utcnow()
+    with store.locked(device_ids):
+        waves = _waves(device_ids)
+        if waves is None:
+            result = _run_wave(
+                store, scenario, climate, device_ids, soil, temp, light,
+                now, features, policies, scheduler, faults
+            )
+        else:
+            result = None
+            for rows in waves:
+                part = _run_wave(
+                    store, scenario, climate, [device_ids[i] for i in rows],
+                    soil[rows], temp[rows], light[rows],
+                    now, features, policies, scheduler, faults
+                )
+                if result is None:
+                    result = {key: np.empty(len(device_ids), dtype=values.dtype) for key, values in part.items()}
+                for key, values in part.items():
+                    result[key][rows] = values
+        result["impact"] = store.impact_totals()
+    return result
+
+
+def _waves(device_ids):
+    """
+    Row indices per wave: wave k holds each device's k-th reading.
+    None when every device appears once (one wave, no copies).
+    """
+    seen = {}
+    rank = np.empty(len(device_ids), dtype=np.int64)
+    for i, device_id in enumerate(device_ids):
+        rank[i] = seen.get(device_id, 0)
+        seen[device_id] = rank[i] + 1
+    if len(seen) == len(device_ids):
+        return None
+    return [np.flatnonzero(rank == k) for k in range(int(rank.max()) + 1)]
+
+
+def _run_wave(store, scenario: dict, climate, device_ids, soil, temp, light,
+              now: datetime, features, policies, scheduler, faults) -> dict:
+    """run_batch() for device_ids that are all distinct (stripes held by the caller)."""
+    state = store.gather(device_ids)
+
+    # Climate Agent (forecast per tile, wall-clock rain ETA)
+    rain_expected, rain_eta = climate.outlook_batch(device_ids, to_epoch(now))
+
+    # Windowed features (rolling soil trend, heat, light)
+    window = (
+        features.update_batch(device_ids, to_epoch(now), soil, temp, light)
+        if features is not None else None
+    )
+
+    # Decision Agent + climate override (same precedence as /data) +
+    # impact flags, per policy group
+    groups = (
+        [(policy.table, policy.field_limits, policy.version, rows) for policy, rows in policies.group(device_ids)]
+        if policies is not None else [(compiled_policy(), FIELD_LIMITS, 0, None)]
+    )
+    pump_fail = scenario["mode"] == "PUMP_FAIL"
+    n = len(device_ids)
+
+    if len(groups) == 1:
+        table, field_limits, version, _ = groups[0]
+        decision, reason, confidence, utility, avoided = _decide_group(
+            table, field_limits, soil, temp, light, state["last_action_time"], to_epoch(now),
+            window, rain_expected, pump_fail
+        )
+        policy_version = np.full(n, version, dtype=np.uint32)
+        interval = table.thresholds["MIN_INTERVAL_SEC"]
+    else:
+        outputs = None
+        policy_version = np.empty(n, dtype=np.uint32)
+        interval = np.empty(n)
+        for table, field_limits, version, rows in groups:
+            rows = np.array(rows, dtype=np.intp)
+            columns = _decide_group(
+                table, field_limits, soil[rows], temp[rows], light[rows],
+                state["last_action_time"][rows], to_epoch(now),
+                {key: values[rows] for key, values in window.items()} if window is not None else None,
+                rain_expected[rows], pump_fail
+            )
+            if outputs is None:
+                outputs = [np.empty(n, dtype=values.dtype) for values in columns]
+            for out, values in zip(outputs, columns):
+                out[rows] = values
+            policy_version[rows] = version
+            interval[rows] = table.thresholds["MIN_INTERVAL_SEC"]
+        decision, reason, confidence, utility, avoided = outputs
+
+    # Fault lockout: stuck / jumping sensors and failed pumps stop the device
+    fault = np.zeros(n, dtype=np.uint8)
+    if faults is not None:
+        fault = faults.update_batch(device_ids, to_epoch(now), soil, temp, state["last_action_time"])
+        if faults.lockout:
+            locked = fault != 0
+            decision[locked] = DECISION_CODES["EMERGENCY_STOP"]
+            reason[locked] = np.where(fault[locked] & FAULT_PUMP, REASON_PUMP_FAIL, REASON_SENSOR_FAULT)
+            avoided[locked] = False
+
+    # Fleet scheduler: IRRIGATE only where the zone's water supply allows
+    if scheduler is not None:
+        irrigate = decision == DECISION_CODES["IRRIGATE"]
+        start_in = scheduler.request_batch(device_ids, irrigate, utility, confidence, to_epoch(now), interval)
+        deferred = irrigate & (start_in != 0.0)
+        decision[deferred] = DECISION_CODES["DELAY"]
+        reason[deferred] = REASON_SCHEDULED
+
+    last_action_time = state["last_action_time"]
+    last_action_time[decision == DECISION_CODES["IRRIGATE"]] = to_epoch(now)
+
+    totals = store.apply_batch(
+        device_ids,
+        last_action_time=last_action_time,
+        rain_eta=rain_eta,
+        decision=decision,
+        water_saved=avoided * (PUMP_FLOW_LPM * 1.0),
+        cycles_avoided=avoided.astype(np.int64)
+    )
+
+    return {
+        "decision": decision,
+        "reason": reason,
+        "confidence": confidence,
+        "utility": utility,
+        "policy_version": policy_version,
+        "fault": fault,
+        "last_action_time": last_action_time,
+        "rain_eta": rain_eta,
+        "water_saved": totals["water_saved_liters"],
+        "pump_cycles_avoided": totals["pump_cycles_avoided"],
+        "rain_expected": rain_expected,
+        "avoided": avoided
+    }
+
+
+def batch_results(device_ids, result: dict) -> list:
+    """Compact per-device dicts for a run_batch() result."""
+    return [
+        {
+            "device_id": device_id,
+            "decision": DECISIONS[code],
+            "confidence": conf,
+            "utility": util,
+            "policy_version": version
+        }
+        for device_id, code, conf, util, version in zip(
+            device_ids,
+            result["decision"].tolist(),
+            result["confidence"].tolist(),
+            result["utility"].tolist(),
+            result["policy_version"].tolist()
+        )
+    ]
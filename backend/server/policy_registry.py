@@ -0,0 +1,326 @@
+"""
+AgriAgents - Policy Registry
+Versioned, hot-reloadable decision policy per crop / field profile.
+
+A policy = THRESHOLDS + UTILITY_LIMITS (Decision Agent) + FIELD_LIMITS
+(Field / Climate Agent bands, climate override), compiled once into an
+immutable Policy that carries its own PolicyTable and a version number.
+
+Profiles:
+  default     module config, overridden by the file's "default" section
+  <profile>   e.g. "tomato": only the keys it changes, on top of default
+Devices pick a profile by reporting "profile" (sticky, like location /
+field_id); otherwise their field's profile from the file's "fields" map;
+otherwise default.
+
+Policy file (AGRI_POLICY_FILE, JSON, reloaded when its mtime changes):
+  {
+    "default":  {"thresholds": {...}, "utility_limits": {...}, "field_limits": {...}},
+    "profiles": {"tomato": {"thresholds": {"SOIL_DRY": 35}}, ...},
+    "fields":   {"north": "tomato"}
+  }
+
+Copy-on-write:
+- Readers take no lock: policy_for() reads the current snapshot
+  (profile dict + field map) once; a publish builds a new Policy (table
+  compiled off the hot path), copies the dicts and swaps the snapshot
+  reference in one assignment
+- A reload swaps every profile at once; profiles whose config did not
+  change keep their Policy object and version
+- Every publish gets the next version (registry-wide); decisions record
+  policy_version, so a rollout is traceable per reading
+- A bad file or value is rejected whole (ValueError) and the running
+  policies stay in place
+"""
+
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+
+from agentic_engine import FIELD_LIMITS, THRESHOLDS, UTILITY_LIMITS
+from pipeline import DEFAULT_DEVICE_ID
+from policy_table import PolicyTable
+
+DEFAULT_PROFILE = "default"
+SECTIONS = (
+    ("thresholds", THRESHOLDS),
+    ("utility_limits", UTILITY_LIMITS),
+    ("field_limits", FIELD_LIMITS)
+)
+WATCH_SEC = 2.0
+HISTORY = 64  # retired versions kept for GET /policy
+
+# Value ranges (everything else: finite and >= 0)
+POSITIVE = {"SOIL_DRY"}                 # Decision Agent divides by it
+SIGNED = {"TEMP_HIGH", "HEAT_STRESS"}   # °C, may be below zero
+
+
+# ==================================================
+# 📜 COMPILED POLICY (IMMUTABLE)
+# ==================================================
+class Policy:
+    """One published version of one profile. Never mutated after publish."""
+
+    __slots__ = ("version", "profile", "thresholds", "utility_limits", "field_limits", "table", "published_at")
+
+    def __init__(self, version: int, profile: str, thresholds: dict, utility_limits: dict, field_limits: dict):
+        self.version = version
+        self.profile = profile
+        self.thresholds = thresholds
+        self.utility_limits = utility_limits
+        self.field_limits = field_limits
+        self.table = PolicyTable(thresholds, utility_limits)
+        self.published_at = time.time()
+
+    def config(self) -> dict:
+        return {
+            "thresholds": self.thresholds,
+            "utility_limits": self.utility_limits,
+            "field_limits": self.field_limits
+        }
+
+    def to_dict(self) -> dict:
+        return {
+            "version": self.version,
+            "profile": self.profile,
+            **self.config(),
+            "published_at": self.published_at
+        }
+
+
+def merge_config(base: dict, update: dict) -> dict:
+    """
+    base config + partial {"thresholds": {...}, ...} → full config.
+    ValueError on unknown sections / keys, non-numeric, non-finite or
+    out-of-range values, and fractions for integer keys.
+    """
+    if not isinstance(update, dict):
+        raise ValueError("policy must be an object")
+    unknown = set(update) - {name for name, _ in SECTIONS}
+    if unknown:
+        raise ValueError(f"unknown policy section(s): {', '.join(sorted(unknown))}")
+
+    merged = {}
+    for name, defaults in SECTIONS:
+        section = update.get(name) or {}
+        if not isinstance(section, dict):
+            raise ValueError(f"{name} must be an object")
+        bad = set(section) - set(defaults)
+        if bad:
+            raise ValueError(f"unknown {name} key(s): {', '.join(sorted(bad))}")
+        values = dict(base[name])
+        for key, value in section.items():
+            values[key] = _check_value(f"{name}.{key}", value, type(defaults[key]), key)
+        merged[name] = values
+    return merged
+
+
+def _check_value(name: str, value, kind: type, key: str):
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ValueError(f"{name} must be a number")
+    if not math.isfinite(value):
+        raise ValueError(f"{name} must be finite")
+    if kind is int and value != int(value):
+        raise ValueError(f"{name} must be an integer")
+    if key in POSITIVE and value <= 0:
+        raise ValueError(f"{name} must be > 0")
+    if key not in POSITIVE and key not in SIGNED and value < 0:
+        raise ValueError(f"{name} must be >= 0")
+    return kind(value)
+
+
+# ==================================================
+# 🗂️ REGISTRY
+# ==================================================
+class PolicyRegistry:
+
+    def __init__(self, path: str = None, field_of=None):
+        """
+        path = policy file (optional); field_of(device_id) → field_id
+        for field-level profiles (e.g. ImpactRollups.field_of).
+        """
+        self.path = path
+        self.field_of = field_of or (lambda device_id: None)
+        self.version = 0
+        self.reloads = 0
+        self.reload_errors = 0
+        self.last_error = None
+
+        # (profile → Policy, field_id → profile): replaced whole, never mutated
+        self._snapshot = ({}, {})
+        self._devices = {}         # device_id → profile reported by the device
+        self._history = deque(maxlen=HISTORY)
+        self._hooks = []
+        self._write_lock = threading.Lock()
+        self._mtime = None
+        self._thread = None
+
+        base = {name: dict(defaults) for name, defaults in SECTIONS}
+        self._swap({DEFAULT_PROFILE: self._compile(DEFAULT_PROFILE, base)}, {})
+        if path:
+            self.reload()
+
+    # ------------------------------
+    # Hot path (lock-free reads)
+    # ------------------------------
+    def policy_for(self, device_id) -> Policy:
+        return self._resolve(device_id, self._snapshot)
+
+    def _resolve(self, device_id, snapshot: tuple) -> Policy:
+        policies, field_profiles = snapshot
+        profile = self._devices.get(device_id)
+        if profile is None:
+            field_id = self.field_of(device_id)
+            if field_id is not None:
+                profile = field_profiles.get(field_id)
+        return policies.get(profile) or policies[DEFAULT_PROFILE]
+
+    def group(self, device_ids) -> list:
+        """[(policy, row indexes or None for all rows), ...] for a batch."""
+        snapshot = self._snapshot
+        policies = [self._resolve(d, snapshot) for d in device_ids]
+        if not policies or all(p is policies[0] for p in policies):
+            return [(policies[0] if policies else snapshot[0][DEFAULT_PROFILE], None)]
+        rows = {}
+        for i, policy in enumerate(policies):
+            rows.setdefault(policy, []).append(i)
+        return list(rows.items())
+
+    def assign(self, device_id, profile):
+        """Device-reported profile (sticky); None leaves it unchanged."""
+        if profile is not None and self._devices.get(device_id) != profile:
+            self._devices[device_id] = str(profile)
+
+    def assign_profiles(self, readings: list):
+        """Batch payloads: optional "profile" per reading."""
+        for reading in readings:
+            if "profile" in reading:
+                self.assign(reading.get("device_id", DEFAULT_DEVICE_ID), reading["profile"])
+
+    def profile_of(self, device_id):
+        return self._devices.get(device_id)
+
+    def discard(self, device_id):
+        self._devices.pop(device_id, None)
+
+    # ------------------------------
+    # Publishing (copy-on-write)
+    # ------------------------------
+    def on_publish(self, callback):
+        """callback() runs after every swap (e.g. clear the decision memo)."""
+        self._hooks.append(callback)
+
+    def _compile(self, profile: str, config: dict) -> Policy:
+        self.version += 1
+        return Policy(self.version, profile, config["thresholds"], config["utility_limits"], config["field_limits"])
+
+    def _swap(self, policies: dict, field_profiles: dict):
+        retired = [p for name, p in self._snapshot[0].items() if policies.get(name) is not p]
+        self._history.extend(p.to_dict() for p in retired)
+        self._snapshot = (policies, field_profiles)
+        for callback in self._hooks:
+            callback()
+
+    def publish(self, profile: str, update: dict) -> Policy:
+        """
+        New version of one profile: update (partial config) on top of its
+        current version, or of default for a new profile.
+        """
+        profile = str(profile or DEFAULT_PROFILE)
+        with self._write_lock:
+            policies, field_profiles = self._snapshot
+            current = policies.get(profile) or policies[DEFAULT_PROFILE]
+            config = merge_config(current.config(), update)
+            if profile in policies and config == current.config():
+                return current
+            policy = self._compile(profile, config)
+            policies = dict(policies)
+            policies[profile] = policy
+            self._swap(policies, field_profiles)
+        return policy
+
+    def load(self, data: dict):
+        """Swap in a whole policy file's profiles at once (ValueError if invalid)."""
+        if not isinstance(data, dict):
+            raise ValueError("policy file must hold a JSON object")
+        base = {name: dict(defaults) for name, defaults in SECTIONS}
+        default = merge_config(base, data.get("default", {}))
+        configs = {DEFAULT_PROFILE: default}
+        for profile, update in (data.get("profiles") or {}).items():
+            configs[str(profile)] = merge_config(default, update)
+        fields = data.get("fields") or {}
+        if not isinstance(fields, dict):
+            raise ValueError("fields must map field_id → profile")
+
+        with self._write_lock:
+            running = self._snapshot[0]
+            policies = {}
+            for profile, config in configs.items():
+                current = running.get(profile)
+                policies[profile] = (
+                    current if current is not None and current.config() == config
+                    else self._compile(profile, config)
+                )
+            self._swap(policies, {str(k): str(v) for k, v in fields.items()})
+
+    def reload(self) -> bool:
+        """
+        Re-read the policy file. False (old policies kept) on error; the
+        watcher retries once the file changes again.
+        """
+        try:
+            self._mtime = os.stat(self.path).st_mtime
+            with open(self.path, encoding="utf-8") as f:
+                self.load(json.load(f))
+        except (OSError, ValueError) as e:
+            self.reload_errors += 1
+            self.last_error = str(e)
+            return False
+        self.reloads += 1
+        self.last_error = None
+        return True
+
+    def reload_if_changed(self) -> bool:
+        """Reload if the file's mtime changed since the last attempt."""
+        try:
+            changed = os.stat(self.path).st_mtime != self._mtime
+        except OSError:
+            return False
+        return changed and self.reload()
+
+    def start_watching(self, interval: float = WATCH_SEC):
+        """Reload whenever the file's mtime changes (daemon thread)."""
+        def run():
+            while True:
+                time.sleep(interval)
+                self.reload_if_changed()
+
+        self._thread = threading.Thread(target=run, name="agri-policy-watch", daemon=True)
+        self._thread.start()
+        return self
+
+    # ------------------------------
+    # Introspection
+    # ------------------------------
+    def describe(self) -> dict:
+        policies, field_profiles = self._snapshot
+        return {
+            "source": self.path,
+            **self.stats(),
+            "profiles": {name: policy.to_dict() for name, policy in policies.items()},
+            "fields": dict(field_profiles),
+            "retired": list(self._history)
+        }
+
+    def stats(self) -> dict:
+        return {
+            "version": self.version,
+            "profiles": len(self._snapshot[0]),
+            "devices_assigned": len(self._devices),
+            "reloads": self.reloads,
+            "reload_errors": self.reload_errors,
+            "last_error": self.last_error
+        }
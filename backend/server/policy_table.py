@@ -0,0 +1,198 @@
+"""
+AgriAgents - Compiled Decision Table
+Lookup-based fast path for the Decision Agent.
+
+For fixed THRESHOLDS / UTILITY_LIMITS the utility step depends only on
+  - soil, quantized to 0.1 %          (1001 rows for 0.0 … 100.0)
+  - temperature > TEMP_HIGH           (2 buckets)
+  - light >= LIGHT_DAY                (2 buckets)
+so decision, confidence, utility and reason flags are precomputed into a
+4004-row table. A reading becomes one index computation and a lookup.
+
+Exactness:
+- Table rows are computed by the batch agent itself
+- Readings off the 0.1 % grid (or out of bounds, or NaN light) fall
+  back to the exact computation, so results always match agentic_decision()
+- Guardrails and cooldown stay per reading (they depend on device state)
+
+Reason strings come from the shared LRU of rendered texts (Reasons).
+Tables are rebuilt only when the config they were compiled from changes.
+"""
+
+import threading
+from datetime import datetime
+
+import numpy as np
+
+from agentic_engine import (
+    THRESHOLDS,
+    UTILITY_LIMITS,
+    DECISIONS,
+    Reasons,
+    agentic_decision,
+    utility_inputs,
+    _utility_batch,
+    _finish_batch
+)
+
+SOIL_STEPS = 1000  # 0.1 % grid over 0 … 100 %
+MAX_TABLES = 8     # replay compares several policies at once
+
+
+# ==================================================
+# 🧮 COMPILED TABLE
+# ==================================================
+class PolicyTable:
+    """
+    Row index = soil_step * 4 + high_temp * 2 + low_light.
+    """
+
+    def __init__(self, thresholds: dict = None, utility_limits: dict = None):
+        self.thresholds = dict(thresholds or THRESHOLDS)
+        self.limits = dict(utility_limits or UTILITY_LIMITS)
+
+        # Grid: every (soil step, temp bucket, light bucket) combination
+        steps = np.arange(SOIL_STEPS + 1)
+        temp_high = self.thresholds["TEMP_HIGH"]
+        light_day = float(self.thresholds["LIGHT_DAY"])
+
+        soil = np.repeat(steps / 10, 4)
+        hot = np.nextafter(temp_high, np.inf)
+        dark = np.nextafter(light_day, -np.inf)
+        temp = np.tile([temp_high, temp_high, hot, hot], len(steps))
+        light = np.tile([light_day, dark, light_day, dark], len(steps))
+
+        decision, confidence, utility, reasons = _utility_batch(
+            soil, temp, light, self.thresholds, self.limits
+        )
+        self.decision = decision
+        self.confidence = confidence
+        self.utility = utility
+        self.reasons = reasons
+
+        # Plain lists for the scalar path (no NumPy scalar overhead)
+        self._decision_names = [DECISIONS[d] for d in decision.tolist()]
+        self._confidence = confidence.tolist()
+        self._utility = utility.tolist()
+        self._reasons = reasons.tolist()
+
+    @property
+    def nbytes(self) -> int:
+        return sum(a.nbytes for a in (self.decision, self.confidence, self.utility, self.reasons))
+
+    def matches(self, thresholds: dict, limits: dict) -> bool:
+        return self.thresholds == thresholds and self.limits == limits
+
+    # ------------------------------
+    # Scalar (same contract as agentic_decision)
+    # ------------------------------
+    def decide(
+        self,
+        sensor_data: dict,
+        last_action_time: datetime = None,
+        last_decision: str = None,
+        now: datetime = None,
+        features: dict = None
+    ) -> dict:
+        raw_soil = float(sensor_data.get("soil", -1))
+        raw_temp = float(sensor_data.get("temperature", -100))
+        now = now or datetime.utcnow()
+
+        if features is None:
+            soil, temp = raw_soil, raw_temp
+            light = float(sensor_data.get("light", 0))
+        else:
+            soil, temp, light = features["soil"], features["temperature"], features["light"]
+
+        step = round(soil * 10) if 0 <= soil <= 100 else -1
+        if (
+            step < 0 or step / 10 != soil
+            or not (0 <= raw_soil <= 100)
+            or not (-10 <= raw_temp <= 60)
+            or light != light  # NaN light is neither day nor night
+            or (last_action_time and (now - last_action_time).total_seconds() < self.thresholds["MIN_INTERVAL_SEC"])
+        ):
+            # Off-grid, guardrail or cooldown: exact path
+            return agentic_decision(
+                sensor_data, last_action_time, last_decision, now,
+                self.thresholds, self.limits, features
+            )
+
+        row = step * 4 + (temp > self.thresholds["TEMP_HIGH"]) * 2 + (light < self.thresholds["LIGHT_DAY"])
+        decision = self._decision_names[row]
+        return {
+            "goal": "Optimize irrigation using utility-based reasoning",
+            "decision": decision,
+            "confidence": self._confidence[row],
+            "utility": self._utility[row],
+            "reasons": Reasons(self._reasons[row], decision, soil, temp),
+            "timestamp": now.isoformat()
+        }
+
+    # ------------------------------
+    # Batch (same contract as agentic_decision_batch)
+    # ------------------------------
+    def decide_batch(
+        self, soil, temperature, light,
+        last_action_time=None, last_decision=None, now=None, features: dict = None
+    ) -> dict:
+        raw_soil = np.asarray(soil, dtype=np.float64)
+        raw_temp = np.asarray(temperature, dtype=np.float64)
+        inputs = utility_inputs(raw_soil, raw_temp, np.asarray(light, dtype=np.float64), features)
+        soil, temp, light = inputs
+
+        with np.errstate(invalid="ignore"):
+            steps = np.rint(soil * 10)
+            on_grid = (steps / 10 == soil) & (steps >= 0) & (steps <= SOIL_STEPS) & ~np.isnan(light)
+        rows = (
+            np.where(on_grid, steps, 0).astype(np.intp) * 4
+            + (temp > self.thresholds["TEMP_HIGH"]) * 2
+            + (light < self.thresholds["LIGHT_DAY"])
+        )
+
+        decision = self.decision[rows]
+        confidence = self.confidence[rows]
+        utility = self.utility[rows]
+        reasons = self.reasons[rows]
+
+        off_grid = np.flatnonzero(~on_grid)
+        if len(off_grid):
+            exact = _utility_batch(soil[off_grid], temp[off_grid], light[off_grid], self.thresholds, self.limits)
+            for column, values in zip((decision, confidence, utility, reasons), exact):
+                column[off_grid] = values
+
+        return _finish_batch(
+            decision, confidence, utility, reasons, raw_soil, raw_temp,
+            last_action_time, last_decision, now, self.thresholds, inputs
+        )
+
+
+# ==================================================
+# 📦 TABLE CACHE (REBUILT ON CONFIG CHANGE)
+# ==================================================
+_tables = []  # most recently used last
+_lock = threading.Lock()
+
+
+def compiled_policy(thresholds: dict = None, utility_limits: dict = None) -> PolicyTable:
+    """
+    Table for this config (default: the module config). THRESHOLDS and
+    UTILITY_LIMITS are compared by value on every call, so edits to the
+    config dicts trigger a rebuild on the next decision.
+    """
+    thresholds = thresholds or THRESHOLDS
+    limits = utility_limits or UTILITY_LIMITS
+
+    with _lock:
+        if _tables and _tables[-1].matches(thresholds, limits):
+            return _tables[-1]
+        for i, table in enumerate(_tables):
+            if table.matches(thresholds, limits):
+                _tables.append(_tables.pop(i))
+                return table
+
+    table = PolicyTable(thresholds, limits)
+    with _lock:
+        _tables.append(table)
+        del _tables[:-MAX_TABLES]
+    return table
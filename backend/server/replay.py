@@ -0,0 +1,437 @@
+"""
+AgriAgents - Offline Replay & Backtesting Engine
+Runs recorded or synthetic telemetry through the ingest pipeline
+(Decision Agent + climate / pump-fail override) on a virtual clock.
+
+Why:
+- demo_scenario.py / fake_sensor_stream.py replay over HTTP in real time
+- Here a season of fleet data replays as fast as NumPy allows
+- Several THRESHOLDS / UTILITY_LIMITS variants are compared side by side
+
+How:
+- Readings are grouped into "waves": wave k holds the k-th reading of
+  every device. Devices are independent, so each wave is one
+  compiled-table decide_batch() call with per-row timestamps.
+- Synthetic fields are closed-loop: IRRIGATE raises that device's soil
+  on the next step, so policies see the consequences of their decisions.
+- The Decision Agent scores windowed features (FeatureStore), as on live
+  ingest, so a backtest reproduces live decisions; --raw scores the bare
+  readings instead.
+- Devices can be sharded across a process pool; shards hold disjoint
+  devices, so metrics are summed, and a synthetic device reads the
+  same whatever the --workers count.
+
+Usage:
+    python replay.py --devices 1000 --days 30 --workers 4 \\
+        --policy baseline --policy wetter:SOIL_DRY=35,IRRIGATE=50
+    python replay.py --log telemetry_log --policy baseline
+    python replay.py --log telemetry_log --raw
+"""
+
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from agentic_engine import (
+    THRESHOLDS,
+    UTILITY_LIMITS,
+    FIELD_LIMITS,
+    DECISIONS,
+    DECISION_CODES,
+    REASON_COOLDOWN
+)
+from features import FeatureStore
+from pipeline import PUMP_FLOW_LPM, apply_overrides
+from policy_table import compiled_policy
+
+# Same 1-minute demo unit the impact metrics use
+PUMP_MINUTES_PER_CYCLE = 1
+
+# Independent random streams in a synthetic fleet: the most shards
+# that still split the work
+SEED_BLOCKS = 16
+
+# Agronomic reference for "time under SOIL_DRY": fixed to the baseline
+# so a policy can't look better by lowering its own threshold
+SOIL_DRY_REFERENCE = THRESHOLDS["SOIL_DRY"]
+
+
+# ==================================================
+# 📜 POLICIES
+# ==================================================
+def make_policy(name: str, thresholds: dict = None, utility_limits: dict = None) -> dict:
+    """Baseline config with overrides applied."""
+    return {
+        "name": name,
+        "thresholds": {**THRESHOLDS, **(thresholds or {})},
+        "utility_limits": {**UTILITY_LIMITS, **(utility_limits or {})}
+    }
+
+
+def parse_policy(spec: str) -> dict:
+    """'wetter:SOIL_DRY=35,IRRIGATE=50' → policy dict."""
+    name, _, overrides = spec.partition(":")
+    thresholds, limits = {}, {}
+
+    for item in filter(None, overrides.split(",")):
+        key, _, value = item.partition("=")
+        if key in THRESHOLDS:
+            thresholds[key] = float(value)
+        elif key in UTILITY_LIMITS:
+            limits[key] = float(value)
+        else:
+            raise ValueError(f"Unknown policy key: {key}")
+
+    return make_policy(name, thresholds, limits)
+
+
+# ==================================================
+# 🌱 SYNTHETIC FLEET (CLOSED LOOP)
+# ==================================================
+class SyntheticSource:
+    """
+    Per-device soil drying, daily temperature sine and light curve
+    (same shapes as fake_sensor_stream.py), fleet-wide rain forecasts,
+    and pump feedback: IRRIGATE adds 8–15 % soil on the next step.
+
+    The fleet is cut into SEED_BLOCKS blocks with one random stream each
+    (plus one for the weather); shard k simulates blocks k, k + shards, ...
+    so a device reads the same whatever the number of shards.
+    """
+
+    def __init__(
+        self,
+        devices: int,
+        steps: int,
+        interval: float = 600.0,
+        seed: int = 0,
+        start: float = 1767225600.0,  # 2026-01-01T00:00:00Z
+        rain_probability: float = 0.2,
+        shard: int = 0,
+        shards: int = 1
+    ):
+        bounds = np.linspace(0, devices, SEED_BLOCKS + 1).astype(np.int64)
+        self.blocks = [
+            (block, int(bounds[block + 1] - bounds[block]))
+            for block in range(shard, SEED_BLOCKS, shards)
+            if bounds[block + 1] > bounds[block]
+        ]
+        self.devices = sum(size for _, size in self.blocks)
+        self.steps = steps
+        self.interval = interval
+        self.seed = seed
+        self.start = start
+        self.rain_probability = rain_probability
+
+    def waves(self):
+        if not self.devices:
+            return
+        streams = [(np.random.default_rng([self.seed, block]), size) for block, size in self.blocks]
+
+        def draw(sample):
+            return np.concatenate([sample(rng, size) for rng, size in streams])
+
+        n = self.devices
+        device = np.arange(n)
+
+        soil = draw(lambda rng, k: rng.uniform(35, 60, k))
+        drying = draw(lambda rng, k: rng.uniform(0.2, 1.2, k)) * (self.interval / 600.0)
+        phase = draw(lambda rng, k: rng.uniform(-0.05, 0.05, k))
+        self._irrigated = np.zeros(n, dtype=bool)
+
+        # One 90-minute rain forecast window on some days, then rain
+        weather = np.random.default_rng([self.seed])
+        days = int(self.steps * self.interval // 86400) + 1
+        rain_days = weather.random(days) < self.rain_probability
+        rain_hour = weather.uniform(10, 18, days)
+
+        for step in range(self.steps):
+            t = self.start + step * self.interval
+            day = int((t - self.start) // 86400)
+            hour = ((t - self.start) % 86400) / 3600.0
+            tod = hour / 24.0 + phase
+
+            forecast = rain_days[day] and rain_hour[day] - 1.5 <= hour < rain_hour[day]
+            raining = rain_days[day] and rain_hour[day] <= hour < rain_hour[day] + self.interval / 3600.0
+
+            soil -= drying * draw(lambda rng, k: rng.uniform(0.5, 1.5, k))
+            soil += self._irrigated * draw(lambda rng, k: rng.uniform(8, 15, k))
+            if raining:
+                soil += draw(lambda rng, k: rng.uniform(10, 20, k))
+            np.clip(soil, 5, 95, out=soil)
+
+            temp = 28 + 8 * np.sin(2 * np.pi * (tod - 0.25)) + draw(lambda rng, k: rng.uniform(-1, 1, k))
+            light = np.clip(
+                2000 + 2000 * np.sin(2 * np.pi * (tod - 0.25)) + draw(lambda rng, k: rng.integers(-200, 200, k)),
+                100, 4095
+            ).astype(np.int64)
+
+            yield {
+                "device": device,
+                "timestamp": np.full(n, t),
+                "soil": np.round(soil, 1),
+                "temp": np.round(temp, 1),
+                "light": light,
+                "rain_expected": np.full(n, forecast),
+                "pump_fail": np.zeros(n, dtype=bool)
+            }
+
+    def feedback(self, device, irrigated):
+        self._irrigated[:] = False
+        self._irrigated[device[irrigated]] = True
+
+
+# ==================================================
+# 💾 RECORDED TELEMETRY (OPEN LOOP)
+# ==================================================
+class RecordedSource:
+    """Readings from a telemetry_log directory, optionally one shard of devices."""
+
+    def __init__(self, directory: str, shard: int = 0, shards: int = 1):
+        from telemetry_log import TelemetryLogReader, FLAG_BACKFILL, FLAG_RAIN, MODE_CODES
+
+        with TelemetryLogReader(directory) as reader:
+            parts = [records.copy() for records in reader.scan()]
+
+        records = np.concatenate(parts) if parts else np.zeros(0, dtype=np.uint8)
+        if len(records):
+            # Backfilled readings carry arrival time, not event time
+            records = records[(records["device"] % shards == shard) & ((records["flags"] & FLAG_BACKFILL) == 0)]
+
+        # Order by (device, time) to rank each device's readings
+        order = np.lexsort((records["timestamp"], records["device"])) if len(records) else []
+        records = records[order]
+
+        if len(records):
+            device = records["device"].astype(np.int64)
+            starts = np.flatnonzero(np.r_[True, device[1:] != device[:-1]])
+            counts = np.diff(np.r_[starts, len(device)])
+            rank = np.arange(len(device)) - np.repeat(starts, counts)
+            by_wave = np.argsort(rank, kind="stable")
+            self._records = records[by_wave]
+            self._bounds = np.flatnonzero(np.r_[True, np.diff(rank[by_wave]) != 0, True])
+            self.devices = int(device.max()) + 1
+        else:
+            self._records = records
+            self._bounds = np.array([0])
+            self.devices = 0
+
+        self._flag_rain = FLAG_RAIN
+        self._pump_fail = MODE_CODES["PUMP_FAIL"]
+
+    def waves(self):
+        r = self._records
+        for lo, hi in zip(self._bounds[:-1], self._bounds[1:]):
+            wave = r[lo:hi]
+            yield {
+                "device": wave["device"].astype(np.int64),
+                "timestamp": wave["timestamp"],
+                "soil": wave["soil"].astype(np.float64),
+                "temp": wave["temperature"].astype(np.float64),
+                "light": wave["light"].astype(np.int64),
+                "rain_expected": (wave["flags"] & self._flag_rain) != 0,
+                "pump_fail": wave["mode"] == self._pump_fail
+            }
+
+    def feedback(self, device, irrigated):
+        pass  # recorded soil doesn't react to a different policy
+
+
+# ==================================================
+# ⏩ REPLAY ENGINE
+# ==================================================
+def replay(source, policy: dict, features: bool = True) -> dict:
+    """
+    Run every wave of source under policy; returns summed metrics.
+    features=False scores raw readings instead of windowed features.
+    """
+    n = source.devices
+    windows = FeatureStore(capacity=max(n, 1)) if features else None
+    last_action_time = np.full(n, np.nan)
+    prev_ts = np.full(n, np.nan)
+    prev_dry = np.zeros(n, dtype=bool)
+    seen = np.zeros(n, dtype=bool)
+
+    readings = 0
+    cooldown_hits = 0
+    cycles_avoided = 0
+    seconds_dry = 0.0
+    decisions = np.zeros(len(DECISIONS), dtype=np.int64)
+    table = compiled_policy(policy["thresholds"], policy["utility_limits"])
+
+    started = time.perf_counter()
+    for wave in source.waves():
+        device = wave["device"]
+        ts = wave["timestamp"]
+        soil = wave["soil"]
+
+        window = (
+            windows.update_batch(device.tolist(), ts, soil, wave["temp"], wave["light"])
+            if windows is not None else None
+        )
+        batch = table.decide_batch(
+            soil, wave["temp"], wave["light"],
+            last_action_time=last_action_time[device],
+            now=ts,
+            features=window
+        )
+        decision = batch["decision"]
+        apply_overrides(decision, soil, wave["rain_expected"], wave["pump_fail"])
+
+        irrigated = decision == DECISION_CODES["IRRIGATE"]
+        last_action_time[device[irrigated]] = ts[irrigated]
+
+        seen[device] = True
+        readings += len(device)
+        decisions += np.bincount(decision, minlength=len(DECISIONS))
+        cooldown_hits += int(np.count_nonzero(batch["reasons"] & REASON_COOLDOWN))
+        cycles_avoided += int(np.count_nonzero(
+            (soil < FIELD_LIMITS["RAIN_SAVE_SOIL"]) & (decision == DECISION_CODES["HOLD"]) & wave["rain_expected"]
+        ))
+
+        # Time under SOIL_DRY: interval since the previous reading counts
+        # when that reading was dry
+        dt = ts - prev_ts[device]
+        seconds_dry += float(np.nansum(dt[prev_dry[device]]))
+        prev_ts[device] = ts
+        prev_dry[device] = soil < SOIL_DRY_REFERENCE
+
+        source.feedback(device, irrigated)
+
+    pump_cycles = int(decisions[DECISION_CODES["IRRIGATE"]])
+    return {
+        "policy": policy["name"],
+        "devices": int(np.count_nonzero(seen)),
+        "readings": readings,
+        "pump_cycles": pump_cycles,
+        "water_used_liters": pump_cycles * PUMP_FLOW_LPM * PUMP_MINUTES_PER_CYCLE,
+        "pump_cycles_avoided": cycles_avoided,
+        "water_saved_liters": cycles_avoided * PUMP_FLOW_LPM * PUMP_MINUTES_PER_CYCLE,
+        "hours_under_soil_dry": seconds_dry / 3600.0,
+        "cooldown_hits": cooldown_hits,
+        "decisions": dict(zip(DECISIONS, decisions.tolist())),
+        "cpu_sec": time.perf_counter() - started
+    }
+
+
+def merge_metrics(parts: list) -> dict:
+    merged = dict(parts[0])
+    merged["decisions"] = dict(parts[0]["decisions"])
+    for part in parts[1:]:
+        for key, value in part.items():
+            if key == "decisions":
+                for name, count in value.items():
+                    merged["decisions"][name] += count
+            elif key != "policy":
+                merged[key] += value
+    return merged
+
+
+# ==================================================
+# 🏭 SHARDED BACKTEST
+# ==================================================
+def make_source(spec: dict, shard: int = 0, shards: int = 1):
+    """
+    spec = {"kind": "synthetic", "devices", "steps", "interval", "seed"}
+         | {"kind": "log", "directory"}
+    plus optional "features" (default True, see replay())
+    """
+    if spec["kind"] == "log":
+        return RecordedSource(spec["directory"], shard, shards)
+
+    return SyntheticSource(
+        devices=spec["devices"],
+        steps=spec["steps"],
+        interval=spec.get("interval", 600.0),
+        seed=spec.get("seed", 0),
+        shard=shard,
+        shards=shards
+    )
+
+
+def _run_job(spec: dict, policy: dict, shard: int, shards: int) -> dict:
+    # Closed-loop sources carry state: always a fresh one per policy
+    return replay(make_source(spec, shard, shards), policy, spec.get("features", True))
+
+
+def backtest(spec: dict, policies: list, workers: int = 1) -> list:
+    """
+    One merged metrics dict per policy, in order. Jobs are
+    (policy × device shard) so both dimensions spread over the pool.
+    """
+    started = time.perf_counter()
+
+    if workers <= 1:
+        parts = [[_run_job(spec, policy, 0, 1)] for policy in policies]
+    else:
+        shards = max(1, -(-workers // len(policies)))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                [pool.submit(_run_job, spec, policy, shard, shards) for shard in range(shards)]
+                for policy in policies
+            ]
+            parts = [[f.result() for f in row] for row in futures]
+
+    wall = time.perf_counter() - started
+    results = []
+    for policy_parts in parts:
+        merged = merge_metrics(policy_parts)
+        merged["wall_sec"] = wall
+        results.append(merged)
+    return results
+
+
+def print_report(results: list):
+    print(f"{'policy':<14}{'readings':>12}{'water L':>12}{'avoided':>10}"
+          f"{'dry h':>12}{'cooldown':>10}{'IRRIGATE':>10}{'DELAY':>10}")
+    for r in results:
+        d = r["decisions"]
+        print(f"{r['policy']:<14}{r['readings']:>12}{r['water_used_liters']:>12}"
+              f"{r['pump_cycles_avoided']:>10}{r['hours_under_soil_dry']:>12.1f}"
+              f"{r['cooldown_hits']:>10}{d['IRRIGATE']:>10}{d['DELAY']:>10}")
+
+    total = sum(r["readings"] for r in results)
+    wall = results[0]["wall_sec"] if results else 0.0
+    print(f"\n⏩ {total} readings in {wall:.2f}s ({total / wall:,.0f} readings/s)" if wall else "")
+
+
+# ==================================================
+# 🚀 ENTRYPOINT
+# ==================================================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="AgriAgents policy backtest")
+    parser.add_argument("--log", help="telemetry_log directory (recorded replay)")
+    parser.add_argument("--devices", type=int, default=1000)
+    parser.add_argument("--days", type=float, default=30)
+    parser.add_argument("--interval", type=float, default=600.0, help="seconds between readings")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--raw", action="store_true",
+                        help="score raw readings, not windowed features (differs from live ingest)")
+    parser.add_argument("--policy", action="append", default=[],
+                        help="name[:KEY=VALUE,...] over THRESHOLDS / UTILITY_LIMITS")
+    args = parser.parse_args()
+
+    if args.log:
+        spec = {"kind": "log", "directory": args.log}
+    else:
+        spec = {
+            "kind": "synthetic",
+            "devices": args.devices,
+            "steps": int(args.days * 86400 // args.interval),
+            "interval": args.interval,
+            "seed": args.seed
+        }
+
+    spec["features"] = not args.raw
+    policies = [parse_policy(p) for p in (args.policy or ["baseline"])]
+
+    print("=" * 50)
+    print("🌱 AgriAgents - Policy Backtest")
+    print(f"   Source: {spec}")
+    print("=" * 50)
+    print()
+
+    print_report(backtest(spec, policies, workers=args.workers))
@@ -0,0 +1,151 @@
+"""
+AgriAgents - Response Shaping & Serialization
+Reply bodies built from preencoded fragments instead of jsonify().
+
+POST /data answers in one of two shapes:
+  full     status, decision, the four agent dicts and impact metrics
+           (dashboards; the default)
+  minimal  "<decision code> <cooldown seconds left>\\n", e.g. b"2 300\\n"
+           (ESP32; ?reply=min or Accept: application/x-agri-min)
+           decision codes: 0 HOLD, 1 DELAY, 2 IRRIGATE, 3 EMERGENCY_STOP
+
+Serialization:
+- Every constant string a reply can hold (keys, decisions, statuses,
+  reasons, farmer messages) is JSON-encoded once at import
+- The full /data reply is one template filled from the stored agent
+  codes: no render_agents() dicts, no per-key encoding
+- Other routes use json_response(): compact json.dumps straight into a
+  Response (jsonify also sorts keys and goes through the app's JSON
+  provider on every call)
+"""
+
+import json
+from functools import lru_cache
+
+from flask import Response
+
+from agentic_engine import DECISIONS, DECISION_CODES
+from pipeline import OVERRIDE_REASONS, MESSAGE_CACHE_SIZE, farmer_message
+
+MIN_MIMETYPE = "application/x-agri-min"
+JSON_MIMETYPE = "application/json"
+
+_dumps = json.JSONEncoder(separators=(",", ":")).encode
+
+# Constant strings → JSON text, encoded once
+_CONSTANTS = {
+    s: _dumps(s)
+    for s in (
+        *DECISIONS, *OVERRIDE_REASONS,
+        "CRITICAL", "LOW", "OK", "HIGH", "NORMAL", "MODERATE", "ON", "OFF"
+    )
+}
+_REASONS = tuple(_dumps(reason) for reason in OVERRIDE_REASONS)
+_BOOL = ("false", "true")
+
+# Minimal replies: decision code + cooldown seconds; cooldowns repeat
+_MIN_REPLIES = {}
+
+
+def _str(value) -> str:
+    encoded = _CONSTANTS.get(value)
+    return encoded if encoded is not None else _dumps(value)
+
+
+def _num(value) -> str:
+    """JSON number text (repr; NaN / ±Infinity spelled like json.dumps)."""
+    if value is None:
+        return "null"
+    text = repr(float(value))
+    return text if text[-1].isdigit() else _dumps(float(value))
+
+
+@lru_cache(maxsize=MESSAGE_CACHE_SIZE)
+def _message(code: int, rain_eta) -> str:
+    return _dumps(farmer_message(code, rain_eta))
+
+
+# ==================================================
+# 🤝 NEGOTIATION
+# ==================================================
+def wants_minimal(args, accept: str = "") -> bool:
+    """?reply=min|full wins; otherwise Accept: application/x-agri-min."""
+    reply = args.get("reply")
+    if reply is not None:
+        return reply == "min"
+    return MIN_MIMETYPE in (accept or "")
+
+
+def cooldown_remaining(last_action_time, now: float, interval: float) -> int:
+    """Whole seconds until the pump may switch again (0 = free)."""
+    if last_action_time is None:
+        return 0
+    return max(0, int(-(-(last_action_time + interval - now) // 1)))
+
+
+# ==================================================
+# 📦 ENCODERS
+# ==================================================
+def encode_minimal(decision: str, cooldown: int) -> bytes:
+    key = (decision, cooldown)
+    body = _MIN_REPLIES.get(key)
+    if body is None:
+        body = f"{DECISION_CODES[decision]} {cooldown}\n".encode()
+        if len(_MIN_REPLIES) < 4096:
+            _MIN_REPLIES[key] = body
+    return body
+
+
+def encode_full(decision: str, agents: dict, impact: dict, explanation: str = None) -> bytes:
+    """
+    Full /data reply from stored agent outputs (reason_code /
+    message_code); same content as render_agents() + jsonify.
+    explanation = deferred explanation text (None → null placeholder).
+    """
+    field = agents["field_agent"]
+    climate = agents["climate_agent"]
+    decision_agent = agents["decision_agent"]
+    farmer_assistant = agents["farmer_assistant"]
+    rain_eta = climate["rain_eta_minutes"]
+
+    return (
+        '{"status":"ok","decision":' + _str(decision)
+        + ',"agents":{"field_agent":{"soil_moisture":' + _num(field["soil_moisture"])
+        + ',"soil_status":' + _str(field["soil_status"])
+        + ',"temperature":' + _num(field["temperature"])
+        + ',"heat_stress":' + _str(field["heat_stress"])
+        + ',"pump_state":' + _str(field["pump_state"])
+        + ',"soil_trend_per_hour":' + _num(field.get("soil_trend_per_hour", 0.0))
+        + '},"climate_agent":{"rain_expected":' + _BOOL[bool(climate["rain_expected"])]
+        + ',"rain_eta_minutes":' + ("null" if rain_eta is None else str(int(rain_eta)))
+        + ',"evaporation_risk":' + _str(climate["evaporation_risk"])
+        + '},"decision_agent":{"decision":' + _str(decision_agent["decision"])
+        + ',"confidence":' + _num(decision_agent["confidence"])
+        + ',"utility_score":' + _num(decision_agent["utility_score"])
+        + ',"policy_version":' + str(int(decision_agent["policy_version"]))
+        + ',"reason":' + _REASONS[decision_agent["reason_code"]]
+        + '},"farmer_assistant":{"message":' + _message(farmer_assistant["message_code"], rain_eta)
+        + (
+            ',"explanation":' + ("null" if explanation is None else _dumps(explanation))
+            if "explain" in farmer_assistant else ""
+        )
+        + '}},"impact_metrics":{"water_saved_liters":' + _num(impact["water_saved_liters"])
+        + ',"pump_cycles_avoided":' + str(int(impact["pump_cycles_avoided"]))
+        + "}}"
+    ).encode()
+
+
+def encode_json(payload) -> bytes:
+    return _dumps(payload).encode()
+
+
+# ==================================================
+# 📤 FLASK RESPONSES
+# ==================================================
+def json_response(payload, status: int = 200) -> Response:
+    """jsonify() replacement: compact, unsorted, no provider lookup."""
+    return Response(_dumps(payload), status=status, mimetype=JSON_MIMETYPE)
+
+
+def raw_response(body: bytes, mimetype: str = JSON_MIMETYPE, status: int = 200) -> Response:
+    return Response(body, status=status, mimetype=mimetype)
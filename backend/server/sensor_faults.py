@@ -0,0 +1,430 @@
+"""
+AgriAgents - Sensor & Pump Fault Detection
+Streaming per-device baselines that lock out faulty devices on ingest.
+
+The Decision Agent's guardrails only reject impossible values (soil
+outside 0–100, temperature outside −10–60). This stage catches devices
+whose readings are plausible one by one but wrong as a stream:
+
+  stuck   the whole sensor frame (soil and temperature) unchanged for
+          STUCK_READINGS readings spanning STUCK_SEC: a hung ADC / I2C
+          bus or frozen firmware repeating its last frame. Quantized
+          hobby sensors repeat values for a while, hence both limits
+  jump    a step larger than the physical rate limit (JUMP + RATE per
+          minute of gap) that is also an outlier against the device's
+          own baseline (running mean / variance, Z_LIMIT deviations);
+          a return to baseline after a glitch is not a jump. Soil steps
+          within WATERING_SEC of an IRRIGATE are expected (wetting front,
+          then drainage) and exempt. Clears after CLEAR_READINGS
+          plausible readings in a row
+  pump    soil has not risen by PUMP_MIN_RISE within PUMP_CHECK_SEC of
+          an IRRIGATE (the reading that started it is the baseline).
+          Latched until cleared (POST /faults/clear): someone has to
+          look at the pump. A device silent past PUMP_CHECK_MAX_SEC is
+          inconclusive, not failed
+
+With lockout on, faulty devices are locked out (EMERGENCY_STOP) by the
+pipeline; stuck and jump faults lift themselves once readings recover.
+Off by default: detect and report only.
+
+Storage:
+- One float64 row per device (STATE_COLUMNS): O(1) memory and work per
+  reading, exponentially weighted mean / variance, no history kept
+- update() unpacks the row once (struct over the array's buffer), works
+  on Python floats and packs it back once; update_batch() runs the same steps as column
+  operations, one wave per repeat of a device (like FeatureStore)
+- Readings the guardrails reject are counted but never touch the
+  baseline. State is not persisted
+"""
+
+import math
+import struct
+import threading
+
+import numpy as np
+
+FAULT_STUCK, FAULT_JUMP, FAULT_PUMP = 1, 2, 4
+FAULT_NAMES = ((FAULT_STUCK, "stuck"), (FAULT_JUMP, "jump"), (FAULT_PUMP, "pump"))
+
+STUCK_READINGS = 120
+STUCK_SEC = 6 * 3600.0
+SOIL_JUMP = 20.0            # % in one step, plus
+SOIL_RATE_PER_MIN = 1.0     # % per minute since the previous reading
+TEMP_JUMP = 10.0            # °C in one step, plus
+TEMP_RATE_PER_MIN = 0.5     # °C per minute
+Z_LIMIT = 6.0               # outlier: deviations from the baseline mean
+SOIL_SD_FLOOR = 2.0         # baseline deviation never counted below this
+TEMP_SD_FLOOR = 1.0
+BASELINE_ALPHA = 0.05       # weight of a new reading in mean / variance
+WARMUP = 8                  # readings before the outlier test applies
+CLEAR_READINGS = 5
+PUMP_CHECK_SEC = 900.0
+PUMP_CHECK_MAX_SEC = 3600.0
+PUMP_MIN_RISE = 1.0         # % soil rise that proves the pump ran
+WATERING_SEC = 3600.0       # soil steps this soon after an IRRIGATE are not jumps
+
+# Per-device state row (float64)
+STATE_COLUMNS = (
+    "count",        # plausible readings seen
+    "ts", "soil", "temp",                       # previous reading
+    "soil_mean", "soil_var", "temp_mean", "temp_var",
+    "same", "same_since",                       # identical frames in a row
+    "clean",        # plausible steps since the last jump
+    "pump_at",      # last IRRIGATE seen (last_action_time)
+    "pump_since",   # first IRRIGATE of the pending check
+    "pump_soil",    # soil before it; NaN = no check pending
+    "faults"        # FAULT_* bits
+)
+(
+    C_COUNT, C_TS, C_SOIL, C_TEMP, C_SOIL_MEAN, C_SOIL_VAR, C_TEMP_MEAN, C_TEMP_VAR,
+    C_SAME, C_SAME_SINCE, C_CLEAN, C_PUMP_AT, C_PUMP_SINCE, C_PUMP_SOIL, C_FAULTS
+) = range(len(STATE_COLUMNS))
+EMPTY_ROW = (0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, -math.inf, 0.0, math.nan, 0.0)
+ROW = struct.Struct(f"={len(STATE_COLUMNS)}d")
+
+
+def fault_names(faults: int) -> list:
+    return [name for bit, name in FAULT_NAMES if faults & bit]
+
+
+class FaultDetector:
+    """
+    update()       one reading → FAULT_* bits (single /data path)
+    update_batch() column arrays → FAULT_* bits per row (batch path)
+    """
+
+    def __init__(self, capacity: int = 1024, lockout: bool = False):
+        self.lockout = lockout
+        self.readings = 0
+        self.invalid = 0
+        self.jumps = 0
+        self.stuck = 0
+        self.pump_faults = 0
+        self.pump_verified = 0
+        self.pump_inconclusive = 0
+        self.cleared = 0
+
+        self._index = {}
+        self._lock = threading.Lock()
+        self._state = np.empty((0, len(STATE_COLUMNS)))
+        self._alloc(capacity)
+
+    def _alloc(self, capacity: int):
+        state = np.tile(np.array(EMPTY_ROW), (capacity, 1))
+        state[:len(self._state)] = self._state
+        self._state = state
+        self._buffer = memoryview(state).cast("B")
+
+    def _row(self, device_id) -> int:
+        row = self._index.get(device_id)
+        if row is None:
+            row = self._index[device_id] = len(self._index)
+            if row == len(self._state):
+                self._alloc(len(self._state) * 2)
+        return row
+
+    def __len__(self):
+        return len(self._index)
+
+    # ------------------------------
+    # Single reading
+    # ------------------------------
+    def update(self, device_id, timestamp: float, soil: float, temperature: float, last_action_time=None) -> int:
+        """
+        Add one reading (epoch seconds); last_action_time = the device's
+        last IRRIGATE before it (None = never). Returns the device's
+        FAULT_* bits after the reading.
+        """
+        with self._lock:
+            self.readings += 1
+            r = self._row(device_id)
+            if not (0 <= soil <= 100 and -10 <= temperature <= 60):
+                self.invalid += 1
+                return int(self._state[r, C_FAULTS])
+
+            offset = r * ROW.size
+            (count, ts, last_soil, last_temp, soil_mean, soil_var, temp_mean, temp_var,
+             same, same_since, clean, pump_at, pump_since, pump_soil, faults) = ROW.unpack_from(self._buffer, offset)
+            faults = int(faults)
+
+            if not count:
+                ROW.pack_into(
+                    self._buffer, offset,
+                    1.0, timestamp, soil, temperature, soil, 0.0, temperature, 0.0,
+                    1.0, timestamp, 0.0, pump_at, pump_since, pump_soil, faults
+                )
+                return faults
+
+            # Jump: physical rate limit, and an outlier once warmed up
+            minutes = max(0.0, timestamp - ts) / 60
+            warm = count >= WARMUP
+            watered = max(pump_at, last_action_time if last_action_time is not None else -math.inf)
+            jump = (
+                timestamp - watered > WATERING_SEC
+                and abs(soil - last_soil) > SOIL_JUMP + SOIL_RATE_PER_MIN * minutes
+                and (not warm or abs(soil - soil_mean) > Z_LIMIT * max(math.sqrt(soil_var), SOIL_SD_FLOOR))
+            ) or (
+                abs(temperature - last_temp) > TEMP_JUMP + TEMP_RATE_PER_MIN * minutes
+                and (not warm or abs(temperature - temp_mean) > Z_LIMIT * max(math.sqrt(temp_var), TEMP_SD_FLOOR))
+            )
+            if jump:
+                self.jumps += 1
+                faults |= FAULT_JUMP
+                clean = 0.0
+            else:
+                # Baseline learns from plausible readings only
+                diff = soil - soil_mean
+                soil_mean += BASELINE_ALPHA * diff
+                soil_var = (1 - BASELINE_ALPHA) * (soil_var + BASELINE_ALPHA * diff * diff)
+                diff = temperature - temp_mean
+                temp_mean += BASELINE_ALPHA * diff
+                temp_var = (1 - BASELINE_ALPHA) * (temp_var + BASELINE_ALPHA * diff * diff)
+                clean += 1
+                if clean >= CLEAR_READINGS:
+                    faults &= ~FAULT_JUMP
+
+            # Stuck: identical frames, by count and by time
+            if soil == last_soil and temperature == last_temp:
+                same += 1
+            else:
+                same, same_since = 1.0, timestamp
+            if same >= STUCK_READINGS and timestamp - same_since >= STUCK_SEC:
+                if not faults & FAULT_STUCK:
+                    self.stuck += 1
+                faults |= FAULT_STUCK
+            else:
+                faults &= ~FAULT_STUCK
+
+            # Pump: an IRRIGATE starts a check against the soil before it;
+            # repeats while it is pending do not restart the clock
+            if last_action_time is not None and last_action_time > pump_at:
+                if pump_soil != pump_soil:
+                    pump_since, pump_soil = last_action_time, last_soil
+                pump_at = last_action_time
+            if pump_soil == pump_soil:
+                elapsed = timestamp - pump_since
+                if soil >= pump_soil + PUMP_MIN_RISE:
+                    self.pump_verified += 1
+                    pump_soil = math.nan
+                elif elapsed > PUMP_CHECK_MAX_SEC:
+                    self.pump_inconclusive += 1
+                    pump_soil = math.nan
+                elif elapsed >= PUMP_CHECK_SEC:
+                    self.pump_faults += 1
+                    faults |= FAULT_PUMP
+                    pump_soil = math.nan
+
+            ROW.pack_into(
+                self._buffer, offset,
+                count + 1, timestamp, soil, temperature, soil_mean, soil_var, temp_mean, temp_var,
+                same, same_since, clean, pump_at, pump_since, pump_soil, faults
+            )
+            return faults
+
+    # ------------------------------
+    # Batch
+    # ------------------------------
+    def update_batch(self, device_ids, timestamp, soil, temperature, last_action_time=None) -> np.ndarray:
+        """
+        Column arrays in arrival order (last_action_time NaN = never) →
+        uint8 FAULT_* bits per row. A device listed several times is
+        applied in order, one wave per repeat, so the result matches
+        calling update() per row.
+        """
+        n = len(device_ids)
+        timestamp = np.broadcast_to(np.asarray(timestamp, dtype=np.float64), (n,))
+        soil = np.asarray(soil, dtype=np.float64)
+        temperature = np.asarray(temperature, dtype=np.float64)
+        last_action_time = (
+            np.full(n, np.nan) if last_action_time is None
+            else np.asarray(last_action_time, dtype=np.float64)
+        )
+        out = np.empty(n, dtype=np.uint8)
+
+        with self._lock:
+            self.readings += n
+            rows = np.fromiter((self._row(d) for d in device_ids), dtype=np.intp, count=n)
+            valid = (soil >= 0) & (soil <= 100) & (temperature >= -10) & (temperature <= 60)
+            self.invalid += n - int(np.count_nonzero(valid))
+
+            # k-th occurrence of a device goes into wave k
+            order = np.argsort(rows, kind="stable")
+            starts = np.r_[True, rows[order][1:] != rows[order][:-1]]
+            first = np.maximum.accumulate(np.where(starts, np.arange(n), 0))
+            rank = np.empty(n, dtype=np.int64)
+            rank[order] = np.arange(n) - first
+
+            for k in range(int(rank.max()) + 1 if n else 0):
+                wave = rank == k
+                rejected = np.flatnonzero(wave & ~valid)
+                out[rejected] = self._state[rows[rejected], C_FAULTS]
+                idx = np.flatnonzero(wave & valid)
+                if len(idx):
+                    out[idx] = self._apply(rows[idx], timestamp[idx], soil[idx], temperature[idx], last_action_time[idx])
+        return out
+
+    def _apply(self, r, ts, soil, temp, last_action_time) -> np.ndarray:
+        """One vectorized update() over distinct rows r (plausible readings)."""
+        state = self._state[r]
+        count = state[:, C_COUNT]
+        faults = state[:, C_FAULTS].astype(np.int64)
+        new = count == 0
+        seen = ~new
+
+        minutes = np.maximum(0.0, ts - state[:, C_TS]) / 60
+        warm = count >= WARMUP
+        soil_sd = np.maximum(np.sqrt(state[:, C_SOIL_VAR]), SOIL_SD_FLOOR)
+        temp_sd = np.maximum(np.sqrt(state[:, C_TEMP_VAR]), TEMP_SD_FLOOR)
+        watered = np.fmax(state[:, C_PUMP_AT], last_action_time)
+        jump = seen & (
+            (
+                (ts - watered > WATERING_SEC)
+                & (np.abs(soil - state[:, C_SOIL]) > SOIL_JUMP + SOIL_RATE_PER_MIN * minutes)
+                & (~warm | (np.abs(soil - state[:, C_SOIL_MEAN]) > Z_LIMIT * soil_sd))
+            ) | (
+                (np.abs(temp - state[:, C_TEMP]) > TEMP_JUMP + TEMP_RATE_PER_MIN * minutes)
+                & (~warm | (np.abs(temp - state[:, C_TEMP_MEAN]) > Z_LIMIT * temp_sd))
+            )
+        )
+        self.jumps += int(np.count_nonzero(jump))
+        faults[jump] |= FAULT_JUMP
+
+        # Baseline learns from plausible readings only (first reading seeds it)
+        learn = seen & ~jump
+        for value, mean_col, var_col in ((soil, C_SOIL_MEAN, C_SOIL_VAR), (temp, C_TEMP_MEAN, C_TEMP_VAR)):
+            diff = value - state[:, mean_col]
+            state[:, mean_col] = np.where(learn, state[:, mean_col] + BASELINE_ALPHA * diff, state[:, mean_col])
+            state[:, var_col] = np.where(
+                learn, (1 - BASELINE_ALPHA) * (state[:, var_col] + BASELINE_ALPHA * diff * diff), state[:, var_col]
+            )
+            state[new, mean_col] = value[new]
+            state[new, var_col] = 0.0
+        clean = np.where(learn, state[:, C_CLEAN] + 1, 0.0)
+        faults[clean >= CLEAR_READINGS] &= ~FAULT_JUMP
+
+        # Stuck
+        repeat = seen & (soil == state[:, C_SOIL]) & (temp == state[:, C_TEMP])
+        same = np.where(repeat, state[:, C_SAME] + 1, 1.0)
+        same_since = np.where(repeat, state[:, C_SAME_SINCE], ts)
+        stuck = (same >= STUCK_READINGS) & (ts - same_since >= STUCK_SEC)
+        self.stuck += int(np.count_nonzero(stuck & ~(faults & FAULT_STUCK).astype(bool)))
+        faults = np.where(stuck, faults | FAULT_STUCK, faults & ~FAULT_STUCK)
+
+        # Pump check (NaN last_action_time never starts one)
+        irrigated = seen & (last_action_time > state[:, C_PUMP_AT])
+        started = irrigated & np.isnan(state[:, C_PUMP_SOIL])
+        pump_at = np.where(irrigated, last_action_time, state[:, C_PUMP_AT])
+        pump_since = np.where(started, last_action_time, state[:, C_PUMP_SINCE])
+        pump_soil = np.where(started, state[:, C_SOIL], state[:, C_PUMP_SOIL])
+        pending = seen & ~np.isnan(pump_soil)
+        elapsed = ts - pump_since
+        verified = pending & (soil >= pump_soil + PUMP_MIN_RISE)
+        inconclusive = pending & ~verified & (elapsed > PUMP_CHECK_MAX_SEC)
+        failed = pending & ~verified & ~inconclusive & (elapsed >= PUMP_CHECK_SEC)
+        self.pump_verified += int(np.count_nonzero(verified))
+        self.pump_inconclusive += int(np.count_nonzero(inconclusive))
+        self.pump_faults += int(np.count_nonzero(failed))
+        faults[failed] |= FAULT_PUMP
+        pump_soil[verified | inconclusive | failed] = np.nan
+
+        state[:, C_COUNT] = count + 1
+        state[:, C_TS] = ts
+        state[:, C_SOIL] = soil
+        state[:, C_TEMP] = temp
+        state[:, C_SAME] = same
+        state[:, C_SAME_SINCE] = same_since
+        state[:, C_CLEAN] = np.where(new, 0.0, clean)
+        state[:, C_PUMP_AT] = pump_at
+        state[:, C_PUMP_SINCE] = pump_since
+        state[:, C_PUMP_SOIL] = pump_soil
+        state[:, C_FAULTS] = faults
+        self._state[r] = state
+        return faults.astype(np.uint8)
+
+    # ------------------------------
+    # Operator actions
+    # ------------------------------
+    def clear(self, device_id=None) -> int:
+        """
+        Acknowledge faults (pump latch, jump) of one device or, with
+        None, of every device; stuck stays until the frame changes.
+        Returns the number of devices whose bits changed.
+        """
+        with self._lock:
+            if device_id is None:
+                rows = np.arange(len(self._index))
+            elif device_id in self._index:
+                rows = np.array([self._index[device_id]])
+            else:
+                return 0
+            faults = self._state[rows, C_FAULTS].astype(np.int64)
+            kept = faults & FAULT_STUCK
+            changed = int(np.count_nonzero(kept != faults))
+            self._state[rows, C_FAULTS] = kept
+            self.cleared += changed
+            return changed
+
+    def discard(self, device_id):
+        """Forget a device's baseline (row kept for reuse by the same id)."""
+        with self._lock:
+            row = self._index.get(device_id)
+            if row is not None:
+                self._state[row] = EMPTY_ROW
+
+    # ------------------------------
+    # Introspection
+    # ------------------------------
+    def faults_of(self, device_id) -> int:
+        row = self._index.get(device_id)
+        return 0 if row is None else int(self._state[row, C_FAULTS])
+
+    def device_status(self, device_id) -> dict:
+        with self._lock:
+            row = self._index.get(device_id)
+            if row is None:
+                return {"device_id": device_id, "faults": [], "readings": 0}
+            (count, _, _, _, soil_mean, soil_var, temp_mean, temp_var,
+             same, _, _, _, pump_since, pump_soil, faults) = self._state[row].tolist()
+        return {
+            "device_id": device_id,
+            "faults": fault_names(int(faults)),
+            "readings": int(count),
+            "soil_baseline": round(soil_mean, 2),
+            "soil_sd": round(math.sqrt(soil_var), 3),
+            "temp_baseline": round(temp_mean, 2),
+            "temp_sd": round(math.sqrt(temp_var), 3),
+            "identical_frames": int(same),
+            "pump_check_since": pump_since if pump_soil == pump_soil else None
+        }
+
+    def locked_out(self, limit: int = 100) -> list:
+        """Devices with any fault bit set (at most limit)."""
+        with self._lock:
+            n = len(self._index)
+            faults = self._state[:n, C_FAULTS].astype(np.int64)
+            rows = set(np.flatnonzero(faults)[:limit].tolist())
+            return [
+                {"device_id": device_id, "faults": fault_names(int(faults[row]))}
+                for device_id, row in self._index.items() if row in rows
+            ]
+
+    def stats(self) -> dict:
+        with self._lock:
+            faults = self._state[:len(self._index), C_FAULTS].astype(np.int64)
+            return {
+                "devices": len(self._index),
+                "lockout": self.lockout,
+                "locked_out": int(np.count_nonzero(faults)),
+                "stuck_now": int(np.count_nonzero(faults & FAULT_STUCK)),
+                "jump_now": int(np.count_nonzero(faults & FAULT_JUMP)),
+                "pump_now": int(np.count_nonzero(faults & FAULT_PUMP)),
+                "readings": self.readings,
+                "invalid": self.invalid,
+                "jumps": self.jumps,
+                "stuck": self.stuck,
+                "pump_faults": self.pump_faults,
+                "pump_verified": self.pump_verified,
+                "pump_inconclusive": self.pump_inconclusive,
+                "cleared": self.cleared,
+                "bytes": self._state.nbytes
+            }
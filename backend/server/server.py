@@ -3,8 +3,17 @@ AgriAgents - Multi-Agent Backend Orchestrator
 Architecture:
 - Explicit per-agent outputs
 - Scenario control for demos
+- Per-device state (cooldown, rain countdown, impact)
 - Impact metrics tracking
+- Minute / hour / day impact rollups per device, field and fleet
+- Historical analytics over columnar exports of the durable log
 - Decision timeline buffer
+- Live dashboard push (Server-Sent Events)
+- Decision memo for repeated identical readings
+- Streaming sensor / pump fault detection with opt-in lockout
+- Minimal device replies, preencoded JSON serialization
+- Per-stage timers (/metrics), sampled async logs, runtime profiler
+- Shard worker API for the sharded deployment (sharding.py)
 - Clean agent boundaries
 
 Agents:
@@ -14,11 +23,61 @@ Agents:
 4. Farmer Assistant - Human explanations
 """
 
-from flask import Flask, request, jsonify
+import os
+import time
+from collections import Counter
+
+from flask import Flask, Response, request
 from flask_cors import CORS
 from datetime import datetime
 
-from agentic_engine import agentic_decision
+from agentic_engine import DECISION_CODES
+from policy_registry import PolicyRegistry
+from decision_memo import DecisionMemo
+from explanation_pool import (
+    EXPLAIN_QUEUE,
+    EXPLAIN_WORKERS,
+    ExplanationPool,
+    LocalExplainer,
+    explanation_context,
+    overridden_context
+)
+from irrigation_scheduler import DEFAULT_ZONE, IrrigationScheduler
+from climate import ClimateAgent, FileForecastProvider
+from features import FeatureStore
+from sensor_faults import FaultDetector, fault_names
+from device_state import DeviceState, make_store, to_epoch, from_epoch
+from timeline import DecisionTimeline
+from telemetry_log import TelemetryLog, TelemetryLogReader
+from event_stream import EventBroker, diff_agents
+from observability import StageMetrics, SamplingProfiler, logger_from_env, render_gauges
+from telemetry_frame import FrameError, UDPFrameListener, decode_frames, frames_to_columns
+from impact_rollup import SNAPSHOT_FILE, SNAPSHOT_SEC, ImpactRollups
+from analytics import EXPORT_SEC, MAX_ROWS, AnalyticsExporter, AnalyticsStore
+from backfill import BackfillReplayer, frame_chunks, ndjson_chunks, take_rows
+from sharding import HashRing
+from response import (
+    MIN_MIMETYPE,
+    cooldown_remaining,
+    encode_full,
+    encode_minimal,
+    json_response,
+    raw_response,
+    wants_minimal
+)
+from pipeline import (
+    PUMP_FLOW_LPM,
+    DEFAULT_DEVICE_ID,
+    FARMER_SCHEDULED,
+    REASON_SCHEDULED,
+    apply_override,
+    farmer_message_code,
+    lockout_codes,
+    render_agents,
+    readings_to_columns,
+    run_batch,
+    batch_results
+)
 
 app = Flask(__name__)
 CORS(app)
@@ -28,55 +87,212 @@ CORS(app)
 # ==================================================
 SCENARIO = {
     "mode": "NORMAL",  # NORMAL | RAIN | PUMP_FAIL
-    "rain_eta": None
+    "rain_eta": None   # RAIN demo: forecast rain this many minutes after the switch
 }
 
 # ==================================================
-# 🧠 SYSTEM MEMORY
+# 🧠 SYSTEM MEMORY (PER DEVICE)
 # ==================================================
+# memory | columnar | sqlite (sqlite lets several workers share state)
+DEVICES = make_store(
+    os.environ.get("AGRI_STATE_BACKEND", "memory"),
+    **({"path": os.environ.get("AGRI_STATE_DB", "device_state.db")}
+       if os.environ.get("AGRI_STATE_BACKEND") == "sqlite" else {})
+)
+
+# Dashboard follows the most recently reporting device
 STATE = {
-    "last_action_time": None,
-    "last_decision": None,
-    "latest_agents": {}
+    "latest_device": None
 }
 
 # ==================================================
 # 📊 IMPACT METRICS (DEMO-SAFE)
 # ==================================================
-IMPACT = {
-    "water_saved_liters": 0.0,
-    "pump_cycles_avoided": 0
-}
-
-# Demo assumption: pump flow rate
-PUMP_FLOW_LPM = 10  # 10 liters per minute (stated in README)
+# Kept per device in DEVICES; fleet totals via DEVICES.impact_totals()
+# Pump flow assumption (PUMP_FLOW_LPM) lives in pipeline.py
+# Time-bucketed history (GET /impact/rollups) survives scenario resets;
+# devices may report an optional "field_id" to join a field rollup
+ROLLUPS = ImpactRollups()
 
 # ==================================================
 # 🕒 DECISION TIMELINE (RING BUFFER)
 # ==================================================
-DECISION_TIMELINE = []
-MAX_TIMELINE_LENGTH = 30  # keep last 30 decisions
+MAX_TIMELINE_LENGTH = 30  # keep last 30 decisions (fleet and per device)
+DECISION_TIMELINE = DecisionTimeline(
+    fleet_capacity=MAX_TIMELINE_LENGTH,
+    device_capacity=MAX_TIMELINE_LENGTH
+)
+
+# ==================================================
+# 🌦️ CLIMATE AGENT (FORECASTS)
+# ==================================================
+# AGRI_FORECAST_FILE = JSON forecast grid; without it the sky stays
+# dry except during the RAIN demo scenario
+CLIMATE = ClimateAgent(
+    FileForecastProvider(os.environ["AGRI_FORECAST_FILE"])
+    if os.environ.get("AGRI_FORECAST_FILE") else None
+)
+
+# ==================================================
+# 📈 WINDOWED FEATURES
+# ==================================================
+# Rolling soil trend / heat / light per device, scored by the Decision
+# Agent instead of the single latest reading
+FEATURES = FeatureStore()
+
+# ==================================================
+# 🚨 SENSOR / PUMP FAULTS
+# ==================================================
+# O(1) per-device baselines flag frozen sensors, impossible jumps and
+# pumps that do not wet the soil; with AGRI_FAULT_LOCKOUT=1 faulty
+# devices answer EMERGENCY_STOP (default: detect and report only)
+FAULTS = FaultDetector(lockout=os.environ.get("AGRI_FAULT_LOCKOUT", "0") == "1")
+
+# ==================================================
+# ♻️ DECISION MEMO
+# ==================================================
+# A device repeating its last reading (same features, cooldown state,
+# rain outlook, scenario, policy) reuses its last decision record
+DECISION_MEMO = DecisionMemo()
+
+# ==================================================
+# 🗣️ DEFERRED EXPLANATIONS
+# ==================================================
+# Farmer Assistant explanations come from a background worker pool:
+# /data replies null until one is ready, /state fills it in.
+# AGRI_EXPLAIN_LATENCY_MS = simulated model latency of the local stand-in
+EXPLAINER = ExplanationPool(
+    LocalExplainer(float(os.environ.get("AGRI_EXPLAIN_LATENCY_MS", 0)) / 1000),
+    workers=int(os.environ.get("AGRI_EXPLAIN_WORKERS", EXPLAIN_WORKERS)),
+    max_queue=int(os.environ.get("AGRI_EXPLAIN_QUEUE", EXPLAIN_QUEUE))
+).start()
+
+# ==================================================
+# 📜 POLICY REGISTRY (HOT RELOAD)
+# ==================================================
+# Versioned thresholds per crop / field profile; AGRI_POLICY_FILE is
+# re-read when it changes, POST /policy publishes one profile. Readers
+# never lock: a publish swaps in a new compiled policy
+POLICIES = PolicyRegistry(os.environ.get("AGRI_POLICY_FILE"), field_of=ROLLUPS.field_of)
+POLICIES.on_publish(lambda: DECISION_MEMO.invalidate())
+if POLICIES.path:
+    POLICIES.start_watching()
+
+# ==================================================
+# 🗓️ FLEET IRRIGATION SCHEDULER
+# ==================================================
+# IRRIGATE decisions share each zone's (field's) water supply. Zones are
+# unlimited unless configured (POST /schedule/zones) or given default
+# limits: AGRI_ZONE_CAPACITY_LPM, AGRI_ZONE_BUDGET_L, AGRI_ZONE_STAGGER_SEC
+SCHEDULER = IrrigationScheduler(
+    zone_of=ROLLUPS.field_of,
+    capacity_lpm=float(os.environ["AGRI_ZONE_CAPACITY_LPM"]) if os.environ.get("AGRI_ZONE_CAPACITY_LPM") else None,
+    budget_liters=float(os.environ["AGRI_ZONE_BUDGET_L"]) if os.environ.get("AGRI_ZONE_BUDGET_L") else None,
+    stagger_sec=float(os.environ.get("AGRI_ZONE_STAGGER_SEC", 0))
+)
+
+# ==================================================
+# 📡 LIVE PUSH (SSE)
+# ==================================================
+# Dashboards subscribe to GET /stream and receive deltas only
+EVENTS = EventBroker(max_queue=256)
+
+# ==================================================
+# 🔭 OBSERVABILITY
+# ==================================================
+# Stage timers (GET /metrics), sampled JSON logs instead of a print per
+# reading (AGRI_LOG_SAMPLE), stack sampler toggled via POST /profiler
+METRICS = StageMetrics()
+LOG = logger_from_env()
+PROFILER = SamplingProfiler()
+
+# ==================================================
+# 💾 DURABLE LOG (OPTIONAL)
+# ==================================================
+# Set AGRI_LOG_DIR to persist every reading + decision and to recover
+# per-device state and the scenario on restart
+LOG_DIR = os.environ.get("AGRI_LOG_DIR")
+TELEMETRY_LOG = None
+
+if LOG_DIR:
+    rollup_path = os.path.join(LOG_DIR, SNAPSHOT_FILE)
+    if os.path.isdir(LOG_DIR):
+        ROLLUPS.load(rollup_path)
+        with TelemetryLogReader(LOG_DIR) as reader:
+            recovered = reader.recover(DEVICES, SCENARIO)
+            # Rollup snapshot + log records written after it
+            folded = ROLLUPS.fold_log(reader, PUMP_FLOW_LPM)
+        print(f"💾 Recovered {recovered} devices from {LOG_DIR} ({folded} readings into rollups)")
+    TELEMETRY_LOG = TelemetryLog(LOG_DIR)
+    ROLLUPS.start_snapshots(rollup_path, SNAPSHOT_SEC)
+    # A recovered RAIN scenario restarts its forecast from now
+    CLIMATE.apply_scenario(SCENARIO["mode"], time.time(), SCENARIO["rain_eta"] or 0)
+
+# Columnar exports of the log for /analytics (analytics.py)
+ANALYTICS = ANALYTICS_EXPORTER = None
+
+if LOG_DIR:
+    analytics_dir = os.environ.get("AGRI_ANALYTICS_DIR") or os.path.join(LOG_DIR, "analytics")
+    ANALYTICS_EXPORTER = AnalyticsExporter(
+        LOG_DIR, analytics_dir, field_of=ROLLUPS.field_of, flush=TELEMETRY_LOG.flush
+    ).start(float(os.environ.get("AGRI_ANALYTICS_SEC", EXPORT_SEC)))
+    ANALYTICS = AnalyticsStore(analytics_dir)
+
+# ==================================================
+# 🧩 SHARD MEMBERSHIP (SHARDED DEPLOYMENT)
+# ==================================================
+# Set by sharding.py for its workers: this process owns only the devices
+# the ring maps to SHARD_NAME. Recovered records of devices handed to
+# another shard are dropped.
+SHARD_NAME = os.environ.get("AGRI_SHARD_NAME")
+
+if SHARD_NAME and os.environ.get("AGRI_SHARD_RING"):
+    shard_ring = HashRing(os.environ["AGRI_SHARD_RING"].split(","))
+    for device_id in DEVICES.device_ids():
+        if shard_ring.node_for(device_id) != SHARD_NAME:
+            DEVICES.pop(device_id)
+            ROLLUPS.discard_device(device_id)
+
+# ==================================================
+# ⏪ STORE-AND-FORWARD BACKFILL
+# ==================================================
+# Seq dedupe for every timestamped reading; history replayed without
+# actuation (backfill.py)
+BACKFILL = BackfillReplayer(DEVICES, CLIMATE, DECISION_TIMELINE, SCENARIO, TELEMETRY_LOG, ROLLUPS, POLICIES)
 
 # ==================================================
 # 🎭 SCENARIO CONTROL
 # ==================================================
 @app.route("/scenario", methods=["POST"])
 def set_scenario():
-    global IMPACT
     data = request.json
     SCENARIO["mode"] = data.get("mode", "NORMAL")
 
     if SCENARIO["mode"] == "RAIN":
         SCENARIO["rain_eta"] = 90
+        DEVICES.reset_scenario()
     elif SCENARIO["mode"] == "PUMP_FAIL":
         SCENARIO["rain_eta"] = None
+        DEVICES.reset_scenario()
     else:
         SCENARIO["rain_eta"] = None
         # Reset impact metrics on Normal mode
-        IMPACT = {"water_saved_liters": 0.0, "pump_cycles_avoided": 0}
+        DEVICES.reset_scenario(reset_impact=True)
+
+    CLIMATE.apply_scenario(SCENARIO["mode"], time.time(), SCENARIO["rain_eta"] or 0)
+    DECISION_MEMO.invalidate()
+
+    if TELEMETRY_LOG:
+        TELEMETRY_LOG.append_control(
+            to_epoch(datetime.utcnow()),
+            SCENARIO["mode"],
+            reset_impact=SCENARIO["mode"] not in ("RAIN", "PUMP_FAIL")
+        )
+
+    EVENTS.publish_impact(DEVICES.impact_totals())
 
-    print(f"🎭 Scenario changed to: {SCENARIO['mode']}")
-    return jsonify({"status": "ok", "scenario": SCENARIO})
+    LOG.log("scenario", always=True, mode=SCENARIO["mode"], rain_eta=SCENARIO["rain_eta"])
+    return json_response({"status": "ok", "scenario": SCENARIO})
 
 
 # ==================================================
@@ -84,159 +300,497 @@ def set_scenario():
 # ==================================================
 @app.route("/data", methods=["POST"])
 def ingest():
+    clock = METRICS.clock()
+    now = datetime.utcnow()
     payload = request.json
+    device_id = payload.get("device_id", DEFAULT_DEVICE_ID)
     sensors = payload.get("sensors", {})
 
     soil = float(sensors.get("soil", 0))
     temp = float(sensors.get("temp", 0))
     light = int(sensors.get("light", 0))
+    clock.lap("parse")
+
+    # Policy version in force for this reading (device / field profile)
+    ROLLUPS.assign_field(device_id, payload.get("field_id"))
+    POLICIES.assign(device_id, payload.get("profile"))
+    policy = POLICIES.policy_for(device_id)
+    limits = policy.field_limits
 
     # ==================================================
     # 🟫 AGENT 1: FIELD AGENT
     # ==================================================
     field_agent = {
         "soil_moisture": round(soil, 1),
-        "soil_status": "CRITICAL" if soil < 25 else ("LOW" if soil < 35 else "OK"),
+        "soil_status": (
+            "CRITICAL" if soil < limits["SOIL_CRITICAL"]
+            else ("LOW" if soil < limits["SOIL_LOW"] else "OK")
+        ),
         "temperature": round(temp, 1),
-        "heat_stress": "HIGH" if temp > 32 else "NORMAL",
+        "heat_stress": "HIGH" if temp > limits["HEAT_STRESS"] else "NORMAL",
         "pump_state": "OFF"
     }
+    clock.lap("field_agent")
 
     # ==================================================
     # 🌦️ AGENT 2: CLIMATE AGENT
     # ==================================================
-    rain_expected = SCENARIO["mode"] == "RAIN"
-    rain_eta = SCENARIO["rain_eta"]
-    
-    # Countdown rain ETA during demo
-    if rain_expected and rain_eta and rain_eta > 0:
-        SCENARIO["rain_eta"] = max(0, rain_eta - 3)
-    
-    climate_agent = {
-        "rain_expected": rain_expected,
-        "rain_eta_minutes": SCENARIO["rain_eta"],
-        "evaporation_risk": "HIGH" if temp > 32 else "MODERATE"
-    }
+    # Forecast tile lookup (cached, shared by nearby devices); rain ETA
+    # from forecast timestamps, so it counts down in real time
+    location = payload.get("location")
+    if location:
+        CLIMATE.locate(device_id, location["lat"], location["lon"])
+    rain_expected, rain_eta = CLIMATE.outlook(device_id, to_epoch(now))
+    clock.lap("climate_agent")
 
-    # ==================================================
-    # 🧠 AGENT 3: DECISION AGENT
-    # ==================================================
-    base_decision = agentic_decision(
-        sensor_data={
-            "soil": soil,
-            "temperature": temp,
-            "light": light
-        },
-        last_action_time=STATE["last_action_time"]
-    )
+    # Cooldown and impact are read-modify-write per device: hold the
+    # device's record for the whole agent pipeline
+    with DEVICES.update(device_id) as dev:
+        clock.lap("device_lock")
+        dev.rain_eta = rain_eta
 
-    decision = base_decision["decision"]
-    reason = "Soil moisture within acceptable range"
+        # Window update under the device lock: readings apply in order
+        features = FEATURES.update(device_id, to_epoch(now), soil, temp, light)
+        field_agent["soil_trend_per_hour"] = round(features["drying_slope"], 2) if features else 0.0
+        clock.lap("features")
 
-    # Climate override (agentic interaction)
-    if climate_agent["rain_expected"] and soil < 35:
-        decision = "HOLD"
-        reason = "Rain expected soon despite dry soil"
-    elif SCENARIO["mode"] == "PUMP_FAIL":
-        decision = "EMERGENCY_STOP"
-        reason = "Pump failure detected - system locked"
-    elif decision == "IRRIGATE":
-        reason = "Soil critically dry - irrigation needed"
-    elif soil < 35:
-        reason = "Soil moisture below optimal range"
+        climate_agent = {
+            "rain_expected": rain_expected,
+            "rain_eta_minutes": dev.rain_eta,
+            "evaporation_risk": "HIGH" if temp > limits["HEAT_STRESS"] else "MODERATE"
+        }
 
-    # ==================================================
-    # 📊 IMPACT METRIC UPDATE
-    # ==================================================
-    if soil < 30 and decision == "HOLD" and climate_agent["rain_expected"]:
-        IMPACT["pump_cycles_avoided"] += 1
-        IMPACT["water_saved_liters"] += PUMP_FLOW_LPM * 1  # 1-minute demo unit
-
-    if decision == "IRRIGATE":
-        STATE["last_action_time"] = datetime.utcnow()
-        field_agent["pump_state"] = "ON"
-
-    decision_agent = {
-        "decision": decision,
-        "confidence": base_decision["confidence"],
-        "utility_score": base_decision["utility"],
-        "reason": reason
-    }
-
-    # ==================================================
-    # 🧑‍🌾 AGENT 4: FARMER ASSISTANT
-    # ==================================================
-    if SCENARIO["mode"] == "PUMP_FAIL":
-        farmer_message = (
-            "⚠️ Pump failure detected. Please check the water pump and tank. "
-            "System has locked irrigation for safety."
-        )
-    elif climate_agent["rain_expected"]:
-        eta_text = f"{climate_agent['rain_eta_minutes']} minutes" if climate_agent['rain_eta_minutes'] else "soon"
-        farmer_message = (
-            f"🌧️ Rain is expected in {eta_text}. Irrigation is delayed to save water "
-            "and avoid unnecessary pump usage."
+        # ==================================================
+        # 🧠 AGENT 3: DECISION AGENT
+        # ==================================================
+        # The policy's compiled decision table (exact)
+        last_action = (
+            from_epoch(dev.last_action_time)
+            if dev.last_action_time is not None else None
         )
-    elif decision == "IRRIGATE":
-        farmer_message = (
-            "💧 Soil moisture is critically low. Irrigation has been activated "
-            "to maintain crop health."
+        cooling_down = bool(
+            last_action
+            and (now - last_action).total_seconds() < policy.thresholds["MIN_INTERVAL_SEC"]
         )
-    else:
-        farmer_message = (
-            "✅ Soil moisture is adequate. System is monitoring field and "
-            "climate conditions."
+        memo_key = DecisionMemo.key(
+            soil, temp, light, features, policy.thresholds, cooling_down, rain_expected, SCENARIO["mode"]
         )
+        memo = DECISION_MEMO.lookup(device_id, memo_key, policy, to_epoch(now))
 
-    farmer_assistant = {
-        "message": farmer_message
-    }
+        if memo is None:
+            base_decision = policy.table.decide(
+                sensor_data={
+                    "soil": soil,
+                    "temperature": temp,
+                    "light": light
+                },
+                last_action_time=last_action,
+                now=now,
+                features=features
+            )
+            clock.lap("decision")
+
+            # Climate override (agentic interaction); reason is an
+            # OVERRIDE_REASONS code, rendered on read
+            decision, reason = apply_override(
+                base_decision["decision"], soil, climate_agent["rain_expected"], SCENARIO["mode"] == "PUMP_FAIL",
+                limits["SOIL_LOW"]
+            )
+            decision_agent = {
+                "decision": decision,
+                "confidence": base_decision["confidence"],
+                "utility_score": base_decision["utility"],
+                "policy_version": policy.version,
+                "reason_code": reason
+            }
+
+            # ==================================================
+            # 🧑‍🌾 AGENT 4: FARMER ASSISTANT
+            # ==================================================
+            # Text rendered on read (render_agents), not per reading;
+            # the explanation is generated in the background (EXPLAINER)
+            message_code = farmer_message_code(SCENARIO["mode"], rain_expected, decision)
+            farmer_assistant = {
+                "message_code": message_code,
+                "explain": explanation_context(decision, reason, message_code, base_decision)
+            }
+            DECISION_MEMO.store(device_id, memo_key, policy, to_epoch(now), (decision_agent, farmer_assistant))
+        else:
+            # Unchanged inputs: same (shared) decision record
+            decision_agent, farmer_assistant = memo
+            decision, reason = decision_agent["decision"], decision_agent["reason_code"]
+            clock.lap("decision_memo")
+
+        # ==================================================
+        # 🚨 FAULT LOCKOUT
+        # ==================================================
+        # Baselines see every reading; a locked-out device gets its own
+        # EMERGENCY_STOP record (memo records stay untouched)
+        fault = FAULTS.update(device_id, to_epoch(now), soil, temp, dev.last_action_time)
+        if fault and FAULTS.lockout:
+            decision = "EMERGENCY_STOP"
+            reason, message_code = lockout_codes(fault)
+            decision_agent = {**decision_agent, "decision": decision, "reason_code": reason}
+            farmer_assistant = {
+                "message_code": message_code,
+                "explain": overridden_context(farmer_assistant["explain"], decision, reason, message_code)
+            }
+        clock.lap("faults")
+
+        # ==================================================
+        # 🗓️ FLEET SCHEDULER (SHARED WATER SUPPLY)
+        # ==================================================
+        # Stored (memo) records stay untouched: a deferred run gets its
+        # own DELAY record
+        start_in = 0.0
+        if decision == "IRRIGATE":
+            start_in = SCHEDULER.request(
+                device_id, decision_agent["utility_score"], decision_agent["confidence"],
+                to_epoch(now), policy.thresholds["MIN_INTERVAL_SEC"]
+            )
+            if start_in != 0.0:
+                decision, reason = "DELAY", REASON_SCHEDULED
+                decision_agent = {**decision_agent, "decision": decision, "reason_code": reason}
+                farmer_assistant = {
+                    "message_code": FARMER_SCHEDULED,
+                    "explain": overridden_context(farmer_assistant["explain"], decision, reason, FARMER_SCHEDULED)
+                }
+        else:
+            SCHEDULER.cancel(device_id, to_epoch(now))
+        clock.lap("scheduler")
+
+        # ==================================================
+        # 📊 IMPACT METRIC UPDATE
+        # ==================================================
+        avoided = soil < limits["RAIN_SAVE_SOIL"] and decision == "HOLD" and climate_agent["rain_expected"]
+        if avoided:
+            dev.pump_cycles_avoided += 1
+            dev.water_saved_liters += PUMP_FLOW_LPM * 1  # 1-minute demo unit
+
+        if decision == "IRRIGATE":
+            dev.last_action_time = to_epoch(now)
+            field_agent["pump_state"] = "ON"
+
+        dev.last_decision = decision
+        clock.lap("overrides")
+
+        latest_agents = {
+            "field_agent": field_agent,
+            "climate_agent": climate_agent,
+            "decision_agent": decision_agent,
+            "farmer_assistant": farmer_assistant
+        }
+        previous_agents = dev.latest_agents
+        dev.latest_agents = latest_agents
+        last_action_time = dev.last_action_time
+
+        # ==================================================
+        # 💾 DURABLE LOG (one buffered write)
+        # ==================================================
+        if TELEMETRY_LOG:
+            TELEMETRY_LOG.append(
+                device_id,
+                timestamp=to_epoch(now),
+                soil=soil,
+                temperature=temp,
+                light=light,
+                decision=decision,
+                reason=reason,
+                rain_expected=rain_expected,
+                mode=SCENARIO["mode"],
+                last_action_time=dev.last_action_time,
+                rain_eta=dev.rain_eta,
+                water_saved=dev.water_saved_liters,
+                pump_cycles_avoided=dev.pump_cycles_avoided
+            )
+        clock.lap("telemetry_log")
+
+    impact = DEVICES.impact_totals()
+    ROLLUPS.record(
+        device_id, to_epoch(now), decision,
+        water_saved=PUMP_FLOW_LPM * 1 if avoided else 0.0,
+        run=decision == "IRRIGATE",
+        avoided=avoided
+    )
+    clock.lap("rollups")
 
     # ==================================================
     # 🕒 TIMELINE SNAPSHOT
     # ==================================================
-    timeline_entry = {
-        "timestamp": datetime.utcnow().isoformat(),
-        "soil": round(soil, 1),
-        "rain_expected": climate_agent["rain_expected"],
-        "decision": decision_agent["decision"],
-        "reason": decision_agent["reason"],
-        "water_saved": IMPACT["water_saved_liters"],
-        "pump_cycles_avoided": IMPACT["pump_cycles_avoided"]
-    }
-
-    DECISION_TIMELINE.append(timeline_entry)
-    DECISION_TIMELINE[:] = DECISION_TIMELINE[-MAX_TIMELINE_LENGTH:]
+    seq = DECISION_TIMELINE.append(
+        device_id,
+        timestamp=to_epoch(now),
+        soil=soil,
+        decision=decision_agent["decision"],
+        reason=reason,
+        rain_expected=climate_agent["rain_expected"],
+        water_saved=impact["water_saved_liters"],
+        pump_cycles_avoided=impact["pump_cycles_avoided"],
+        policy_version=policy.version
+    )
+    clock.lap("timeline")
 
     # ==================================================
     # 📤 STORE & RETURN
     # ==================================================
-    STATE["latest_agents"] = {
-        "field_agent": field_agent,
-        "climate_agent": climate_agent,
-        "decision_agent": decision_agent,
-        "farmer_assistant": farmer_assistant
-    }
+    STATE["latest_device"] = device_id
+
+    # Cached explanation or None (job queued; never waits for the model)
+    explanation = EXPLAINER.explain(farmer_assistant["explain"])
+    clock.lap("explain")
 
-    print(f"📡 {soil}% | {decision} | Rain: {rain_expected} | Saved: {IMPACT['water_saved_liters']}L")
+    if EVENTS.has_subscribers:
+        EVENTS.publish("decisions", DECISION_TIMELINE.query(since=seq - 1)["timeline"])
+        changes = diff_agents(render_agents(previous_agents), render_agents(latest_agents))
+        if changes:
+            EVENTS.publish("agents", {"device_id": device_id, "changes": changes}, device_id=device_id)
+    EVENTS.publish_impact(impact)
+    clock.lap("events")
 
-    return jsonify({
+    LOG.log(
+        "reading",
+        device_id=device_id,
+        soil=soil,
+        decision=decision,
+        rain_expected=rain_expected,
+        water_saved=impact["water_saved_liters"]
+    )
+
+    # ESP32: decision code + cooldown left; dashboards: full agent payload
+    if wants_minimal(request.args, request.headers.get("Accept", "")):
+        # Seconds until the pump may switch: cooldown, or a granted start
+        response = raw_response(
+            encode_minimal(decision, max(
+                cooldown_remaining(last_action_time, to_epoch(now), policy.thresholds["MIN_INTERVAL_SEC"]),
+                int(-(-start_in // 1)) if start_in else 0
+            )),
+            MIN_MIMETYPE
+        )
+    else:
+        response = raw_response(encode_full(decision, latest_agents, impact, explanation))
+    clock.lap("serialize")
+    clock.done()
+    return response
+
+
+# ==================================================
+# 🚜 BATCH DATA INGEST
+# ==================================================
+@app.route("/data/batch", methods=["POST"])
+def ingest_batch():
+    """
+    Fleet ingest: one Decision Agent pass for many readings.
+
+    Request:  {"readings": [{"device_id": ..., "sensors": {...}}, ...]}
+    Response: compact per-device decisions (no per-device agent dicts);
+              400 if any reading is malformed (none are applied)
+    """
+    payload = request.get_json(silent=True)
+    readings = payload.get("readings", []) if isinstance(payload, dict) else None
+    try:
+        if not isinstance(readings, list):
+            raise ValueError('expected {"readings": [...]}')
+        columns = readings_to_columns(readings)
+    except (ValueError, TypeError, KeyError) as e:
+        return json_response({"status": "error", "error": str(e)}, 400)
+    CLIMATE.locate_readings(readings)
+    ROLLUPS.assign_fields(readings)
+    POLICIES.assign_profiles(readings)
+
+    result, impact = ingest_columns(columns, "batch")
+
+    return json_response({
         "status": "ok",
-        "decision": decision,
-        "agents": STATE["latest_agents"],
-        "impact_metrics": IMPACT
+        "count": len(columns["device_ids"]),
+        "results": batch_results(columns["device_ids"], result),
+        "impact_metrics": impact
     })
 
 
+# ==================================================
+# 📦 BINARY TELEMETRY (HTTP + UDP)
+# ==================================================
+@app.route("/data/binary", methods=["POST"])
+def ingest_binary():
+    """
+    Packed telemetry frames (telemetry_frame.py), any number per body.
+
+    Request:  application/octet-stream, concatenated frames
+    Response: {"status", "count", live / replayed / duplicate counts,
+              "impact_metrics"} (no per-device results)
+    """
+    try:
+        readings = decode_frames(request.get_data(cache=False))
+    except FrameError as e:
+        return json_response({"status": "error", "error": str(e)}, 400)
+
+    counts = ingest_timed(frames_to_columns(readings), "binary") if len(readings) else {}
+    return json_response({
+        "status": "ok",
+        "count": len(readings),
+        **counts,
+        "impact_metrics": DEVICES.impact_totals()
+    })
+
+
+@app.route("/data/backfill", methods=["POST"])
+def ingest_backfill():
+    """
+    Store-and-forward catch-up: readings buffered while a device was offline.
+
+    Request:  binary frames (application/octet-stream) or NDJSON
+              (application/x-ndjson), one {"device_id", "seq", "timestamp",
+              "sensors"} per line; read and replayed in chunks
+    Response: {"status", live / replayed / duplicate / too_old / untimed
+              counts, "impact_metrics"}; 400 keeps the counts applied so
+              far (resending is safe: readings dedupe by seq)
+    """
+    ndjson = request.mimetype == "application/x-ndjson"
+    chunks = ndjson_chunks(request.stream) if ndjson else frame_chunks(request.stream)
+
+    counts = Counter()
+    try:
+        for columns in chunks:
+            counts.update(ingest_timed(columns, "backfill"))
+    except (FrameError, ValueError, KeyError) as e:
+        return json_response({
+            "status": "error",
+            "error": str(e),
+            **counts,
+            "impact_metrics": DEVICES.impact_totals()
+        }, 400)
+
+    return json_response({"status": "ok", **counts, "impact_metrics": DEVICES.impact_totals()})
+
+
+def ingest_timed(columns: dict, source: str) -> dict:
+    """
+    Readings with (seq, device timestamp): duplicates dropped, history
+    replayed in event time without actuation, each device's newest fresh
+    reading through the live fleet path. Returns the split counts.
+    """
+    live, replay, counts = BACKFILL.split(columns, time.time())
+
+    if len(replay):
+        before = DECISION_TIMELINE.cursor
+        BACKFILL.replay(take_rows(columns, replay), time.time())
+        if EVENTS.has_subscribers:
+            EVENTS.publish("decisions", DECISION_TIMELINE.query(since=before)["timeline"])
+
+    if len(live):
+        ingest_columns(take_rows(columns, live), source)
+    else:
+        EVENTS.publish_impact(DEVICES.impact_totals())
+    return counts
+
+
+def ingest_columns(columns: dict, source: str) -> tuple:
+    """
+    Shared fleet path (/data/batch, /data/binary, UDP): one run_batch()
+    pass, then durable log, timeline, SSE and a sampled log line.
+    Returns (run_batch result, impact totals).
+    """
+    device_ids = columns["device_ids"]
+    now = datetime.utcnow()
+
+    result = run_batch(
+        DEVICES, SCENARIO, CLIMATE, device_ids,
+        columns["soil"], columns["temp"], columns["light"],
+        now=now,
+        features=FEATURES,
+        policies=POLICIES,
+        scheduler=SCHEDULER,
+        faults=FAULTS
+    )
+    impact = result["impact"]
+
+    ROLLUPS.record_batch(
+        device_ids, to_epoch(now), result["decision"],
+        water_saved=result["avoided"] * (PUMP_FLOW_LPM * 1.0),
+        run=result["decision"] == DECISION_CODES["IRRIGATE"],
+        avoided=result["avoided"]
+    )
+
+    if TELEMETRY_LOG:
+        TELEMETRY_LOG.append_batch(
+            device_ids,
+            timestamp=to_epoch(now),
+            columns={
+                "soil": columns["soil"],
+                "temperature": columns["temp"],
+                "light": columns["light"],
+                "decision": result["decision"],
+                "reason": result["reason"],
+                "rain_expected": result["rain_expected"],
+                "last_action_time": result["last_action_time"],
+                "rain_eta": result["rain_eta"],
+                "water_saved": result["water_saved"],
+                "pump_cycles_avoided": result["pump_cycles_avoided"]
+            },
+            mode=SCENARIO["mode"]
+        )
+
+    before = DECISION_TIMELINE.cursor
+    DECISION_TIMELINE.append_batch(
+        device_ids,
+        timestamp=to_epoch(now),
+        soil=columns["soil"],
+        decision=result["decision"],
+        reason=result["reason"],
+        rain_expected=result["rain_expected"],
+        impact=impact,
+        policy_version=result["policy_version"]
+    )
+
+    if EVENTS.has_subscribers:
+        # Fleet ring holds at most MAX_TIMELINE_LENGTH entries per event
+        EVENTS.publish("decisions", DECISION_TIMELINE.query(since=before)["timeline"])
+    EVENTS.publish_impact(impact)
+
+    LOG.log(
+        "batch",
+        source=source,
+        count=len(device_ids),
+        rain_devices=int(result["rain_expected"].sum()),
+        water_saved=impact["water_saved_liters"]
+    )
+    return result, impact
+
+
+# AGRI_UDP_PORT = listen for one frame per datagram (off by default)
+UDP_LISTENER = (
+    UDPFrameListener(
+        lambda readings: ingest_timed(frames_to_columns(readings), "udp"),
+        port=int(os.environ["AGRI_UDP_PORT"])
+    ).start()
+    if os.environ.get("AGRI_UDP_PORT") else None
+)
+
+
+@app.route("/data/udp/stats", methods=["GET"])
+def udp_stats():
+    return json_response(UDP_LISTENER.stats() if UDP_LISTENER else {"enabled": False})
+
+
+@app.route("/data/backfill/stats", methods=["GET"])
+def backfill_stats():
+    return json_response(BACKFILL.stats())
+
+
 # ==================================================
 # 🌐 UI POLLING
 # ==================================================
 @app.route("/state", methods=["GET"])
 def state():
-    return jsonify({
+    device_id = request.args.get("device_id", STATE["latest_device"])
+    dev = DEVICES.get(device_id) if device_id is not None else None
+
+    return json_response({
         "timestamp": datetime.utcnow().isoformat(),
-        "agents": STATE["latest_agents"],
-        "impact_metrics": IMPACT
+        "device_id": device_id,
+        "agents": render_agents(dev.latest_agents or {}, EXPLAINER.explain) if dev else {},
+        "impact_metrics": DEVICES.impact_totals(),
+        "devices": len(DEVICES)
     })
 
 
@@ -245,11 +799,422 @@ def state():
 # ==================================================
 @app.route("/timeline", methods=["GET"])
 def timeline():
-    return jsonify({
-        "timeline": DECISION_TIMELINE
+    """
+    Query params (all optional):
+      since=<cursor>  only entries newer than a previous response's cursor
+      device_id=<id>  one device's ring instead of the fleet ring
+      limit=<n>       newest n entries only
+    """
+    return json_response(DECISION_TIMELINE.query(
+        device_id=request.args.get("device_id"),
+        since=request.args.get("since", type=int),
+        limit=request.args.get("limit", type=int)
+    ))
+
+
+# ==================================================
+# 📊 IMPACT ROLLUPS API
+# ==================================================
+@app.route("/impact/rollups", methods=["GET"])
+def impact_rollups():
+    """
+    Query params (all optional):
+      scope=fleet|field|device   default fleet
+      key=<field_id|device_id>   required for field / device
+      start=<epoch> end=<epoch>  default: the last hour
+      resolution=minute|hour|day default: finest that covers the range
+    Response: {"scope", "key", "resolution", "bucket_sec", "start", "end",
+              "buckets": [...], "totals": {...}}
+    """
+    scope = request.args.get("scope", "fleet")
+    key = request.args.get("key")
+    if scope != "fleet" and key is None:
+        return json_response({"status": "error", "error": f"key is required for scope {scope}"}, 400)
+    try:
+        return json_response(ROLLUPS.query(
+            scope=scope,
+            key=key,
+            start=request.args.get("start", type=float),
+            end=request.args.get("end", type=float),
+            resolution=request.args.get("resolution")
+        ))
+    except ValueError as e:
+        return json_response({"status": "error", "error": str(e)}, 400)
+
+
+@app.route("/impact/rollups/stats", methods=["GET"])
+def impact_rollups_stats():
+    return json_response(ROLLUPS.stats())
+
+
+# ==================================================
+# 🗄️ HISTORICAL ANALYTICS API
+# ==================================================
+ANALYTICS_DISABLED = {"status": "error", "error": "analytics needs the durable log (AGRI_LOG_DIR)"}
+
+
+@app.route("/analytics", methods=["GET"])
+def analytics():
+    """
+    Aggregations over every exported reading (analytics.py).
+    Query params (all optional):
+      start=<epoch> end=<epoch>            time range
+      device_id / field_id / decision      filters
+      group_by=field,day                   day|hour|hour_of_day|device|field|decision|reason
+      metrics=count,water_saved_liters     default: count, water saved, pump runs, avoided
+      limit=<n>                            result rows (default 10000)
+    Response: {"group_by", "metrics", "filters", "rows", "truncated",
+              "scan", "exported_until", "elapsed_ms"}
+    """
+    if ANALYTICS is None:
+        return json_response(ANALYTICS_DISABLED, 404)
+    args = request.args
+    try:
+        return json_response(ANALYTICS.query(
+            start=args.get("start", type=float),
+            end=args.get("end", type=float),
+            device_id=args.get("device_id"),
+            field_id=args.get("field_id"),
+            decision=args.get("decision"),
+            group_by=[g for g in args.get("group_by", "").split(",") if g],
+            metrics=[m for m in args.get("metrics", "").split(",") if m],
+            limit=args.get("limit", MAX_ROWS, type=int)
+        ))
+    except ValueError as e:
+        return json_response({"status": "error", "error": str(e)}, 400)
+
+
+@app.route("/analytics/stats", methods=["GET"])
+def analytics_stats():
+    if ANALYTICS is None:
+        return json_response(ANALYTICS_DISABLED, 404)
+    return json_response({**ANALYTICS.stats(), "exporter": ANALYTICS_EXPORTER.stats()})
+
+
+@app.route("/analytics/export", methods=["POST"])
+def analytics_export():
+    """Export log records written since the last export now (instead of waiting)."""
+    if ANALYTICS is None:
+        return json_response(ANALYTICS_DISABLED, 404)
+    try:
+        exported = ANALYTICS_EXPORTER.export()
+    except (OSError, ValueError) as e:
+        return json_response({"status": "error", "error": str(e)}, 500)
+    return json_response({"status": "ok", "exported": exported, **ANALYTICS.stats()})
+
+
+# ==================================================
+# 📜 POLICY API
+# ==================================================
+@app.route("/policy", methods=["GET", "POST"])
+def policy():
+    """
+    GET  → every profile's live version and config, field → profile map,
+           retired versions, reload stats
+    POST {"profile": "tomato", "thresholds": {...}, "utility_limits": {...},
+          "field_limits": {...}} → publish a new version of that profile
+          (only the keys given change; default profile if omitted)
+    """
+    if request.method == "GET":
+        return json_response(POLICIES.describe())
+
+    payload = dict(request.json or {})
+    profile = payload.pop("profile", None)
+    try:
+        published = POLICIES.publish(profile, payload)
+    except ValueError as e:
+        return json_response({"status": "error", "error": str(e)}, 400)
+
+    LOG.log("policy", always=True, profile=published.profile, version=published.version)
+    return json_response({"status": "ok", "policy": published.to_dict()})
+
+
+@app.route("/policy/reload", methods=["POST"])
+def policy_reload():
+    """Re-read AGRI_POLICY_FILE now (the watcher also does on change)."""
+    if not POLICIES.path:
+        return json_response({"status": "error", "error": "AGRI_POLICY_FILE is not set"}, 400)
+    if not POLICIES.reload():
+        return json_response({"status": "error", "error": POLICIES.last_error}, 400)
+    LOG.log("policy", always=True, reloaded=POLICIES.path, version=POLICIES.version)
+    return json_response({"status": "ok", **POLICIES.stats()})
+
+
+# ==================================================
+# 🗓️ SCHEDULER API
+# ==================================================
+@app.route("/schedule", methods=["GET"])
+def schedule():
+    """
+    Zone limits, flow in use, budget used today, queue depth and
+    counters; ?device_id=<id> → that device's queued / granted / running
+    state instead.
+    """
+    device_id = request.args.get("device_id")
+    if device_id is not None:
+        return json_response(SCHEDULER.device_status(device_id, to_epoch(datetime.utcnow())))
+    return json_response(SCHEDULER.describe())
+
+
+@app.route("/schedule/zones", methods=["POST"])
+def schedule_zones():
+    """
+    {"zone": "north", "capacity_lpm": 40, "daily_budget_liters": 2000,
+     "stagger_sec": 5} → set one zone's limits (null / omitted = unlimited)
+    """
+    payload = request.json or {}
+    try:
+        zone = SCHEDULER.configure(
+            payload.get("zone", DEFAULT_ZONE),
+            capacity_lpm=payload.get("capacity_lpm"),
+            budget_liters=payload.get("daily_budget_liters"),
+            stagger_sec=payload.get("stagger_sec", 0.0)
+        )
+    except ValueError as e:
+        return json_response({"status": "error", "error": str(e)}, 400)
+    LOG.log("schedule_zone", always=True, zone=zone.name, **zone.to_dict())
+    return json_response({"status": "ok", "zone": zone.name, **zone.to_dict()})
+
+
+# ==================================================
+# 🚨 FAULTS API
+# ==================================================
+@app.route("/faults", methods=["GET"])
+def fault_status():
+    """
+    Detector counters and locked-out devices (?limit=, default 100);
+    ?device_id=<id> → that device's faults and baseline instead.
+    """
+    device_id = request.args.get("device_id")
+    if device_id is not None:
+        return json_response(FAULTS.device_status(device_id))
+    return json_response({
+        **FAULTS.stats(),
+        "devices_locked_out": FAULTS.locked_out(int(request.args.get("limit", 100)))
+    })
+
+
+@app.route("/faults/clear", methods=["POST"])
+def faults_clear():
+    """
+    {"device_id": "esp32_main"} → acknowledge that device's pump / jump
+    faults (pump checked, sensor fixed); no device_id → every device.
+    """
+    device_id = (request.json or {}).get("device_id")
+    cleared = FAULTS.clear(device_id)
+    LOG.log("faults_clear", always=True, device_id=device_id, cleared=cleared)
+    return json_response({
+        "status": "ok",
+        "cleared": cleared,
+        **({"faults": fault_names(FAULTS.faults_of(device_id))} if device_id is not None else {})
     })
 
 
+@app.route("/explain/stats", methods=["GET"])
+def explain_stats():
+    return json_response(EXPLAINER.stats())
+
+
+@app.route("/memo/stats", methods=["GET"])
+def memo_stats():
+    return json_response(DECISION_MEMO.stats())
+
+
+@app.route("/climate/stats", methods=["GET"])
+def climate_stats():
+    return json_response(CLIMATE.stats())
+
+
+@app.route("/features/stats", methods=["GET"])
+def features_stats():
+    return json_response(FEATURES.stats())
+
+
+@app.route("/timeline/stats", methods=["GET"])
+def timeline_stats():
+    return json_response(DECISION_TIMELINE.memory_report())
+
+
+# ==================================================
+# 📡 LIVE STREAM (SSE)
+# ==================================================
+@app.route("/stream", methods=["GET"])
+def stream():
+    """
+    text/event-stream of decisions / agents / impact / resync events.
+    device_id=<id> limits agents events to one device.
+    """
+    subscriber = EVENTS.subscribe(request.args.get("device_id"))
+    return Response(
+        EVENTS.stream(subscriber),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.route("/stream/stats", methods=["GET"])
+def stream_stats():
+    return json_response(EVENTS.stats())
+
+
+# ==================================================
+# 🔭 METRICS & PROFILER
+# ==================================================
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    """Prometheus text exposition: stage histograms + subsystem gauges."""
+    body = (
+        METRICS.render_prometheus()
+        + render_gauges("agri_devices", {"tracked": len(DEVICES)})
+        + render_gauges("agri_climate", CLIMATE.stats())
+        + render_gauges("agri_stream", EVENTS.stats())
+        + render_gauges("agri_log", LOG.stats())
+        + render_gauges("agri_rollups", ROLLUPS.stats())
+        + render_gauges("agri_memo", DECISION_MEMO.stats())
+        + render_gauges("agri_policy", POLICIES.stats())
+        + render_gauges("agri_explain", EXPLAINER.stats())
+        + render_gauges("agri_schedule", SCHEDULER.stats())
+        + render_gauges("agri_faults", FAULTS.stats())
+        + (render_gauges("agri_analytics", ANALYTICS.stats()) if ANALYTICS else "")
+    )
+    return Response(body, mimetype="text/plain; version=0.0.4")
+
+
+@app.route("/metrics/stages", methods=["GET"])
+def metrics_stages():
+    return json_response(METRICS.summary())
+
+
+@app.route("/profiler", methods=["GET", "POST"])
+def profiler():
+    """
+    POST {"enabled": true, "interval_ms": 5, "reset": false} toggles sampling.
+    GET → folded stacks (text/plain), hottest first.
+    """
+    if request.method == "GET":
+        return Response(PROFILER.folded(), mimetype="text/plain")
+
+    payload = request.json or {}
+    if payload.get("reset"):
+        PROFILER.reset()
+    if "enabled" in payload:
+        if payload["enabled"]:
+            PROFILER.start(payload.get("interval_ms", PROFILER.interval * 1000) / 1000)
+        else:
+            PROFILER.stop()
+    return json_response(PROFILER.stats())
+
+
+# ==================================================
+# 🧩 SHARD API (ROUTER ONLY)
+# ==================================================
+# sharding.py calls these for fleet reads and rebalancing; ingest is
+# paused while a handover runs
+@app.route("/shard/summary", methods=["GET"])
+def shard_summary():
+    return json_response({
+        "shard": SHARD_NAME,
+        "devices": len(DEVICES),
+        "impact_metrics": DEVICES.impact_totals(),
+        "latest_device": STATE["latest_device"],
+        "timeline_cursor": DECISION_TIMELINE.cursor
+    })
+
+
+@app.route("/shard/devices", methods=["GET"])
+def shard_devices():
+    return json_response({"device_ids": DEVICES.device_ids()})
+
+
+@app.route("/shard/export", methods=["POST"])
+def shard_export():
+    """{"device_ids": [...]} → snapshots: device record, climate tile, seq window, rollups, profile."""
+    snapshots = []
+    for device_id in request.json.get("device_ids", []):
+        dev = DEVICES.get(device_id)
+        if dev is None:
+            continue
+        snapshots.append({
+            **dev.to_dict(),
+            "tile": CLIMATE.device_tile(device_id),
+            "seq_window": BACKFILL.seqs.export(device_id),
+            "rollups": ROLLUPS.export_device(device_id),
+            "profile": POLICIES.profile_of(device_id)
+        })
+    return json_response({"devices": snapshots})
+
+
+@app.route("/shard/import", methods=["POST"])
+def shard_import():
+    """Adopt /shard/export snapshots (feature windows start empty)."""
+    snapshots = request.json.get("devices", [])
+    now = to_epoch(datetime.utcnow())
+
+    for snapshot in snapshots:
+        device_id = snapshot["device_id"]
+        with DEVICES.update(device_id) as dev:
+            for name in DeviceState.__slots__[1:]:
+                setattr(dev, name, snapshot[name])
+
+            if TELEMETRY_LOG:
+                # Handover record so recovery restores the device here
+                agents = dev.latest_agents or {}
+                field = agents.get("field_agent", {})
+                TELEMETRY_LOG.append(
+                    device_id,
+                    timestamp=now,
+                    soil=field.get("soil_moisture", 0.0),
+                    temperature=field.get("temperature", 0.0),
+                    light=0,
+                    decision=dev.last_decision or "HOLD",
+                    reason=agents.get("decision_agent", {}).get("reason_code", 0),
+                    rain_expected=agents.get("climate_agent", {}).get("rain_expected", False),
+                    mode=SCENARIO["mode"],
+                    last_action_time=dev.last_action_time,
+                    rain_eta=dev.rain_eta,
+                    water_saved=dev.water_saved_liters,
+                    pump_cycles_avoided=dev.pump_cycles_avoided,
+                    # Never-decided devices carry impact only
+                    backfill=dev.last_decision is None
+                )
+
+        if snapshot.get("tile") is not None:
+            CLIMATE.set_tile(device_id, snapshot["tile"])
+        if snapshot.get("seq_window") is not None:
+            BACKFILL.seqs.restore(device_id, snapshot["seq_window"])
+        if snapshot.get("rollups") is not None:
+            ROLLUPS.import_device(device_id, snapshot["rollups"])
+        POLICIES.assign(device_id, snapshot.get("profile"))
+
+    if TELEMETRY_LOG:
+        # Durable before the old owner drops its copy
+        TELEMETRY_LOG.flush()
+    EVENTS.publish_impact(DEVICES.impact_totals())
+    return json_response({"status": "ok", "imported": len(snapshots), "devices": len(DEVICES)})
+
+
+@app.route("/shard/drop", methods=["POST"])
+def shard_drop():
+    """Forget devices another shard now owns."""
+    dropped = 0
+    for device_id in request.json.get("device_ids", []):
+        if DEVICES.pop(device_id) is not None:
+            dropped += 1
+        BACKFILL.seqs.discard(device_id)
+        ROLLUPS.discard_device(device_id)
+        POLICIES.discard(device_id)
+        SCHEDULER.discard(device_id)
+        FAULTS.discard(device_id)
+        FEATURES.discard(device_id)
+        DECISION_TIMELINE.discard(device_id)
+        DECISION_MEMO.invalidate(device_id)
+        if STATE["latest_device"] == device_id:
+            STATE["latest_device"] = None
+
+    EVENTS.publish_impact(DEVICES.impact_totals())
+    return json_response({"status": "ok", "dropped": dropped, "devices": len(DEVICES)})
+
+
 # ==================================================
 # 🚀 ENTRYPOINT
 # ==================================================
@@ -259,4 +1224,5 @@ if __name__ == "__main__":
     print("   Impact Metrics + Decision Timeline enabled")
     print("=" * 50)
     print()
-    app.run(host="0.0.0.0", port=5000, debug=True)
+    # threaded: every open /stream holds a worker thread
+    app.run(host="0.0.0.0", port=5000, debug=True, threaded=True)
@@ -0,0 +1,232 @@
+"""
+AgriAgents - Serverless Handler
+The decision pipeline behind a Lambda-style entry point (no Flask, no server).
+
+    handler(event, context) → {"status", "count", "results", "impact_metrics"}
+    (same reply as POST /data/batch)
+
+Events (readings as in POST /data and /data/batch):
+  {"device_id", "sensors", ...}               one reading
+  {"readings": [...]}                         a batch
+  {"body": "...", "isBase64Encoded": ...}     API Gateway / function URL
+                                              → {"statusCode", "headers", "body"}
+  {"Records": [...]}                          SQS ("body") / Kinesis ("data")
+                                              records, each a reading or a batch;
+                                              bad records → batchItemFailures
+All readings of one invocation go through one run_batch() pass.
+
+Cold start:
+- Importing this module costs only the standard library; NumPy and the
+  engine modules are imported by the first invocation, or during the
+  runtime's init phase with AGRI_SERVERLESS_PRELOAD=1
+- The engine (compiled policy tables, device store, forecast cache,
+  feature windows) is built once per container and reused by warm
+  invocations. Building it runs one scratch reading, so the first real
+  batch finds every table and cache warm
+- AGRI_POLICY_FILE is re-checked at most every POLICY_CHECK_SEC when
+  invoked: no watcher thread, the runtime freezes idle containers
+
+State: cooldowns, rain ETAs and feature windows are per container
+(AGRI_STATE_BACKEND=sqlite with AGRI_STATE_DB on shared storage shares
+the device store). Zone scheduling, fault lockout, the durable log and
+rollups need every reading of a device in one process: use server.py.
+"""
+
+import base64
+import json
+import os
+import time
+
+POLICY_CHECK_SEC = 5.0
+
+_ENGINE = None
+
+
+class Engine:
+    """Everything a warm container keeps between invocations."""
+
+    def __init__(self):
+        started = time.perf_counter()
+        import numpy as np
+        import pipeline
+        from climate import ClimateAgent, FileForecastProvider
+        from device_state import make_store
+        from features import FeatureStore
+        from policy_registry import PolicyRegistry
+
+        self.np = np
+        self.pipeline = pipeline
+        backend = os.environ.get("AGRI_STATE_BACKEND", "memory")
+        self.store = make_store(
+            backend,
+            **({"path": os.environ.get("AGRI_STATE_DB", "device_state.db")} if backend == "sqlite" else {})
+        )
+        self.climate = ClimateAgent(
+            FileForecastProvider(os.environ["AGRI_FORECAST_FILE"])
+            if os.environ.get("AGRI_FORECAST_FILE") else None
+        )
+        self.features = FeatureStore()
+        # Compiles every profile's PolicyTable now, not on the first reading
+        self.policies = PolicyRegistry(os.environ.get("AGRI_POLICY_FILE"))
+        self.scenario = {"mode": "NORMAL", "rain_eta": None}
+
+        # Scratch reading on throwaway state: warms NumPy dispatch and caches
+        pipeline.run_batch(
+            make_store("memory"), self.scenario, ClimateAgent(), ["warm-up"],
+            np.array([40.0]), np.array([25.0]), np.array([2500.0]),
+            policies=self.policies
+        )
+
+        self.invocations = 0
+        self.readings = 0
+        self.build_ms = round((time.perf_counter() - started) * 1000, 3)
+        self._policy_checked = time.monotonic()
+
+    def columns(self, readings: list) -> dict:
+        """
+        Readings → run_batch columns. ValueError on a bad reading (sensors,
+        device_id, location, profile): evaluate() applies nothing that
+        could still fail.
+        """
+        if not all(isinstance(reading, dict) for reading in readings):
+            raise ValueError("readings must be JSON objects")
+        for reading in readings:
+            if not isinstance(reading.get("profile", ""), (str, type(None))):
+                raise ValueError("profile must be a string")
+        return self.pipeline.readings_to_columns(readings)
+
+    def evaluate(self, readings: list, columns: dict = None) -> dict:
+        columns = columns or self.columns(readings)
+        self._check_policies()
+        self.invocations += 1
+        if not readings:
+            return {"status": "ok", "count": 0, "results": [], "impact_metrics": self.store.impact_totals()}
+
+        self.climate.locate_readings(readings)
+        self.policies.assign_profiles(readings)
+        result = self.pipeline.run_batch(
+            self.store, self.scenario, self.climate, columns["device_ids"],
+            columns["soil"], columns["temp"], columns["light"],
+            features=self.features,
+            policies=self.policies
+        )
+        self.readings += len(readings)
+        return {
+            "status": "ok",
+            "count": len(readings),
+            "results": self.pipeline.batch_results(columns["device_ids"], result),
+            "impact_metrics": result["impact"]
+        }
+
+    def _check_policies(self):
+        if self.policies.path and time.monotonic() - self._policy_checked >= POLICY_CHECK_SEC:
+            self._policy_checked = time.monotonic()
+            self.policies.reload_if_changed()
+
+    def stats(self) -> dict:
+        return {
+            "build_ms": self.build_ms,
+            "invocations": self.invocations,
+            "readings": self.readings,
+            "devices": len(self.store),
+            "policy": self.policies.stats()
+        }
+
+
+def engine() -> Engine:
+    """This container's engine (built by the first call)."""
+    global _ENGINE
+    if _ENGINE is None:
+        _ENGINE = Engine()
+    return _ENGINE
+
+
+# ==================================================
+# 📨 EVENT SHAPES
+# ==================================================
+def readings_of(payload) -> list:
+    """One reading, {"readings": [...]} or a bare list → list of readings."""
+    if isinstance(payload, dict) and "readings" in payload:
+        readings = payload["readings"]
+    elif isinstance(payload, dict):
+        readings = [payload]
+    else:
+        readings = payload
+    if not isinstance(readings, list):
+        raise ValueError('expected a reading or {"readings": [...]}')
+    return readings
+
+
+def _http_reply(status: int, payload: dict) -> dict:
+    return {
+        "statusCode": status,
+        "headers": {"Content-Type": "application/json", "Access-Control-Allow-Origin": "*"},
+        "body": json.dumps(payload)
+    }
+
+
+def _handle_http(event: dict) -> dict:
+    body = event.get("body") or "{}"
+    try:
+        if event.get("isBase64Encoded"):
+            body = base64.b64decode(body)
+        readings = readings_of(json.loads(body))
+        columns = engine().columns(readings)
+    except (ValueError, TypeError) as e:
+        return _http_reply(400, {"status": "error", "error": str(e)})
+    return _http_reply(200, engine().evaluate(readings, columns))
+
+
+def _handle_records(records: list) -> dict:
+    """
+    Queue / stream batch: every valid record in one pass; invalid ones
+    are reported for redelivery (partial batch response).
+    """
+    current = engine()
+    readings, parts, failures = [], [], []
+    for record in records:
+        identifier = None
+        try:
+            if "kinesis" in record:
+                identifier = record["kinesis"].get("sequenceNumber")
+                body = base64.b64decode(record["kinesis"].get("data", ""))
+            else:
+                identifier = record.get("messageId")
+                body = record.get("body", "")
+            batch = readings_of(json.loads(body))
+            parts.append(current.columns(batch))
+        except (ValueError, TypeError, AttributeError):
+            failures.append({"itemIdentifier": identifier})
+            continue
+        readings.extend(batch)
+
+    np = current.np
+    columns = {
+        "device_ids": [device_id for part in parts for device_id in part["device_ids"]],
+        **{
+            name: np.concatenate([part[name] for part in parts]) if parts else np.empty(0)
+            for name in ("soil", "temp", "light")
+        }
+    }
+    return {**current.evaluate(readings, columns), "batchItemFailures": failures}
+
+
+# ==================================================
+# 🚀 ENTRYPOINT
+# ==================================================
+def handler(event, context=None) -> dict:
+    """Lambda entry point (configure as serverless.handler)."""
+    if isinstance(event, dict) and "Records" in event:
+        return _handle_records(event["Records"])
+    if isinstance(event, dict) and "body" in event:
+        return _handle_http(event)
+    try:
+        readings = readings_of(event)
+        columns = engine().columns(readings)
+    except (ValueError, TypeError) as e:
+        return {"status": "error", "error": str(e)}
+    return engine().evaluate(readings, columns)
+
+
+if os.environ.get("AGRI_SERVERLESS_PRELOAD") == "1":
+    engine()
@@ -0,0 +1,1059 @@
+"""
+AgriAgents - Sharded Deployment
+One front router, N server.py worker processes; each worker owns the
+devices that consistent-hash to it.
+
+server.py keeps DEVICES, SCENARIO, the timeline and the feature windows
+as process globals, so one process is one core. Sharding on device_id
+keeps every per-device read-modify-write inside one worker (no shared
+state, no cross-process locks), so ingest scales with worker processes.
+
+  client ──► router (asyncio, this file)
+               │  HashRing: device_id → shard (VNODES points per shard)
+               ├──► shard-0   server.py on 127.0.0.1:5100
+               ├──► shard-1   server.py on 127.0.0.1:5101
+               └──► ...
+
+Routing:
+  POST /data            owner shard; body and reply forwarded untouched
+  POST /data/batch      readings split per shard, sent concurrently,
+                        results merged back into request order
+  POST /data/binary     frames split per shard (header walk, no decode)
+  POST /data/backfill   read in chunks, each chunk split per shard
+  POST /scenario        broadcast to every shard
+  POST /policy          broadcast (also /policy/reload); published
+                        updates are replayed to shards added later
+  POST /faults/clear    device_id → owner shard; otherwise broadcast,
+                        cleared counts summed
+  GET  /state           agents from the owner shard; impact totals and
+                        device count summed over every shard
+  GET  /timeline        device_id=… → owner shard; fleet view merged from
+                        every shard's ring, router-assigned seqs
+  GET  /impact/rollups  scope=device → owner shard; fleet / field buckets
+                        summed over every shard
+  GET  /shards          ring membership + per-shard summaries
+  POST /shards          {"add": true} | {"remove": "shard-2"} → rebalance
+  other GETs            scatter-gather: {"shards": {name: reply}}
+  UDP (--udp-port)      each datagram forwarded to its owner's listener
+
+Rebalancing (shard added or removed):
+  ingest is paused and drained, every shard lists its devices, and each
+  device whose owner changes is exported (device record, climate tile,
+  seq window, device rollups, policy profile), imported by its new owner
+  and then dropped at the old one. Virtual nodes keep the move to ~1/N of the fleet. Feature windows,
+  fault baselines and per-device timeline history are not handed over
+  (the old shard forgets them, the new one starts them fresh).
+
+Usage:
+    python sharding.py --workers 4 --port 5000
+"""
+
+import argparse
+import asyncio
+import bisect
+import contextlib
+import hashlib
+import json
+import os
+import re
+import signal
+import subprocess
+import sys
+import time
+from collections import Counter, deque
+from urllib.parse import parse_qs, urlencode
+
+from impact_rollup import merge_series
+from observability import render_gauges
+from pipeline import DEFAULT_DEVICE_ID, readings_to_columns
+from response import MIN_MIMETYPE
+from telemetry_frame import FRAME_MAGIC, FRAME_VERSION, HEADER, RECORD_DTYPE, FrameError, device_name
+
+VNODES = 64                 # ring points per shard
+WORKER_PORT = 5100          # shard-i listens on WORKER_PORT + i
+UDP_PORT_OFFSET = 1000      # shard UDP listener = its HTTP port + offset
+ROUTER_READ_BYTES = 65536   # /data/backfill bytes split per round
+HANDOVER_CHUNK = 1000       # devices per export/import request
+FLEET_TIMELINE_LENGTH = 30  # same as server.MAX_TIMELINE_LENGTH
+WORKER_START_SEC = 30.0
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+STATUS_TEXT = {
+    200: "OK",
+    204: "No Content",
+    400: "Bad Request",
+    404: "Not Found",
+    502: "Bad Gateway"
+}
+
+# device_id without a JSON parse (falls back to json.loads on no match)
+DEVICE_ID_RE = re.compile(rb'"device_id"\s*:\s*"([^"\\]*)"')
+
+# Count fields of /data/binary and /data/backfill replies (summed on merge)
+COUNT_KEYS = ("count", "readings", "live", "replayed", "duplicate", "too_old", "untimed")
+
+
+# ==================================================
+# 💍 CONSISTENT HASH RING
+# ==================================================
+def _hash(key: str) -> int:
+    # Stable across processes and restarts (unlike hash())
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """
+    Each node owns vnodes points on a 64-bit ring; a key belongs to the
+    first point at or after its hash. Adding or removing a node only
+    moves the keys of that node's points.
+    """
+
+    def __init__(self, nodes=(), vnodes: int = VNODES):
+        self.vnodes = vnodes
+        self.nodes = []
+        self._points = []
+        self._owners = []
+        for node in nodes:
+            self.add(node)
+
+    def add(self, node: str):
+        if node not in self.nodes:
+            self.nodes.append(node)
+            self._build()
+
+    def remove(self, node: str):
+        if node in self.nodes:
+            self.nodes.remove(node)
+            self._build()
+
+    def _build(self):
+        points = sorted((_hash(f"{node}#{i}"), node) for node in self.nodes for i in range(self.vnodes))
+        self._points = [point for point, _ in points]
+        self._owners = [node for _, node in points]
+
+    def node_for(self, key) -> str:
+        i = bisect.bisect_left(self._points, _hash(str(key)))
+        return self._owners[i % len(self._owners)]
+
+    def __len__(self):
+        return len(self.nodes)
+
+
+def split_frames(buf) -> tuple:
+    """
+    Header walk over concatenated frames → ([(device, start, end), ...],
+    bytes consumed). Stops before a trailing partial frame; FrameError on
+    a bad header.
+    """
+    spans, pos, size = [], 0, len(buf)
+    while size - pos >= HEADER.size:
+        magic, version, count, device = HEADER.unpack_from(buf, pos)
+        if magic != FRAME_MAGIC or version != FRAME_VERSION or not count:
+            raise FrameError(f"bad frame header at byte {pos}")
+        end = pos + HEADER.size + count * RECORD_DTYPE.itemsize
+        if end > size:
+            break
+        spans.append((device, pos, end))
+        pos = end
+    return spans, pos
+
+
+# ==================================================
+# 🔌 SHARD CONNECTIONS
+# ==================================================
+class ShardConnection:
+    """One keep-alive HTTP/1.1 connection to a shard."""
+
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.reader = self.writer = None
+
+    async def request(self, method: str, path: str, body: bytes, content_type: str) -> tuple:
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+            return await self._exchange(method, path, body, content_type)
+        try:
+            return await self._exchange(method, path, body, content_type)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            # Stale keep-alive socket: retry once on a fresh connection
+            self.close()
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+            return await self._exchange(method, path, body, content_type)
+
+    async def _exchange(self, method, path, body, content_type) -> tuple:
+        self.writer.write(
+            f"{method} {path} HTTP/1.1\r\n"
+            f"Host: {self.host}:{self.port}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: keep-alive\r\n\r\n".encode() + body
+        )
+        await self.writer.drain()
+
+        head = await self.reader.readuntil(b"\r\n\r\n")
+        lines = head.decode("latin-1").split("\r\n")
+        status = int(lines[0].split()[1])
+        headers = {}
+        for line in lines[1:]:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        if "content-length" in headers:
+            data = await self.reader.readexactly(int(headers["content-length"]))
+        else:
+            data = await self.reader.read()
+            headers["connection"] = "close"
+
+        if headers.get("connection", "").lower() == "close" or lines[0].startswith("HTTP/1.0"):
+            self.close()
+        return status, headers.get("content-type", "application/json"), data
+
+
+class ShardClient:
+    """Pool of keep-alive connections to one shard (opened lazily)."""
+
+    def __init__(self, host: str, port: int, size: int = 32):
+        self._idle = asyncio.Queue()
+        for _ in range(size):
+            self._idle.put_nowait(ShardConnection(host, port))
+
+    async def request(self, method: str, path: str, body: bytes = b"",
+                      content_type: str = "application/json") -> tuple:
+        """(status, content type, body bytes)"""
+        conn = await self._idle.get()
+        try:
+            return await conn.request(method, path, body, content_type)
+        except BaseException:
+            conn.close()
+            raise
+        finally:
+            self._idle.put_nowait(conn)
+
+    async def json(self, method: str, path: str, payload=None) -> tuple:
+        """(status, decoded JSON reply)"""
+        body = json.dumps(payload).encode() if payload is not None else b""
+        status, _, data = await self.request(method, path, body)
+        return status, json.loads(data)
+
+    def close(self):
+        while not self._idle.empty():
+            self._idle.get_nowait().close()
+
+
+# ==================================================
+# 🧩 SHARD PROCESSES
+# ==================================================
+class Shard:
+    """One server.py worker process and the router's pool to it."""
+
+    def __init__(self, name: str, port: int):
+        self.name = name
+        self.port = port
+        self.process = None
+        self.client = ShardClient("127.0.0.1", port)
+
+    def start(self, ring_nodes: list, log_root: str = None, udp: bool = False):
+        env = dict(os.environ, AGRI_SHARD_NAME=self.name, AGRI_SHARD_RING=",".join(ring_nodes))
+        # Per-shard durable log / SQLite file / UDP port: nothing is shared
+        env.pop("AGRI_LOG_DIR", None)
+        env.pop("AGRI_UDP_PORT", None)
+        if log_root:
+            env["AGRI_LOG_DIR"] = os.path.join(log_root, self.name)
+        if udp:
+            env["AGRI_UDP_PORT"] = str(self.port + UDP_PORT_OFFSET)
+        if env.get("AGRI_STATE_BACKEND") == "sqlite":
+            root, ext = os.path.splitext(env.get("AGRI_STATE_DB", "device_state.db"))
+            env["AGRI_STATE_DB"] = f"{root}.{self.name}{ext}"
+
+        self.process = subprocess.Popen(
+            [sys.executable, os.path.join(HERE, "sharding.py"), "--serve-shard", str(self.port)],
+            env=env,
+            cwd=HERE
+        )
+
+    async def wait_ready(self, timeout: float = WORKER_START_SEC):
+        deadline = time.monotonic() + timeout
+        while True:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"{self.name} exited with code {self.process.returncode}")
+            try:
+                status, _ = await self.client.json("GET", "/shard/summary")
+                if status == 200:
+                    return
+            except (OSError, asyncio.IncompleteReadError):
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"{self.name} did not start within {timeout:.0f} s")
+            await asyncio.sleep(0.1)
+
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    def stop(self):
+        self.client.close()
+        if self.alive:
+            # SIGINT: clean interpreter exit, buffered log records get written
+            self.process.send_signal(signal.SIGINT)
+            try:
+                self.process.wait(5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+
+def run_shard(port: int):
+    """Worker process body: server.py's Flask app on 127.0.0.1:port."""
+    import logging
+    from werkzeug.serving import WSGIRequestHandler
+
+    # Keep-alive to the router, no per-request access log
+    WSGIRequestHandler.protocol_version = "HTTP/1.1"
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+
+    import server
+    server.app.run(host="127.0.0.1", port=port, threaded=True)
+
+
+# ==================================================
+# 📡 UDP FORWARDING
+# ==================================================
+class UDPForwarder(asyncio.DatagramProtocol):
+    """
+    Reads the frame header only and relays the datagram to its owner's
+    UDP listener. Datagrams arriving during a rebalance are held (up to
+    max_held) and relayed once the new ring is live.
+    """
+
+    def __init__(self, router, max_held: int = 10000):
+        self.router = router
+        self.max_held = max_held
+        self.transport = None
+        self.held = []
+        self.forwarded = 0
+        self.malformed = 0
+        self.dropped = 0
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        if len(data) < HEADER.size:
+            self.malformed += 1
+            return
+        magic, version, _, device = HEADER.unpack_from(data)
+        if magic != FRAME_MAGIC or version != FRAME_VERSION:
+            self.malformed += 1
+            return
+        if self.router.paused:
+            if len(self.held) < self.max_held:
+                self.held.append((device, data))
+            else:
+                self.dropped += 1
+            return
+        self._send(device, data)
+
+    def _send(self, device: int, data: bytes):
+        shard = self.router.shard_for(device_name(device))
+        self.transport.sendto(data, ("127.0.0.1", shard.port + UDP_PORT_OFFSET))
+        self.forwarded += 1
+
+    def release(self):
+        held, self.held = self.held, []
+        for device, data in held:
+            self._send(device, data)
+
+    def stats(self) -> dict:
+        return {
+            "forwarded": self.forwarded,
+            "malformed": self.malformed,
+            "held": len(self.held),
+            "dropped": self.dropped
+        }
+
+
+# ==================================================
+# 🔀 ROUTER
+# ==================================================
+class ShardRouter:
+
+    def __init__(self, worker_port: int = WORKER_PORT, vnodes: int = VNODES, log_root: str = None,
+                 udp_port: int = None):
+        self.worker_port = worker_port
+        self.log_root = log_root
+        self.udp_port = udp_port
+        self.ring = HashRing(vnodes=vnodes)
+        self.shards = {}          # name → Shard (ring members + one being added)
+        self.next_index = 0
+        self.latest_device = None
+        self.scenario_body = None  # last /scenario, replayed to new shards
+        self.policy_bodies = []    # every accepted POST /policy, in order
+        self.impact = {}          # name → latest impact totals reported
+        self.udp = None
+
+        # Fleet timeline merged from the shards' rings
+        self._timeline = deque(maxlen=FLEET_TIMELINE_LENGTH)
+        self._timeline_seq = 0
+        self._shard_cursors = {}
+        self._timeline_lock = asyncio.Lock()
+
+        # Rebalance gate: ingest waits while closed, handover waits for in-flight
+        self._open = asyncio.Event()
+        self._open.set()
+        self._drained = asyncio.Event()
+        self._inflight = 0
+        self._rebalance_lock = asyncio.Lock()
+
+        self.requests = 0
+        self.moved_devices = 0
+        self.rebalances = 0
+
+    # ------------------------------
+    # Ownership
+    # ------------------------------
+    def shard_for(self, device_id) -> Shard:
+        return self.shards[self.ring.node_for(device_id)]
+
+    @property
+    def paused(self) -> bool:
+        return not self._open.is_set()
+
+    @contextlib.asynccontextmanager
+    async def _ingest(self):
+        while not self._open.is_set():
+            await self._open.wait()
+        self._inflight += 1
+        try:
+            yield
+        finally:
+            self._inflight -= 1
+            if not self._inflight:
+                self._drained.set()
+
+    async def _pause(self):
+        self._open.clear()
+        while self._inflight:
+            self._drained.clear()
+            await self._drained.wait()
+
+    def _resume(self):
+        self._open.set()
+        if self.udp:
+            self.udp.release()
+
+    # ------------------------------
+    # Membership
+    # ------------------------------
+    def _ring_file(self):
+        return os.path.join(self.log_root, "ring.json") if self.log_root else None
+
+    def _save_ring(self):
+        path = self._ring_file()
+        if path:
+            with open(path + ".tmp", "w") as f:
+                json.dump({"nodes": self.ring.nodes, "next_index": self.next_index}, f)
+            os.replace(path + ".tmp", path)
+
+    def _new_shard(self) -> Shard:
+        name = f"shard-{self.next_index}"
+        shard = Shard(name, self.worker_port + self.next_index)
+        self.next_index += 1
+        return shard
+
+    async def start(self, workers: int):
+        """Start workers shards, or the saved ring under log_root."""
+        path = self._ring_file()
+        if path and os.path.exists(path):
+            with open(path) as f:
+                saved = json.load(f)
+            names = saved["nodes"]
+            self.next_index = saved["next_index"]
+        else:
+            names = [f"shard-{i}" for i in range(workers)]
+            self.next_index = workers
+        if self.log_root:
+            os.makedirs(self.log_root, exist_ok=True)
+
+        for name in names:
+            self.shards[name] = Shard(name, self.worker_port + int(name.rsplit("-", 1)[1]))
+            self.ring.add(name)
+        for shard in self.shards.values():
+            shard.start(names, self.log_root, udp=self.udp_port is not None)
+        await asyncio.gather(*(shard.wait_ready() for shard in self.shards.values()))
+        self._save_ring()
+        await self._summaries()
+
+    async def add_shard(self) -> str:
+        async with self._rebalance_lock:
+            shard = self._new_shard()
+            shard.start(self.ring.nodes + [shard.name], self.log_root, udp=self.udp_port is not None)
+            try:
+                await shard.wait_ready()
+            except RuntimeError:
+                shard.stop()
+                raise
+            # Registered before the scenario / policy replay so a
+            # concurrent broadcast reaches it too
+            self.shards[shard.name] = shard
+            if self.scenario_body is not None:
+                await shard.client.request("POST", "/scenario", self.scenario_body)
+            for body in list(self.policy_bodies):
+                await shard.client.request("POST", "/policy", body)
+            await self._rebalance(self.ring.nodes + [shard.name])
+            return shard.name
+
+    async def remove_shard(self, name: str):
+        async with self._rebalance_lock:
+            if name not in self.ring.nodes:
+                raise KeyError(name)
+            if len(self.ring) == 1:
+                raise ValueError("cannot remove the last shard")
+            await self._rebalance([node for node in self.ring.nodes if node != name])
+            self.shards.pop(name).stop()
+            self.impact.pop(name, None)
+            self._shard_cursors.pop(name, None)
+
+    async def _rebalance(self, nodes: list):
+        """Hand every device whose owner changes to its new shard, then switch rings."""
+        ring = HashRing(nodes, self.ring.vnodes)
+        await self._pause()
+        try:
+            listings = await asyncio.gather(*(
+                self.shards[name].client.json("GET", "/shard/devices") for name in self.ring.nodes
+            ))
+            moves = {}   # (source, target) → device ids
+            for name, (_, listing) in zip(self.ring.nodes, listings):
+                for device_id in listing["device_ids"]:
+                    owner = ring.node_for(device_id)
+                    if owner != name:
+                        moves.setdefault((name, owner), []).append(device_id)
+
+            imported = []
+            try:
+                for (source, target), device_ids in moves.items():
+                    for i in range(0, len(device_ids), HANDOVER_CHUNK):
+                        chunk = device_ids[i:i + HANDOVER_CHUNK]
+                        _, snapshot = await self.shards[source].client.json(
+                            "POST", "/shard/export", {"device_ids": chunk}
+                        )
+                        status, reply = await self.shards[target].client.json("POST", "/shard/import", snapshot)
+                        if status != 200:
+                            raise RuntimeError(f"{target} rejected handover: {reply}")
+                        imported.append((target, chunk))
+            except BaseException:
+                # Old ring stays authoritative: undo partial imports
+                for target, chunk in imported:
+                    await self.shards[target].client.json("POST", "/shard/drop", {"device_ids": chunk})
+                raise
+
+            self.ring = ring
+            for (source, _), device_ids in moves.items():
+                for i in range(0, len(device_ids), HANDOVER_CHUNK):
+                    await self.shards[source].client.json(
+                        "POST", "/shard/drop", {"device_ids": device_ids[i:i + HANDOVER_CHUNK]}
+                    )
+                self.moved_devices += len(device_ids)
+            self.rebalances += 1
+            self._save_ring()
+        finally:
+            self._resume()
+        await self._summaries()
+
+    def stop(self):
+        for shard in self.shards.values():
+            shard.stop()
+
+    # ------------------------------
+    # Scatter-gather helpers
+    # ------------------------------
+    async def _summaries(self) -> dict:
+        names = list(self.ring.nodes)
+        replies = await asyncio.gather(*(self.shards[name].client.json("GET", "/shard/summary") for name in names))
+        summaries = {name: reply for name, (_, reply) in zip(names, replies)}
+        for name, summary in summaries.items():
+            self.impact[name] = summary["impact_metrics"]
+        return summaries
+
+    def _impact_totals(self) -> dict:
+        impact = [self.impact[name] for name in self.ring.nodes if name in self.impact]
+        return {
+            "water_saved_liters": sum(i["water_saved_liters"] for i in impact),
+            "pump_cycles_avoided": sum(i["pump_cycles_avoided"] for i in impact)
+        }
+
+    def _merge_counts(self, groups: list, replies: list) -> tuple:
+        """Sum count fields of per-shard replies; first non-200 status wins."""
+        status, counts, error = 200, Counter(), None
+        for name, (shard_status, _, data) in zip(groups, replies):
+            reply = json.loads(data)
+            if "impact_metrics" in reply:
+                self.impact[name] = reply["impact_metrics"]
+            counts.update({key: reply[key] for key in COUNT_KEYS if key in reply})
+            if shard_status != 200 and status == 200:
+                status, error = shard_status, reply.get("error")
+        return status, counts, error
+
+    # ------------------------------
+    # Ingest routes
+    # ------------------------------
+    async def handle_data(self, body: bytes, query: dict, accept: str) -> tuple:
+        match = DEVICE_ID_RE.search(body)
+        if match:
+            device_id = match.group(1).decode()
+        else:
+            try:
+                device_id = json.loads(body).get("device_id", DEFAULT_DEVICE_ID)
+            except (ValueError, AttributeError):
+                return _json(400, {"status": "error", "error": "invalid JSON"})
+
+        # Reply shape (response.py) travels as ?reply=, Accept is not forwarded
+        if "reply" not in query and MIN_MIMETYPE in accept:
+            query = {**query, "reply": "min"}
+        path = "/data?" + urlencode(query) if query else "/data"
+
+        async with self._ingest():
+            reply = await self.shard_for(device_id).client.request("POST", path, body)
+        self.latest_device = device_id
+        return reply
+
+    async def handle_batch(self, body: bytes) -> tuple:
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            return _json(400, {"status": "error", "error": "invalid JSON"})
+        # Validated whole before any shard applies its part, like server.py
+        readings = payload.get("readings", []) if isinstance(payload, dict) else None
+        try:
+            if not isinstance(readings, list):
+                raise ValueError('expected {"readings": [...]}')
+            device_ids = readings_to_columns(readings)["device_ids"]
+        except ValueError as e:
+            return _json(400, {"status": "error", "error": str(e)})
+
+        async with self._ingest():
+            groups = {}
+            for i, device_id in enumerate(device_ids):
+                groups.setdefault(self.ring.node_for(device_id), []).append(i)
+            replies = await asyncio.gather(*(
+                self.shards[name].client.json("POST", "/data/batch", {"readings": [readings[i] for i in rows]})
+                for name, rows in groups.items()
+            ))
+
+        results = [None] * len(readings)
+        for (name, rows), (status, reply) in zip(groups.items(), replies):
+            if status != 200:
+                return _json(status, reply)
+            self.impact[name] = reply["impact_metrics"]
+            for i, result in zip(rows, reply["results"]):
+                results[i] = result
+
+        return _json(200, {
+            "status": "ok",
+            "count": len(readings),
+            "results": results,
+            "impact_metrics": self._impact_totals()
+        })
+
+    async def handle_binary(self, body: bytes) -> tuple:
+        try:
+            spans, end = split_frames(body)
+            if end != len(body):
+                raise FrameError(f"truncated frame at byte {end}")
+        except FrameError as e:
+            return _json(400, {"status": "error", "error": str(e)})
+
+        async with self._ingest():
+            parts = self._group_frames(body, spans)
+            replies = await asyncio.gather(*(
+                self.shards[name].client.request("POST", "/data/binary", b"".join(chunks), "application/octet-stream")
+                for name, chunks in parts.items()
+            ))
+
+        status, counts, error = self._merge_counts(list(parts), replies)
+        return _json(status, {
+            "status": "ok" if status == 200 else "error",
+            **({"error": error} if error else {}),
+            "count": counts.pop("count", 0),
+            **counts,
+            "impact_metrics": self._impact_totals()
+        })
+
+    def _group_frames(self, buf, spans) -> dict:
+        view = memoryview(buf)
+        parts = {}
+        for device, start, end in spans:
+            parts.setdefault(self.ring.node_for(device_name(device)), []).append(view[start:end])
+        return parts
+
+    def _group_lines(self, buf: bytes) -> dict:
+        parts = {}
+        for line in buf.splitlines(keepends=True):
+            if not line.strip():
+                continue
+            match = DEVICE_ID_RE.search(line)
+            device_id = match.group(1).decode() if match else json.loads(line).get("device_id", DEFAULT_DEVICE_ID)
+            parts.setdefault(self.ring.node_for(device_id), []).append(line)
+        return parts
+
+    async def handle_backfill(self, reader, length: int, content_type: str) -> tuple:
+        """Streamed like server.py's /data/backfill: split and forward per chunk."""
+        ndjson = content_type.split(";")[0].strip() == "application/x-ndjson"
+        totals, status, error = Counter(), 200, None
+        pending, remaining = b"", length
+
+        while remaining:
+            chunk = await reader.readexactly(min(ROUTER_READ_BYTES, remaining))
+            remaining -= len(chunk)
+            buf = pending + chunk
+
+            try:
+                if ndjson:
+                    cut = len(buf) if not remaining else buf.rfind(b"\n") + 1
+                else:
+                    spans, cut = split_frames(buf)
+                    if not remaining and cut != len(buf):
+                        raise FrameError(f"stream ends inside a frame ({len(buf) - cut} bytes left)")
+                pending = buf[cut:]
+                if not cut:
+                    continue
+
+                async with self._ingest():
+                    parts = self._group_lines(buf[:cut]) if ndjson else self._group_frames(buf, spans)
+                    replies = await asyncio.gather(*(
+                        self.shards[name].client.request("POST", "/data/backfill", b"".join(lines), content_type)
+                        for name, lines in parts.items()
+                    ))
+            except (FrameError, ValueError, AttributeError) as e:
+                status, error = 400, str(e)
+            else:
+                status, counts, error = self._merge_counts(list(parts), replies)
+                totals.update(counts)
+
+            if status != 200:
+                # Keep the connection usable: discard the rest of the body
+                while remaining:
+                    remaining -= len(await reader.readexactly(min(ROUTER_READ_BYTES, remaining)))
+                break
+
+        reply = {"status": "ok"} if status == 200 else {"status": "error", "error": error}
+        return _json(status, {**reply, **totals, "impact_metrics": self._impact_totals()})
+
+    async def handle_scenario(self, body: bytes) -> tuple:
+        async with self._ingest():
+            replies = await asyncio.gather(*(
+                shard.client.request("POST", "/scenario", body) for shard in list(self.shards.values())
+            ))
+        if all(status == 200 for status, _, _ in replies):
+            self.scenario_body = body
+        await self._summaries()
+        return replies[0]
+
+    async def handle_policy(self, path: str, body: bytes) -> tuple:
+        """Same publish / reload on every shard, so versions stay in step."""
+        async with self._ingest():
+            replies = await asyncio.gather(*(
+                shard.client.request("POST", path, body) for shard in list(self.shards.values())
+            ))
+        if path == "/policy" and all(status == 200 for status, _, _ in replies):
+            self.policy_bodies.append(body)
+        return next((reply for reply in replies if reply[0] != 200), replies[0])
+
+    async def handle_faults_clear(self, body: bytes) -> tuple:
+        """Fault acknowledgements: the owner shard, or every shard for the fleet."""
+        try:
+            device_id = json.loads(body or b"{}").get("device_id")
+        except (ValueError, AttributeError):
+            return _json(400, {"status": "error", "error": "invalid JSON"})
+        if device_id is not None:
+            return await self.shard_for(device_id).client.request("POST", "/faults/clear", body)
+        replies = await asyncio.gather(*(
+            shard.client.json("POST", "/faults/clear", {}) for shard in list(self.shards.values())
+        ))
+        return _json(200, {"status": "ok", "cleared": sum(reply.get("cleared", 0) for _, reply in replies)})
+
+    # ------------------------------
+    # Fleet reads
+    # ------------------------------
+    async def handle_state(self, query: dict) -> tuple:
+        summaries = await self._summaries()
+        device_id = query.get("device_id", self.latest_device)
+        if device_id is None:
+            device_id = next((s["latest_device"] for s in summaries.values() if s["latest_device"]), None)
+
+        if device_id is None:
+            status, reply = await self.shards[self.ring.nodes[0]].client.json("GET", "/state")
+        else:
+            status, reply = await self.shard_for(device_id).client.json(
+                "GET", "/state?" + urlencode({"device_id": device_id})
+            )
+        reply["impact_metrics"] = self._impact_totals()
+        reply["devices"] = sum(s["devices"] for s in summaries.values())
+        return _json(status, reply)
+
+    async def handle_timeline(self, query: dict) -> tuple:
+        device_id = query.get("device_id")
+        if device_id is not None:
+            return await self.shard_for(device_id).client.request(
+                "GET", "/timeline?" + urlencode(query)
+            )
+
+        async with self._timeline_lock:
+            names = list(self.ring.nodes)
+            replies = await asyncio.gather(*(self._pull_timeline(name) for name in names))
+            fresh = [entry for entries in replies for entry in entries]
+            fresh.sort(key=lambda entry: entry["timestamp"])
+            for entry in fresh:
+                self._timeline_seq += 1
+                entry["seq"] = self._timeline_seq
+                self._timeline.append(entry)
+            entries, cursor = list(self._timeline), self._timeline_seq
+
+        since, limit = _int_arg(query, "since"), _int_arg(query, "limit")
+        if since is not None:
+            entries = [entry for entry in entries if entry["seq"] > since]
+        if limit is not None and limit >= 0:
+            entries = entries[len(entries) - min(limit, len(entries)):]
+        return _json(200, {"timeline": entries, "cursor": cursor})
+
+    async def _pull_timeline(self, name: str) -> list:
+        """Entries a shard appended since the last pull."""
+        client = self.shards[name].client
+        since = self._shard_cursors.get(name, 0)
+        _, reply = await client.json("GET", f"/timeline?since={since}")
+        if reply["cursor"] < since:
+            # Shard restarted: its seqs start over
+            _, reply = await client.json("GET", "/timeline")
+        self._shard_cursors[name] = reply["cursor"]
+        return reply["timeline"]
+
+    async def handle_rollups(self, query: dict) -> tuple:
+        if query.get("scope") == "device" and query.get("key") is not None:
+            return await self.shard_for(query["key"]).client.request(
+                "GET", "/impact/rollups?" + urlencode(query)
+            )
+
+        # Pin the range so every shard returns the same buckets
+        query = dict(query)
+        query.setdefault("end", str(time.time()))
+        target = "/impact/rollups?" + urlencode(query)
+        names = list(self.ring.nodes)
+        replies = await asyncio.gather(*(self.shards[name].client.request("GET", target) for name in names))
+        for status, _, data in replies:
+            if status != 200:
+                return status, "application/json", data
+        return _json(200, merge_series([json.loads(data) for _, _, data in replies]))
+
+    async def handle_shards(self) -> tuple:
+        summaries = await self._summaries()
+        return _json(200, {
+            "ring": {"nodes": self.ring.nodes, "vnodes": self.ring.vnodes},
+            "shards": {
+                name: {"port": shard.port, "pid": shard.process.pid, "alive": shard.alive, **summaries.get(name, {})}
+                for name, shard in self.shards.items()
+            },
+            **self.stats()
+        })
+
+    async def handle_shards_change(self, body: bytes) -> tuple:
+        try:
+            payload = json.loads(body or b"{}")
+            if payload.get("remove"):
+                await self.remove_shard(payload["remove"])
+            elif payload.get("add"):
+                await self.add_shard()
+        except (ValueError, AttributeError, KeyError) as e:
+            return _json(400, {"status": "error", "error": str(e) or "invalid request"})
+        except (RuntimeError, OSError) as e:
+            return _json(502, {"status": "error", "error": str(e)})
+        return await self.handle_shards()
+
+    async def scatter_get(self, path: str, query: dict) -> tuple:
+        """Any other GET: every shard's reply, keyed by shard."""
+        target = path + ("?" + urlencode(query) if query else "")
+        names = list(self.ring.nodes)
+        replies = await asyncio.gather(*(self.shards[name].client.request("GET", target) for name in names))
+        if all(status == 404 for status, _, _ in replies):
+            return _json(404, {"status": "error", "error": "not found"})
+        return _json(200, {"shards": {
+            name: json.loads(data) if content_type.startswith("application/json") else data.decode()
+            for name, (_, content_type, data) in zip(names, replies)
+        }})
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "inflight": self._inflight,
+            "moved_devices": self.moved_devices,
+            "rebalances": self.rebalances,
+            **({"udp": self.udp.stats()} if self.udp else {})
+        }
+
+    async def route(self, method: str, path: str, query: dict, body: bytes, headers: dict) -> tuple:
+        if method == "POST":
+            if path == "/data":
+                return await self.handle_data(body, query, headers.get("accept", ""))
+            if path == "/data/batch":
+                return await self.handle_batch(body)
+            if path == "/data/binary":
+                return await self.handle_binary(body)
+            if path == "/scenario":
+                return await self.handle_scenario(body)
+            if path in ("/policy", "/policy/reload"):
+                return await self.handle_policy(path, body)
+            if path == "/faults/clear":
+                return await self.handle_faults_clear(body)
+            if path == "/shards":
+                return await self.handle_shards_change(body)
+            return _json(404, {"status": "error", "error": "not found"})
+
+        if method == "GET":
+            if path == "/state":
+                return await self.handle_state(query)
+            if path == "/timeline":
+                return await self.handle_timeline(query)
+            if path == "/impact/rollups":
+                return await self.handle_rollups(query)
+            if path == "/shards":
+                return await self.handle_shards()
+            if path == "/metrics":
+                # Router gauges only; shards are scraped on their own ports
+                body = render_gauges("agri_router", {"shards": len(self.ring), **self.stats()})
+                return 200, "text/plain; version=0.0.4", body.encode()
+            if path == "/stream":
+                # Fleet events live in the shards: dashboards fall back to polling
+                return _json(404, {"status": "error", "error": "no live stream in sharded mode; poll /timeline"})
+            return await self.scatter_get(path, query)
+
+        return _json(404, {"status": "error", "error": "not found"})
+
+    # ------------------------------
+    # Minimal HTTP/1.1 (keep-alive)
+    # ------------------------------
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+
+                method, target, version = request_line.decode("latin-1").split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                path, _, query_string = target.partition("?")
+                query = {key: values[-1] for key, values in parse_qs(query_string).items()}
+                length = int(headers.get("content-length", 0))
+                self.requests += 1
+
+                if method == "OPTIONS":
+                    # CORS preflight (dashboards POST JSON to /scenario)
+                    status, content_type, data = 204, "text/plain", b""
+                elif method == "POST" and path == "/data/backfill":
+                    status, content_type, data = await self.handle_backfill(
+                        reader, length, headers.get("content-type", "application/octet-stream")
+                    )
+                else:
+                    body = await reader.readexactly(length) if length else b""
+                    try:
+                        status, content_type, data = await self.route(method, path, query, body, headers)
+                    except (OSError, asyncio.IncompleteReadError) as e:
+                        status, content_type, data = _json(502, {"status": "error", "error": f"shard unavailable: {e}"})
+
+                keep_alive = (
+                    headers.get("connection", "").lower() != "close"
+                    and version == "HTTP/1.1"
+                )
+                head = (
+                    f"HTTP/1.1 {status} {STATUS_TEXT.get(status, 'Error')}\r\n"
+                    f"Content-Type: {content_type}\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    f"Access-Control-Allow-Origin: *\r\n"
+                    f"Access-Control-Allow-Headers: Content-Type\r\n"
+                    f"Access-Control-Allow-Methods: GET, POST, OPTIONS\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+                )
+                writer.write(head.encode() + b"\r\n" + data)
+                await writer.drain()
+
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, workers: int, host: str = "0.0.0.0", port: int = 5000):
+        try:
+            await self.start(workers)
+            if self.udp_port is not None:
+                loop = asyncio.get_running_loop()
+                _, self.udp = await loop.create_datagram_endpoint(
+                    lambda: UDPForwarder(self), local_addr=(host, self.udp_port)
+                )
+            server = await asyncio.start_server(self.handle_connection, host, port, backlog=4096)
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.stop()
+
+
+def _json(status: int, payload) -> tuple:
+    return status, "application/json", json.dumps(payload).encode()
+
+
+def _int_arg(query: dict, name: str):
+    try:
+        return int(query[name]) if name in query else None
+    except ValueError:
+        return None
+
+
+# ==================================================
+# 🚀 ENTRYPOINT
+# ==================================================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="AgriAgents sharded deployment (router + worker processes)")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--worker-port", type=int, default=WORKER_PORT, help="shard-i listens on this + i")
+    parser.add_argument("--vnodes", type=int, default=VNODES)
+    parser.add_argument("--log-dir", default=os.environ.get("AGRI_LOG_DIR"),
+                        help="durable logs in <dir>/shard-i, ring membership in <dir>/ring.json")
+    parser.add_argument("--udp-port", type=int, help="forward binary frames received on this UDP port")
+    parser.add_argument("--serve-shard", type=int, metavar="PORT", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve_shard:
+        run_shard(args.serve_shard)
+    else:
+        print("=" * 50)
+        print("🌱 AgriAgents - Sharded Deployment")
+        print(f"   Router :{args.port} → {args.workers} shards from :{args.worker_port}")
+        print("=" * 50)
+        print()
+
+        # SIGTERM shuts the shards down like Ctrl-C does
+        signal.signal(signal.SIGTERM, signal.default_int_handler)
+        router = ShardRouter(
+            worker_port=args.worker_port,
+            vnodes=args.vnodes,
+            log_root=args.log_dir,
+            udp_port=args.udp_port
+        )
+        try:
+            asyncio.run(router.serve(args.workers, args.host, args.port))
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,253 @@
+"""
+AgriAgents - Binary Telemetry Frames
+Fixed-layout alternative to the JSON /data payload.
+
+Frame (little-endian, packed; ESP32 can memcpy the structs):
+
+  header   8 bytes
+    magic      u16   0x4741 ("AG" on the wire)
+    version    u8    FRAME_VERSION
+    count      u8    readings that follow (1 … MAX_READINGS)
+    device     u32   numeric device id (0 = DEFAULT_DEVICE_ID)
+  reading  14 bytes × count
+    seq        u32   per-device sequence number
+    timestamp  u32   epoch seconds (0 = device clock not set)
+    soil       u16   0.1 %
+    temp       i16   0.1 °C
+    light      u16   raw LDR reading
+
+One reading is 22 bytes instead of ~90 bytes of JSON. A device that was
+offline sends its buffered readings in one frame. Several frames may be
+concatenated in one HTTP body; a UDP datagram carries exactly one frame.
+
+decode_frames() returns a NumPy structured array (READING_DTYPE) for the
+whole buffer: single-reading frames decode in one np.frombuffer() call,
+other layouts walk the 8-byte headers and slice the readings in bulk.
+"""
+
+import socket
+import struct
+import threading
+
+import numpy as np
+
+from pipeline import DEFAULT_DEVICE_ID
+
+FRAME_MAGIC = 0x4741
+FRAME_VERSION = 1
+MAX_READINGS = 255
+
+HEADER = struct.Struct("<HBBI")
+
+HEADER_DTYPE = np.dtype([
+    ("magic", "<u2"), ("version", "u1"), ("count", "u1"), ("device", "<u4")
+])
+RECORD_DTYPE = np.dtype([
+    ("seq", "<u4"), ("timestamp", "<u4"), ("soil", "<u2"), ("temp", "<i2"), ("light", "<u2")
+])
+SINGLE_DTYPE = np.dtype(HEADER_DTYPE.descr + RECORD_DTYPE.descr)
+
+# Decoded reading: wire record + the header's device id
+READING_DTYPE = np.dtype([("device", "<u4")] + RECORD_DTYPE.descr)
+
+
+class FrameError(ValueError):
+    pass
+
+
+# ==================================================
+# 📦 ENCODE (simulators, load tests)
+# ==================================================
+def encode_frame(device: int, readings) -> bytes:
+    """readings: [(seq, timestamp, soil %, temp °C, light), ...]"""
+    if not 1 <= len(readings) <= MAX_READINGS:
+        raise FrameError(f"frame holds 1 … {MAX_READINGS} readings, got {len(readings)}")
+    records = np.empty(len(readings), dtype=RECORD_DTYPE)
+    for i, (seq, timestamp, soil, temp, light) in enumerate(readings):
+        records[i] = (seq, timestamp, round(soil * 10), round(temp * 10), light)
+    return HEADER.pack(FRAME_MAGIC, FRAME_VERSION, len(readings), device) + records.tobytes()
+
+
+# ==================================================
+# 🔍 DECODE
+# ==================================================
+def decode_frames(buf) -> np.ndarray:
+    """Concatenated frames → READING_DTYPE array; FrameError if malformed."""
+    buf = memoryview(buf).cast("B")
+    size = len(buf)
+    if not size:
+        return np.zeros(0, dtype=READING_DTYPE)
+
+    # Fast path: a run of single-reading frames
+    if size % SINGLE_DTYPE.itemsize == 0:
+        frames = np.frombuffer(buf, dtype=SINGLE_DTYPE)
+        if (
+            (frames["magic"] == FRAME_MAGIC).all()
+            and (frames["version"] == FRAME_VERSION).all()
+            and (frames["count"] == 1).all()
+        ):
+            out = np.empty(len(frames), dtype=READING_DTYPE)
+            for name in READING_DTYPE.names:
+                out[name] = frames[name]
+            return out
+
+    # General path: walk headers, bulk-copy each frame's readings
+    devices, parts, pos = [], [], 0
+    while pos < size:
+        if size - pos < HEADER.size:
+            raise FrameError(f"truncated header at byte {pos}")
+        magic, version, count, device = HEADER.unpack_from(buf, pos)
+        if magic != FRAME_MAGIC or version != FRAME_VERSION:
+            raise FrameError(f"bad magic/version at byte {pos}")
+        start = pos + HEADER.size
+        pos = start + count * RECORD_DTYPE.itemsize
+        if not count or pos > size:
+            raise FrameError(f"{'empty' if not count else 'truncated'} frame at byte {start - HEADER.size}")
+        parts.append(np.frombuffer(buf[start:pos], dtype=RECORD_DTYPE))
+        devices.append((device, count))
+
+    records = np.concatenate(parts)
+    out = np.empty(len(records), dtype=READING_DTYPE)
+    out["device"] = np.repeat([d for d, _ in devices], [c for _, c in devices])
+    for name in RECORD_DTYPE.names:
+        out[name] = records[name]
+    return out
+
+
+class FrameStreamDecoder:
+    """
+    decode_frames() for a body read in chunks: feed() returns the readings
+    of every frame completed so far and keeps the partial tail.
+    """
+
+    def __init__(self):
+        self._buf = bytearray()
+
+    def feed(self, chunk: bytes) -> np.ndarray:
+        self._buf += chunk
+        size = len(self._buf)
+        pos = 0
+        while size - pos >= HEADER.size:
+            magic, version, count, _ = HEADER.unpack_from(self._buf, pos)
+            if magic != FRAME_MAGIC or version != FRAME_VERSION:
+                raise FrameError(f"bad magic/version at stream byte {pos}")
+            end = pos + HEADER.size + count * RECORD_DTYPE.itemsize
+            if end > size:
+                break
+            pos = end
+        readings = decode_frames(bytes(self._buf[:pos]))
+        del self._buf[:pos]
+        return readings
+
+    def close(self):
+        if self._buf:
+            raise FrameError(f"stream ends inside a frame ({len(self._buf)} bytes left)")
+
+
+_names = {0: DEFAULT_DEVICE_ID}
+
+
+def device_name(device: int) -> str:
+    """Numeric frame id → the device_id string JSON clients use."""
+    name = _names.get(device)
+    if name is None:
+        name = _names[device] = f"esp32_{device:08x}"
+    return name
+
+
+def frames_to_columns(readings: np.ndarray) -> dict:
+    """READING_DTYPE array → the same columns readings_to_columns() gives."""
+    unique, inverse = np.unique(readings["device"], return_inverse=True)
+    names = [device_name(int(d)) for d in unique]
+    return {
+        "device_ids": [names[i] for i in inverse.tolist()],
+        "soil": readings["soil"] / 10.0,
+        "temp": readings["temp"] / 10.0,
+        "light": readings["light"].astype(np.float64),
+        "seq": readings["seq"],
+        "timestamp": readings["timestamp"]
+    }
+
+
+# ==================================================
+# 📡 UDP LISTENER
+# ==================================================
+class UDPFrameListener:
+    """
+    One frame per datagram. Datagrams already waiting are drained into one
+    batch (up to max_batch) and handed to handler(readings) together;
+    malformed datagrams are dropped and counted.
+    """
+
+    def __init__(self, handler, host: str = "0.0.0.0", port: int = 5005, max_batch: int = 512):
+        self.handler = handler
+        self.max_batch = max_batch
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20)
+        self.sock.bind((host, port))
+        self.address = self.sock.getsockname()
+
+        self.datagrams = 0
+        self.readings = 0
+        self.malformed = 0
+        self.batches = 0
+        self.errors = 0
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="agri-udp", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._running = False
+        self.sock.close()
+
+    def _run(self):
+        while self._running:
+            try:
+                self.sock.settimeout(1.0)
+                first = self.sock.recv(65535)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+
+            datagrams = [first]
+            self.sock.setblocking(False)
+            while len(datagrams) < self.max_batch:
+                try:
+                    datagrams.append(self.sock.recv(65535))
+                except OSError:  # BlockingIOError: nothing more waiting
+                    break
+
+            parts = []
+            for datagram in datagrams:
+                try:
+                    parts.append(decode_frames(datagram))
+                except FrameError:
+                    self.malformed += 1
+            self.datagrams += len(datagrams)
+            if not parts:
+                continue
+
+            readings = np.concatenate(parts)
+            self.readings += len(readings)
+            self.batches += 1
+            try:
+                self.handler(readings)
+            except Exception:
+                # A bad batch must not kill the listener
+                self.errors += 1
+
+    def stats(self) -> dict:
+        return {
+            "port": self.address[1],
+            "datagrams": self.datagrams,
+            "readings": self.readings,
+            "malformed": self.malformed,
+            "batches": self.batches,
+            "handler_errors": self.errors
+        }
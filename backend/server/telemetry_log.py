@@ -0,0 +1,403 @@
+"""
+AgriAgents - Durable Telemetry & Decision Log
+Append-only, fixed-width binary segments for audit and restart recovery.
+
+Layout:
+  <dir>/devices.txt          JSON device_id per line (line number = device index)
+  <dir>/segment-000001.log   16-byte header + packed 48-byte records
+  <dir>/segment-000002.log   ... rotated at segment_bytes
+
+Writer:
+- One struct.pack + one buffered write per reading (hot path)
+- fsync every fsync_interval seconds and on rotation / close
+
+Reader:
+- mmap every segment, np.frombuffer → zero-copy structured arrays
+- Range scans by time (binary search) and device
+- recover() rebuilds per-device state and the scenario after a restart
+"""
+
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+
+import numpy as np
+
+from agentic_engine import DECISIONS, DECISION_CODES
+
+MAGIC = b"AGRILOG1"
+HEADER = struct.Struct("<8sII")  # magic, version, record size
+VERSION = 1
+
+SCENARIO_MODES = ("NORMAL", "RAIN", "PUMP_FAIL")
+MODE_CODES = {mode: code for code, mode in enumerate(SCENARIO_MODES)}
+
+FLAG_RAIN = 1      # rain_expected for this reading
+FLAG_CONTROL = 2   # scenario change, not a reading
+FLAG_RESET = 4     # control record that reset impact metrics
+FLAG_BACKFILL = 8  # replayed store-and-forward reading (never actuated)
+
+NO_RAIN_ETA = -1
+CONTROL_DEVICE = 0xFFFFFFFF
+
+# (name, struct code, numpy type): one source of truth for both views
+FIELDS = (
+    ("timestamp", "d", "<f8"),
+    ("last_action_time", "d", "<f8"),   # NaN = never irrigated
+    ("water_saved", "d", "<f8"),        # device cumulative liters
+    ("device", "I", "<u4"),
+    ("soil", "f", "<f4"),
+    ("temperature", "f", "<f4"),
+    ("pump_cycles_avoided", "I", "<u4"),
+    ("rain_eta", "h", "<i2"),           # NO_RAIN_ETA = None
+    ("light", "H", "<u2"),
+    ("decision", "B", "u1"),
+    ("reason", "B", "u1"),
+    ("flags", "B", "u1"),
+    ("mode", "B", "u1")
+)
+
+RECORD = struct.Struct("<" + "".join(code for _, code, _ in FIELDS))
+RECORD_DTYPE = np.dtype([(name, dtype) for name, _, dtype in FIELDS])
+assert RECORD.size == RECORD_DTYPE.itemsize
+
+
+def _segment_name(number: int) -> str:
+    return f"segment-{number:06d}.log"
+
+
+def _segments(directory: str) -> list:
+    return sorted(
+        name for name in os.listdir(directory)
+        if name.startswith("segment-") and name.endswith(".log")
+    )
+
+
+def id_line(value) -> str:
+    """Dictionary line for an id: JSON keeps newlines in ids and int ids as ints."""
+    return json.dumps(value) + "\n"
+
+
+def load_ids(path: str) -> list:
+    """Ids from a dictionary file, line number = index."""
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        lines = f.read().split("\n")
+    return [json.loads(line) for line in lines[:-1]]
+
+
+def _load_devices(directory: str) -> list:
+    return load_ids(os.path.join(directory, "devices.txt"))
+
+
+# ==================================================
+# ✍️ WRITER
+# ==================================================
+class TelemetryLog:
+
+    def __init__(
+        self,
+        directory: str,
+        segment_bytes: int = 64 * 1024 * 1024,
+        fsync_interval: float = 1.0,
+        buffer_bytes: int = 256 * 1024
+    ):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.fsync_interval = fsync_interval
+        self.buffer_bytes = buffer_bytes
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._device_ids = _load_devices(directory)
+        self._devices = {d: i for i, d in enumerate(self._device_ids)}
+        self._device_file = open(os.path.join(directory, "devices.txt"), "a", encoding="utf-8")
+
+        existing = _segments(directory)
+        self._segment = int(existing[-1][8:14]) if existing else 0
+        self._file = None
+        self._size = 0
+        self._open_segment(new=not existing)
+        self._last_sync = time.monotonic()
+
+    # ------------------------------
+    # Segments
+    # ------------------------------
+    def _open_segment(self, new: bool):
+        if new:
+            self._segment += 1
+        path = os.path.join(self.directory, _segment_name(self._segment))
+        self._file = open(path, "ab", buffering=self.buffer_bytes)
+        self._size = self._file.tell()
+
+        if self._size == 0:
+            self._file.write(HEADER.pack(MAGIC, VERSION, RECORD.size))
+            self._size = HEADER.size
+        else:
+            # Drop a torn trailing record left by a crash
+            torn = (self._size - HEADER.size) % RECORD.size
+            if torn:
+                self._file.truncate(self._size - torn)
+                self._size -= torn
+
+    def _rotate(self):
+        self._sync()
+        self._file.close()
+        self._open_segment(new=True)
+
+    def _sync(self):
+        self._device_file.flush()
+        os.fsync(self._device_file.fileno())
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._last_sync = time.monotonic()
+
+    def _device(self, device_id) -> int:
+        index = self._devices.get(device_id)
+        if index is None:
+            index = self._devices[device_id] = len(self._device_ids)
+            self._device_ids.append(device_id)
+            self._device_file.write(id_line(device_id))
+        return index
+
+    def _write(self, data: bytes):
+        if self._size + len(data) > self.segment_bytes and self._size > HEADER.size:
+            self._rotate()
+        self._file.write(data)
+        self._size += len(data)
+        if time.monotonic() - self._last_sync >= self.fsync_interval:
+            self._sync()
+
+    # ------------------------------
+    # Appends
+    # ------------------------------
+    def append(
+        self,
+        device_id,
+        timestamp: float,
+        soil: float,
+        temperature: float,
+        light: int,
+        decision: str,
+        reason: int,
+        rain_expected: bool,
+        mode: str,
+        last_action_time,
+        rain_eta,
+        water_saved: float,
+        pump_cycles_avoided: int,
+        backfill: bool = False
+    ):
+        """
+        backfill: replayed reading; timestamp stays the arrival time (the
+        log is time-ordered), device state fields are not restored from it.
+        """
+        with self._lock:
+            self._write(RECORD.pack(
+                timestamp,
+                float("nan") if last_action_time is None else last_action_time,
+                water_saved,
+                self._device(device_id),
+                soil,
+                temperature,
+                pump_cycles_avoided,
+                NO_RAIN_ETA if rain_eta is None else int(rain_eta),
+                min(max(int(light), 0), 0xFFFF),
+                DECISION_CODES[decision],
+                reason,
+                (FLAG_RAIN if rain_expected else 0) | (FLAG_BACKFILL if backfill else 0),
+                MODE_CODES.get(mode, 0)
+            ))
+
+    def append_batch(self, device_ids, timestamp: float, columns: dict, mode: str):
+        """
+        One write for a whole batch. columns: soil, temperature, light,
+        decision, reason, rain_expected, last_action_time, rain_eta,
+        water_saved, pump_cycles_avoided (arrays, NaN = None).
+        """
+        records = np.zeros(len(device_ids), dtype=RECORD_DTYPE)
+        records["timestamp"] = timestamp
+        records["soil"] = columns["soil"]
+        records["temperature"] = columns["temperature"]
+        records["light"] = np.clip(columns["light"], 0, 0xFFFF)
+        records["decision"] = columns["decision"]
+        records["reason"] = columns["reason"]
+        records["flags"] = np.where(columns["rain_expected"], FLAG_RAIN, 0)
+        records["mode"] = MODE_CODES.get(mode, 0)
+        records["last_action_time"] = columns["last_action_time"]
+        rain_eta = np.asarray(columns["rain_eta"], dtype=np.float64)
+        records["rain_eta"] = np.where(np.isnan(rain_eta), NO_RAIN_ETA, np.nan_to_num(rain_eta))
+        records["water_saved"] = columns["water_saved"]
+        records["pump_cycles_avoided"] = columns["pump_cycles_avoided"]
+
+        with self._lock:
+            records["device"] = [self._device(d) for d in device_ids]
+            self._write(records.tobytes())
+
+    def append_control(self, timestamp: float, mode: str, reset_impact: bool):
+        """Scenario change marker (recovery needs it to clear countdowns)."""
+        with self._lock:
+            self._write(RECORD.pack(
+                timestamp, float("nan"), 0.0, CONTROL_DEVICE, 0.0, 0.0, 0,
+                NO_RAIN_ETA, 0, 0, 0,
+                FLAG_CONTROL | (FLAG_RESET if reset_impact else 0),
+                MODE_CODES.get(mode, 0)
+            ))
+
+    def flush(self):
+        with self._lock:
+            self._sync()
+
+    def close(self):
+        with self._lock:
+            self._sync()
+            self._file.close()
+            self._device_file.close()
+
+
+# ==================================================
+# 📖 READER (MMAP)
+# ==================================================
+class TelemetryLogReader:
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.device_ids = _load_devices(directory)
+        self._maps = []
+        self.segments = []
+        self.names = []  # segment file per entry of segments
+
+        for name in _segments(directory):
+            with open(os.path.join(directory, name), "rb") as f:
+                size = os.fstat(f.fileno()).st_size
+                if size <= HEADER.size:
+                    continue
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+            magic, version, record_size = HEADER.unpack_from(mm, 0)
+            if magic != MAGIC or record_size != RECORD.size:
+                mm.close()
+                raise ValueError(f"{name}: not a version {VERSION} telemetry segment")
+
+            count = (size - HEADER.size) // RECORD.size
+            self._maps.append(mm)
+            self.names.append(name)
+            self.segments.append(
+                np.frombuffer(mm, dtype=RECORD_DTYPE, count=count, offset=HEADER.size)
+            )
+
+    def close(self):
+        self.segments = []
+        self.names = []
+        for mm in self._maps:
+            mm.close()
+        self._maps = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return sum(len(s) for s in self.segments)
+
+    def scan(self, device_id=None, start: float = None, end: float = None, controls: bool = False):
+        """
+        Yield record arrays per segment for [start, end) and one device.
+        Time-only scans are zero-copy views (records are appended in
+        time order); device filters return compacted copies.
+        """
+        device = None
+        if device_id is not None:
+            if device_id not in self.device_ids:
+                return
+            device = self.device_ids.index(device_id)
+
+        for records in self.segments:
+            if len(records) == 0:
+                continue
+            if start is not None and records["timestamp"][-1] < start:
+                continue
+            if end is not None and records["timestamp"][0] >= end:
+                break
+
+            lo = 0 if start is None else np.searchsorted(records["timestamp"], start, "left")
+            hi = len(records) if end is None else np.searchsorted(records["timestamp"], end, "left")
+            view = records[lo:hi]
+
+            if device is not None:
+                view = view[view["device"] == device]
+            elif not controls:
+                view = view[(view["flags"] & FLAG_CONTROL) == 0]
+            if len(view):
+                yield view
+
+    # ------------------------------
+    # Restart recovery
+    # ------------------------------
+    def recover(self, store, scenario: dict) -> int:
+        """
+        Restore each device's latest state into store and the last
+        scenario mode into scenario. Returns devices recovered.
+        """
+        latest = {}          # device index → (position, record): impact
+        latest_live = {}     # same, actuated readings only: device state
+        last_control = None  # (position, record)
+        last_reset = -1
+
+        position = 0
+        for records in self.segments:
+            if len(records) == 0:
+                continue
+            control = np.flatnonzero(records["flags"] & FLAG_CONTROL)
+            if len(control):
+                last_control = (position + control[-1], records[control[-1]])
+                resets = control[(records["flags"][control] & FLAG_RESET) != 0]
+                if len(resets):
+                    last_reset = position + resets[-1]
+
+            readings = np.flatnonzero((records["flags"] & FLAG_CONTROL) == 0)
+            devices = records["device"][readings]
+            # Last occurrence of each device in this segment
+            unique, rev_index = np.unique(devices[::-1], return_index=True)
+            last = readings[len(readings) - 1 - rev_index]
+            for device, i in zip(unique.tolist(), last.tolist()):
+                latest[device] = (position + i, records[i])
+
+            live = readings[(records["flags"][readings] & FLAG_BACKFILL) == 0]
+            unique, rev_index = np.unique(records["device"][live][::-1], return_index=True)
+            last = live[len(live) - 1 - rev_index]
+            for device, i in zip(unique.tolist(), last.tolist()):
+                latest_live[device] = (position + i, records[i])
+
+            position += len(records)
+
+        if last_control is not None:
+            scenario["mode"] = SCENARIO_MODES[last_control[1]["mode"]]
+            scenario["rain_eta"] = 90 if scenario["mode"] == "RAIN" else None
+        control_position = -1 if last_control is None else last_control[0]
+
+        for device, (pos, record) in latest.items():
+            if device >= len(self.device_ids):
+                continue  # record outlived an unsynced devices.txt line
+            with store.update(self.device_ids[device]) as dev:
+                if device in latest_live:
+                    live_pos, live_record = latest_live[device]
+                    last_action_time = float(live_record["last_action_time"])
+                    dev.last_action_time = None if np.isnan(last_action_time) else last_action_time
+                    dev.last_decision = DECISIONS[live_record["decision"]]
+                    rain_eta = int(live_record["rain_eta"])
+                    dev.rain_eta = None if rain_eta == NO_RAIN_ETA or live_pos < control_position else rain_eta
+                if pos > last_reset:
+                    dev.water_saved_liters = float(record["water_saved"])
+                    dev.pump_cycles_avoided = int(record["pump_cycles_avoided"])
+                else:
+                    dev.water_saved_liters = 0.0
+                    dev.pump_cycles_avoided = 0
+
+        return len(latest)
@@ -0,0 +1,14 @@
+"""
+Backend tests. Modules live flat in backend/server and import each
+other by name, so that directory goes on sys.path.
+
+    cd backend/server && python -m pytest -q
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# server.py reads these at import; keep test runs quiet and in memory
+os.environ.setdefault("AGRI_LOG_SAMPLE", "0")
@@ -0,0 +1,81 @@
+"""Async ingest: readings share a micro-batch but not each other's errors."""
+
+import asyncio
+import json
+
+from async_ingest import AsyncIngestServer
+
+
+def post_all(bodies: list, **options) -> list:
+    async def run():
+        ingest = AsyncIngestServer(max_delay=0.05, **options)
+        ingest.batcher.start()
+        try:
+            return await asyncio.gather(*(ingest.handle_data(json.dumps(body).encode()) for body in bodies))
+        finally:
+            await ingest.batcher.stop()
+    return asyncio.run(run())
+
+
+def reading(device_id, soil, **extra) -> dict:
+    return {"device_id": device_id, "sensors": {"soil": soil, "temp": 25, "light": 2500}, **extra}
+
+
+def test_bad_reading_fails_alone():
+    replies = post_all([
+        reading("a", 10),
+        reading("b", "x"),
+        reading("c", 10, location={"lat": 1}),
+        reading("d", 10, location="x"),
+        reading("e", 50),
+    ])
+    assert [status for status, _ in replies] == [200, 400, 400, 400, 200]
+    assert replies[0][1]["decision"] == "IRRIGATE"
+    assert replies[4][1]["decision"] == "HOLD"
+
+
+def test_repeated_device_in_one_micro_batch():
+    replies = post_all([reading("a", 10)] * 3)
+    assert [payload["decision"] for _, payload in replies] == ["IRRIGATE", "HOLD", "HOLD"]
+
+
+def test_policy_profiles_apply(tmp_path):
+    policy_file = tmp_path / "policy.json"
+    policy_file.write_text(json.dumps({
+        "profiles": {"tomato": {"thresholds": {"SOIL_DRY": 80}}},
+        "fields": {"north": "tomato"}
+    }))
+    replies = post_all([
+        reading("a", 25),
+        reading("b", 25, profile="tomato"),
+        reading("c", 25, field_id="north"),
+    ], policy_file=str(policy_file))
+    default, tomato, north = (payload for _, payload in replies)
+    assert default["policy_version"] != tomato["policy_version"] == north["policy_version"]
+    assert default["decision"] == "HOLD"
+    assert tomato["decision"] == north["decision"] != "HOLD"
+
+
+def test_zone_limits_apply():
+    replies = post_all(
+        [reading("a", 10, field_id="north"), reading("b", 5, field_id="north"), reading("c", 10, field_id="south")],
+        zone_limits={"capacity_lpm": 10}
+    )
+    assert [payload["decision"] for _, payload in replies] == ["DELAY", "IRRIGATE", "IRRIGATE"]
+
+
+def test_fault_lockout_applies():
+    sensors = [reading("a", 60)] * 8 + [reading("a", 95)]
+    assert post_all(sensors)[-1][1]["decision"] == "HOLD"
+    assert post_all(sensors, fault_lockout=True)[-1][1]["decision"] == "EMERGENCY_STOP"
+
+
+def test_scenario_rejects_bad_bodies():
+    ingest = AsyncIngestServer()
+    for body in (b"[1]", b'"x"', b"{", b'{"mode": "DROUGHT"}', b'{"mode": 1}'):
+        status, payload = ingest.handle_scenario(body)
+        assert status == 400 and payload["status"] == "error", body
+    assert ingest.scenario["mode"] == "NORMAL"
+
+    status, payload = ingest.handle_scenario(b'{"mode": "RAIN"}')
+    assert status == 200 and payload["scenario"] == {"mode": "RAIN", "rain_eta": 90}
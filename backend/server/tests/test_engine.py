@@ -0,0 +1,117 @@
+"""Batch agent, compiled table and scalar agent agree row for row."""
+
+import json
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from agentic_engine import (
+    DECISIONS,
+    DECISION_CODES,
+    agentic_decision,
+    agentic_decision_batch,
+    batch_reasons
+)
+from device_state import to_epoch
+from policy_table import PolicyTable, compiled_policy
+
+NOW = datetime(2026, 5, 1, 12, 0, 0)
+
+
+def fleet(n: int = 4000, seed: int = 0) -> dict:
+    """Readings across the grid, off the grid, guardrails and cooldowns."""
+    rng = np.random.default_rng(seed)
+    soil = np.round(rng.uniform(-5, 105, n), 1)
+    soil[::3] = rng.uniform(0, 100, len(soil[::3]))          # off the 0.1 % grid
+    soil[::97] = np.nan
+    temp = rng.uniform(-15, 65, n)
+    temp[::5] = 35.0                                         # TEMP_HIGH boundary
+    light = rng.integers(0, 4096, n).astype(np.float64)
+    light[::7] = 2000.0                                      # LIGHT_DAY boundary
+    last = np.where(rng.random(n) < 0.3, to_epoch(NOW) - rng.uniform(0, 600, n), np.nan)
+    last_decision = rng.integers(0, 4, n).astype(np.uint8)
+    return {"soil": soil, "temp": temp, "light": light, "last": last, "last_decision": last_decision}
+
+
+def scalar(i: int, f: dict, decide=agentic_decision) -> dict:
+    last = f["last"][i]
+    return decide(
+        {"soil": f["soil"][i], "temperature": f["temp"][i], "light": f["light"][i]},
+        None if np.isnan(last) else NOW - timedelta(seconds=to_epoch(NOW) - last),
+        DECISIONS[f["last_decision"][i]],
+        NOW
+    )
+
+
+def assert_rows_match(batch: dict, f: dict, decide=agentic_decision):
+    for i in range(len(f["soil"])):
+        expected = scalar(i, f, decide)
+        assert DECISIONS[batch["decision"][i]] == expected["decision"], i
+        assert batch["confidence"][i] == pytest.approx(expected["confidence"]), i
+        assert batch["utility"][i] == pytest.approx(expected["utility"]), i
+        assert batch_reasons(batch, i) == list(expected["reasons"]), i
+
+
+def test_batch_matches_scalar():
+    f = fleet()
+    batch = agentic_decision_batch(
+        f["soil"], f["temp"], f["light"], f["last"], f["last_decision"], to_epoch(NOW)
+    )
+    assert_rows_match(batch, f)
+
+
+def test_table_batch_matches_scalar():
+    f = fleet(seed=1)
+    batch = compiled_policy().decide_batch(
+        f["soil"], f["temp"], f["light"], f["last"], f["last_decision"], to_epoch(NOW)
+    )
+    assert_rows_match(batch, f)
+
+
+def test_table_scalar_matches_engine():
+    f = fleet(1000, seed=2)
+    table = compiled_policy()
+    for i in range(len(f["soil"])):
+        fast, exact = scalar(i, f, table.decide), scalar(i, f)
+        assert {k: fast[k] for k in ("decision", "confidence", "utility")} == \
+            {k: exact[k] for k in ("decision", "confidence", "utility")}, i
+        assert list(fast["reasons"]) == list(exact["reasons"]), i
+
+
+def test_table_custom_policy_matches_engine():
+    thresholds = {"SOIL_DRY": 40.0, "SOIL_WET": 80.0, "TEMP_HIGH": 30.0, "LIGHT_DAY": 1500, "MIN_INTERVAL_SEC": 60}
+    limits = {"IRRIGATE": 50.0, "DELAY": 20.0}
+    f = fleet(1000, seed=3)
+    batch = PolicyTable(thresholds, limits).decide_batch(
+        f["soil"], f["temp"], f["light"], f["last"], f["last_decision"], to_epoch(NOW)
+    )
+    exact = agentic_decision_batch(
+        f["soil"], f["temp"], f["light"], f["last"], f["last_decision"], to_epoch(NOW),
+        thresholds=thresholds, utility_limits=limits
+    )
+    for column in ("decision", "confidence", "utility", "reasons"):
+        np.testing.assert_array_equal(batch[column], exact[column])
+
+
+def test_guardrails_win_over_cooldown():
+    result = agentic_decision_batch(
+        [150.0, 40.0], [25.0, 70.0], [3000, 3000],
+        last_action_time=[to_epoch(NOW) - 10] * 2, now=to_epoch(NOW)
+    )
+    assert result["decision"].tolist() == [DECISION_CODES["EMERGENCY_STOP"]] * 2
+
+
+@pytest.mark.parametrize("decide", [agentic_decision, compiled_policy().decide])
+def test_reasons_behave_like_a_list(decide):
+    result = decide({"soil": 20.0, "temperature": 36.0, "light": 900}, None, None, NOW)
+    reasons = result["reasons"]
+    expected = [
+        "High temperature (36.0°C) increases evaporation risk",
+        "Low light detected (non-ideal irrigation window)",
+        "Soil moisture within acceptable range"
+    ]
+    assert json.loads(json.dumps(result))["reasons"] == expected
+    assert reasons == expected and repr(reasons) == repr(expected)
+    reasons.append("extra")
+    assert reasons[-1] == "extra"
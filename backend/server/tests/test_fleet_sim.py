@@ -0,0 +1,16 @@
+"""Batch microbenchmarks run with fewer iterations than one batch."""
+
+from fleet_sim import SimDevice, bench_decisions, bench_faults, bench_parsing
+
+
+def test_batch_benchmarks_below_one_batch():
+    devices = [SimDevice(f"t-bench-{i}", i) for i in range(10)]
+    readings = [devices[i % len(devices)].reading() for i in range(64)]
+    results = {
+        **bench_decisions(readings, 10, 64),
+        **bench_faults(readings, 10, 64),
+        **bench_parsing(readings, 10, 64)
+    }
+    assert results["faults.update_batch[64]"]["iterations"] == 64
+    assert results["policy_table.decide_batch[64]"]["iterations"] == 64
+    assert results["parse_frames[64]"]["bytes_per_reading"] > 0
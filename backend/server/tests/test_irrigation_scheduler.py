@@ -0,0 +1,64 @@
+"""Zone admission: IRRIGATE only where the zone's water supply allows."""
+
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from agentic_engine import DECISIONS
+from climate import ClimateAgent
+from device_state import make_store
+from irrigation_scheduler import RUN_SEC, IrrigationScheduler
+from pipeline import OVERRIDE_REASONS, PUMP_FLOW_LPM, REASON_SCHEDULED, run_batch
+
+START = datetime(2026, 5, 1, 12, 0, 0)
+SCENARIO = {"mode": "NORMAL", "rain_eta": None}
+
+
+class Fleet:
+
+    def __init__(self, **limits):
+        self.store = make_store("memory")
+        self.climate = ClimateAgent()
+        self.scheduler = IrrigationScheduler(**limits)
+
+    def read(self, device_ids, soil, seconds: float = 0) -> tuple:
+        result = run_batch(
+            self.store, SCENARIO, self.climate, device_ids,
+            np.asarray(soil, dtype=np.float64), np.full(len(device_ids), 25.0), np.full(len(device_ids), 2500.0),
+            now=START + timedelta(seconds=seconds), scheduler=self.scheduler
+        )
+        return [DECISIONS[code] for code in result["decision"].tolist()], result["reason"].tolist()
+
+
+def test_unlimited_zone_admits_everyone():
+    decisions, _ = Fleet().read(["a", "b", "c"], [5, 10, 12])
+    assert decisions == ["IRRIGATE"] * 3
+
+
+def test_capacity_admits_best_utility_first():
+    fleet = Fleet(capacity_lpm=PUMP_FLOW_LPM)
+    decisions, reasons = fleet.read(["a", "b", "c"], [12, 5, 10])
+    assert decisions == ["DELAY", "IRRIGATE", "DELAY"]
+    assert reasons[0] == reasons[2] == REASON_SCHEDULED
+    assert OVERRIDE_REASONS[REASON_SCHEDULED].startswith("Irrigation queued")
+
+    # Still running: the queue waits
+    decisions, _ = fleet.read(["a", "c"], [12, 10], seconds=RUN_SEC / 2)
+    assert decisions == ["DELAY", "DELAY"]
+    # The run is over: next best (drier) device starts
+    decisions, _ = fleet.read(["a", "c"], [12, 10], seconds=RUN_SEC + 1)
+    assert decisions == ["DELAY", "IRRIGATE"]
+
+
+def test_daily_budget_defers_until_the_next_day():
+    fleet = Fleet(budget_liters=PUMP_FLOW_LPM * RUN_SEC / 60)
+    assert fleet.read(["a", "b"], [5, 10])[0] == ["IRRIGATE", "DELAY"]
+    assert fleet.read(["b"], [10], seconds=RUN_SEC + 1)[0] == ["DELAY"]
+    assert fleet.read(["b"], [10], seconds=86400)[0] == ["IRRIGATE"]
+
+
+def test_recovered_soil_cancels_the_request():
+    fleet = Fleet(capacity_lpm=PUMP_FLOW_LPM)
+    assert fleet.read(["a", "b"], [5, 10])[0] == ["IRRIGATE", "DELAY"]
+    assert fleet.read(["b"], [60], seconds=10)[0] == ["HOLD"]
+    assert fleet.scheduler.stats()["pending"] == 0
@@ -0,0 +1,24 @@
+"""Sampled logger output follows sys.stdout redirects."""
+
+import io
+import json
+import time
+from contextlib import redirect_stdout
+
+from observability import SampledLogger
+
+
+def wait_logged(logger, count, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while logger.logged < count and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_default_stream_is_resolved_at_write_time():
+    logger = SampledLogger(sample_rate=0.0)
+    captured = io.StringIO()
+    with redirect_stdout(captured):
+        logger.log("reading", always=True, device_id="t-log")
+        wait_logged(logger, 1)
+    assert logger.logged == 1
+    assert json.loads(captured.getvalue())["device_id"] == "t-log"
@@ -0,0 +1,73 @@
+"""Policy validation: bad values are rejected and the running policy stays."""
+
+import json
+import math
+
+import pytest
+
+import server
+from policy_registry import DEFAULT_PROFILE, PolicyRegistry
+
+
+@pytest.mark.parametrize("update", [
+    {"thresholds": {"SOIL_DRY": 0}},
+    {"thresholds": {"SOIL_DRY": -5}},
+    {"thresholds": {"MIN_INTERVAL_SEC": -1}},
+    {"thresholds": {"MIN_INTERVAL_SEC": 2.9}},
+    {"thresholds": {"LIGHT_DAY": 1500.5}},
+    {"thresholds": {"SOIL_WET": math.nan}},
+    {"utility_limits": {"IRRIGATE": math.inf}},
+    {"utility_limits": {"DELAY": -1}},
+    {"field_limits": {"SOIL_LOW": -0.1}},
+    {"thresholds": {"SOIL_DRY": True}},
+])
+def test_publish_rejects_out_of_range(update):
+    registry = PolicyRegistry()
+    before = registry.policy_for("d")
+    with pytest.raises(ValueError):
+        registry.publish(None, update)
+    assert registry.policy_for("d") is before
+
+
+def test_publish_accepts_edge_values():
+    registry = PolicyRegistry()
+    policy = registry.publish("cold", {
+        "thresholds": {"MIN_INTERVAL_SEC": 0, "LIGHT_DAY": 1500.0, "TEMP_HIGH": -2},
+        "field_limits": {"HEAT_STRESS": -1.5}
+    })
+    assert policy.thresholds["MIN_INTERVAL_SEC"] == 0
+    assert policy.thresholds["LIGHT_DAY"] == 1500 and isinstance(policy.thresholds["LIGHT_DAY"], int)
+
+
+def test_route_rejects_zero_soil_dry():
+    client = server.app.test_client()
+    reply = client.post("/policy", json={"profile": "t-zero", "thresholds": {"SOIL_DRY": 0}})
+    assert reply.status_code == 400
+    assert "SOIL_DRY" in reply.get_json()["error"]
+
+
+def test_file_reload_keeps_old_version(tmp_path):
+    path = tmp_path / "policy.json"
+    path.write_text(json.dumps({"default": {"thresholds": {"SOIL_DRY": 35}}}))
+    registry = PolicyRegistry(str(path))
+    good = registry.policy_for("d")
+    assert good.thresholds["SOIL_DRY"] == 35
+
+    path.write_text(json.dumps({"default": {"thresholds": {"SOIL_DRY": 0}}}))
+    assert not registry.reload()
+    assert registry.policy_for("d") is good
+    assert "SOIL_DRY" in registry.stats()["last_error"]
+
+
+def test_profiles_and_fields_swap_together(tmp_path):
+    fields = {"d": "north"}
+    path = tmp_path / "policy.json"
+    path.write_text(json.dumps({
+        "profiles": {"tomato": {"thresholds": {"SOIL_DRY": 35}}},
+        "fields": {"north": "tomato"}
+    }))
+    registry = PolicyRegistry(str(path), field_of=fields.get)
+    policies, field_profiles = registry._snapshot
+    assert field_profiles == {"north": "tomato"}
+    assert registry.policy_for("d") is policies["tomato"]
+    assert registry.group(["d", "x"]) == [(policies["tomato"], [0]), (policies[DEFAULT_PROFILE], [1])]
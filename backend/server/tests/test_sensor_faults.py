@@ -0,0 +1,96 @@
+"""Fault detection: watering is not a jump, lockout and clear cycle."""
+
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from agentic_engine import DECISIONS
+from climate import ClimateAgent
+from device_state import make_store
+from pipeline import run_batch
+from sensor_faults import (
+    CLEAR_READINGS,
+    FAULT_JUMP,
+    FAULT_PUMP,
+    PUMP_CHECK_SEC,
+    WARMUP,
+    FaultDetector
+)
+
+START = datetime(2026, 5, 1, 12, 0, 0)
+SCENARIO = {"mode": "NORMAL", "rain_eta": None}
+
+
+class Device:
+    """One device through run_batch with a lockout detector."""
+
+    def __init__(self):
+        self.store = make_store("memory")
+        self.climate = ClimateAgent()
+        self.faults = FaultDetector(lockout=True)
+
+    def read(self, soil, seconds: float, temp=25.0) -> str:
+        result = run_batch(
+            self.store, SCENARIO, self.climate, ["d"],
+            np.array([soil], dtype=np.float64), np.array([temp]), np.array([2500.0]),
+            now=START + timedelta(seconds=seconds), faults=self.faults
+        )
+        return DECISIONS[int(result["decision"][0])]
+
+
+def test_lockout_is_off_by_default():
+    assert not FaultDetector().lockout
+
+
+def test_soil_rise_after_irrigate_is_not_a_jump():
+    device = Device()
+    assert device.read(10, 0) == "IRRIGATE"
+    assert device.read(50, 0.005) != "EMERGENCY_STOP"
+    assert device.read(20, 0.010) != "EMERGENCY_STOP"
+    assert device.faults.faults_of("d") == 0
+
+
+def test_jump_locks_out_then_clears_itself():
+    device = Device()
+    assert [device.read(60, i) for i in range(WARMUP)] == ["HOLD"] * WARMUP
+    assert device.read(95, WARMUP) == "EMERGENCY_STOP"
+    assert device.faults.faults_of("d") == FAULT_JUMP
+    decisions = [device.read(60, WARMUP + 1 + i) for i in range(CLEAR_READINGS)]
+    assert decisions[:-1] == ["EMERGENCY_STOP"] * (CLEAR_READINGS - 1)
+    assert decisions[-1] == "HOLD"
+
+
+def test_pump_fault_latches_until_cleared():
+    device = Device()
+    assert device.read(10, 0) == "IRRIGATE"
+    assert device.read(10, 60) != "EMERGENCY_STOP"
+    assert device.read(10, PUMP_CHECK_SEC + 1) == "EMERGENCY_STOP"
+    assert device.faults.faults_of("d") == FAULT_PUMP
+    assert device.read(40, PUMP_CHECK_SEC + 60) == "EMERGENCY_STOP"
+
+    assert device.faults.clear("d") == 1
+    assert device.read(40, PUMP_CHECK_SEC + 120) == "HOLD"
+    assert device.faults.stats()["cleared"] == 1
+
+
+def test_batch_matches_single_updates():
+    rng = np.random.default_rng(3)
+    n = 3000
+    device_ids = [f"d{i}" for i in rng.integers(0, 40, n)]
+    ts = np.cumsum(rng.uniform(0, 120, n))
+    soil = np.clip(rng.normal(40, 15, n), -5, 105)
+    soil[::11] += 50
+    temp = rng.normal(25, 8, n)
+    last = np.where(rng.random(n) < 0.2, ts - rng.uniform(0, 4000, n), np.nan)
+
+    single, batch = FaultDetector(), FaultDetector()
+    expected = [
+        single.update(d, t, s, c, None if np.isnan(a) else a)
+        for d, t, s, c, a in zip(device_ids, ts, soil, temp, last)
+    ]
+    got = np.concatenate([
+        batch.update_batch(device_ids[i:i + 500], ts[i:i + 500], soil[i:i + 500], temp[i:i + 500], last[i:i + 500])
+        for i in range(0, n, 500)
+    ])
+    assert got.tolist() == expected
+    assert batch.stats() == single.stats()
@@ -0,0 +1,51 @@
+"""Flask endpoints: batch ingest through the live fleet state."""
+
+import pytest
+
+import server
+
+
+@pytest.fixture
+def client():
+    return server.app.test_client()
+
+
+def reading(device_id, soil, **extra) -> dict:
+    return {"device_id": device_id, "sensors": {"soil": soil, "temp": 25, "light": 2500}, **extra}
+
+
+def test_batch_repeated_device_keeps_cooldown(client):
+    reply = client.post("/data/batch", json={"readings": [reading("t-repeat", 10)] * 3})
+    assert reply.status_code == 200
+    assert [r["decision"] for r in reply.get_json()["results"]] == ["IRRIGATE", "HOLD", "HOLD"]
+
+
+@pytest.mark.parametrize("bad", [
+    reading("t-bad", "x"),
+    reading("t-bad", None),
+    reading("t-bad", 10, location={"lat": 1}),
+    reading("t-bad", 10, location="x"),
+    reading(["t-bad"], 10),
+    "not an object",
+])
+def test_batch_malformed_reading_is_400(client, bad):
+    reply = client.post("/data/batch", json={"readings": [reading("t-good", 40), bad]})
+    assert reply.status_code == 400
+    assert reply.get_json()["error"].startswith("reading 1:")
+    assert server.DEVICES.get("t-good") is None
+
+
+@pytest.mark.parametrize("body", [[], {"readings": "x"}, "x"])
+def test_batch_malformed_body_is_400(client, body):
+    assert client.post("/data/batch", json=body).status_code == 400
+
+
+def test_shard_drop_forgets_windows_and_history(client):
+    client.post("/data", json=reading("t-moved", 40))
+    assert server.FEATURES.stats()["devices"] and server.DECISION_TIMELINE.query("t-moved")["timeline"]
+
+    devices = server.FEATURES.stats()["devices"]
+    reply = client.post("/shard/drop", json={"device_ids": ["t-moved"]})
+    assert reply.get_json()["dropped"] == 1
+    assert server.FEATURES.stats()["devices"] == devices - 1
+    assert server.DECISION_TIMELINE.query("t-moved")["timeline"] == []
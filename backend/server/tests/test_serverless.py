@@ -0,0 +1,55 @@
+"""Serverless handler: bad readings never escape as exceptions."""
+
+import base64
+import json
+
+import pytest
+
+import serverless
+
+BAD = [
+    {"device_id": "s-bad", "sensors": {"soil": "x"}},
+    {"device_id": "s-bad", "sensors": {"soil": 10}, "location": {"lat": 1}},
+    {"device_id": "s-bad", "sensors": {"soil": 10}, "location": "x"},
+    {"device_id": "s-bad", "sensors": {"soil": 10}, "profile": {"name": "tomato"}},
+]
+
+
+def reading(device_id, soil) -> dict:
+    return {"device_id": device_id, "sensors": {"soil": soil, "temp": 25, "light": 2500}}
+
+
+@pytest.mark.parametrize("bad", BAD)
+def test_direct_invocation_reports_error(bad):
+    assert serverless.handler({"readings": [reading("s-ok", 40), bad]})["status"] == "error"
+
+
+@pytest.mark.parametrize("bad", BAD)
+def test_http_bad_reading_is_400(bad):
+    reply = serverless.handler({"body": json.dumps(bad)})
+    assert reply["statusCode"] == 400
+
+
+@pytest.mark.parametrize("bad", BAD)
+def test_queue_bad_record_is_a_batch_item_failure(bad):
+    reply = serverless.handler({"Records": [
+        {"messageId": "ok", "body": json.dumps(reading("s-queue", 10))},
+        {"messageId": "bad", "body": json.dumps(bad)},
+        {"kinesis": {"sequenceNumber": "k1", "data": base64.b64encode(json.dumps(reading("s-stream", 10)).encode())}},
+    ]})
+    assert reply["batchItemFailures"] == [{"itemIdentifier": "bad"}]
+    assert [r["device_id"] for r in reply["results"]] == ["s-queue", "s-stream"]
+
+
+def test_malformed_stream_records_are_batch_item_failures():
+    reply = serverless.handler({"Records": [
+        {"kinesis": {"sequenceNumber": "k-b64", "data": "not base64!"}},
+        {"kinesis": {"sequenceNumber": "k-utf8", "data": base64.b64encode(b"\xff\xfe").decode()}},
+        {"kinesis": "x"},
+        5,
+        {"messageId": "ok", "body": json.dumps(reading("s-after", 10))},
+    ]})
+    assert reply["batchItemFailures"] == [
+        {"itemIdentifier": "k-b64"}, {"itemIdentifier": "k-utf8"}, {"itemIdentifier": None}, {"itemIdentifier": None}
+    ]
+    assert [r["device_id"] for r in reply["results"]] == ["s-after"]
@@ -0,0 +1,66 @@
+"""Router batch ingest: malformed batches are rejected before any shard sees them."""
+
+import asyncio
+import json
+
+import pytest
+
+from sharding import ShardRouter
+
+
+class RecordingClient:
+    """Stands in for a shard's HTTP pool; every batch is accepted."""
+
+    def __init__(self):
+        self.batches = []
+
+    async def json(self, method, path, payload=None):
+        self.batches.append(payload["readings"])
+        return 200, {
+            "results": [{"device_id": r["device_id"], "decision": "HOLD"} for r in payload["readings"]],
+            "impact_metrics": {"water_saved_liters": 0.0, "pump_cycles_avoided": 0}
+        }
+
+
+class FakeShard:
+    def __init__(self):
+        self.client = RecordingClient()
+
+
+def router(shards: int = 2) -> ShardRouter:
+    r = ShardRouter()
+    for i in range(shards):
+        r.shards[f"shard-{i}"] = FakeShard()
+        r.ring.add(f"shard-{i}")
+    return r
+
+
+def post_batch(r: ShardRouter, payload) -> tuple:
+    status, _, body = asyncio.run(r.route("POST", "/data/batch", {}, json.dumps(payload).encode(), {}))
+    return status, json.loads(body)
+
+
+def good(i: int) -> dict:
+    return {"device_id": f"t-shard-{i}", "sensors": {"soil": 40, "temp": 25, "light": 2500}}
+
+
+@pytest.mark.parametrize("payload", [
+    {"readings": [1]},
+    {"readings": 5},
+    [1],
+    {"readings": [good(i) for i in range(20)] + [{"device_id": "t-bad", "sensors": {"soil": "x"}}]},
+])
+def test_malformed_batch_applies_nothing(payload):
+    r = router()
+    status, reply = post_batch(r, payload)
+    assert status == 400 and reply["status"] == "error"
+    assert all(not shard.client.batches for shard in r.shards.values())
+
+
+def test_batch_split_and_merged_in_order():
+    r = router()
+    readings = [good(i) for i in range(20)]
+    status, reply = post_batch(r, {"readings": readings})
+    assert status == 200
+    assert [res["device_id"] for res in reply["results"]] == [x["device_id"] for x in readings]
+    assert all(shard.client.batches for shard in r.shards.values())
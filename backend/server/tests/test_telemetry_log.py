@@ -0,0 +1,50 @@
+"""devices.txt round-trips any JSON device id through restart recovery."""
+
+import pytest
+
+from analytics import AnalyticsExporter, AnalyticsStore
+from device_state import make_store
+from telemetry_log import TelemetryLog, TelemetryLogReader
+
+DEVICE_IDS = ["plain", "two\nlines", 7, "007", "true", "carriage\rreturn", "sep arator"]
+
+
+def write(directory, device_ids):
+    log = TelemetryLog(directory)
+    for i, device_id in enumerate(device_ids):
+        log.append(
+            device_id, 1767225600.0 + i, 40.0, 25.0, 2500, "HOLD", 0,
+            False, "NORMAL", None, None, float(i), i
+        )
+    log.close()
+
+
+def test_ids_round_trip_through_recovery(tmp_path):
+    write(str(tmp_path), DEVICE_IDS)
+    write(str(tmp_path), ["after"])  # reopened writer keeps the indexes
+
+    store = make_store("memory")
+    with TelemetryLogReader(str(tmp_path)) as reader:
+        assert reader.device_ids == DEVICE_IDS + ["after"]
+        reader.recover(store, {"mode": "NORMAL", "rain_eta": None})
+    for i, device_id in enumerate(DEVICE_IDS):
+        assert store.get(device_id).pump_cycles_avoided == i
+    assert store.get("7") is None
+
+
+def test_malformed_dictionary_line_raises(tmp_path):
+    write(str(tmp_path), ["node-1"])
+    (tmp_path / "devices.txt").write_text("node-1\n", encoding="utf-8")
+    with pytest.raises(ValueError):
+        TelemetryLogReader(str(tmp_path))
+
+
+def test_analytics_dictionary_matches_log(tmp_path):
+    log_dir, analytics_dir = str(tmp_path / "log"), str(tmp_path / "analytics")
+    write(log_dir, DEVICE_IDS)
+    AnalyticsExporter(log_dir, analytics_dir).export()
+
+    store = AnalyticsStore(analytics_dir)
+    for device_id in DEVICE_IDS:
+        result = store.query(device_id=device_id)
+        assert result["rows"][0]["count"] == 1, device_id
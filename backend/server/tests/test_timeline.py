@@ -0,0 +1,22 @@
+"""Decision timeline: per-device rings can be dropped and come back empty."""
+
+from timeline import DecisionTimeline
+
+
+def append(timeline, device_id, soil):
+    return timeline.append(device_id, 1767225600.0, soil, "HOLD", 0, False, 0.0, 0)
+
+
+def test_discard_drops_device_history():
+    timeline = DecisionTimeline()
+    append(timeline, "a", 40.0)
+    append(timeline, "b", 41.0)
+    timeline.discard("a")
+
+    assert timeline.query("a")["timeline"] == []
+    assert timeline.memory_report()["devices"] == 1
+    # Fleet entries still name the device
+    assert [e["device_id"] for e in timeline.query()["timeline"]] == ["a", "b"]
+
+    append(timeline, "a", 42.0)
+    assert [e["soil"] for e in timeline.query("a")["timeline"]] == [42.0]
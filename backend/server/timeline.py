@@ -0,0 +1,223 @@
+"""
+AgriAgents - Decision Timeline (Ring Buffers)
+Fixed-capacity, preallocated, columnar history of decisions.
+
+Layout:
+- One fleet ring (last N decisions across all devices)
+- One ring per device (last N decisions of that device)
+- Columns: seq, timestamp, device slot, soil (0.1 % units),
+  decision code, reason code (OVERRIDE_REASONS index), policy version,
+  rain flag, impact totals; reason text is rendered only by query()
+
+Every entry gets a global sequence number. Pollers pass it back as
+since=<cursor> and only receive newer entries.
+
+Appends are O(1): a slot index moves, nothing is copied.
+"""
+
+import threading
+from datetime import datetime, timezone
+
+import numpy as np
+
+from agentic_engine import DECISIONS, DECISION_CODES
+from pipeline import OVERRIDE_REASONS
+
+ENTRY_DTYPE = np.dtype([
+    ("seq", np.int64),
+    ("timestamp", np.float64),
+    ("device", np.int32),
+    ("soil_tenths", np.int16),
+    ("decision", np.uint8),
+    ("reason", np.uint8),
+    ("policy_version", np.uint32),
+    ("rain_expected", np.bool_),
+    ("water_saved", np.float64),
+    ("pump_cycles_avoided", np.int32)
+])
+
+SOIL_LIMIT = np.iinfo(np.int16).max
+
+
+def _soil_tenths(soil):
+    """Soil % → int16 tenths (28.3 → 283), clipped; NaN stored as 0."""
+    tenths = np.rint(np.nan_to_num(np.asarray(soil, dtype=np.float64)) * 10)
+    return np.clip(tenths, -SOIL_LIMIT, SOIL_LIMIT).astype(np.int16)
+
+
+# ==================================================
+# 🔁 RING BUFFER
+# ==================================================
+class TimelineRing:
+    """Preallocated structured array used as a circular buffer."""
+
+    __slots__ = ("entries", "capacity", "count", "head")
+
+    def __init__(self, capacity: int):
+        self.entries = np.zeros(capacity, dtype=ENTRY_DTYPE)
+        self.capacity = capacity
+        self.count = 0
+        self.head = 0  # next slot to write
+
+    def append(self, row: tuple):
+        self.entries[self.head] = row
+        self.head = (self.head + 1) % self.capacity
+        if self.count < self.capacity:
+            self.count += 1
+
+    def ordered(self) -> np.ndarray:
+        """Retained entries, oldest first (a copy)."""
+        start = (self.head - self.count) % self.capacity
+        idx = (start + np.arange(self.count)) % self.capacity
+        return self.entries[idx]
+
+
+# ==================================================
+# 🕒 DECISION TIMELINE
+# ==================================================
+class DecisionTimeline:
+
+    def __init__(self, fleet_capacity: int = 30, device_capacity: int = 30):
+        self.fleet_capacity = fleet_capacity
+        self.device_capacity = device_capacity
+        self.cursor = 0  # seq of the newest entry
+
+        self._fleet = TimelineRing(fleet_capacity)
+        self._devices = {}      # device_id → TimelineRing
+        self._slots = {}        # device_id → int slot
+        self._device_ids = []   # slot → device_id
+        self._lock = threading.Lock()
+
+    def _slot(self, device_id) -> int:
+        slot = self._slots.get(device_id)
+        if slot is None:
+            slot = self._slots[device_id] = len(self._device_ids)
+            self._device_ids.append(device_id)
+        if device_id not in self._devices:
+            self._devices[device_id] = TimelineRing(self.device_capacity)
+        return slot
+
+    def discard(self, device_id):
+        """
+        Drop a device's ring (e.g. it moved to another shard). Its slot
+        stays: fleet entries still name the device.
+        """
+        with self._lock:
+            self._devices.pop(device_id, None)
+
+    # ------------------------------
+    # Writes
+    # ------------------------------
+    def append(
+        self,
+        device_id,
+        timestamp: float,
+        soil: float,
+        decision: str,
+        reason: int,
+        rain_expected: bool,
+        water_saved: float,
+        pump_cycles_avoided: int,
+        policy_version: int = 0
+    ) -> int:
+        with self._lock:
+            self.cursor += 1
+            row = (
+                self.cursor,
+                timestamp,
+                self._slot(device_id),
+                _soil_tenths(soil),
+                DECISION_CODES[decision],
+                reason,
+                policy_version,
+                rain_expected,
+                water_saved,
+                pump_cycles_avoided
+            )
+            self._fleet.append(row)
+            self._devices[device_id].append(row)
+            return self.cursor
+
+    def append_batch(self, device_ids, timestamp: float, soil, decision, reason, rain_expected, impact: dict,
+                     policy_version=None):
+        """
+        Batch rows from pipeline.run_batch(): decision / reason are codes,
+        rain_expected and policy_version are per row or shared, impact
+        holds the fleet totals after the batch.
+        """
+        soil_tenths = _soil_tenths(soil)
+        decision = np.asarray(decision).tolist()
+        reason = np.asarray(reason).tolist()
+        policy_version = np.broadcast_to(0 if policy_version is None else policy_version, len(device_ids)).tolist()
+        rain_expected = np.broadcast_to(rain_expected, len(device_ids)).tolist()
+        water = impact["water_saved_liters"]
+        cycles = impact["pump_cycles_avoided"]
+
+        with self._lock:
+            for i, device_id in enumerate(device_ids):
+                self.cursor += 1
+                row = (
+                    self.cursor, timestamp, self._slot(device_id), soil_tenths[i],
+                    decision[i], reason[i], policy_version[i], rain_expected[i], water, cycles
+                )
+                self._fleet.append(row)
+                self._devices[device_id].append(row)
+
+    # ------------------------------
+    # Reads
+    # ------------------------------
+    def query(self, device_id=None, since: int = None, limit: int = None) -> dict:
+        """
+        {"timeline": entries oldest → newest, "cursor": newest seq}
+        since = cursor from a previous poll, limit keeps only the newest N.
+        """
+        with self._lock:
+            cursor = self.cursor
+            if device_id is None:
+                rows = self._fleet.ordered()
+            elif device_id in self._devices:
+                rows = self._devices[device_id].ordered()
+            else:
+                return {"timeline": [], "cursor": cursor}
+            device_ids = list(self._device_ids)
+
+        if since is not None:
+            rows = rows[np.searchsorted(rows["seq"], since, side="right"):]
+        if limit is not None and limit >= 0:
+            rows = rows[len(rows) - min(limit, len(rows)):]
+
+        entries = [
+            {
+                "seq": seq,
+                "timestamp": datetime.fromtimestamp(ts, tz=timezone.utc).replace(tzinfo=None).isoformat(),
+                "device_id": device_ids[device],
+                "soil": soil_tenths / 10,
+                "rain_expected": rain,
+                "decision": DECISIONS[decision],
+                "reason": OVERRIDE_REASONS[reason],
+                "policy_version": version,
+                "water_saved": water,
+                "pump_cycles_avoided": cycles
+            }
+            for seq, ts, device, soil_tenths, decision, reason, version, rain, water, cycles
+            in rows.tolist()
+        ]
+        return {"timeline": entries, "cursor": cursor}
+
+    def memory_report(self) -> dict:
+        with self._lock:
+            devices = len(self._devices)
+            retained = self._fleet.count + sum(r.count for r in self._devices.values())
+            allocated = self._fleet.entries.nbytes + sum(
+                r.entries.nbytes for r in self._devices.values()
+            )
+
+        return {
+            "bytes_per_entry": ENTRY_DTYPE.itemsize,
+            "devices": devices,
+            "retained_entries": retained,
+            "allocated_bytes": allocated,
+            "allocated_bytes_per_retained_entry": round(allocated / retained, 1) if retained else 0.0,
+            "fleet_capacity": self.fleet_capacity,
+            "device_capacity": self.device_capacity
+        }
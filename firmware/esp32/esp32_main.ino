@@ -6,17 +6,28 @@
  * - Hysteresis + Cooldown
  * - Sensor fault awareness
  * - Network-failure tolerant
+ * - Compact binary telemetry over UDP (JSON/HTTP fallback)
  ************************************************************/
 
 #include <WiFi.h>
+#include <WiFiUdp.h>
 #include <HTTPClient.h>
 #include <DHT.h>
 #include <ArduinoJson.h>
+#include <Preferences.h>
+#include <time.h>
 
 /* ===================== CONFIG ===================== */
 const char* WIFI_SSID = "<WIFI_SSID>";
 const char* WIFI_PASSWORD = "<WIFI_PASSWORD>";
 const char* SERVER_URL = "http://<SERVER_IP>:5000/data";
+const char* BACKFILL_URL = "http://<SERVER_IP>:5000/data/backfill";
+
+// Binary frames (backend/server/telemetry_frame.py); false = JSON POST
+const bool USE_BINARY_TELEMETRY = true;
+const char* SERVER_HOST = "<SERVER_IP>";
+const uint16_t UDP_PORT = 5005;   // server: AGRI_UDP_PORT=5005
+const char* NTP_SERVER = "pool.ntp.org";
 
 const unsigned long SENSOR_INTERVAL = 2000;
 const unsigned long TELEMETRY_INTERVAL = 10000;
@@ -48,6 +59,36 @@ enum PumpState {
 
 PumpState pumpState = IDLE;
 
+/* ===================== BINARY FRAME ===================== */
+#define FRAME_MAGIC 0x4741
+#define FRAME_VERSION 1
+#define OFFLINE_BUFFER 32   // readings kept while WiFi is down
+
+struct __attribute__((packed)) FrameHeader {
+  uint16_t magic;
+  uint8_t version;
+  uint8_t count;
+  uint32_t device;
+};
+
+struct __attribute__((packed)) FrameReading {
+  uint32_t seq;
+  uint32_t timestamp;   // epoch seconds, 0 until NTP sync
+  uint16_t soil;        // 0.1 %
+  int16_t temp;         // 0.1 °C
+  uint16_t light;
+};
+
+WiFiUDP udp;
+Preferences prefs;
+uint32_t deviceId = 0;
+uint32_t telemetrySeq = 0;   // boot count << 20 | reading count (wraps after 2^32; server resyncs)
+
+// Ring of unsent readings (oldest dropped when full)
+FrameReading pending[OFFLINE_BUFFER];
+uint8_t pendingHead = 0;
+uint8_t pendingCount = 0;
+
 /* ===================== SYSTEM STATE ===================== */
 struct {
   float temp;
@@ -142,7 +183,70 @@ void runFSM(unsigned long now) {
 }
 
 /* ===================== TELEMETRY ===================== */
+void queueReading() {
+  time_t epoch = time(nullptr);
+
+  FrameReading& r = pending[(pendingHead + pendingCount) % OFFLINE_BUFFER];
+  r.seq = telemetrySeq++;
+  if ((telemetrySeq & 0xFFFFF) == 0) {
+    // Reading count carried into the boot field: the next boot starts above it
+    prefs.putUInt("boots", telemetrySeq >> 20);
+  }
+  r.timestamp = epoch > 1600000000 ? (uint32_t)epoch : 0;
+  r.soil = (uint16_t)(sensors.soil * 10);
+  r.temp = (int16_t)lroundf(sensors.temp * 10);
+  r.light = (uint16_t)sensors.light;
+
+  if (pendingCount < OFFLINE_BUFFER) {
+    pendingCount++;
+  } else {
+    pendingHead = (pendingHead + 1) % OFFLINE_BUFFER;
+  }
+}
+
+void sendBinaryTelemetry() {
+  queueReading();
+  if (WiFi.status() != WL_CONNECTED) return;
+
+  // Everything buffered goes out in one datagram
+  uint8_t frame[sizeof(FrameHeader) + OFFLINE_BUFFER * sizeof(FrameReading)];
+  FrameHeader header = {FRAME_MAGIC, FRAME_VERSION, pendingCount, deviceId};
+  memcpy(frame, &header, sizeof(header));
+  for (uint8_t i = 0; i < pendingCount; i++) {
+    memcpy(
+      frame + sizeof(header) + i * sizeof(FrameReading),
+      &pending[(pendingHead + i) % OFFLINE_BUFFER],
+      sizeof(FrameReading)
+    );
+  }
+
+  size_t size = sizeof(header) + pendingCount * sizeof(FrameReading);
+  bool sent;
+  if (pendingCount > 1) {
+    // Catching up after an outage: acknowledged HTTP upload, the server
+    // replays the history and dedupes by seq, so a retry is harmless
+    HTTPClient http;
+    http.setTimeout(2000);
+    http.begin(BACKFILL_URL);
+    http.addHeader("Content-Type", "application/octet-stream");
+    sent = http.POST(frame, size) == 200;
+    http.end();
+  } else {
+    sent = udp.beginPacket(SERVER_HOST, UDP_PORT) && udp.write(frame, size) == size && udp.endPacket();
+  }
+
+  if (sent) {
+    pendingHead = 0;
+    pendingCount = 0;
+    digitalWrite(LED_STATUS, !digitalRead(LED_STATUS));
+  }
+}
+
 void sendTelemetry() {
+  if (USE_BINARY_TELEMETRY) {
+    sendBinaryTelemetry();
+    return;
+  }
   if (WiFi.status() != WL_CONNECTED) return;
 
   StaticJsonDocument<256> doc;
@@ -159,7 +263,15 @@ void sendTelemetry() {
   http.setTimeout(800);
   http.begin(SERVER_URL);
   http.addHeader("Content-Type", "application/json");
-  http.POST(payload);
+  // Minimal reply "<decision code> <cooldown s>\n" instead of the full agent JSON
+  http.addHeader("Accept", "application/x-agri-min");
+  if (http.POST(payload) == 200) {
+    int decision = 0;
+    unsigned long cooldown = 0;
+    if (sscanf(http.getString().c_str(), "%d %lu", &decision, &cooldown) == 2) {
+      Serial.printf("Server decision %d, cooldown %lus\n", decision, cooldown);
+    }
+  }
   http.end();
 
   digitalWrite(LED_STATUS, !digitalRead(LED_STATUS));
@@ -174,6 +286,16 @@ void setup() {
 
   dht.begin();
   WiFi.begin(WIFI_SSID, WIFI_PASSWORD);
+
+  // Low 32 bits of the MAC: server names the device esp32_<hex id>
+  deviceId = (uint32_t)ESP.getEfuseMac();
+  configTime(0, 0, NTP_SERVER);
+
+  // Sequence numbers survive reboots (server dedupes by seq)
+  prefs.begin("agri", false);
+  uint32_t boots = prefs.getUInt("boots", 0) + 1;
+  prefs.putUInt("boots", boots);
+  telemetrySeq = (boots & 0xFFF) << 20;
 }
 
 /* ===================== LOOP ===================== */